@@ -1,5 +1,3 @@
-import csv
-import math
 import argparse
 import sys
 
@@ -11,32 +9,8 @@ except ImportError:
     tk = None
     filedialog = None
 
-def compute_cumulative_length(csv_file):
-    # 1本の中心線CSVから累積長さを計算する
-    points = []
-    with open(csv_file, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            x = float(row['x'])
-            y = float(row['y'])
-            z = float(row['z'])
-            points.append((x, y, z))
-
-    if len(points) < 2:
-        return 0.0
-
-    cumulative_length = 0.0
-    for i in range(1, len(points)):
-        x1, y1, z1 = points[i - 1]
-        x2, y2, z2 = points[i]
-        distance = math.sqrt(
-            (x2 - x1)**2 +
-            (y2 - y1)**2 +
-            (z2 - z1)**2
-        )
-        cumulative_length += distance
-
-    return cumulative_length
+from length_batch import centerline_length
+from stage_cache import add_cache_arguments, configure_cache_from_args
 
 
 def process_files(file_list):
@@ -44,7 +18,7 @@ def process_files(file_list):
     results = {}
     for path in file_list:
         try:
-            length = compute_cumulative_length(path)
+            length = centerline_length(path)
             results[path] = length
             print(f"{path}: total length = {length:.6f}")
         except Exception as e:
@@ -81,7 +55,10 @@ def main():
         help="入力CSVファイル（複数指定可）。指定がなければGUIで選択。"
     )
 
+    add_cache_arguments(parser)
+
     args = parser.parse_args()
+    configure_cache_from_args(args)
 
     if args.files:
         # コマンドラインから指定されたファイルを処理
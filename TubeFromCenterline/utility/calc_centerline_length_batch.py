@@ -1,9 +1,6 @@
-import csv
-import math
 import argparse
 import sys
 import os
-import glob
 
 # グラフ描画用
 try:
@@ -19,33 +16,8 @@ except ImportError:
     tk = None
     filedialog = None
 
-
-def compute_cumulative_length(csv_file):
-    # 1本の中心線CSVから累積長さを計算する
-    points = []
-    with open(csv_file, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            x = float(row['x'])
-            y = float(row['y'])
-            z = float(row['z'])
-            points.append((x, y, z))
-
-    if len(points) < 2:
-        return 0.0
-
-    cumulative_length = 0.0
-    for i in range(1, len(points)):
-        x1, y1, z1 = points[i - 1]
-        x2, y2, z2 = points[i]
-        distance = math.sqrt(
-            (x2 - x1)**2 +
-            (y2 - y1)**2 +
-            (z2 - z1)**2
-        )
-        cumulative_length += distance
-
-    return cumulative_length
+from stage_cache import add_cache_arguments, configure_cache_from_args
+from length_batch import list_csv_files, store_lengths, stream_lengths
 
 
 def select_directory_via_gui():
@@ -76,7 +48,7 @@ def plot_histogram(lengths, output_png):
         print("matplotlib がインポートできないため、グラフは出力されません。", file=sys.stderr)
         return
 
-    if not lengths:
+    if len(lengths) == 0:
         print("ヒストグラムを作成するデータがありません。", file=sys.stderr)
         return
 
@@ -93,45 +65,35 @@ def plot_histogram(lengths, output_png):
     print(f"ヒストグラムを {output_png} に保存しました。")
 
 
-def process_directory(input_dir, output_csv):
+def process_directory(input_dir, output_csv, workers=None):
     """
-    指定ディレクトリ内の *.csv をすべて処理し、
-    filename, total_length をまとめた output_csv を出力し、
+    指定ディレクトリ内の *.csv をすべて（workers 個のプロセスで並列に）処理し、
+    filename, total_length を終わった順に output_csv へ書き出し、
     さらに total_length の度数分布を png で出力する。
     """
-    # ディレクトリ内の *.csv ファイル一覧
-    pattern = os.path.join(input_dir, "*.csv")
-    csv_files = sorted(glob.glob(pattern))
-
-    # 自分がこれから書く出力ファイルを一覧から除外（念のため）
-    csv_files = [f for f in csv_files if os.path.abspath(f) != os.path.abspath(output_csv)]
+    csv_files = list_csv_files(input_dir, output_csv)
 
     if not csv_files:
         print("指定ディレクトリ内に *.csv ファイルが見つかりませんでした。")
         return
 
-    results = []
+    # 並列に計算し、結果は1件ずつCSVへ書き出す（統計量も逐次集計）
+    stats = stream_lengths(csv_files, output_csv, workers)
+    report_lengths(stats, output_csv)
 
-    for path in csv_files:
-        try:
-            length = compute_cumulative_length(path)
-            filename_only = os.path.basename(path)
-            results.append((filename_only, length))
-            print(f"{filename_only}: total length = {length:.6f}")
-        except Exception as e:
-            print(f"{path}: エラーが発生しました: {e}", file=sys.stderr)
 
-    # 結果をまとめてCSVに書き出し
-    with open(output_csv, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["filename", "total_length"])
-        for filename, length in results:
-            writer.writerow([filename, f"{length:.6f}"])
+def process_store(store_path, output_csv, variant="original"):
+    """
+    中心線ストア（.npz）の variant の中心線すべてについて同じ処理を行う。
+    """
+    stats = store_lengths(store_path, output_csv, variant)
+    report_lengths(stats, output_csv)
 
-    print(f"\n結果を {output_csv} に書き出しました。")
 
+def report_lengths(stats, output_csv):
+    """集計済みの統計量から、output_csv と同じ場所にヒストグラムを出力する"""
     # total_length の配列を作ってヒストグラムを出力
-    lengths = [length for _, length in results]
+    lengths = stats.values()
     # 出力PNGファイル名（output_csv と同じ場所・同じベース名に "_hist.png" を付ける）
     base, _ = os.path.splitext(output_csv)
     output_png = base + "_hist.png"
@@ -150,8 +112,30 @@ def main():
         "-o", "--output",
         help="出力CSVファイル名（パス）。省略時は '<dir>/centerline_lengths.csv'。"
     )
+    parser.add_argument(
+        "-j", "--workers", type=int,
+        help="並列プロセス数。省略時は CPU コア数。"
+    )
+    parser.add_argument(
+        "--store",
+        help="CSV の代わりに中心線ストア（centerline_store.py で作った .npz）から読み込む。"
+    )
+    parser.add_argument(
+        "--variant", default="original",
+        help="--store 使用時に対象とする中心線の種類（original, resampled120 など）。既定: original"
+    )
+
+    add_cache_arguments(parser)
 
     args = parser.parse_args()
+    configure_cache_from_args(args)
+
+    if args.store:
+        output_csv = args.output or os.path.join(
+            os.path.dirname(os.path.abspath(args.store)), "centerline_lengths.csv"
+        )
+        process_store(args.store, output_csv, args.variant)
+        return
 
     # ディレクトリを決定
     if args.dir:
@@ -168,7 +152,7 @@ def main():
     else:
         output_csv = os.path.join(input_dir, "centerline_lengths.csv")
 
-    process_directory(input_dir, output_csv)
+    process_directory(input_dir, output_csv, args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線の座標だけから、各点の接線・曲率・ねじれ率を計算するスクリプト。
+
+V-modeler の PLY や siphon の VTK には curvature / torsion が入っているが、
+output_csv/*_ascii.csv のような座標だけの中心線には無い。ここでは
+  - savgol : 弧長で等間隔に並べ直した点に、窓ごとの多項式（Savitzky-Golay）を当てはめて微分する
+  - spline : 弧長をパラメータにした平滑化スプライン（5次, SciPy が必要）を微分する
+のどちらかで r', r'', r''' を求め、
+  曲率     κ = |r' × r''| / |r'|^3
+  ねじれ率 τ = (r' × r'')・r''' / |r' × r''|^2
+を全点まとめて計算する。結果は元の点の位置で返す。
+
+使い方:
+  python centerline_geometry.py "../data/10_siphon(MCA_ICA)/output_csv/BG0001_L_MCA-ICA_ascii.csv"
+  python centerline_geometry.py -d "../data/10_siphon(MCA_ICA)/output_csv" -o geometry/ --summary geometry/summary.csv
+  python centerline_geometry.py --method spline --noise 0.05 -d ... -o geometry/
+"""
+
+import argparse
+import csv
+import glob
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from centerline_io import cumulative_length
+from centerline_store import has_centerline_name
+from parallel_batch import iter_parallel, report_error
+from resample_centerline import FLOAT_FORMAT, interpolate_table, resample_arrays
+from stage_cache import cached
+
+METHODS = ("savgol", "spline")
+
+# 結果CSVの列（x,y,z の後に並べる）
+GEOMETRY_COLUMNS = ("s", "tx", "ty", "tz", "curvature", "torsion")
+
+SUMMARY_FIELDS = [
+    "file_name", "n_points", "length", "max_curvature", "mean_curvature",
+    "max_abs_torsion", "total_turning",
+]
+
+
+def load_points(path):
+    """中心線の点列 (M,3) を読む（CSV / VTK / PLY）"""
+    if path.lower().endswith(".ply"):
+        from ply_reader import read_ply_vertices
+
+        v = read_ply_vertices(path, ("x", "y", "z"))
+        return np.column_stack([v["x"], v["y"], v["z"]])
+    from tube_mesh import load_centerline
+
+    return load_centerline(path)[0]
+
+
+def _savgol_matrix(half, order, h):
+    """窓 [-half, half]（間隔 h）の点に order 次多項式を最小二乗で当てはめる行列 (order+1, 2*half+1)"""
+    offsets = np.arange(-half, half + 1) * h
+    return np.linalg.pinv(np.vander(offsets, order + 1, increasing=True))
+
+
+def savgol_derivatives(values, h, window, order=3, max_deriv=3):
+    """
+    等間隔 h の値 values (N,C) の 0〜max_deriv 階微分を、Savitzky-Golay で求める [(N,C), ...]。
+    window は窓の点数（奇数）。両端の half 点は、端の窓の多項式をその位置で評価する。
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    window = min(window, n if n % 2 else n - 1)
+    order = min(order, window - 1)
+    if window < 3 or order < 2:
+        raise ValueError("点が少なすぎるため、2階以上の微分を求められません。")
+    half = window // 2
+
+    # 窓ごとの多項式の係数 (N-2*half, C, order+1)
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    coeffs = windows @ _savgol_matrix(half, order, h).T
+
+    # 各点で使う窓と、その窓の中心からの距離
+    i = np.arange(n)
+    w = np.clip(i - half, 0, n - window)
+    t = ((i - (w + half)) * h)[:, None]
+    c = coeffs[w]
+
+    out = []
+    for d in range(max_deriv + 1):
+        total = np.zeros(values.shape)
+        for k in range(d, order + 1):
+            total += c[:, :, k] * (math.factorial(k) / math.factorial(k - d)) * t ** (k - d)
+        out.append(total)
+    return out
+
+
+def spline_derivatives(points, s, noise=0.0):
+    """
+    弧長 s をパラメータにした 5次の平滑化スプラインの 0〜3 階微分 [(M,3), ...]。
+    noise は点の位置のばらつき（長さ）の目安で、平滑化の強さ s = M * noise^2 に使う。
+    """
+    try:
+        from scipy.interpolate import splev, splprep
+    except ImportError:
+        raise ImportError("spline には scipy が必要です。'pip install scipy' を実行してください。")
+    if len(points) < 6:
+        raise ValueError("spline には 6 点以上が必要です。")
+    tck, _ = splprep(points.T, u=s, k=5, s=len(points) * noise ** 2)
+    return [np.column_stack(splev(s, tck, der=d)) for d in range(4)]
+
+
+def frenet_quantities(d1, d2, d3):
+    """1〜3階微分から (単位接線 (M,3), 曲率 (M,), ねじれ率 (M,))"""
+    speed = np.linalg.norm(d1, axis=1)
+    cross = np.cross(d1, d2)
+    cross2 = np.einsum("ij,ij->i", cross, cross)
+    tangent = d1 / np.maximum(speed, 1e-12)[:, None]
+    curvature = np.sqrt(cross2) / np.maximum(speed, 1e-12) ** 3
+    # ほぼ直線のところ（r' × r'' ≈ 0）ではねじれ率は定まらないので 0 にする
+    scale = np.maximum(speed, 1e-12) ** 6 * 1e-12
+    torsion = np.divide(
+        np.einsum("ij,ij->i", cross, d3), cross2,
+        out=np.zeros(len(d1)), where=cross2 > scale,
+    )
+    return tangent, curvature, torsion
+
+
+def centerline_geometry(points, method="savgol", window=3.0, order=3, spacing=None, noise=0.0):
+    """
+    中心線 points (M,3) の各点の弧長・接線・曲率・ねじれ率を返す。
+    {"s", "tangent" (M,3), "curvature", "torsion"}。
+
+    savgol では、弧長の間隔 spacing（既定: 区間長の中央値）で並べ直してから
+    長さ window の窓で微分し、元の点の位置に線形補間で戻す。
+    """
+    points = np.asarray(points, dtype=float)
+    s = cumulative_length(points)
+    keep = np.concatenate([[True], np.diff(s) > 0])
+    p, sk = points[keep], s[keep]
+    if len(p) < 3:
+        raise ValueError("長さのある区間が 2 つ未満のため、曲率を計算できません。")
+
+    if method == "spline":
+        _, d1, d2, d3 = spline_derivatives(p, sk, noise)
+        tangent, curvature, torsion = frenet_quantities(d1, d2, d3)
+        table = np.column_stack([tangent, curvature, torsion])
+    elif method == "savgol":
+        spacing = spacing or float(np.median(np.diff(sk)))
+        uniform, _ = resample_arrays(p, spacing=spacing)
+        su = cumulative_length(uniform)
+        h = su[-1] / (len(uniform) - 1)
+        n_window = 2 * max(int(round(window / h / 2)), 1) + 1
+        _, d1, d2, d3 = savgol_derivatives(uniform, h, n_window, order)
+        tangent, curvature, torsion = frenet_quantities(d1, d2, d3)
+        table = interpolate_table(
+            np.linspace(0.0, su[-1], len(uniform)), np.column_stack([tangent, curvature, torsion]),
+            sk * (su[-1] / sk[-1]),
+        )
+        table[:, :3] /= np.linalg.norm(table[:, :3], axis=1, keepdims=True)
+    else:
+        raise ValueError(f"未対応の方法です: {method}")
+
+    # 同じ位置の点（除いた点）には直前の点の値を使う
+    full = table[np.cumsum(keep) - 1]
+    return {"s": s, "tangent": full[:, :3], "curvature": full[:, 3], "torsion": full[:, 4]}
+
+
+def geometry_summary(name, geom):
+    """1本分の要約（最大・平均の曲率、ねじれ率の最大、曲率の積分 = 全体の曲がり角 [rad]）"""
+    s, k = geom["s"], geom["curvature"]
+    ds = np.diff(s)
+    length = float(s[-1])
+    turning = float(np.sum(0.5 * (k[1:] + k[:-1]) * ds))
+    return {
+        "file_name": name,
+        "n_points": len(s),
+        "length": length,
+        "max_curvature": float(np.max(k)),
+        "mean_curvature": turning / length if length > 0 else float("nan"),
+        "max_abs_torsion": float(np.max(np.abs(geom["torsion"]))),
+        "total_turning": turning,
+    }
+
+
+def output_path_for(path, output_dir=None):
+    """<元のファイル名>_geometry.csv"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(out_dir, f"{stem}_geometry.csv")
+
+
+def geometry_task(task):
+    """
+    中心線1本の接線・曲率・ねじれ率を計算して CSV に書き出す（プロセスプールのワーカーで実行される）。
+    要約の dict を返す。
+    """
+    path, params = task["path"], task["params"]
+    points = load_points(path)
+    geom = cached("centerline_geometry", [path], params, lambda: centerline_geometry(points, **params))
+
+    table = np.column_stack([points, geom["s"], geom["tangent"], geom["curvature"], geom["torsion"]])
+    df = pd.DataFrame(table, columns=["x", "y", "z", *GEOMETRY_COLUMNS])
+    df.to_csv(output_path_for(path, task["output_dir"]), index=False, float_format=FLOAT_FORMAT)
+    return geometry_summary(os.path.basename(path), geom)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中心線の座標から接線・曲率・ねじれ率を計算する")
+    parser.add_argument("files", nargs="*", help="入力ファイル（CSV / VTK / PLY、複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの *.csv / *.vtk をすべて処理する")
+    parser.add_argument("--method", choices=METHODS, default="savgol", help="微分の方法（既定: savgol）")
+    parser.add_argument("--window", type=float, default=3.0, help="savgol の窓の長さ（既定: 3.0）")
+    parser.add_argument("--order", type=int, default=3, help="savgol の多項式の次数（既定: 3）")
+    parser.add_argument("--spacing", type=float, help="savgol で並べ直す間隔（既定: 区間長の中央値）")
+    parser.add_argument("--noise", type=float, default=0.05, help="spline の位置のばらつきの目安（既定: 0.05）")
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("--summary", help="1本ごとの要約を書き出す CSV")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.dir:
+        files += [
+            f for f in sorted(glob.glob(os.path.join(args.dir, "*")))
+            if os.path.splitext(f)[1].lower() in (".csv", ".vtk")
+            # 自分の出力や再サンプリング済みのファイル、centerline_lengths.csv などの結果表は対象外
+            and not f.endswith("_geometry.csv") and "_resampled" not in os.path.basename(f)
+            and has_centerline_name(f)
+        ]
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.method == "savgol":
+        params = {"method": "savgol", "window": args.window, "order": args.order, "spacing": args.spacing}
+    else:
+        params = {"method": "spline", "noise": args.noise}
+    tasks = [{"path": f, "params": params, "output_dir": args.output_dir} for f in files]
+
+    summaries = []
+    for task, summary, error in iter_parallel(geometry_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        summaries.append(summary)
+        print(f"{summary['file_name']}: max curvature = {summary['max_curvature']:.4f}, "
+              f"total turning = {summary['total_turning']:.3f} rad")
+
+    if args.summary:
+        summaries.sort(key=lambda r: r["file_name"])
+        with open(args.summary, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(summaries)
+        print(f"要約を書き出しました: {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
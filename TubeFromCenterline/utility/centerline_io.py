@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線CSV（x,y,z[,radius,...]）の読み込みと、弧長の計算をまとめた共通モジュール。
+"""
+
+import numpy as np
+
+
+def read_csv_header(csv_file):
+    """CSV の1行目（列名）をリストで返す"""
+    with open(csv_file, newline="") as f:
+        return [c.strip() for c in f.readline().strip().split(",")]
+
+
+def read_centerline_columns(csv_file, columns=("x", "y", "z")):
+    """
+    中心線CSVから columns の列だけを (M, len(columns)) の配列で読み込む。
+    列名は大文字/小文字を区別しない。
+    """
+    header = [c.lower() for c in read_csv_header(csv_file)]
+    try:
+        idx = [header.index(c.lower()) for c in columns]
+    except ValueError:
+        missing = [c for c in columns if c.lower() not in header]
+        raise ValueError(f"{'/'.join(missing)} 列が見つかりません: {csv_file}")
+
+    values = np.loadtxt(csv_file, delimiter=",", skiprows=1, usecols=idx, ndmin=2)
+    return values.reshape(-1, len(columns))
+
+
+def read_centerline_points(csv_file):
+    """中心線CSVの x, y, z を (M,3) 配列で返す"""
+    return read_centerline_columns(csv_file, ("x", "y", "z"))
+
+
+def segment_lengths(points):
+    """隣り合う点の間の距離 (M-1,)"""
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return np.zeros(0)
+    return np.linalg.norm(np.diff(points, axis=0), axis=1)
+
+
+def cumulative_length(points):
+    """各点までの累積長さ (M,)（先頭は 0）"""
+    return np.concatenate([[0.0], np.cumsum(segment_lengths(points))])
+
+
+def polyline_length(points):
+    """折れ線の全長"""
+    return float(segment_lengths(points).sum())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線の幾何学的な指標（蛇行度など）を、血管全体とラベルの区間ごとにまとめて計算するスクリプト。
+
+指標（区間ごと）:
+  length         弧長
+  chord          始点と終点の直線距離
+  dm_tortuosity  Distance Metric = length / chord
+  soam           Sum of Angles Metric（Bullitt ら）: 各点の曲がりの角度とねじれの角度から
+                 sqrt(IP^2 + TP^2) を足し、length で割ったもの [rad/mm]
+  inflections    変曲点の数（平滑化した法線の向きが反転する点）
+  icm            Inflection Count Metric = (inflections + 1) * dm_tortuosity
+  max_curvature, mean_curvature（∫κ ds / length）
+  mean_radius, min_radius（半径があれば）
+
+区間は siphon の VTK の lab、PLY / CSV の label など点ごとのラベルが同じ値で続く範囲
+（label_segments.py と同じ分け方）。
+点ごとの量（区間長・角度・曲率など）は中心線1本につき1回だけ計算し、
+全体と各区間の値は累積和の差でまとめて求める。
+
+出力は1行1本の横長の表（全体の指標と、<指標>_lab<ラベル> の列）。--long なら1行1区間。
+
+使い方:
+  python centerline_metrics.py -d "../data/8_Centerline_Siphon(with labal)" -o siphon_metrics.csv
+  python centerline_metrics.py -d "../data/10_siphon(MCA_ICA)/output_csv" -o metrics.csv --curvature computed
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from centerline_geometry import centerline_geometry
+from centerline_store import has_centerline_name, is_segment_file, parse_centerline_name
+from label_segments import label_runs, load_labeled_centerline, segment_names
+from parallel_batch import iter_parallel, report_error
+from stage_cache import cached
+
+# 区間ごとの指標の列（横長の表ではこの順に並べる）
+METRIC_COLUMNS = [
+    "n_points", "length", "chord", "dm_tortuosity", "soam", "inflections", "icm",
+    "max_curvature", "mean_curvature", "mean_radius", "min_radius",
+]
+
+# 変曲点を数えるとき、これより曲率が小さい点（ほぼ直線で法線が定まらない）は見ない
+INFLECTION_MIN_CURVATURE = 0.02
+
+
+def _angle(u, v):
+    """行ごとのベクトル u, v のなす角 [rad]（長さ 0 のベクトルとの角は 0）"""
+    nu = np.linalg.norm(u, axis=1)
+    nv = np.linalg.norm(v, axis=1)
+    cos = np.einsum("ij,ij->i", u, v) / np.maximum(nu * nv, 1e-300)
+    return np.where((nu > 0) & (nv > 0), np.arccos(np.clip(cos, -1.0, 1.0)), 0.0)
+
+
+def _range_sum(cum, lo, hi):
+    """累積和 cum（先頭に 0 を付けたもの）から、区間 [lo, hi) の和をまとめて求める"""
+    hi = np.maximum(hi, lo)
+    return cum[hi] - cum[lo]
+
+
+def point_quantities(points, curvature):
+    """
+    区間ごとの指標の元になる点・辺ごとの量を1回で計算する。
+      seg_len (M-1,)    : 辺の長さ
+      curv_len (M-1,)   : 辺の平均曲率 * 辺の長さ（∫κ ds の台形則）
+      in_plane (M,)     : 点 i での曲がりの角度（辺 i-1 と辺 i のなす角。両端は 0）
+      torsional (M,)    : 点 i での捩れの角度（点 i と i+1 の従法線のなす角。定まらなければ 0）
+      flip (M,)         : 点 i が変曲点か
+    """
+    d = np.diff(points, axis=0)
+    seg_len = np.linalg.norm(d, axis=1)
+    m = len(points)
+
+    in_plane = np.zeros(m)
+    torsional = np.zeros(m)
+    if m >= 3:
+        in_plane[1:-1] = _angle(d[:-1], d[1:])
+        binormal = np.cross(d[:-1], d[1:])          # 点 1..M-2 の従法線
+        if m >= 4:
+            torsional[1:-2] = _angle(binormal[:-1], binormal[1:])
+
+    # 法線 = 接線の弧長微分。平滑化した接線から求め、ひとつ前の曲がっている点の法線と
+    # 逆向きなら、その点を変曲点とする（変曲点の前後は曲率がほぼ 0 なので飛ばして比べる）
+    flip = np.zeros(m, dtype=bool)
+    if m >= 3:
+        geom = centerline_geometry(points)
+        normal = np.gradient(geom["tangent"], geom["s"], axis=0)
+        curved = np.flatnonzero(curvature >= INFLECTION_MIN_CURVATURE)
+        if len(curved) > 1:
+            flip[curved[1:]] = np.einsum("ij,ij->i", normal[curved[:-1]], normal[curved[1:]]) < 0
+
+    curv_len = 0.5 * (curvature[1:] + curvature[:-1]) * seg_len
+    return {"seg_len": seg_len, "curv_len": curv_len, "in_plane": in_plane,
+            "torsional": torsional, "flip": flip}
+
+
+def segment_metrics(points, curvature, starts, ends, radius=None):
+    """
+    点 [starts[j], ends[j]) の区間ごとの指標を、累積和でまとめて求める {列名: (J,)}。
+    区間の境目をまたぐ辺は、どちらの区間にも含めない。
+    """
+    points = np.asarray(points, dtype=float)
+    curvature = np.asarray(curvature, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    q = point_quantities(points, curvature)
+
+    def cum(values):
+        return np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+
+    # 区間 [start, end) では、辺 [start, end-1) と内側の点 [start+1, end-1) を使う
+    length = _range_sum(cum(q["seg_len"]), starts, ends - 1)
+    curv_int = _range_sum(cum(q["curv_len"]), starts, ends - 1)
+    # SOAM は内側の点ごとに sqrt(IP^2 + TP^2) を足す。
+    # 最後の内側の点 end-2 の捩れの角は区間の外の点を使うので、その点は IP だけにする
+    cp = np.sqrt(q["in_plane"] ** 2 + q["torsional"] ** 2)
+    last = ends - 2
+    soam_sum = _range_sum(cum(cp), starts + 1, last) + np.where(last > starts, q["in_plane"][np.maximum(last, 0)], 0.0)
+    inflections = _range_sum(cum(q["flip"]), starts + 1, ends - 1).astype(np.int64)
+
+    chord = np.linalg.norm(points[ends - 1] - points[starts], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dm = np.where(chord > 0, length / chord, np.nan)
+        soam = np.where(length > 0, soam_sum / length, np.nan)
+        mean_curv = np.where(length > 0, curv_int / length, np.nan)
+
+    # 区間ごとの最大・最小・和。全体と lab0 のように区間が重なってもよいように、
+    # reduceat に (開始, 終了) を交互に渡して偶数番目だけを使う（区間は1点以上ある前提）
+    bounds = np.column_stack([starts, ends]).ravel()
+
+    def reduce(ufunc, values):
+        return ufunc.reduceat(np.append(values, 0.0), bounds)[::2]
+
+    max_curv = reduce(np.maximum, curvature)
+    out = {
+        "n_points": ends - starts,
+        "length": length,
+        "chord": chord,
+        "dm_tortuosity": dm,
+        "soam": soam,
+        "inflections": inflections,
+        "icm": (inflections + 1) * dm,
+        "max_curvature": max_curv,
+        "mean_curvature": mean_curv,
+    }
+    if radius is not None and np.any(np.isfinite(radius)):
+        radius = np.asarray(radius, dtype=float)
+        out["mean_radius"] = reduce(np.add, radius) / (ends - starts)
+        out["min_radius"] = reduce(np.minimum, radius)
+    else:
+        out["mean_radius"] = np.full(len(starts), np.nan)
+        out["min_radius"] = np.full(len(starts), np.nan)
+    return out
+
+
+def centerline_metrics(points, attrs, curvature_source="auto", use_labels=True, breaks=()):
+    """
+    中心線1本の全体とラベルの区間ごとの指標を、1行1区間の dict のリストで返す。
+    curvature_source: "auto"（ファイルにあればそれ、なければ計算）/ "file" / "computed"
+    breaks は線の並びの境目（label_segments.load_labeled_centerline の戻り値）。
+    """
+    points = np.asarray(points, dtype=float)
+    curvature = attrs.get("curvature")
+    has_file_curvature = curvature is not None and np.all(np.isfinite(curvature))
+    if curvature_source == "file" and not has_file_curvature:
+        raise ValueError("ファイルに curvature がありません。")
+    if curvature_source == "computed" or not has_file_curvature:
+        curvature = centerline_geometry(points)["curvature"]
+
+    starts, ends, names = [0], [len(points)], ["all"]
+    labels = [None]
+    if use_labels and attrs.get("label") is not None:
+        run_starts, run_ends, run_labels = label_runs(np.asarray(attrs["label"]).astype(np.int64), breaks)
+        starts += list(run_starts)
+        ends += list(run_ends)
+        labels += [int(lab) for lab in run_labels]
+        names += segment_names(run_labels)
+
+    metrics = segment_metrics(points, curvature, starts, ends, attrs.get("radius"))
+    rows = []
+    for j, name in enumerate(names):
+        row = {"segment": name, "label": labels[j], "start": int(starts[j]), "end": int(ends[j])}
+        row.update({k: v[j].item() for k, v in metrics.items()})
+        rows.append(row)
+    return rows
+
+
+def metrics_task(task):
+    """中心線1本の指標を計算する（プロセスプールのワーカーで実行される）"""
+    path, params = task["path"], task["params"]
+
+    def compute():
+        points, attrs, breaks = load_labeled_centerline(path)
+        return centerline_metrics(points, attrs, params["curvature"], params["labels"], breaks)
+
+    return cached("centerline_metrics", [path], params, compute)
+
+
+def metrics_table(paths, params, workers=None):
+    """全例の指標を並列に計算し、1行1区間の DataFrame にする"""
+    tasks = [{"path": p, "params": params} for p in paths]
+    rows = []
+    for task, result, error in iter_parallel(metrics_task, tasks, workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        subject, side, variant = parse_centerline_name(task["path"])
+        info = {"file_name": os.path.basename(task["path"]), "subject": subject, "side": side, "variant": variant}
+        rows += [{**info, **r} for r in result]
+    # 1本ごとに全体の行を先頭に、区間を始点の順に並べる
+    return pd.DataFrame(rows).sort_values(["file_name", "start", "end"], ascending=[True, True, False],
+                                          ignore_index=True)
+
+
+def wide_table(long):
+    """1行1区間の表を、1行1本の横長の表にする（全体の列と <指標>_<区間名> の列）"""
+    info = ["file_name", "subject", "side", "variant"]
+    whole = long[long["segment"] == "all"].set_index(info)[METRIC_COLUMNS]
+    parts = long[long["segment"] != "all"]
+    if parts.empty:
+        return whole.reset_index()
+    pivot = parts.pivot_table(index=info, columns="segment", values=METRIC_COLUMNS, aggfunc="first", dropna=False)
+    # 区間名の順（lab0, lab1, ...）に、区間ごとに指標をまとめて並べる
+    segments = sorted(parts["segment"].unique(), key=lambda n: (len(n), n))
+    pivot = pivot.reindex(columns=[(m, s) for s in segments for m in METRIC_COLUMNS])
+    pivot.columns = [f"{m}_{s}" for m, s in pivot.columns]
+    return whole.join(pivot).reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中心線の蛇行度などの指標を、全体とラベルの区間ごとに計算する")
+    parser.add_argument("files", nargs="*", help="中心線ファイル（CSV / VTK / PLY、複数指定可）")
+    parser.add_argument("-d", "--dir",
+                        help="このディレクトリの中心線（*.csv / *.vtk / *.ply）をすべて処理する（label_segments の *_lab<N>.csv は除く）")
+    parser.add_argument("-o", "--output", default="centerline_metrics.csv", help="結果の表（既定: centerline_metrics.csv）")
+    parser.add_argument("--long", action="store_true", help="1行1区間の縦長の表で出力する")
+    parser.add_argument("--curvature", choices=("auto", "file", "computed"), default="auto",
+                        help="曲率: ファイルの値 / 座標から計算（既定: auto = ファイルにあればその値）")
+    parser.add_argument("--no-labels", action="store_true", help="ラベルの区間ごとの指標を計算しない")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.dir:
+        files += [
+            f for f in sorted(glob.glob(os.path.join(args.dir, "*")))
+            if os.path.splitext(f)[1].lower() in (".csv", ".vtk", ".ply")
+            and "_resampled" not in os.path.basename(f) and not f.endswith("_geometry.csv")
+            and not is_segment_file(f)
+        ]
+    files = [f for f in files if has_centerline_name(f)]
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+
+    params = {"curvature": args.curvature, "labels": not args.no_labels}
+    long = metrics_table(files, params, args.workers)
+    table = long if args.long else wide_table(long)
+    table.to_csv(args.output, index=False)
+
+    whole = long[long["segment"] == "all"]
+    print(f"{len(whole)} 本（{len(long) - len(whole)} 区間）の指標を {args.output} に書き出しました。")
+    print(whole[["length", "dm_tortuosity", "soam", "icm", "max_curvature"]].describe().round(4).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全中心線を1つの .npz ファイルにまとめて保持する「中心線ストア」。
+
+output_csv/ 以下の *_ascii.csv, *_resampled120.csv, uvcs/{u,v,c,s}/ のコピー,
+V-modeler の PLY, 元の VTK などを1回だけ読み込み、
+（被験者ID, 左右, バリアント）をキーにして O(1) で取り出せるようにする。
+
+ファイル内のレイアウト（すべて NumPy 配列）:
+  points    (P,3)  全中心線の点を連結したもの
+  radius    (P,)   点ごとの半径（無ければ NaN）
+  curvature (P,)   点ごとの曲率（無ければ NaN）
+  torsion   (P,)   点ごとの捩率（無ければ NaN）
+  label     (P,)   点ごとのラベル（無ければ -1）
+  offsets   (K+1,) 中心線 i の点は points[offsets[i]:offsets[i+1]]
+  subject, side, variant, shape_class, source  (K,)  中心線ごとの情報
+
+使い方:
+  python centerline_store.py build -o store.npz <ディレクトリ/ファイル...>
+  python centerline_store.py list store.npz
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+
+from centerline_io import read_csv_header, read_centerline_columns
+
+
+# 点ごとの属性と、欠損値
+POINT_ATTRIBUTES = {
+    "radius": np.nan,
+    "curvature": np.nan,
+    "torsion": np.nan,
+    "label": -1,
+}
+
+# 入力ファイルの列名・配列名 → ストアの属性名
+_ATTRIBUTE_ALIASES = {
+    "radius": "radius",
+    "maximuminscribedsphereradius": "radius",
+    "curvature": "curvature",
+    "torsion": "torsion",
+    "label": "label",
+    "lab": "label",
+}
+
+# ファイル名: BG0001_L_MCA-ICA_ascii_resampled120.csv, BG0010_R.ply, BG0001_ICA_L.vtk など
+_SUBJECT_PATTERN = re.compile(r"B[A-Z]\d{4}")
+_RESAMPLED_PATTERN = re.compile(r"resampled(\d+)$")
+
+# バリアント名に含めないトークン（形式の違いだけを表すもの）
+_NEUTRAL_TOKENS = {"ascii", "lab", "mca-ica"}
+
+# uvcs/{u,v,c,s} のように形状クラスごとに分けたディレクトリ名
+SHAPE_CLASSES = ("u", "v", "c", "s")
+
+
+def parse_centerline_name(path):
+    """
+    ファイル名から (被験者ID, 左右, バリアント) を取り出す。
+
+    バリアントは、MCA-ICA の中心線そのものなら "original"（PLY なら "vmodeler"）、
+    ICA や siphon など別の切り出しならその名前、*_resampledN なら "resampledN" を付ける。
+      BG0001_L_MCA-ICA_ascii.csv              -> ("BG0001", "L", "original")
+      BG0001_L_MCA-ICA_ascii_resampled120.csv -> ("BG0001", "L", "resampled120")
+      BG0001_ICA_L.vtk                        -> ("BG0001", "L", "ICA")
+      BG0001_L_siphon_lab.vtk                 -> ("BG0001", "L", "siphon")
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tokens = stem.split("_")
+    subject = next((t for t in tokens if _SUBJECT_PATTERN.fullmatch(t)), None)
+    side = next((t for t in tokens if t in ("L", "R")), None)
+    if subject is None or side is None:
+        raise ValueError(f"ファイル名から被験者ID・左右を判定できません: {path}")
+
+    names = []
+    resampled = ""
+    for t in tokens:
+        if t in (subject, side) or t.lower() in _NEUTRAL_TOKENS:
+            continue
+        m = _RESAMPLED_PATTERN.match(t)
+        if m:
+            resampled = t
+        else:
+            names.append(t)
+
+    if names:
+        variant = "_".join(names)
+    elif path.lower().endswith(".ply"):
+        variant = "vmodeler"
+    else:
+        variant = "original"
+
+    if resampled:
+        variant = resampled if variant == "original" else f"{variant}_{resampled}"
+    return subject, side, variant
+
+
+def has_centerline_name(path):
+    """被験者ID・左右がファイル名からわかるか（ディレクトリの中の結果表などを除くのに使う）"""
+    try:
+        parse_centerline_name(path)
+    except ValueError:
+        return False
+    return True
+
+
+# label_segments.py が書き出す区間ごとのファイル（<名前>_lab<ラベル>、<名前>_lab<ラベル>.<番号>）
+_SEGMENT_PATTERN = re.compile(r"_lab-?\d+(\.\d+)?$")
+
+
+def is_segment_file(path):
+    """label_segments.py の区間ごとの出力か（-d で中心線を集めるときに、元の中心線と分けるのに使う）"""
+    return bool(_SEGMENT_PATTERN.search(os.path.splitext(os.path.basename(path))[0]))
+
+
+def shape_class_of(path):
+    """uvcs/{u,v,c,s}/ 以下のファイルなら、その形状クラス（"u" など）を返す"""
+    parts = os.path.normpath(os.path.abspath(path)).split(os.sep)
+    for i, part in enumerate(parts[:-1]):
+        if part.lower() == "uvcs" and i + 1 < len(parts) - 1:
+            cls = parts[i + 1].lower()
+            if cls in SHAPE_CLASSES:
+                return cls
+    return ""
+
+
+def shape_class_lookup(uvcs_dir):
+    """uvcs/{u,v,c,s}/ 以下のファイル名から {(被験者ID, 左右): 形状クラス} を作る（手作業の分類）"""
+    lookup = {}
+    for path in glob.glob(os.path.join(uvcs_dir, "*", "**", "*"), recursive=True):
+        cls = shape_class_of(path)
+        if not cls:
+            continue
+        try:
+            subject, side, _ = parse_centerline_name(path)
+        except ValueError:
+            continue
+        lookup[(subject, side)] = cls
+    return lookup
+
+
+def load_centerline_file(path):
+    """
+    CSV / PLY / VTK から (points, {属性名: 配列}) を読み込む。
+    属性は radius / curvature / torsion / label のうちファイルにあるものだけ。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    attrs = {}
+
+    if ext == ".csv":
+        header = read_csv_header(path)
+        wanted = [c for c in header if c.lower() in _ATTRIBUTE_ALIASES]
+        table = read_centerline_columns(path, ["x", "y", "z"] + wanted)
+        points = table[:, :3]
+        for i, col in enumerate(wanted):
+            attrs[_ATTRIBUTE_ALIASES[col.lower()]] = table[:, 3 + i]
+
+    elif ext == ".ply":
+        from ply_reader import PlyFile
+
+        with PlyFile(path) as ply:
+            props = ply.properties("vertex")
+            wanted = [p for p in props if p.lower() in _ATTRIBUTE_ALIASES]
+            v = ply.element("vertex", ["x", "y", "z"] + wanted)
+        points = np.column_stack([v["x"], v["y"], v["z"]])
+        for p in wanted:
+            attrs[_ATTRIBUTE_ALIASES[p.lower()]] = v[p]
+
+    elif ext == ".vtk":
+        from vtk_legacy_reader import VtkLegacyFile
+
+        with VtkLegacyFile(path) as vf:
+            points = vf.points(copy=True).astype(float)
+            for name in vf.array_names("point_data"):
+                if name.lower() in _ATTRIBUTE_ALIASES:
+                    attrs[_ATTRIBUTE_ALIASES[name.lower()]] = vf.point_array(name, copy=True)
+
+    else:
+        raise ValueError(f"未対応のファイル形式です: {path}")
+
+    return np.asarray(points, dtype=float), attrs
+
+
+class CenterlineStore:
+    """
+    中心線ストア。build 時は add() で追加し、save() で1つの .npz に書き出す。
+    load() で開いたストアからは get() で O(1) に中心線を取り出せる。
+    """
+
+    def __init__(self):
+        self.points = np.zeros((0, 3))
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.attributes = {
+            name: np.zeros(0, dtype=np.int32 if name == "label" else float)
+            for name in POINT_ATTRIBUTES
+        }
+        self.info = {k: np.zeros(0, dtype=str) for k in ("subject", "side", "variant", "shape_class", "source")}
+        self._lookup = {}
+        self._pending = []   # add() されてまだ連結していない中心線
+
+    # ---- 構築 ----
+    def add(self, subject, side, variant, points, attributes=None, shape_class="", source=""):
+        """
+        中心線を1本追加する。同じキーが既にある場合は、
+        欠けている属性と形状クラスだけを補う（uvcs のコピーなどの重複を1本にまとめる）。
+        """
+        key = (subject, side, variant)
+        attributes = attributes or {}
+
+        if key in self._lookup:
+            self._merge_into(self._lookup[key], points, attributes, shape_class)
+            return
+
+        self._lookup[key] = ("pending", len(self._pending))
+        self._pending.append({
+            "key": key,
+            "points": np.asarray(points, dtype=float),
+            "attributes": dict(attributes),
+            "shape_class": shape_class,
+            "source": source,
+        })
+
+    def _merge_into(self, where, points, attributes, shape_class):
+        if where[0] != "pending":
+            raise ValueError("保存済みのストアに同じキーの中心線は追加できません。")
+        entry = self._pending[where[1]]
+        if len(points) != len(entry["points"]):
+            print(
+                f"警告: {' '.join(entry['key'])} は点数の異なる中心線が既にあるため、"
+                f"{entry['source']} の方を使います。",
+                file=sys.stderr,
+            )
+            return
+        for name, values in attributes.items():
+            entry["attributes"].setdefault(name, values)
+        if shape_class and not entry["shape_class"]:
+            entry["shape_class"] = shape_class
+
+    def add_file(self, path, variant=None):
+        """ファイル1つを読み込んで追加する（キーはファイル名から判定）"""
+        subject, side, auto_variant = parse_centerline_name(path)
+        points, attrs = load_centerline_file(path)
+        self.add(
+            subject, side, variant or auto_variant, points, attrs,
+            shape_class=shape_class_of(path), source=os.path.basename(path),
+        )
+
+    def _finalize(self):
+        """add() された中心線を連結して配列にする"""
+        if not self._pending:
+            return
+        entries = self._pending
+        start = len(self.info["subject"])
+
+        counts = np.array([len(e["points"]) for e in entries], dtype=np.int64)
+        self.points = np.concatenate([self.points] + [e["points"] for e in entries])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(counts)])
+
+        for name, missing in POINT_ATTRIBUTES.items():
+            parts = [self.attributes[name]]
+            for e in entries:
+                values = e["attributes"].get(name)
+                if values is None:
+                    values = np.full(len(e["points"]), missing)
+                parts.append(np.asarray(values).astype(self.attributes[name].dtype))
+            self.attributes[name] = np.concatenate(parts)
+
+        columns = {
+            "subject": [e["key"][0] for e in entries],
+            "side": [e["key"][1] for e in entries],
+            "variant": [e["key"][2] for e in entries],
+            "shape_class": [e["shape_class"] for e in entries],
+            "source": [e["source"] for e in entries],
+        }
+        for k, values in columns.items():
+            self.info[k] = np.concatenate([self.info[k], np.array(values, dtype=str)])
+
+        for i, e in enumerate(entries):
+            self._lookup[e["key"]] = start + i
+        self._pending = []
+
+    # ---- 保存・読み込み ----
+    def save(self, path):
+        self._finalize()
+        np.savez(
+            path,
+            points=self.points,
+            offsets=self.offsets,
+            **self.attributes,
+            **self.info,
+        )
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with np.load(path) as data:
+            store.points = data["points"]
+            store.offsets = data["offsets"]
+            for name in POINT_ATTRIBUTES:
+                store.attributes[name] = data[name]
+            for k in store.info:
+                store.info[k] = data[k]
+        store._lookup = {
+            key: i for i, key in enumerate(
+                zip(store.info["subject"], store.info["side"], store.info["variant"])
+            )
+        }
+        return store
+
+    # ---- 取り出し ----
+    def __len__(self):
+        self._finalize()
+        return len(self.info["subject"])
+
+    def keys(self):
+        """(被験者ID, 左右, バリアント) のリスト（格納順）"""
+        self._finalize()
+        return list(zip(self.info["subject"], self.info["side"], self.info["variant"]))
+
+    def index_of(self, subject, side, variant="original"):
+        self._finalize()
+        try:
+            return self._lookup[(subject, side, variant)]
+        except KeyError:
+            raise KeyError(f"ストアにありません: {subject} {side} {variant}")
+
+    def get(self, subject, side, variant="original"):
+        """中心線1本を {"points", "radius", ...} の dict（配列はビュー）で返す"""
+        return self.entry(self.index_of(subject, side, variant))
+
+    def entry(self, i):
+        """i 番目の中心線を dict で返す"""
+        self._finalize()
+        s, e = self.offsets[i], self.offsets[i + 1]
+        result = {k: str(v[i]) for k, v in self.info.items()}
+        result["points"] = self.points[s:e]
+        for name in POINT_ATTRIBUTES:
+            result[name] = self.attributes[name][s:e]
+        return result
+
+    def select(self, variant=None, side=None, subject=None, shape_class=None):
+        """条件に合う中心線のインデックス配列を返す"""
+        self._finalize()
+        mask = np.ones(len(self.info["subject"]), dtype=bool)
+        for k, v in (("variant", variant), ("side", side), ("subject", subject), ("shape_class", shape_class)):
+            if v is not None:
+                mask &= self.info[k] == v
+        return np.flatnonzero(mask)
+
+    def lengths(self, indices=None):
+        """中心線ごとの全長を（全点まとめて）計算する"""
+        self._finalize()
+        indices = np.arange(len(self.info["subject"])) if indices is None else np.asarray(indices)
+        seg = np.linalg.norm(np.diff(self.points, axis=0), axis=1)
+        # 中心線の境目をまたぐ区間を除いた累積和から、各中心線の全長を求める
+        cum = np.concatenate([[0.0], np.cumsum(seg)])
+        starts = self.offsets[indices]
+        ends = np.maximum(self.offsets[indices + 1] - 1, starts)
+        return cum[ends] - cum[starts]
+
+    def name_of(self, i):
+        """i 番目の中心線の表示名（元のファイル名があればそれ）"""
+        self._finalize()
+        source = str(self.info["source"][i])
+        if source:
+            return source
+        return "_".join(str(self.info[k][i]) for k in ("subject", "side", "variant"))
+
+
+def collect_files(paths, recursive=True):
+    """ディレクトリ・ファイルの指定から、対象の CSV / PLY / VTK ファイルを列挙する"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "*") if recursive else os.path.join(path, "*")
+            files.extend(
+                f for f in glob.glob(pattern, recursive=recursive)
+                if os.path.splitext(f)[1].lower() in (".csv", ".ply", ".vtk")
+            )
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def build_store(paths, output_path, recursive=True):
+    """paths のファイルをすべて読み込んでストアを作り、output_path に保存する"""
+    store = CenterlineStore()
+    for path in collect_files(paths, recursive):
+        try:
+            store.add_file(path)
+        except Exception as e:
+            print(f"{path}: スキップしました: {e}", file=sys.stderr)
+    store.save(output_path)
+    print(f"{len(store)} 本の中心線を {output_path} に保存しました。")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中心線ストア（.npz）の作成・一覧表示")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="CSV / PLY / VTK からストアを作る")
+    p_build.add_argument("paths", nargs="+", help="入力ディレクトリまたはファイル")
+    p_build.add_argument("-o", "--output", required=True, help="出力する .npz のパス")
+    p_build.add_argument("--no-recursive", action="store_true", help="サブディレクトリを探さない")
+
+    p_list = sub.add_parser("list", help="ストアの中身を一覧表示する")
+    p_list.add_argument("store", help="ストア（.npz）のパス")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_store(args.paths, args.output, recursive=not args.no_recursive)
+    else:
+        store = CenterlineStore.load(args.store)
+        lengths = store.lengths()
+        for i, (subject, side, variant) in enumerate(store.keys()):
+            n = store.offsets[i + 1] - store.offsets[i]
+            cls = store.info["shape_class"][i] or "-"
+            print(f"{subject} {side} {variant:<14s} class={cls} points={n:5d} length={lengths[i]:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線ごとの結果表（長さ・曲率・半径・蛇行度など）から、コホート全体と
+グループごと（被験者IDの接頭辞 BG/BH/BI、左右 L/R、形状クラス U/V/C/S）の統計を
+まとめて計算し、CSV と JSON に書き出すスクリプト。
+
+calc_rusult.txt は全長の min/max/median/mean だけを、クラスのディレクトリごとに
+計算し直していた。ここでは結果表を1回だけ読み、全指標 × 全グループの
+件数・平均・標準偏差・最小・分位点（5/25/50/75/95%）・最大を groupby でまとめて求める。
+
+入力の表は1行1本で、ファイル名の列（file_name / filename）を持つもの:
+  centerline_lengths.csv, centerline_geometry.py の --summary, siphon_classifier.py の出力など。
+複数指定すると (被験者ID, 左右, バリアント) で結合する。
+
+同じ中心線の元の点列と *_resampledN のように、バリアント（centerline_store.parse_centerline_name）が
+違う行は別の中心線として扱い、統計もバリアントごとに出す（--variant で1つに絞れる）。
+
+使い方:
+  python cohort_stats.py centerline_lengths.csv -o cohort_stats
+  python cohort_stats.py centerline_lengths.csv geometry/summary.csv siphon_classes.csv \\
+      --uvcs "../data/10_siphon(MCA_ICA)/output_csv/uvcs" -o cohort_stats
+  → cohort_stats.csv（縦長の表）, cohort_stats.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from centerline_store import parse_centerline_name, shape_class_lookup
+
+# ファイル名の列として探す名前
+NAME_COLUMNS = ("file_name", "filename", "name", "file")
+
+# 統計の列（quantile の列名は p05 など）
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+STAT_NAMES = ["count", "mean", "std", "min"] + [f"p{int(q * 100):02d}" for q in QUANTILES] + ["max"]
+
+# グループ分けに使う列（表にあるものだけ使う）
+GROUP_COLUMNS = ("prefix", "side", "shape_class", "uvcs_class")
+
+# 表を結合するキー
+MERGE_KEYS = ["subject", "side", "variant"]
+
+# 指標として扱わない列
+_KEY_COLUMNS = {"subject", "side", "variant", "prefix", "shape_class", "uvcs_class", "reference_class"}
+
+
+def read_result_table(path, variant=None):
+    """
+    結果表を読み、被験者ID・左右・バリアントの列を付けた DataFrame を返す。
+    ファイル名から被験者ID・左右がわからない行（合計の行など）は除く。
+    variant を指定すると、そのバリアントの行だけを使う。
+    除いた行は、理由ごとに件数を標準エラーに出す。
+    """
+    df = pd.read_csv(path)
+    name_col = next((c for c in df.columns if c.lower() in NAME_COLUMNS), None)
+    if name_col is None:
+        raise ValueError(f"ファイル名の列（{'/'.join(NAME_COLUMNS)}）が見つかりません: {path}")
+
+    keys = []
+    for name in df[name_col].astype(str):
+        try:
+            keys.append(parse_centerline_name(name))
+        except ValueError:
+            keys.append((None, None, None))
+    df["subject"] = [k[0] for k in keys]
+    df["side"] = [k[1] for k in keys]
+    df["variant"] = [k[2] for k in keys]
+    dropped = int(df["subject"].isna().sum())
+    if dropped:
+        print(f"{path}: 被験者ID・左右がわからない {dropped} 行を除きました。", file=sys.stderr)
+    df = df[df["subject"].notna()]
+
+    if variant is not None:
+        other = df["variant"] != variant
+        if other.any():
+            print(f"{path}: バリアントが {variant} でない {int(other.sum())} 行を除きました。", file=sys.stderr)
+        df = df[~other]
+
+    # 同じファイル名の行が2回あれば（uvcs/ のコピーなど）最初のものを使う
+    duplicated = df.duplicated([name_col])
+    if duplicated.any():
+        print(f"{path}: 同じファイル名の {int(duplicated.sum())} 行を除きました。", file=sys.stderr)
+    df = df[~duplicated]
+
+    clash = df.duplicated(MERGE_KEYS, keep=False)
+    if clash.any():
+        names = ", ".join(df.loc[clash, name_col].astype(str).head(4))
+        raise ValueError(f"被験者ID・左右・バリアントが同じでファイル名の違う行があります（{names} など）: {path}")
+    return df.drop(columns=[name_col])
+
+
+def merge_tables(tables, names):
+    """(被験者ID, 左右, バリアント) で結果表を外部結合する。同じ指標の列名があれば後の表の列に表の名前を付ける"""
+    merged = None
+    for df, name in zip(tables, names):
+        if merged is None:
+            merged = df
+            continue
+        clash = [c for c in df.columns if c in merged.columns and c not in MERGE_KEYS]
+        # キーやクラスの列は最初の表のものを使う
+        df = df.drop(columns=[c for c in clash if c in _KEY_COLUMNS])
+        df = df.rename(columns={c: f"{name}.{c}" for c in clash if c not in _KEY_COLUMNS})
+        merged = merged.merge(df, on=MERGE_KEYS, how="outer")
+    merged["prefix"] = merged["subject"].str[:2]
+    return merged
+
+
+def metric_columns(table):
+    """統計を取る列（数値の列のうち、キーやクラスでないもの）"""
+    return [c for c in table.columns
+            if c not in _KEY_COLUMNS and pd.api.types.is_numeric_dtype(table[c])]
+
+
+def _describe(grouped, metrics):
+    """groupby の結果から、全指標の統計を1回ずつの集計でまとめて求める（縦長の表）"""
+    parts = {
+        "count": grouped[metrics].count(),
+        "mean": grouped[metrics].mean(),
+        "std": grouped[metrics].std(),
+        "min": grouped[metrics].min(),
+        "max": grouped[metrics].max(),
+    }
+    quant = grouped[metrics].quantile(list(QUANTILES))
+    for q in QUANTILES:
+        parts[f"p{int(q * 100):02d}"] = quant.xs(q, level=-1)
+
+    long = pd.concat({name: df.stack(future_stack=True) for name, df in parts.items()}, axis=1)
+    long.index.names = ["group", "metric"]
+    return long[STAT_NAMES].reset_index()
+
+
+def cohort_stats(table, group_columns=GROUP_COLUMNS, metrics=None):
+    """
+    バリアントごとに、全体（group_by = "all"）と group_columns の各列ごとの統計を1つの縦長の表にする。
+    バリアントの違う中心線（元の点列と再サンプリングしたものなど）を1つの統計に混ぜない。
+    列: variant, group_by, group, metric, count, mean, std, min, p05 ... p95, max
+    """
+    metrics = metrics or metric_columns(table)
+    if "variant" not in table.columns:
+        table = table.assign(variant="")
+    frames = []
+    for variant, part in table.groupby(table["variant"].fillna(""), sort=True):
+        whole = part.assign(_all="all").groupby("_all")
+        frames.append(_describe(whole, metrics).assign(group_by="all", variant=variant))
+        for col in group_columns:
+            if col not in part.columns or not part[col].notna().any():
+                continue
+            grouped = part[part[col].fillna("") != ""].groupby(col)
+            frames.append(_describe(grouped, metrics).assign(group_by=col, variant=variant))
+    stats = pd.concat(frames, ignore_index=True)
+    return stats[["variant", "group_by", "group", "metric"] + STAT_NAMES]
+
+
+def stats_to_json(stats):
+    """{variant: {group_by: {group: {metric: {統計名: 値}}}}} の形にする（NaN は null）"""
+    out = {}
+    for row in stats.itertuples(index=False):
+        values = {s: (None if pd.isna(getattr(row, s)) else float(getattr(row, s))) for s in STAT_NAMES}
+        values["count"] = int(row.count)
+        by_variant = out.setdefault(row.variant, {})
+        by_variant.setdefault(row.group_by, {}).setdefault(str(row.group), {})[row.metric] = values
+    return out
+
+
+def write_summary(table, output_base, group_columns=GROUP_COLUMNS):
+    """統計を <output_base>.csv と <output_base>.json に書き出し、統計の表を返す"""
+    stats = cohort_stats(table, group_columns)
+    stats.to_csv(output_base + ".csv", index=False)
+    with open(output_base + ".json", "w", encoding="utf-8") as f:
+        json.dump(stats_to_json(stats), f, indent=2, ensure_ascii=False)
+    return stats
+
+
+def summarize_tables(paths, output_base, uvcs_dir=None, variant=None):
+    """結果表 paths を読んで結合し、統計を書き出す（variant を指定するとそのバリアントだけ）"""
+    tables = [read_result_table(p, variant) for p in paths]
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    table = merge_tables(tables, names)
+    if uvcs_dir:
+        lookup = shape_class_lookup(uvcs_dir)
+        table["uvcs_class"] = [lookup.get(k, "") for k in zip(table["subject"], table["side"])]
+    return write_summary(table, output_base)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中心線ごとの結果表から、コホート全体とグループごとの統計を出す")
+    parser.add_argument("tables", nargs="+", help="結果表（CSV、1行1本。複数指定すると被験者・左右で結合）")
+    parser.add_argument("--uvcs", help="手作業の形状分類（uvcs/ ディレクトリ）をグループに加える")
+    parser.add_argument("--variant",
+                        help="このバリアント（original, resampled120 など）の行だけを使う（既定: バリアントごとに統計を出す）")
+    parser.add_argument("-o", "--output", default="cohort_stats",
+                        help="出力のベース名（<名前>.csv と <名前>.json、既定: cohort_stats）")
+    args = parser.parse_args()
+
+    output_base = os.path.splitext(args.output)[0]
+    stats = summarize_tables(args.tables, output_base, args.uvcs, args.variant)
+
+    overall = stats[stats["group_by"] == "all"].set_index(["variant", "metric"])
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(overall[["count", "mean", "std", "min", "p50", "max"]].round(4).to_string())
+    print(f"\n{output_base}.csv と {output_base}.json に書き出しました"
+          f"（{stats['metric'].nunique()} 指標, {len(stats)} 行）。")
+
+
+if __name__ == "__main__":
+    main()
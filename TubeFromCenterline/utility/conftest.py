@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""
+utility/ のテスト（test_*.py）で共通に使うフィクスチャ。
+
+  data_dir   : リポジトリの TubeFromCenterline/data（無ければそのテストはスキップ）
+  network_vtk: 小さな血管の木の ASCII VTK（LINES 4本・Domain・SegmentIndex・半径つき）を書く関数
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+@pytest.fixture
+def data_dir():
+    if not os.path.isdir(DATA_DIR):
+        pytest.skip("TubeFromCenterline/data がありません。")
+    return DATA_DIR
+
+
+def write_network_vtk(path, points, segments, radius=None, domain=None, segment_index=None):
+    """
+    points (N,3) と枝ごとの点インデックスのリスト segments から、
+    vtk_set と同じ形（LINES・CELL_DATA の Domain / SegmentIndex・POINT_DATA の半径）の ASCII VTK を書く。
+    """
+    points = np.asarray(points, dtype=float)
+    n_cells = len(segments)
+    lines = [
+        "# vtk DataFile Version 2.0",
+        "Vessel Segment",
+        "ASCII",
+        "DATASET POLYDATA",
+        f"POINTS {len(points)} float",
+    ]
+    lines += [" ".join(f"{v:.9g}" for v in p) for p in points]
+    lines.append(f"LINES {n_cells} {sum(len(s) + 1 for s in segments)}")
+    lines += [" ".join(str(v) for v in [len(s), *s]) for s in segments]
+    if domain is not None or segment_index is not None:
+        lines.append(f"CELL_DATA {n_cells}")
+        for name, values in (("Domain", domain), ("SegmentIndex", segment_index)):
+            if values is not None:
+                lines += [f"SCALARS {name} int 1", "LOOKUP_TABLE default", " ".join(str(int(v)) for v in values)]
+    if radius is not None:
+        lines += [
+            f"POINT_DATA {len(points)}",
+            "SCALARS MaximumInscribedSphereRadius double 1",
+            "LOOKUP_TABLE default",
+            " ".join(f"{v:.9g}" for v in radius),
+        ]
+    with open(path, "w", newline="\n") as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def network_vtk(tmp_path):
+    """
+    Y 字の小さな木（幹 0→2、そこから 2 本に分かれ、片方がさらに伸びる）を書いて、そのパスを返す。
+
+        枝0: 点 0,1,2（幹）   枝1: 点 2,3,4   枝2: 点 2,5,6   枝3: 点 4,7
+    """
+    points = [
+        [0, 0, 0], [1, 0, 0], [2, 0, 0],
+        [3, 1, 0], [4, 2, 0],
+        [3, -1, 0], [4, -2, 0],
+        [5, 3, 0],
+    ]
+    segments = [[0, 1, 2], [2, 3, 4], [2, 5, 6], [4, 7]]
+    radius = [1.0, 0.9, 0.8, 0.6, 0.5, 0.7, 0.6, 0.4]
+    return write_network_vtk(
+        tmp_path / "BG0002_tree.vtk", points, segments, radius=radius,
+        domain=[1, 1, 2, 1], segment_index=[10, 11, 12, 13],
+    )
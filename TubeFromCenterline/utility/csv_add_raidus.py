@@ -1,108 +1,406 @@
 import os
 import re
-import math
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import sys
+import glob
+import argparse
+
+# GUI 用（引数が無いときに使う）
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+except ImportError:
+    tk = None
+    filedialog = None
+    messagebox = None
 
 import numpy as np
 import pandas as pd
 
+from parallel_batch import iter_parallel, report_error
+from spatial_index import build_spatial_index
+from stage_cache import add_cache_arguments, cached, configure_cache_from_args
+from subject_ids import SUBJECT_ID_PATTERN, subject_of
+from vtk_legacy_reader import VtkLegacyFile
+
 
 def parse_vtk_points_and_radius(vtk_path):
     """
-    VTK(ASCII, POLYDATA)から
+    VTK(ASCII / BINARY, POLYDATA)から
     - 点座標 (N,3) ndarray
     - MaximumInscribedSphereRadius (N,) ndarray
-    を取り出す
+    を取り出す（ファイルはメモリマップで開き、この2つ以外の配列は読まない）。
+    SWC（*.swc）なら、その x,y,z と radius を使う（VTK に変換しなくてよい）。
     """
-    with open(vtk_path, "r") as f:
-        text = f.read()
+    if vtk_path.lower().endswith(".swc"):
+        from swc_io import read_swc
 
-    # ---- POINTS ブロックを抽出 ----
-    m_points = re.search(r"POINTS\s+(\d+)\s+\w+\s*([\s\S]*)", text)
-    if not m_points:
-        raise ValueError("VTK内に POINTS ブロックが見つかりません。")
+        swc = read_swc(vtk_path)
+        return swc["points"], swc["radius"]
 
-    n_points = int(m_points.group(1))
-    tail = m_points.group(2)
+    with VtkLegacyFile(vtk_path) as vf:
+        points = vf.points(copy=True).astype(float)
 
-    # 次のキーワードまでを切り出す
-    m_next = re.search(
-        r"\n(?:VERTICES|LINES|POLYGONS|TRIANGLE_STRIPS|POINT_DATA|CELL_DATA)\b",
-        tail
-    )
-    if m_next:
-        points_text = tail[:m_next.start()]
-    else:
-        points_text = tail
+        if "MaximumInscribedSphereRadius" not in vf.array_names("point_data"):
+            raise ValueError("SCALARS MaximumInscribedSphereRadius が見つかりません。")
+        radius = vf.point_array("MaximumInscribedSphereRadius", copy=True).astype(float)
 
-    # 数値に変換
-    point_nums = [float(v) for v in points_text.split()]
-    if len(point_nums) < 3 * n_points:
-        raise ValueError("POINTS の数値が指定数より少ないようです。")
-    point_nums = point_nums[: 3 * n_points]
+    if points.shape[0] != radius.shape[0]:
+        raise ValueError("点数と MaximumInscribedSphereRadius の数が一致しません。")
 
-    points = np.array(point_nums, dtype=float).reshape(-1, 3)
+    return points, radius
 
-    # ---- POINT_DATA & MaximumInscribedSphereRadius を抽出 ----
-    m_pd = re.search(r"POINT_DATA\s+(\d+)", text)
-    if not m_pd:
-        raise ValueError("VTK内に POINT_DATA ブロックが見つかりません。")
 
-    # MaximumInscribedSphereRadius スカラーフィールドを探す
-    m_scalar = re.search(
-        r"POINT_DATA\s+\d+[\s\S]*?SCALARS\s+MaximumInscribedSphereRadius\s+\w+[\r\n]+LOOKUP_TABLE\s+\w+([\s\S]*)",
-        text
-    )
-    if not m_scalar:
-        raise ValueError("SCALARS MaximumInscribedSphereRadius が見つかりません。")
+def compute_nearest(points_csv, points_vtk, radius_vtk, index=None, source=None):
+    """
+    CSVの各点(points_csv: (M,3))に対して、
+    VTKの点(points_vtk: (N,3))の最近接点を探し、
+    距離とその点のradius(MaximumInscribedSphereRadius)を返す。
+
+    空間インデックス（KD-tree / グリッド）で全点を1回で問い合わせる。
+    同じVTKに対して何度も呼ぶ場合は、build_spatial_index(points_vtk) で
+    作ったものを index に渡すと作り直さずに済む。
+    source に points_vtk / radius_vtk を読んだファイルのパスを渡すと、キャッシュ（stage_cache）が
+    有効なとき、そのファイルの中身と points_csv が同じなら前回の結果を返す
+    （ネットワークの大きな配列を呼ぶたびにハッシュしないよう、キーはファイルのハッシュにする）。
+    """
+    def compute():
+        tree = build_spatial_index(points_vtk) if index is None else index
+        distances, idx = tree.query(points_csv, k=1)
+        radii = np.asarray(radius_vtk, dtype=float)[idx]
+        return radii, distances
 
-    tail_scalar = m_scalar.group(1)
+    if source is None:
+        return compute()
+    return cached("nearest", [source, points_csv], {}, compute)
 
-    # 次の CELL_DATA または 別の SCALARS まで
-    m_stop = re.search(r"\n(?:CELL_DATA\b|SCALARS\b)", tail_scalar)
-    if m_stop:
-        scalar_text = tail_scalar[:m_stop.start()]
+
+def compute_interpolated(points_csv, points_vtk, radius_vtk, k=4, within=None,
+                         power=2.0, index=None):
+    """
+    CSVの各点について、VTKの複数の近傍点の radius を
+    逆距離加重（重み 1/d^power）で補間して返す。
+
+    - within を省略: 最近傍 k 点から補間
+    - within を指定: 距離 within 以内の全点から補間
+      （範囲内に点が無い場合は最近傍点の radius を使う）
+
+    戻り値は compute_nearest と同じく (radii, 最近傍点までの距離)。
+    """
+    if index is None:
+        index = build_spatial_index(points_vtk)
+    radius_vtk = np.asarray(radius_vtk, dtype=float)
+    m = len(points_csv)
+
+    nearest_d, nearest_i = index.query(points_csv, k=1)
+
+    if within is None:
+        k = min(k, len(radius_vtk))
+        dist, idx = index.query(points_csv, k=k)
+        dist = dist.reshape(m, -1)
+        idx = idx.reshape(m, -1)
+        owner = np.repeat(np.arange(m), dist.shape[1])
+        dist = dist.ravel()
+        values = radius_vtk[idx.ravel()]
     else:
-        scalar_text = tail_scalar
+        offsets, idx, dist = index.query_radius(points_csv, within)
+        owner = np.repeat(np.arange(m), np.diff(offsets))
+        values = radius_vtk[idx]
 
-    scalar_nums = [float(v) for v in scalar_text.split()]
-    if len(scalar_nums) < n_points:
-        raise ValueError("MaximumInscribedSphereRadius の個数が POINT_DATA の点数より少ないようです。")
-    scalar_nums = scalar_nums[:n_points]
+    # 距離0の点があればその値をそのまま使えるよう、重みに下限を設ける
+    weights = 1.0 / np.maximum(dist, 1e-12) ** power
+    wsum = np.bincount(owner, weights=weights, minlength=m)
+    vsum = np.bincount(owner, weights=weights * values, minlength=m)
 
-    radius = np.array(scalar_nums, dtype=float)
+    radii = radius_vtk[nearest_i].copy()
+    has = wsum > 0
+    radii[has] = vsum[has] / wsum[has]
 
-    if points.shape[0] != radius.shape[0]:
-        raise ValueError("点数と MaximumInscribedSphereRadius の数が一致しません。")
+    return radii, nearest_d
+
+
+def csv_points(df):
+    """
+    DataFrame から x, y, z カラムを (M,3) 配列で取り出す
+    （名前が違う場合は先頭3列を使う）
+    """
+    for_candidate = [c.lower() for c in df.columns]
+    if all(col in for_candidate for col in ["x", "y", "z"]):
+        # 大文字/小文字を気にせずマッピング
+        col_map = {c.lower(): c for c in df.columns}
+        x_col = col_map["x"]
+        y_col = col_map["y"]
+        z_col = col_map["z"]
+    else:
+        # 先頭3列を x,y,z とみなす
+        x_col, y_col, z_col = df.columns[:3]
+
+    return df[[x_col, y_col, z_col]].to_numpy(dtype=float)
+
+
+def output_path_for(csv_path):
+    """出力ファイル名（元CSVと同じ場所・ファイル名に_suffixを追加）"""
+    base, ext = os.path.splitext(csv_path)
+    return base + "_with_radius_distance.csv"
 
-    return points, radius
 
+def transfer_radius(points_csv, points_vtk, radius_vtk, index, mode="nearest", k=4, within=None,
+                    source=None):
+    """mode（"nearest" / "knn" / "within"）に応じて radius と距離を求める（source は compute_nearest へ）"""
+    if mode == "nearest":
+        return compute_nearest(points_csv, points_vtk, radius_vtk, index=index, source=source)
+    if mode == "knn":
+        return compute_interpolated(points_csv, points_vtk, radius_vtk, k=k, index=index)
+    if mode == "within":
+        if within is None:
+            raise ValueError("mode='within' のときは within（距離）を指定してください。")
+        return compute_interpolated(points_csv, points_vtk, radius_vtk, within=within, index=index)
+    raise ValueError(f"未対応の mode です: {mode}")
 
-def compute_nearest(points_csv, points_vtk, radius_vtk):
+
+# 中心線の点から木の最も近い点までの距離の中央値の上限 [mm]（path_extraction の --max-snap と同じ考え方）
+DEFAULT_MAX_DISTANCE = 5.0
+
+
+def check_distance(distances, max_distance, name):
     """
-    CSVの各点(points_csv: (M,3))に対して、
-    VTKの点(points_vtk: (N,3))の最近接点を探し、
-    距離とその点のradius(MaximumInscribedSphereRadius)を返す。
+    中心線の点から木の点までの距離の中央値が max_distance を超えたら ValueError。
+    座標系の違う木から半径を取ると、どの点も遠い1つの端点の半径になってしまうのを防ぐ
+    （max_distance が None なら調べない）。
     """
-    M = points_csv.shape[0]
-    N = points_vtk.shape[0]
+    if max_distance is None or len(distances) == 0:
+        return
+    median = float(np.median(distances))
+    if median > max_distance:
+        raise ValueError(f"{name}: 木の点までの距離の中央値が {median:.2f} です（上限 {max_distance:g}）。"
+                         "座標系が木と同じか確認してください。")
 
-    distances = np.zeros(M, dtype=float)
-    radii = np.zeros(M, dtype=float)
 
-    # 単純な最近傍探索（M×N）。データ数が極端でなければ十分高速。
-    for i in range(M):
-        diff = points_vtk - points_csv[i]
-        dist2 = np.sum(diff * diff, axis=1)
-        idx = int(np.argmin(dist2))
-        distances[i] = math.sqrt(dist2[idx])
-        radii[i] = radius_vtk[idx]
+# ---- バッチ処理（被験者IDで CSV と VTK を対応付ける） ----
 
-    return radii, distances
+# 既定の被験者ID: BG0001, BH0005, BI0001 など（vtk_set の BG001, BG04 も 4桁 にそろえて比べる）
+DEFAULT_ID_PATTERN = SUBJECT_ID_PATTERN
+# ファイル名中の左右 (BG0001_L_MCA-ICA など)
+SIDE_PATTERN = re.compile(r"_([LR])_")
 
 
-def main():
+def pair_files_by_subject(csv_paths, vtk_paths, id_pattern=DEFAULT_ID_PATTERN):
+    """
+    ファイル名に含まれる被験者ID（subject_ids.normalize_subject で 4桁 にそろえたもの）で
+    CSV と VTK を対応付け、{被験者ID: (vtk_path, [csv_path, ...])} を返す。
+    対応する VTK が無い CSV は警告を出して除外する。
+    """
+    vtk_by_subject = {}
+    for path in sorted(vtk_paths):
+        sid = subject_of(path, id_pattern)
+        if sid is None:
+            continue
+        if sid in vtk_by_subject:
+            print(f"警告: {sid} の VTK が複数あります。{vtk_by_subject[sid]} を使います。", file=sys.stderr)
+            continue
+        vtk_by_subject[sid] = path
+
+    pairs = {}
+    for path in sorted(csv_paths):
+        sid = subject_of(path, id_pattern)
+        if sid is None:
+            print(f"警告: 被験者IDが見つかりません: {path}", file=sys.stderr)
+            continue
+        if sid not in vtk_by_subject:
+            print(f"警告: {sid} に対応する VTK がありません: {path}", file=sys.stderr)
+            continue
+        pairs.setdefault(sid, (vtk_by_subject[sid], []))[1].append(path)
+    return pairs
+
+
+def iter_task_centerlines(task):
+    """
+    タスクに含まれる中心線を (filename, side, df, points, csv_path) で順に返す。
+    CSV から読む場合（task["csv_paths"]）と、中心線ストアから渡された場合
+    （task["centerlines"] = [(filename, side, points), ...]、df と csv_path は None）がある。
+    """
+    for csv_path in task.get("csv_paths", ()):
+        df = pd.read_csv(csv_path)
+        m_side = SIDE_PATTERN.search(os.path.basename(csv_path))
+        side = m_side.group(1) if m_side else ""
+        yield os.path.basename(csv_path), side, df, csv_points(df), csv_path
+
+    for filename, side, points in task.get("centerlines", ()):
+        yield filename, side, None, points, None
+
+
+def process_subject(task, shared=None):
+    """
+    1被験者分の処理（プロセスプールのワーカーで実行される）。
+    ネットワーク VTK の読み込みと空間インデックスの作成は1回だけ行い、
+    その被験者の全 CSV（L / R など）で使い回す。
+    shared（shared_network_pool.SharedNetwork）を渡すと、VTK を読まずに共有メモリの
+    点・半径・空間インデックスを使う。
+    結果は全CSVの点をまとめた DataFrame で返す。
+
+    キャッシュ（stage_cache）が有効なら、VTK・CSV の中身とパラメータが
+    前回と同じ被験者は計算せずに前回の表を返す（--per-file のときは毎回計算する）。
+    """
+    if task["per_file"]:
+        return _process_subject(task, shared)
+
+    inputs = [task["vtk_path"]] + list(task.get("csv_paths", ()))
+    inputs += [points for _, _, points in task.get("centerlines", ())]
+    params = {
+        "subject": task["subject"],
+        "names": [name for name, _, _ in task.get("centerlines", ())],
+        "mode": task["mode"],
+        "k": task["k"],
+        "within": task["within"],
+        "max_distance": task.get("max_distance"),
+    }
+    return cached("radius_transfer", inputs, params, lambda: _process_subject(task, shared))
+
+
+def transfer_job(shared, job):
+    """共有メモリのネットワークで中心線の半径を求める（NetworkPool のワーカーで実行される）"""
+    return process_subject(job, shared)
+
+
+def _process_subject(task, shared=None):
+    if shared is None:
+        points_vtk, radius_vtk = parse_vtk_points_and_radius(task["vtk_path"])
+        index = build_spatial_index(points_vtk)
+    else:
+        points_vtk, radius_vtk, index = shared.points, shared.radius, shared.index
+        if not np.isfinite(radius_vtk).any():
+            raise ValueError("SCALARS MaximumInscribedSphereRadius が見つかりません。")
+
+    frames = []
+    for filename, side, df, points_csv, csv_path in iter_task_centerlines(task):
+        radii, distances = transfer_radius(
+            points_csv, points_vtk, radius_vtk, index,
+            mode=task["mode"], k=task["k"], within=task["within"],
+            # 被験者ごとの表がキャッシュされない --per-file のときだけ、1本ずつの結果をキャッシュする
+            source=task["vtk_path"] if task["per_file"] else None,
+        )
+        check_distance(distances, task.get("max_distance"), filename)
+
+        if task["per_file"] and df is not None:
+            df["radius"] = radii
+            df["distance"] = distances
+            df.to_csv(output_path_for(csv_path), index=False)
+
+        table = pd.DataFrame({
+            "subject": task["subject"],
+            "side": side,
+            "filename": filename,
+            "point_index": np.arange(len(points_csv)),
+            "x": points_csv[:, 0],
+            "y": points_csv[:, 1],
+            "z": points_csv[:, 2],
+            "radius": radii,
+            "distance": distances,
+        })
+        frames.append(table)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_batch(csv_paths, vtk_paths, output_csv, id_pattern=DEFAULT_ID_PATTERN,
+              mode="nearest", k=4, within=None, workers=None, per_file=False,
+              store=None, variant="original", shared=False, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    被験者ごとに process_subject をプロセスプールで実行し、
+    終わった順に1つの表（output_csv）へ追記していく。
+    store（centerline_store.CenterlineStore）を渡すと、csv_paths の代わりに
+    ストアの variant の中心線を使う。
+    shared=True なら、ネットワークを共有メモリに1回だけ読み込み、中心線1本ずつのジョブを
+    被験者ごとにまとめて実行する（被験者より多いコア数を使えるようにする）。
+    処理した被験者数を返す。
+    """
+    by_name = {}
+    if store is not None:
+        by_name = {store.name_of(i): i for i in store.select(variant=variant)}
+        csv_paths = list(by_name)
+
+    pairs = pair_files_by_subject(csv_paths, vtk_paths, id_pattern)
+    if not pairs:
+        print("CSV と VTK の組が見つかりませんでした。")
+        return 0
+
+    tasks = []
+    for sid, (vtk_path, csv_list) in sorted(pairs.items()):
+        task = {
+            "subject": sid,
+            "vtk_path": vtk_path,
+            "mode": mode,
+            "k": k,
+            "within": within,
+            "per_file": per_file,
+            "max_distance": max_distance,
+        }
+        if store is not None:
+            task["centerlines"] = [
+                (name, str(store.info["side"][by_name[name]]), store.entry(by_name[name])["points"])
+                for name in csv_list
+            ]
+        else:
+            task["csv_paths"] = csv_list
+        tasks.append(task)
+
+    if shared:
+        return _run_shared(tasks, output_csv, workers)
+
+    n_done = 0
+    header = True
+    with open(output_csv, "w", newline="") as f:
+        for task, table, error in iter_parallel(process_subject, tasks, workers):
+            if error is not None:
+                report_error(task["subject"], error)
+                continue
+            table.to_csv(f, index=False, header=header)
+            header = False
+            n_done += 1
+            n_files = len(task.get("csv_paths", ())) + len(task.get("centerlines", ()))
+            print(f"{task['subject']}: {n_files} files, {len(table)} points")
+
+    print(f"\n結果を {output_csv} に書き出しました。（{n_done}/{len(tasks)} 被験者）")
+    return n_done
+
+
+def _run_shared(tasks, output_csv, workers=None):
+    """run_batch の shared=True の場合。被験者のタスクを中心線1本ずつのジョブに分けて NetworkPool で実行する"""
+    from shared_network_pool import NetworkPool
+
+    jobs = []
+    for task in tasks:
+        base = {k: v for k, v in task.items() if k not in ("csv_paths", "centerlines")}
+        base["network"] = task["vtk_path"]
+        jobs += [dict(base, csv_paths=[p]) for p in task.get("csv_paths", ())]
+        jobs += [dict(base, centerlines=[c]) for c in task.get("centerlines", ())]
+
+    done = set()
+    failed = set()
+    header = True
+    with NetworkPool() as pool, open(output_csv, "w", newline="") as f:
+        for job, table, error in pool.run(transfer_job, jobs, workers, chunk_size=1):
+            name = (job.get("csv_paths") or [c[0] for c in job["centerlines"]])[0]
+            if error is not None:
+                report_error(os.path.basename(name), error)
+                failed.add(job["subject"])
+                continue
+            table.to_csv(f, index=False, header=header)
+            header = False
+            done.add(job["subject"])
+            print(f"{job['subject']}: {os.path.basename(name)}, {len(table)} points")
+        mb = pool.nbytes / 1e6
+
+    n_done = len(done - failed)
+    print(f"\n結果を {output_csv} に書き出しました。（{n_done}/{len(tasks)} 被験者、共有メモリ {mb:.1f} MB）")
+    return n_done
+
+
+def main_gui():
+    """GUIで CSV と VTK を1つずつ選んで処理する"""
+    if tk is None:
+        print("tkinter が利用できないため、GUIでの選択は使えません。引数を指定してバッチモードで実行してください。", file=sys.stderr)
+        return
+
     root = tk.Tk()
     root.withdraw()
 
@@ -117,11 +415,11 @@ def main():
         messagebox.showwarning("キャンセル", "CSVファイルが選択されませんでした。")
         return
 
-    messagebox.showinfo("VTKファイル選択", "次に、VTK ASCII ファイルを選択してください。")
+    messagebox.showinfo("VTKファイル選択", "次に、VTK ファイル（ASCII / BINARY）を選択してください。")
 
     vtk_path = filedialog.askopenfilename(
         title="VTKファイルを選択",
-        filetypes=[("VTK files", "*.vtk"), ("All files", "*.*")]
+        filetypes=[("VTK files", "*.vtk"), ("SWC files", "*.swc"), ("All files", "*.*")]
     )
 
     if not vtk_path:
@@ -132,33 +430,20 @@ def main():
         # CSV読み込み
         df = pd.read_csv(csv_path)
 
-        # x, y, z カラムの取得（名前が違う場合は先頭3列を使う）
-        for_candidate = [c.lower() for c in df.columns]
-        if all(col in for_candidate for col in ["x", "y", "z"]):
-            # 大文字/小文字を気にせずマッピング
-            col_map = {c.lower(): c for c in df.columns}
-            x_col = col_map["x"]
-            y_col = col_map["y"]
-            z_col = col_map["z"]
-        else:
-            # 先頭3列を x,y,z とみなす
-            x_col, y_col, z_col = df.columns[:3]
-
-        points_csv = df[[x_col, y_col, z_col]].to_numpy(dtype=float)
+        points_csv = csv_points(df)
 
         # VTK から点と MaximumInscribedSphereRadius を取得
         points_vtk, radius_vtk = parse_vtk_points_and_radius(vtk_path)
 
         # 最近接点探索
-        radii, distances = compute_nearest(points_csv, points_vtk, radius_vtk)
+        radii, distances = compute_nearest(points_csv, points_vtk, radius_vtk, source=vtk_path)
+        check_distance(distances, DEFAULT_MAX_DISTANCE, os.path.basename(csv_path))
 
         # 新しい列を追加
         df["radius"] = radii
         df["distance"] = distances
 
-        # 出力ファイル名（元CSVと同じ場所・ファイル名に_suffixを追加）
-        base, ext = os.path.splitext(csv_path)
-        out_path = base + "_with_radius_distance.csv"
+        out_path = output_path_for(csv_path)
 
         df.to_csv(out_path, index=False)
 
@@ -168,5 +453,87 @@ def main():
         messagebox.showerror("エラー", f"処理中にエラーが発生しました:\n{e}")
 
 
+def main():
+    # 引数がある場合はバッチ（CLI）モード、ない場合は従来通り GUI モード
+    if len(sys.argv) <= 1:
+        main_gui()
+        return
+
+    parser = argparse.ArgumentParser(
+        description="中心線CSVにネットワークVTKの MaximumInscribedSphereRadius を被験者IDで対応付けて一括付加するスクリプト"
+    )
+    parser.add_argument("--csv-dir", help="中心線CSVファイルがあるディレクトリ")
+    parser.add_argument("--vtk-dir", required=True, help="ネットワークVTK（vtk_set など）があるディレクトリ")
+    parser.add_argument(
+        "-o", "--output",
+        help="まとめた結果CSVのパス。省略時は '<csv-dir>/radius_transfer.csv'。"
+    )
+    parser.add_argument("--csv-glob", default="*.csv", help="対象CSVのパターン（既定: *.csv）")
+    parser.add_argument("--vtk-glob", default="*.vtk", help="対象VTKのパターン（既定: *.vtk。SWC を直接使うなら *.swc）")
+    parser.add_argument(
+        "--id-pattern", default=DEFAULT_ID_PATTERN,
+        help=f"被験者IDの正規表現（既定: {DEFAULT_ID_PATTERN}）。数字の桁数は 4桁 にそろえて対応付ける"
+    )
+    parser.add_argument(
+        "--mode", choices=("nearest", "knn", "within"), default="nearest",
+        help="nearest: 最近傍点 / knn: k近傍の補間 / within: 距離以内の点の補間"
+    )
+    parser.add_argument("-k", type=int, default=4, help="knn モードの近傍点数（既定: 4）")
+    parser.add_argument("--within", type=float, help="within モードの距離")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+    parser.add_argument(
+        "--per-file", action="store_true",
+        help="CSVごとの '*_with_radius_distance.csv' も出力する"
+    )
+    parser.add_argument(
+        "--store",
+        help="--csv-dir の代わりに中心線ストア（centerline_store.py で作った .npz）から中心線を読む"
+    )
+    parser.add_argument(
+        "--variant", default="original",
+        help="--store 使用時に対象とする中心線の種類（既定: original）"
+    )
+    parser.add_argument(
+        "--shared-memory", action="store_true",
+        help="ネットワークを共有メモリに1回だけ読み込み、中心線1本ずつ並列に処理する（コア数が被験者数より多いとき）"
+    )
+    parser.add_argument(
+        "--max-distance", type=float, default=DEFAULT_MAX_DISTANCE,
+        help=f"中心線の点から木の点までの距離の中央値の上限。超えた被験者はエラーにする（既定: {DEFAULT_MAX_DISTANCE:g}、inf で無制限）"
+    )
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    configure_cache_from_args(args)
+
+    if not args.csv_dir and not args.store:
+        parser.error("--csv-dir か --store のどちらかを指定してください。")
+
+    store = None
+    csv_paths = []
+    if args.store:
+        from centerline_store import CenterlineStore
+
+        store = CenterlineStore.load(args.store)
+        output_csv = args.output or os.path.join(
+            os.path.dirname(os.path.abspath(args.store)), "radius_transfer.csv"
+        )
+    else:
+        output_csv = args.output or os.path.join(args.csv_dir, "radius_transfer.csv")
+        csv_paths = [
+            p for p in glob.glob(os.path.join(args.csv_dir, args.csv_glob))
+            if os.path.abspath(p) != os.path.abspath(output_csv)
+            and not p.endswith("_with_radius_distance.csv")
+        ]
+    vtk_paths = glob.glob(os.path.join(args.vtk_dir, args.vtk_glob))
+
+    run_batch(
+        csv_paths, vtk_paths, output_csv,
+        id_pattern=args.id_pattern, mode=args.mode, k=args.k, within=args.within,
+        workers=args.workers, per_file=args.per_file,
+        store=store, variant=args.variant, shared=args.shared_memory, max_distance=args.max_distance,
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+点ごとのラベルで中心線を区間に分けるスクリプト。
+
+siphon の VTK（8_Centerline_Siphon(with labal)）は点データ lab に、
+V-modeler の PLY は vertex の label と vertex_seq（点の並びとそのラベル）に
+解剖学的な区間（C2〜C7 など）の情報を持っている。ここでは
+  - VTK は LINES セル、PLY は vertex_seq の順に点を並べ（セル・並びの境目でも切る）、
+  - ラベルの配列の run-length（同じ値が続く範囲）を1回で求めて区間にし、
+  - 区間ごとの長さ・曲率・半径の表、区間ごとの CSV、区間ごとの管のメッシュ
+を書き出す。区間の長さなどは centerline_metrics.segment_metrics で累積和からまとめて求める。
+
+区間の名前は lab<ラベル>。同じラベルが離れて2回以上出てきたら lab1.2 のように番号を付ける。
+
+使い方:
+  python label_segments.py -d "../data/8_Centerline_Siphon(with labal)" -o segments/ --table segments.csv
+  python label_segments.py BG0001_L_siphon_lab.vtk --labels 1 2 --mesh --vary-radius -n 24 -o segments/
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from centerline_store import (
+    POINT_ATTRIBUTES, has_centerline_name, is_segment_file, load_centerline_file, parse_centerline_name,
+)
+from parallel_batch import iter_parallel, report_error
+from resample_centerline import FLOAT_FORMAT
+
+# 区間の表の列
+TABLE_COLUMNS = [
+    "file_name", "subject", "side", "variant", "segment", "label", "start", "end",
+    "n_points", "length", "max_curvature", "mean_curvature", "mean_radius", "min_radius",
+]
+
+
+def label_runs(labels, breaks=()):
+    """
+    ラベルが同じ値で続く区間を (開始, 終了, ラベル) の配列で返す（終了は含まない）。
+    breaks の位置（セル・点の並びの境目）では、ラベルが同じでも区間を切る。
+    """
+    labels = np.asarray(labels)
+    if len(labels) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, labels[:0]
+    cut = np.zeros(len(labels), dtype=bool)
+    cut[0] = True
+    cut[1:] = labels[1:] != labels[:-1]
+    breaks = np.asarray(breaks, dtype=np.int64)
+    cut[breaks[(breaks > 0) & (breaks < len(labels))]] = True
+    starts = np.flatnonzero(cut)
+    ends = np.append(starts[1:], len(labels))
+    return starts, ends, labels[starts]
+
+
+def segment_names(run_labels):
+    """区間のラベルから名前（lab1, lab0, lab2, lab1.2 ...）を付ける"""
+    seen = {}
+    names = []
+    for lab in run_labels:
+        lab = int(lab)
+        seen[lab] = seen.get(lab, 0) + 1
+        names.append(f"lab{lab}" + (f".{seen[lab]}" if seen[lab] > 1 else ""))
+    return names
+
+
+def _line_order(path):
+    """
+    点を並べる順 (order, breaks, 並びごとのラベル or None)。
+    VTK は LINES セル、PLY は vertex_seq の順につなぐ。breaks は order の中の並びの境目。
+    並びの情報が無ければ (None, [], None)。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".vtk":
+        from vtk_legacy_reader import VtkLegacyFile
+
+        with VtkLegacyFile(path) as vf:
+            offsets, connectivity = vf.cells("LINES")
+        seq_labels = None
+    elif ext == ".ply":
+        from ply_reader import PlyFile
+
+        with PlyFile(path) as ply:
+            if "vertex_seq" not in ply.element_names():
+                return None, [], None
+            offsets, connectivity = ply.vertex_sequences()
+            seq_labels = ply.element("vertex_seq", ["label"])["label"]
+    else:
+        return None, [], None
+
+    if len(offsets) < 2 or offsets[-1] == 0:
+        return None, [], None
+    return np.asarray(connectivity, dtype=np.int64), np.asarray(offsets[1:-1]), seq_labels
+
+
+def load_labeled_centerline(path):
+    """
+    中心線を線の順に並べて読み込み、(points, attrs, breaks) を返す。
+    attrs は load_centerline_file と同じ（radius / curvature / torsion / label）。
+    点にラベルが無く、PLY の vertex_seq にラベルがあれば、それを点のラベルにする。
+    """
+    points, attrs = load_centerline_file(path)
+    order, breaks, seq_labels = _line_order(path)
+    if order is None:
+        return points, attrs, np.zeros(0, dtype=np.int64)
+
+    points = points[order]
+    attrs = {k: np.asarray(v)[order] for k, v in attrs.items()}
+    if "label" not in attrs and seq_labels is not None:
+        counts = np.diff(np.concatenate([[0], breaks, [len(order)]]))
+        attrs["label"] = np.repeat(seq_labels, counts)
+    return points, attrs, np.asarray(breaks, dtype=np.int64)
+
+
+def split_centerline(points, attrs, breaks=(), labels=None):
+    """
+    中心線を区間に分け、区間ごとの dict のリストを返す。
+      name, label, start, end, points (区間の点のビュー), 属性名ごとの配列
+    ラベルが無ければ全体を1区間（ラベル -1）にする。labels を与えたら、そのラベルの区間だけを返す。
+    """
+    n = len(points)
+    label_array = attrs.get("label")
+    if label_array is None:
+        label_array = np.full(n, POINT_ATTRIBUTES["label"])
+    starts, ends, run_labels = label_runs(np.asarray(label_array).astype(np.int64), breaks)
+    names = segment_names(run_labels)
+
+    segments = []
+    for a, b, lab, name in zip(starts, ends, run_labels, names):
+        if labels is not None and int(lab) not in labels:
+            continue
+        seg = {"name": name, "label": int(lab), "start": int(a), "end": int(b), "points": points[a:b]}
+        seg.update({k: v[a:b] for k, v in attrs.items() if k != "label"})
+        segments.append(seg)
+    return segments
+
+
+def joined_ends(starts, ends, breaks, n):
+    """
+    メッシュ用に、各区間の終わりを次の区間の最初の点まで1点延ばした終了位置。
+    隣の区間の管がつながるようにする（並びの境目は越えない）。
+    """
+    seq_ends = np.append(np.asarray(breaks, dtype=np.int64), n)
+    limit = seq_ends[np.searchsorted(seq_ends, np.asarray(starts), side="right")]
+    return np.minimum(np.asarray(ends) + 1, limit)
+
+
+def segment_table(path, points, attrs, breaks=(), labels=None):
+    """区間ごとの長さ・曲率・半径を、1行1区間の dict のリストで返す"""
+    from centerline_geometry import centerline_geometry
+    from centerline_metrics import segment_metrics
+
+    curvature = attrs.get("curvature")
+    if curvature is None or not np.all(np.isfinite(curvature)):
+        curvature = centerline_geometry(points)["curvature"]
+    segments = split_centerline(points, attrs, breaks, labels)
+    starts = np.array([s["start"] for s in segments], dtype=np.int64)
+    ends = np.array([s["end"] for s in segments], dtype=np.int64)
+    metrics = segment_metrics(points, curvature, starts, ends, attrs.get("radius"))
+
+    subject, side, variant = parse_centerline_name(path)
+    rows = []
+    for j, seg in enumerate(segments):
+        row = {"file_name": os.path.basename(path), "subject": subject, "side": side, "variant": variant,
+               "segment": seg["name"], "label": seg["label"], "start": seg["start"], "end": seg["end"]}
+        row.update({c: metrics[c][j].item() for c in TABLE_COLUMNS if c in metrics})
+        rows.append(row)
+    return rows
+
+
+def write_segment_csv(path, segment):
+    """区間の点と属性を CSV（x,y,z,<属性>...）に書き出す"""
+    columns = {"x": segment["points"][:, 0], "y": segment["points"][:, 1], "z": segment["points"][:, 2]}
+    columns.update({k: segment[k] for k in ("radius", "curvature", "torsion") if k in segment})
+    columns["label"] = np.full(len(segment["points"]), segment["label"])
+    pd.DataFrame(columns).to_csv(path, index=False, float_format=FLOAT_FORMAT)
+
+
+def segments_task(task):
+    """
+    中心線1本を区間に分け、区間ごとの CSV・メッシュを書き出す（プロセスプールのワーカーで実行される）。
+    (区間の表の行, 書き出したファイル) を返す。
+    """
+    path = task["path"]
+    labels = task.get("labels")
+    points, attrs, breaks = load_labeled_centerline(path)
+    rows = segment_table(path, points, attrs, breaks, labels)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = task["output_dir"] or os.path.dirname(os.path.abspath(path))
+    segments = split_centerline(points, attrs, breaks, labels)
+    written = []
+    if task.get("csv"):
+        for seg in segments:
+            out_path = os.path.join(out_dir, f"{stem}_{seg['name']}.csv")
+            write_segment_csv(out_path, seg)
+            written.append(out_path)
+
+    mesh = task.get("mesh")
+    if mesh:
+        from mesh_io import write_mesh
+        from tube_mesh import output_path_for, task_radius, tube_mesh
+
+        stops = joined_ends([s["start"] for s in segments], [s["end"] for s in segments], breaks, len(points))
+        radius = attrs.get("radius")
+        for seg, stop in zip(segments, stops):
+            if stop - seg["start"] < 2:
+                continue
+            seg_points = points[seg["start"]:stop]
+            seg_radius = None if radius is None else radius[seg["start"]:stop]
+            vertices, faces = tube_mesh(seg_points, task_radius(mesh, seg_points, seg_radius),
+                                        mesh["sides"], mesh["capping"])
+            out_radius = None if mesh.get("vary_radius") else mesh["radius"]
+            out_path = output_path_for(f"{stem}_{seg['name']}.csv", out_radius, mesh["sides"], out_dir,
+                                       mesh["format"])
+            write_mesh(out_path, vertices, faces, mesh["format"])
+            written.append(out_path)
+    return rows, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="点ごとのラベルで中心線を区間に分け、区間ごとに長さ・曲率・半径・メッシュを出す")
+    parser.add_argument("files", nargs="*", help="中心線ファイル（VTK / PLY / CSV、複数指定可）")
+    parser.add_argument("-d", "--dir",
+                        help="このディレクトリの *.vtk / *.ply / *.csv をすべて処理する（区間ごとの出力 *_lab<N>.csv は除く）")
+    parser.add_argument("-o", "--output-dir", help="区間ごとのファイルの出力先（既定: 入力と同じ場所）")
+    parser.add_argument("--labels", type=int, nargs="+", help="このラベルの区間だけを対象にする")
+    parser.add_argument("--table", default="label_segments.csv", help="区間の表（既定: label_segments.csv）")
+    parser.add_argument("--no-csv", action="store_true", help="区間ごとの CSV を書き出さない")
+    parser.add_argument("--mesh", action="store_true", help="区間ごとに管のメッシュを書き出す")
+    parser.add_argument("-r", "--radius", type=float, default=0.8, help="--mesh の管の半径（既定: 0.8）")
+    parser.add_argument("-n", "--nTv", type=int, default=32, help="--mesh の周方向の辺の数（既定: 32）")
+    parser.add_argument("--capping", action="store_true", help="--mesh で両端を閉じる")
+    parser.add_argument("--vary-radius", action="store_true", help="--mesh で点ごとの半径を使う")
+    parser.add_argument("--smooth", type=float, default=0.0, help="--vary-radius の半径の平滑化の幅（既定: 0）")
+    parser.add_argument("--format", choices=("stl", "stl-ascii", "ply"), default="stl",
+                        help="--mesh の出力形式（stl: バイナリSTL（既定） / stl-ascii: ASCII STL / ply: バイナリPLY）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.dir:
+        files += [f for f in sorted(glob.glob(os.path.join(args.dir, "*")))
+                  if os.path.splitext(f)[1].lower() in (".vtk", ".ply", ".csv") and not is_segment_file(f)]
+    files = [f for f in files if has_centerline_name(f)]
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    mesh = None
+    if args.mesh:
+        mesh = {"radius": args.radius, "sides": args.nTv, "capping": args.capping, "format": args.format,
+                "vary_radius": args.vary_radius, "smooth": args.smooth}
+    tasks = [{"path": f, "output_dir": args.output_dir, "labels": args.labels,
+              "csv": not args.no_csv, "mesh": mesh} for f in files]
+
+    rows = []
+    n_files = 0
+    for task, result, error in iter_parallel(segments_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        seg_rows, written = result
+        rows += seg_rows
+        n_files += len(written)
+        names = ", ".join(f"{r['segment']} ({r['length']:.2f})" for r in seg_rows)
+        print(f"{os.path.basename(task['path'])}: {names}")
+
+    table = pd.DataFrame(rows, columns=TABLE_COLUMNS).sort_values(["file_name", "start"], ignore_index=True)
+    table.to_csv(args.table, index=False)
+    print(f"{table['file_name'].nunique()} 本・{len(table)} 区間の表を {args.table} に、"
+          f"区間ごとのファイルを {n_files} 個書き出しました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ディレクトリ内の中心線CSVの全長を並列に計算し、
+終わったものから順に結果CSVへ書き出すバッチ処理エンジン。
+中心線ストア（.npz）からまとめて計算することもできる（store_lengths）。
+
+calc_centerline_length_batch.py / make_graph_and_csv_centerline_length_batch.py
+から使う。
+"""
+
+import csv
+import glob
+import math
+import os
+from array import array
+
+import numpy as np
+
+from centerline_io import polyline_length, read_centerline_points
+from centerline_store import has_centerline_name
+from parallel_batch import iter_parallel, report_error
+from stage_cache import cached
+
+
+class LengthStats:
+    """
+    total_length の統計量を1件ずつ更新する集計器。
+
+    件数・最小・最大・平均はその場で更新し、
+    中央値とヒストグラム用には値だけを array('d')（1件 8 バイト）で保持する。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self._values = array("d")
+
+    def add(self, value):
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.mean += (value - self.mean) / self.count
+        self._values.append(value)
+
+    def values(self):
+        """これまでの値を NumPy 配列で返す"""
+        return np.array(self._values, dtype=float)
+
+    def median(self):
+        return float(np.median(self.values())) if self.count else math.nan
+
+
+def centerline_length(csv_file):
+    """1本の中心線CSVの全長（ワーカーで実行される。キャッシュが有効なら再利用する）"""
+    return cached(
+        "centerline_length", [csv_file], {},
+        lambda: polyline_length(read_centerline_points(csv_file)),
+    )
+
+
+def list_csv_files(input_dir, output_csv):
+    """
+    ディレクトリ内の中心線の *.csv をソートして返す。出力ファイル自身と、被験者ID・左右が
+    ファイル名からわからない結果表（radius_transfer.csv, *_stats.csv など）は除く。
+    """
+    csv_files = sorted(glob.glob(os.path.join(input_dir, "*.csv")))
+    # 自分がこれから書く出力ファイルを一覧から除外（念のため）
+    return [f for f in csv_files
+            if os.path.abspath(f) != os.path.abspath(output_csv) and has_centerline_name(f)]
+
+
+def stream_lengths(csv_files, output_csv, workers=None):
+    """
+    csv_files の全長をプロセスプールで計算し、
+    終わった順に filename, total_length を output_csv へ書き出す。
+    統計量は LengthStats で逐次集計して返す。
+    """
+    stats = LengthStats()
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "total_length"])
+        for path, length, error in iter_parallel(centerline_length, csv_files, workers):
+            if error is not None:
+                report_error(path, error)
+                continue
+            filename_only = os.path.basename(path)
+            writer.writerow([filename_only, f"{length:.6f}"])
+            stats.add(length)
+            print(f"{filename_only}: total length = {length:.6f}")
+
+    print(f"\n結果を {output_csv} に書き出しました。")
+    return stats
+
+
+def store_lengths(store_path, output_csv, variant="original"):
+    """
+    中心線ストア（centerline_store.py）の variant の中心線の全長を
+    まとめて計算し、stream_lengths と同じ形式で output_csv へ書き出す。
+    """
+    from centerline_store import CenterlineStore
+
+    store = CenterlineStore.load(store_path)
+    indices = store.select(variant=variant)
+    lengths = store.lengths(indices)
+
+    stats = LengthStats()
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "total_length"])
+        for i, length in zip(indices, lengths):
+            length = float(length)
+            writer.writerow([store.name_of(i), f"{length:.6f}"])
+            stats.add(length)
+
+    print(f"{stats.count} 本の中心線の全長を {output_csv} に書き出しました。")
+    return stats
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+大きな VTK / PLY ファイルをメモリマップで開き、NumPy 配列として読むための共通関数。
+
+- バイナリデータは np.frombuffer でメモリマップ上のビューとして返せる。
+- ASCII データは一定サイズごとに数値化し、あらかじめ確保した配列へ直接書き込む
+  （ファイル全体の文字列や Python の float リストを作らない）。
+"""
+
+import mmap
+import os
+
+import numpy as np
+
+
+# ASCII データを一度に数値化する大きさ（バイト）。一時メモリはおおよそこの程度で済む
+ASCII_CHUNK_BYTES = 1 << 22
+
+
+def open_mapped(path):
+    """ファイルを読み取り専用でメモリマップして返す"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"空のファイルです: {path}")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def find_line_end(buf, start, n_lines):
+    """
+    buf[start:] から n_lines 行を数え、その直後の位置を返す。
+    改行の検索はチャンク単位で NumPy にまかせる。
+    """
+    pos = start
+    remaining = n_lines
+    total = len(buf)
+    while remaining > 0 and pos < total:
+        stop = min(pos + ASCII_CHUNK_BYTES, total)
+        chunk = np.frombuffer(buf, dtype=np.uint8, count=stop - pos, offset=pos)
+        newlines = np.flatnonzero(chunk == 0x0A)
+        if len(newlines) >= remaining:
+            return pos + int(newlines[remaining - 1]) + 1
+        remaining -= len(newlines)
+        pos = stop
+
+    # 最終行に改行が無い場合は、ファイル末尾までを1行とみなす
+    if remaining == 1 and total > start and buf[total - 1:total] != b"\n":
+        return total
+    if remaining > 0:
+        raise ValueError(f"行数が不足しています（残り {remaining} 行）。")
+    return pos
+
+
+def parse_ascii_block(buf, start, end, n_rows, n_cols=1, columns=None, dtype=float):
+    """
+    buf[start:end] の空白区切りの数値を先頭から n_rows * n_cols 個読み、
+    (n_rows, len(columns)) の配列に直接書き込んで返す。
+
+    columns を指定すると、その列だけを保持する（不要な列は配列にしない）。
+    """
+    columns = list(range(n_cols)) if columns is None else list(columns)
+    out = np.empty((n_rows, len(columns)), dtype=dtype)
+
+    row = 0
+    pos = start
+    carry = np.empty(0)
+    while row < n_rows and pos < end:
+        stop = min(pos + ASCII_CHUNK_BYTES, end)
+        if stop < end:
+            # 数値の途中で切らないよう、チャンク内の最後の改行（無ければ空白）まで戻す
+            cut = buf.rfind(b"\n", pos, stop)
+            if cut <= pos:
+                cut = buf.rfind(b" ", pos, stop)
+            if cut > pos:
+                stop = cut
+            else:
+                # チャンクより長い数値（か空白だけ）のときは、次の区切りまで伸ばす
+                ends = [i for i in (buf.find(b"\n", stop, end), buf.find(b" ", stop, end)) if i >= 0]
+                stop = min(ends) if ends else end
+        text = buf[pos:stop]
+        pos = stop
+        if not text.strip():
+            continue
+
+        values = np.fromstring(text, dtype=float, sep=" ")
+        if len(carry):
+            values = np.concatenate([carry, values])
+        n_full = min(len(values) // n_cols, n_rows - row)
+        block = values[:n_full * n_cols].reshape(n_full, n_cols)
+        out[row:row + n_full] = block[:, columns]
+        row += n_full
+        carry = values[n_full * n_cols:]
+
+    if row < n_rows:
+        raise ValueError(f"数値が不足しています（必要行数 {n_rows}, 実際 {row}）。")
+    return out
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+三角形メッシュ（頂点 (V,3), 三角形 (F,3) の NumPy 配列）を STL / PLY で書き出すモジュール。
+
+- write_mesh(path, vertices, faces)  : 一括書き出し（バイナリは1回の書き込み）
+- open_mesh_writer(path)             : 枝ごと・部品ごとに add() して少しずつ書き出す
+                                       （木全体のメッシュをメモリに持たなくてよい）
+
+形式（fmt）:
+  "stl"       : バイナリ STL（既定）
+  "stl-ascii" : ASCII STL（vtkSTLWriter と同じ書式。チェックイン済みの STL と同じ形）
+  "ply"       : バイナリ PLY（little endian, 頂点 float / 面 uchar + int）
+
+    with open_mesh_writer("tree.stl") as w:
+        for vertices, faces in segments:
+            w.add(vertices, faces)
+"""
+
+import abc
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+# STL の solid 行・ヘッダに書く名前
+STL_SOLID_NAME = "TubeFromCenterline generated STL File"
+
+MESH_FORMATS = ("stl", "stl-ascii", "ply")
+
+# バイナリ STL の1三角形分（法線・3頂点・属性）
+_STL_RECORD = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2"),
+])
+
+# バイナリ PLY の1面分（頂点数 uchar + 頂点インデックス int x3、詰めて並べる）
+_PLY_FACE = np.dtype([("count", "u1"), ("indices", "<i4", (3,))])
+
+_ASCII_FACET = (
+    " facet normal {} {} {}\n"
+    "  outer loop\n"
+    "   vertex {} {} {}\n"
+    "   vertex {} {} {}\n"
+    "   vertex {} {} {}\n"
+    "  endloop\n"
+    " endfacet\n"
+)
+
+# PLY ヘッダの要素数を書く桁数（後から同じ長さで書き換えるため固定幅にする）
+_PLY_COUNT_WIDTH = 10
+
+
+def facet_normals(vertices, faces):
+    """三角形ごとの単位法線 (F,3)"""
+    tri = vertices[faces]
+    nrm = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    length = np.linalg.norm(nrm, axis=1, keepdims=True)
+    return np.divide(nrm, length, out=np.zeros_like(nrm), where=length > 0)
+
+
+def _single_precision(vertices):
+    """vtkSTLWriter と同じく頂点を単精度（float）に丸めた倍精度配列"""
+    return np.asarray(vertices, dtype=np.float32).astype(float)
+
+
+def stl_records(vertices, faces):
+    """バイナリ STL の三角形レコードの配列 (F,)"""
+    vertices = _single_precision(vertices)
+    faces = np.asarray(faces, dtype=np.int64)
+    records = np.zeros(len(faces), dtype=_STL_RECORD)
+    records["normal"] = facet_normals(vertices, faces)
+    records["vertices"] = vertices[faces]
+    return records
+
+
+def stl_ascii_text(vertices, faces):
+    """ASCII STL の facet 部分の文字列"""
+    vertices = _single_precision(vertices)
+    faces = np.asarray(faces, dtype=np.int64)
+    rows = np.concatenate([facet_normals(vertices, faces), vertices[faces].reshape(-1, 9)], axis=1)
+    # tolist() で Python の float にしてから書く（最短で元の値に戻る桁数になる）
+    return "".join(_ASCII_FACET.format(*row) for row in rows.tolist())
+
+
+def _stl_header(name):
+    header = name.encode("ascii", "replace")[:80]
+    # バイナリ STL のヘッダは "solid" で始めない（ASCII と誤認されるため）
+    if header.lower().startswith(b"solid"):
+        header = b"binary " + header[:73]
+    return header.ljust(80, b" ")
+
+
+def _ply_header(n_vertices, n_faces):
+    w = _PLY_COUNT_WIDTH
+    return (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        "comment TubeFromCenterline generated PLY File\n"
+        f"element vertex {n_vertices:0{w}d}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        f"element face {n_faces:0{w}d}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    ).encode("ascii")
+
+
+class MeshWriter(abc.ABC):
+    """
+    メッシュを部品ごとに add() して書き出すライター（形式ごとのサブクラスで実装）。
+    with 文で使うと、抜けるときにヘッダの三角形数などを書き直して閉じる。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.n_vertices = 0
+        self.n_faces = 0
+
+    @abc.abstractmethod
+    def add(self, vertices, faces):
+        """部品1つ分の頂点 (V,3) と三角形 (F,3)（vertices の中のインデックス）を書き足す"""
+
+    @abc.abstractmethod
+    def close(self):
+        """書き終えて（ヘッダを直して）ファイルを閉じる"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StlWriter(MeshWriter):
+    """バイナリ STL。三角形数はヘッダの直後にあるので、閉じるときに書き直す"""
+
+    def __init__(self, path, name=STL_SOLID_NAME):
+        super().__init__(path)
+        self._f = open(path, "wb")
+        self._f.write(_stl_header(name))
+        self._f.write(struct.pack("<I", 0))
+
+    def add(self, vertices, faces):
+        if len(faces):
+            stl_records(vertices, faces).tofile(self._f)
+            self.n_vertices += len(vertices)
+            self.n_faces += len(faces)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.seek(80)
+        self._f.write(struct.pack("<I", self.n_faces))
+        self._f.close()
+
+
+class AsciiStlWriter(MeshWriter):
+    """ASCII STL（vtkSTLWriter と同じ書式）"""
+
+    def __init__(self, path, name=STL_SOLID_NAME):
+        super().__init__(path)
+        self._f = open(path, "w", newline="\n")
+        self._f.write(f"solid {name}\n")
+
+    def add(self, vertices, faces):
+        if len(faces):
+            self._f.write(stl_ascii_text(vertices, faces))
+            self.n_vertices += len(vertices)
+            self.n_faces += len(faces)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.write("endsolid\n")
+        self._f.close()
+
+
+class PlyWriter(MeshWriter):
+    """
+    バイナリ PLY。PLY は全頂点の後に全面を並べるので、
+    頂点は本体に、面は一時ファイルに書いておき、閉じるときに後ろへつなげる。
+    ヘッダの要素数は固定幅で書いておき、閉じるときに同じ長さで書き直す。
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._f = open(path, "wb")
+        self._f.write(_ply_header(0, 0))
+        self._faces = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+
+    def add(self, vertices, faces):
+        if not len(faces):
+            return
+        np.asarray(vertices, dtype="<f4").reshape(-1, 3).tofile(self._f)
+        records = np.empty(len(faces), dtype=_PLY_FACE)
+        records["count"] = 3
+        records["indices"] = np.asarray(faces, dtype=np.int64) + self.n_vertices
+        records.tofile(self._faces)
+        self.n_vertices += len(vertices)
+        self.n_faces += len(faces)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._faces.seek(0)
+        shutil.copyfileobj(self._faces, self._f, 1 << 22)
+        self._faces.close()
+        self._f.seek(0)
+        self._f.write(_ply_header(self.n_vertices, self.n_faces))
+        self._f.close()
+
+
+def mesh_format_for(path, fmt=None):
+    """fmt が省略されたら拡張子から決める（.stl → バイナリ STL, .ply → PLY）"""
+    if fmt is None:
+        fmt = "ply" if path.lower().endswith(".ply") else "stl"
+    if fmt not in MESH_FORMATS:
+        raise ValueError(f"未対応のメッシュ形式です: {fmt}")
+    return fmt
+
+
+def mesh_extension(fmt):
+    """形式に対応する拡張子"""
+    return ".ply" if fmt == "ply" else ".stl"
+
+
+def open_mesh_writer(path, fmt=None):
+    """少しずつ書き出すためのライター（MeshWriter）を開く"""
+    fmt = mesh_format_for(path, fmt)
+    if fmt == "ply":
+        return PlyWriter(path)
+    if fmt == "stl-ascii":
+        return AsciiStlWriter(path)
+    return StlWriter(path)
+
+
+def write_mesh(path, vertices, faces, fmt=None):
+    """メッシュを一括で書き出す"""
+    fmt = mesh_format_for(path, fmt)
+    if fmt == "ply":
+        write_ply_binary(path, vertices, faces)
+        return
+    with open_mesh_writer(path, fmt) as w:
+        w.add(vertices, faces)
+
+
+def write_stl_ascii(path, vertices, faces, name=STL_SOLID_NAME):
+    """ASCII STL を書き出す。vtkSTLWriter と同じく頂点は単精度（float）に丸めて書く。"""
+    with AsciiStlWriter(path, name) as w:
+        w.add(vertices, faces)
+
+
+def write_stl_binary(path, vertices, faces, name=STL_SOLID_NAME):
+    """バイナリ STL を書き出す（三角形レコードは1回の書き込み）"""
+    with StlWriter(path, name) as w:
+        w.add(vertices, faces)
+
+
+def write_ply_binary(path, vertices, faces):
+    """バイナリ PLY を書き出す（頂点・面はそれぞれ1回の書き込み）"""
+    records = np.empty(len(faces), dtype=_PLY_FACE)
+    records["count"] = 3
+    records["indices"] = faces
+    with open(path, "wb") as f:
+        f.write(_ply_header(len(vertices), len(faces)))
+        np.asarray(vertices, dtype="<f4").reshape(-1, 3).tofile(f)
+        records.tofile(f)
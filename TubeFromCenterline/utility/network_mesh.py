@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+vtk_set/*_ColorCoded.CNG.swc.vtk のような血管の木（LINES セルが枝ごとに分かれ、
+SegmentIndex / Domain をセルデータに持つ VTK）から、木全体の管メッシュを作るスクリプト。
+
+1本の折れ線にまとめてしまう vtk_to_csv / TubeFromCenterline と違い、
+LINES の1セル（枝）ごとに tube_mesh.tube_mesh で管を作り、
+分岐点（複数の枝が共有する点）には管と同じ半径の球を置いて枝どうしの隙間をふさぐ。
+
+出力単位（--split）:
+  tree   : 木全体で1つの STL（既定）
+  domain : Domain の値ごとに1つの STL
+  segment: 枝ごとに1つの STL
+
+ファイルごと（--split domain なら Domain ごと、--split segment なら SEGMENTS_PER_TASK 本の枝ごと）に
+プロセスプールで並列に作り、枝ごとに mesh_io のライターへ書き出す（既定はバイナリ STL）。
+
+使い方:
+  python network_mesh.py -r 0.5 -n 16 ../data/vtk_set/BG0002_ColorCoded.CNG.swc.vtk
+  python network_mesh.py --vary-radius --split domain -d ../data/vtk_set -o stl/ -j 8
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from parallel_batch import iter_parallel, report_error
+from mesh_io import MESH_FORMATS, mesh_extension, open_mesh_writer
+from tube_mesh import smooth_radius, tube_mesh
+from vtk_legacy_reader import VtkLegacyFile
+
+RADIUS_ARRAY = "MaximumInscribedSphereRadius"
+
+# --split segment で1つのタスクにまとめる枝の数（木1本でも複数のプロセスで分けて作る）
+SEGMENTS_PER_TASK = 32
+
+# ワーカーが直前に読み込んだ木（同じ木の続きのタスクで読み直さない）
+# {"key": (パス, サイズ, mtime, 半径のパラメータ), "network": ..., "radii": ...}
+_prepared = {}
+
+
+def load_network(path):
+    """
+    血管の木の VTK（または SWC）を読み込み、dict で返す。
+      points (N,3), offsets (S+1,), connectivity, radius (N,) or None,
+      domain (S,) / segment_index (S,)（無ければ 0 / 0..S-1）
+    """
+    if path.lower().endswith(".swc"):
+        from swc_io import load_swc_network
+
+        return load_swc_network(path)
+
+    with VtkLegacyFile(path) as vf:
+        points = vf.points(copy=True).astype(float)
+        offsets, connectivity = vf.cells("LINES")
+        n_seg = len(offsets) - 1
+
+        radius = None
+        if RADIUS_ARRAY in vf.array_names("point_data"):
+            radius = vf.point_array(RADIUS_ARRAY, copy=True).astype(float)
+
+        cell_names = vf.array_names("cell_data")
+        domain = (
+            vf.cell_array("Domain", copy=True).astype(np.int64)
+            if "Domain" in cell_names else np.zeros(n_seg, dtype=np.int64)
+        )
+        segment_index = (
+            vf.cell_array("SegmentIndex", copy=True).astype(np.int64)
+            if "SegmentIndex" in cell_names else np.arange(n_seg)
+        )
+
+    return {
+        "points": points,
+        "offsets": offsets,
+        "connectivity": connectivity,
+        "radius": radius,
+        "domain": domain,
+        "segment_index": segment_index,
+    }
+
+
+def junction_points(offsets, connectivity, segments=None):
+    """
+    segments（省略時は全枝）のうち2本以上の枝が共有する点（分岐点）のインデックス。
+    SWC から作った木では、子の枝は親の枝の途中の点から始まる。
+    """
+    if segments is None:
+        ids = connectivity
+    else:
+        ids = np.concatenate([connectivity[offsets[s]:offsets[s + 1]] for s in segments])
+    owner_count = np.bincount(ids, minlength=int(connectivity.max()) + 1 if len(connectivity) else 0)
+    return np.flatnonzero(owner_count >= 2)
+
+
+def sphere_template(sides):
+    """単位球の経緯度メッシュ（経線 sides 本、緯線 sides//2 本）の (頂点, 三角形)"""
+    n_lat = max(sides // 2, 2)
+    lat = np.pi * np.arange(1, n_lat) / n_lat
+    lon = 2.0 * np.pi * np.arange(sides) / sides
+    ring = np.stack([
+        np.outer(np.sin(lat), np.cos(lon)),
+        np.outer(np.sin(lat), np.sin(lon)),
+        np.repeat(np.cos(lat)[:, None], sides, axis=1),
+    ], axis=-1).reshape(-1, 3)
+    verts = np.concatenate([[[0.0, 0.0, 1.0]], ring, [[0.0, 0.0, -1.0]]])
+
+    k = np.arange(sides)
+    k1 = (k + 1) % sides
+    top = np.column_stack([np.zeros(sides, dtype=np.int64), 1 + k, 1 + k1])
+    i = np.arange(n_lat - 2)[:, None]
+    a = 1 + i * sides + k
+    b = 1 + i * sides + k1
+    c, d = a + sides, b + sides
+    band = np.stack([np.stack([a, c, b], -1), np.stack([b, c, d], -1)], axis=2).reshape(-1, 3)
+    south = len(verts) - 1
+    last = 1 + (n_lat - 2) * sides
+    bottom = np.column_stack([np.full(sides, south), last + k1, last + k])
+    return verts, np.concatenate([top, band, bottom])
+
+
+def spheres_mesh(centers, radii, sides):
+    """中心 centers (K,3)・半径 radii (K,) の球をまとめて1つのメッシュにする"""
+    tv, tf = sphere_template(sides)
+    centers = np.asarray(centers, dtype=float)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(centers),))
+    verts = (centers[:, None, :] + radii[:, None, None] * tv[None, :, :]).reshape(-1, 3)
+    faces = (tf[None, :, :] + (np.arange(len(centers)) * len(tv))[:, None, None]).reshape(-1, 3)
+    return verts, faces
+
+
+def merge_meshes(meshes):
+    """[(頂点, 三角形), ...] を1つのメッシュにまとめる（三角形のインデックスをずらす）"""
+    meshes = [m for m in meshes if len(m[1])]
+    if not meshes:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    shift = np.cumsum([0] + [len(v) for v, _ in meshes[:-1]])
+    vertices = np.concatenate([v for v, _ in meshes])
+    faces = np.concatenate([f + s for (_, f), s in zip(meshes, shift)])
+    return vertices, faces
+
+
+def point_radius(network, radius, vary_radius, smooth=0.0, max_slope=None):
+    """
+    各点の半径 (N,)。vary_radius なら MaximumInscribedSphereRadius を枝ごとに
+    平滑化したもの、そうでなければ一定値 radius。
+    """
+    n = len(network["points"])
+    if not vary_radius:
+        return np.full(n, float(radius))
+    if network["radius"] is None:
+        raise ValueError(f"{RADIUS_ARRAY} が見つかりません。")
+    if not smooth and max_slope is None:
+        return network["radius"]
+
+    # 枝ごとに弧長に沿って平滑化し、分岐点のように複数の枝が共有する点は最大値を使う
+    out = np.full(n, -np.inf)
+    offsets, conn = network["offsets"], network["connectivity"]
+    for s in range(len(offsets) - 1):
+        ids = conn[offsets[s]:offsets[s + 1]]
+        if len(ids) < 2:
+            continue
+        r = smooth_radius(network["points"][ids], network["radius"][ids], smooth, max_slope)
+        np.maximum.at(out, ids, r)
+    missing = ~np.isfinite(out)
+    out[missing] = network["radius"][missing]
+    return out
+
+
+def iter_group_meshes(network, segments, radii, sides, joints=True):
+    """
+    segments の枝の管と、分岐点の球を (頂点, 三角形) で1つずつ返すジェネレータ。
+    radii は各点の半径 (N,)。mesh_io のライターに順に add() すれば、
+    木全体のメッシュをメモリに持たずに書き出せる。
+    """
+    points = network["points"]
+    offsets, conn = network["offsets"], network["connectivity"]
+
+    for s in segments:
+        ids = conn[offsets[s]:offsets[s + 1]]
+        try:
+            yield tube_mesh(points[ids], radii[ids], sides)
+        except ValueError:
+            # 長さのない枝（1点だけなど）は分岐点の球に任せる
+            continue
+
+    if joints:
+        # 木全体の分岐点のうち、この組の枝が通るもの（Domain の境目の分岐点も含める）
+        used = np.concatenate([conn[offsets[s]:offsets[s + 1]] for s in segments])
+        joint_ids = np.intersect1d(network["junctions"], used)
+        if len(joint_ids):
+            yield spheres_mesh(points[joint_ids], radii[joint_ids], sides)
+
+
+def network_group_mesh(network, segments, radii, sides, joints=True):
+    """iter_group_meshes の部品を1つのメッシュ (頂点, 三角形) にまとめる"""
+    if "junctions" not in network:
+        network["junctions"] = junction_points(network["offsets"], network["connectivity"])
+    return merge_meshes(list(iter_group_meshes(network, segments, radii, sides, joints)))
+
+
+def group_segments(network, split, domains=None, segments=None):
+    """
+    出力単位ごとの枝の組 [(名前の接尾辞, 枝インデックス配列), ...]。
+    split="domain" で domains を指定すると、その Domain だけを返す。
+    split="segment" で segments（枝インデックスの (start, stop)）を指定すると、その範囲の枝だけを返す。
+    """
+    n_seg = len(network["offsets"]) - 1
+    if split == "tree":
+        return [("", np.arange(n_seg))]
+    if split == "domain":
+        if domains is None:
+            domains = np.unique(network["domain"])
+        return [(f"_domain{d}", np.flatnonzero(network["domain"] == d)) for d in domains]
+    if split == "segment":
+        start, stop = (0, n_seg) if segments is None else segments
+        return [(f"_segment{network['segment_index'][s]}", np.array([s])) for s in range(start, min(stop, n_seg))]
+    raise ValueError(f"未対応の split です: {split}")
+
+
+def output_path_for(path, suffix, radius, sides, output_dir=None, fmt="stl"):
+    """'<stem><suffix>_radius{r}_nTv{n}.stl'（tube_mesh.output_path_for と同じ書式）"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    r = "var" if radius is None else f"{radius:g}"
+    return os.path.join(out_dir, f"{stem}{suffix}_radius{r}_nTv{sides}{mesh_extension(fmt)}")
+
+
+def file_domains(path):
+    """木の Domain の値の一覧（VTK はセルデータ Domain、無ければ [0]。SWC は枝の type）"""
+    if path.lower().endswith(".swc"):
+        return [int(d) for d in np.unique(load_network(path)["domain"])]
+    with VtkLegacyFile(path) as vf:
+        if "Domain" not in vf.array_names("cell_data"):
+            return [0]
+        return [int(d) for d in np.unique(vf.cell_array("Domain"))]
+
+
+def file_segment_count(path):
+    """木の枝（LINES のセル）の数"""
+    if path.lower().endswith(".swc"):
+        return len(load_network(path)["offsets"]) - 1
+    with VtkLegacyFile(path) as vf:
+        return len(vf.cells("LINES")[0]) - 1
+
+
+def prepared_network(task):
+    """
+    task の木と点ごとの半径 (network, radii)。同じ木・同じ半径の指定が続くタスクでは
+    前回読み込んだものを使う（--split domain / segment で1本の木が複数のタスクに分かれるため）。
+    """
+    st = os.stat(task["path"])
+    key = (os.path.abspath(task["path"]), st.st_size, st.st_mtime_ns,
+           task["radius"], task["vary_radius"], task["smooth"], task["max_slope"])
+    if _prepared.get("key") != key:
+        network = load_network(task["path"])
+        network["junctions"] = junction_points(network["offsets"], network["connectivity"])
+        radii = point_radius(network, task["radius"], task["vary_radius"], task["smooth"], task["max_slope"])
+        _prepared.update(key=key, network=network, radii=radii)
+    return _prepared["network"], _prepared["radii"]
+
+
+def mesh_network_task(task):
+    """
+    1ファイル分（split=domain なら task["domains"] の Domain 分、split=segment なら
+    task["segments"] の範囲の枝の分）のメッシュを作って書き出す
+    （プロセスプールのワーカーで実行される）。[(出力パス, 三角形数), ...] を返す。
+    """
+    network, radii = prepared_network(task)
+    out_radius = None if task["vary_radius"] else task["radius"]
+
+    written = []
+    fmt = task.get("format", "stl")
+    for suffix, segments in group_segments(network, task["split"], task.get("domains"), task.get("segments")):
+        out_path = output_path_for(task["path"], suffix, out_radius, task["sides"], task["output_dir"], fmt)
+        # 枝ごとに書き出すので、木全体のメッシュを一度にメモリに持たない
+        with open_mesh_writer(out_path, fmt) as writer:
+            for vertices, faces in iter_group_meshes(network, segments, radii, task["sides"], task["joints"]):
+                writer.add(vertices, faces)
+        if writer.n_faces == 0:
+            os.remove(out_path)
+            continue
+        written.append((out_path, writer.n_faces))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="血管の木（LINES の VTK）から枝をつないだ管メッシュ（STL）を作る")
+    parser.add_argument("files", nargs="*", help="入力VTKファイル（複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの VTK をすべて処理する")
+    parser.add_argument("--glob", default="*.vtk", help="--dir で対象にするファイルのパターン（既定: *.vtk）")
+    parser.add_argument("--split", choices=("tree", "domain", "segment"), default="tree",
+                        help="出力単位（既定: tree = 木全体で1つ）")
+    parser.add_argument("-r", "--radius", type=float, default=0.8, help="管の半径（既定: 0.8）")
+    parser.add_argument("-n", "--nTv", type=int, default=16, help="周方向の辺の数（既定: 16）")
+    parser.add_argument("--vary-radius", action="store_true",
+                        help=f"-r の代わりに点ごとの {RADIUS_ARRAY} を使う")
+    parser.add_argument("--smooth", type=float, default=0.0, help="--vary-radius の半径を平滑化する幅（既定: 0）")
+    parser.add_argument("--max-slope", type=float, help="--vary-radius の半径の傾きの上限")
+    parser.add_argument("--no-joints", action="store_true", help="分岐点に球を置かない")
+    parser.add_argument(
+        "--format", choices=MESH_FORMATS, default="stl",
+        help="出力形式（stl: バイナリSTL（既定） / stl-ascii: ASCII STL / ply: バイナリPLY）"
+    )
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+    if args.nTv < 3:
+        parser.error("辺の数は 3 以上にしてください。")
+
+    files = list(args.files)
+    if args.dir:
+        files += sorted(glob.glob(os.path.join(args.dir, args.glob)))
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = [
+        {
+            "path": f,
+            "split": args.split,
+            "radius": args.radius,
+            "sides": args.nTv,
+            "vary_radius": args.vary_radius,
+            "smooth": args.smooth,
+            "max_slope": args.max_slope,
+            "joints": not args.no_joints,
+            "output_dir": args.output_dir,
+            "format": args.format,
+        }
+        for f in files
+    ]
+    if args.split == "domain":
+        # Domain ごとに別のタスクにして、1本の木でも複数のプロセスで分けて作る
+        tasks = [dict(t, domains=[d]) for t in tasks for d in file_domains(t["path"])]
+    elif args.split == "segment":
+        # 枝 SEGMENTS_PER_TASK 本ごとに別のタスクにする（続きのタスクは読み込んだ木を使い回す）
+        tasks = [
+            dict(t, segments=(start, start + SEGMENTS_PER_TASK))
+            for t in tasks for start in range(0, file_segment_count(t["path"]), SEGMENTS_PER_TASK)
+        ]
+
+    for task, written, error in iter_parallel(mesh_network_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        for out_path, n_faces in written:
+            print(f"{os.path.basename(task['path'])} -> {out_path} ({n_faces} triangles)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ファイル単位・被験者単位のバッチ処理をプロセスプールで並列に実行するための共通関数。
+"""
+
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+def default_workers():
+    """既定のワーカー数（CPU コア数）"""
+    return os.cpu_count() or 1
+
+
+def iter_parallel(func, items, workers=None, max_pending=None):
+    """
+    items の各要素に func を適用し、終わった順に (item, result, error) を返すジェネレータ。
+
+    - func はモジュールのトップレベルで定義された関数であること（プロセス間で渡すため）。
+    - error は例外が起きた場合のみ入る（そのとき result は None）。
+    - workers=1 ならプロセスを作らずに順番に実行する（デバッグ用）。
+    - 実行待ちのタスクは max_pending 個（既定: workers*4）までに抑えるので、
+      何万件あってもメモリに溜まる結果はわずかで済む。
+    """
+    workers = workers or default_workers()
+
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    max_pending = max_pending or workers * 4
+    items = iter(items)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit_next():
+            for item in items:
+                pending[pool.submit(func, item)] = item
+                return True
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                item = pending.pop(fut)
+                try:
+                    yield item, fut.result(), None
+                except Exception as e:
+                    yield item, None, e
+                submit_next()
+
+
+def report_error(label, error):
+    """バッチ処理中のエラーを標準エラーに出す（処理は継続する）"""
+    print(f"{label}: エラーが発生しました: {error}", file=sys.stderr)
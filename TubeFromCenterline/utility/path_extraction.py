@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+血管の木（vtk_set/*_ColorCoded.CNG.swc.vtk）から、始点から終点までの経路（ICA → MCA など）を
+最短路で切り出し、点ごとの半径を付けて中心線CSV（x,y,z,radius）に書き出すスクリプト。
+
+10_siphon(MCA_ICA) や 1_Original(from chen)/*_ICA_{L,R}.vtk は木の一部の経路で、
+これまでは外部のツールで手作業で切り出していた。ここでは
+  - vessel_graph.VesselNetwork の点の隣接表（辺の重み = 弧長）の上で Dijkstra を1回だけ解き、
+    始点からの距離と前の点の表から経路をたどる（SciPy があれば scipy.sparse.csgraph を使う）
+  - 始点・終点は座標（木の最も近い点に合わせる）か、Domain の値で指定する
+      座標から木の点までの距離（スナップ距離）が --max-snap を超えたらエラーにする
+      （座標系の違う中心線の端点を渡すと、木の端の点に寄って長さ 0 の経路になるため）
+      始点の Domain : その Domain の最も根元に近い枝の最初の点
+      終点の Domain : --end-mode distal（既定）なら、その Domain の端点のうち始点から最も遠いもの、
+                      proximal なら、その Domain の点のうち始点に最も近いもの
+  - 被験者・左右ごとの指定を表（--seeds）にまとめて、全被験者を一度に処理する
+
+始点・終点の表（CSV）の列:
+  subject, side, start_x, start_y, start_z, end_x, end_y, end_z, start_domain, end_domain
+  （座標か Domain のどちらかを埋める。subject が * の行は、-d のすべての木に使う）
+
+使い方:
+  python path_extraction.py ../data/vtk_set/BG0019_ColorCoded.CNG.swc.vtk --side L \\
+      --start 88.5 -104.8 96.4 --end-domain 4 -o BG0019_L_path.csv
+  python path_extraction.py --seeds seeds.csv -d ../data/vtk_set -o paths/ --name ICA-MCA
+"""
+
+import argparse
+import glob
+import heapq
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from parallel_batch import iter_parallel, report_error
+from resample_centerline import FLOAT_FORMAT
+from stage_cache import add_cache_arguments, configure_cache_from_args
+from subject_ids import normalize_subject, subject_of
+from vessel_graph import load_vessel_network
+
+END_MODES = ("distal", "proximal")
+
+# 座標を木の点に合わせるときの既定の上限 [mm]
+DEFAULT_MAX_SNAP = 5.0
+
+SUMMARY_FIELDS = [
+    "subject", "side", "network", "output", "start_point", "end_point", "start_snap", "end_snap",
+    "n_points", "length", "mean_radius", "min_radius",
+]
+
+
+def _dijkstra_heap(network, source):
+    """SciPy が無いとき用の Dijkstra（二分ヒープ）。(距離 (N,), 前の点 (N,)、無ければ -1)"""
+    indptr, indices, weights = network.adj_indptr, network.adj_indices, network.adj_length
+    dist = np.full(network.n_points, np.inf)
+    pred = np.full(network.n_points, -1, dtype=np.int64)
+    dist[source] = 0.0
+    heap = [(0.0, int(source))]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, int(v)))
+    return dist, pred
+
+
+def distances_from(network, source):
+    """点 source から全点への弧長の最短距離と、最短路の前の点 (距離 (N,), 前の点 (N,))"""
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra
+    except ImportError:
+        return _dijkstra_heap(network, source)
+    n = network.n_points
+    graph = csr_matrix((network.adj_length, network.adj_indices, network.adj_indptr), shape=(n, n))
+    dist, pred = dijkstra(graph, directed=True, indices=int(source), return_predecessors=True)
+    return dist, np.where(pred < 0, -1, pred).astype(np.int64)
+
+
+def trace_path(pred, source, target):
+    """前の点の表から source → target の点のインデックスを並べる"""
+    path = [int(target)]
+    while path[-1] != source:
+        prev = pred[path[-1]]
+        if prev < 0 or len(path) > len(pred):
+            raise ValueError(f"点 {source} から点 {target} へつながっていません。")
+        path.append(int(prev))
+    return np.array(path[::-1], dtype=np.int64)
+
+
+def nearest_point(network, xyz):
+    """座標 xyz に最も近い木の点 (インデックス, 距離)"""
+    d = np.linalg.norm(network.points - np.asarray(xyz, dtype=float), axis=1)
+    i = int(np.argmin(d))
+    return i, float(d[i])
+
+
+def domain_start_point(network, domain):
+    """Domain の最も根元に近い枝（深さが最小、同じなら部分木が最も長い枝）の最初の点"""
+    segs = network.domain_segments(domain)
+    if len(segs) == 0:
+        raise ValueError(f"Domain {domain} の枝がありません。")
+    best = segs[np.lexsort((-network.subtree_length[segs], network.depth[segs]))[0]]
+    return int(network.segment_points(best)[0])
+
+
+def domain_end_point(network, domain, dist, mode="distal"):
+    """
+    始点からの距離 dist を使って、Domain の中の終点を選ぶ。
+    distal: その Domain の端点のうち最も遠いもの / proximal: その Domain の点のうち最も近いもの
+    """
+    segs = network.domain_segments(domain)
+    if len(segs) == 0:
+        raise ValueError(f"Domain {domain} の枝がありません。")
+    ids = np.unique(np.concatenate([network.segment_points(s) for s in segs]))
+    if mode == "distal":
+        ends = np.intersect1d(ids, network.endpoints())
+        ids = ends if len(ends) else ids
+    ids = ids[np.isfinite(dist[ids])]
+    if len(ids) == 0:
+        raise ValueError(f"始点から Domain {domain} へつながっていません。")
+    pick = np.argmax(dist[ids]) if mode == "distal" else np.argmin(dist[ids])
+    return int(ids[pick])
+
+
+def _snap(network, xyz, max_snap, which):
+    """座標を木の最も近い点に合わせる。距離が max_snap を超えたら ValueError"""
+    i, d = nearest_point(network, xyz)
+    if max_snap is not None and d > max_snap:
+        raise ValueError(f"{which}の座標から木の最も近い点まで {d:.2f} 離れています（上限 {max_snap:g}）。"
+                         "座標系が木と同じか確認してください。")
+    return i, d
+
+
+def extract_path(network, start=None, end=None, start_domain=None, end_domain=None, end_mode="distal",
+                 max_snap=None):
+    """
+    始点から終点までの最短路を返す
+    {"ids", "points", "radius", "length", "start_point", "end_point", "start_snap", "end_snap"}。
+    start / end は座標 (3,)、start_domain / end_domain は Domain の値（どちらか一方を指定）。
+    座標で指定した点は木の最も近い点に合わせ、その距離を start_snap / end_snap に入れる
+    （Domain で指定したら NaN）。max_snap を超えたら ValueError。
+    """
+    start_snap = end_snap = np.nan
+    if start is not None:
+        source, start_snap = _snap(network, start, max_snap, "始点")
+    elif start_domain is not None:
+        source = domain_start_point(network, start_domain)
+    else:
+        raise ValueError("始点（座標か Domain）を指定してください。")
+
+    dist, pred = distances_from(network, source)
+    if end is not None:
+        target, end_snap = _snap(network, end, max_snap, "終点")
+    elif end_domain is not None:
+        target = domain_end_point(network, end_domain, dist, end_mode)
+    else:
+        raise ValueError("終点（座標か Domain）を指定してください。")
+    if not np.isfinite(dist[target]):
+        raise ValueError(f"点 {source} から点 {target} へつながっていません。")
+
+    ids = trace_path(pred, source, target)
+    return {
+        "ids": ids,
+        "points": network.points[ids],
+        "radius": network.radius[ids],
+        "length": float(dist[target]),
+        "start_point": source,
+        "end_point": target,
+        "start_snap": start_snap,
+        "end_snap": end_snap,
+    }
+
+
+def write_path_csv(path, result):
+    """経路を中心線CSV（x,y,z,radius）に書き出す"""
+    p = result["points"]
+    df = pd.DataFrame({"x": p[:, 0], "y": p[:, 1], "z": p[:, 2], "radius": result["radius"]})
+    df.to_csv(path, index=False, float_format=FLOAT_FORMAT)
+
+
+def _seed_value(row, prefix):
+    """表の1行から座標の指定 (3,)（空なら None）"""
+    cols = [f"{prefix}_{a}" for a in "xyz"]
+    if not all(c in row and pd.notna(row[c]) for c in cols):
+        return None
+    return np.array([row[c] for c in cols], dtype=float)
+
+
+def _domain_value(row, name):
+    return int(row[name]) if name in row and pd.notna(row[name]) else None
+
+
+def read_seeds(path):
+    """始点・終点の表を [{"subject", "side", "start", "end", "start_domain", "end_domain"}, ...] で読む"""
+    df = pd.read_csv(path, dtype={"subject": str, "side": str})
+    seeds = []
+    for row in df.to_dict("records"):
+        seeds.append({
+            "subject": row["subject"] if row["subject"] == "*" else normalize_subject(row["subject"]),
+            "side": row["side"],
+            "start": _seed_value(row, "start"),
+            "end": _seed_value(row, "end"),
+            "start_domain": _domain_value(row, "start_domain"),
+            "end_domain": _domain_value(row, "end_domain"),
+        })
+    return seeds
+
+
+def plan_tasks(seeds, network_paths, output_dir, name, end_mode, max_snap=DEFAULT_MAX_SNAP):
+    """被験者ごとの木と、始点・終点の指定を組み合わせたタスク（同じ木のタスクは1つにまとめる）"""
+    by_subject = {}
+    for path in sorted(network_paths):
+        sid = subject_of(path)
+        if sid is None:
+            continue
+        if sid in by_subject:
+            print(f"警告: {sid} の木が複数あります。{by_subject[sid]} を使います。", file=sys.stderr)
+            continue
+        by_subject[sid] = path
+
+    tasks = {}
+    for seed in seeds:
+        subjects = sorted(by_subject) if seed["subject"] == "*" else [seed["subject"]]
+        for sid in subjects:
+            if sid not in by_subject:
+                print(f"警告: {sid} の木がありません。", file=sys.stderr)
+                continue
+            task = tasks.setdefault(sid, {"network": by_subject[sid], "subject": sid, "paths": {},
+                                          "output_dir": output_dir, "name": name, "end_mode": end_mode,
+                                          "max_snap": max_snap})
+            # 同じ被験者・左右の指定が複数あれば、個別の行（subject が * でない行）を優先する
+            if seed["side"] not in task["paths"] or seed["subject"] != "*":
+                task["paths"][seed["side"]] = seed
+    return list(tasks.values())
+
+
+def path_task(task):
+    """
+    1被験者の木から、左右ごとの経路を切り出して書き出す（プロセスプールのワーカーで実行される）。
+    木の読み込みとつながりの表は1回だけ作る。[要約の dict, ...] を返す。
+    切り出せなかった左右（スナップ距離が上限を超えたなど）はエラーを出して飛ばす。
+    """
+    network = load_vessel_network(task["network"])
+    rows = []
+    for side, seed in sorted(task["paths"].items()):
+        try:
+            result = extract_path(network, seed["start"], seed["end"], seed["start_domain"], seed["end_domain"],
+                                  task["end_mode"], task.get("max_snap"))
+        except ValueError as e:
+            report_error(f"{task['subject']} {side}", e)
+            continue
+        out_path = seed.get("output") or os.path.join(task["output_dir"], f"{task['subject']}_{side}_{task['name']}.csv")
+        write_path_csv(out_path, result)
+        rows.append({
+            "subject": task["subject"], "side": side, "network": os.path.basename(task["network"]),
+            "output": out_path, "start_point": result["start_point"], "end_point": result["end_point"],
+            "start_snap": result["start_snap"], "end_snap": result["end_snap"],
+            "n_points": len(result["ids"]), "length": result["length"],
+            "mean_radius": float(np.nanmean(result["radius"])) if np.isfinite(result["radius"]).any() else np.nan,
+            "min_radius": float(np.nanmin(result["radius"])) if np.isfinite(result["radius"]).any() else np.nan,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="血管の木から始点〜終点の経路を最短路で切り出し、半径付きの中心線CSVにする")
+    parser.add_argument("network", nargs="?", help="血管の木の VTK / SWC（1つだけ処理する場合）")
+    parser.add_argument("--start", type=float, nargs=3, metavar=("X", "Y", "Z"), help="始点の座標")
+    parser.add_argument("--end", type=float, nargs=3, metavar=("X", "Y", "Z"), help="終点の座標")
+    parser.add_argument("--start-domain", type=int, help="始点の Domain")
+    parser.add_argument("--end-domain", type=int, help="終点の Domain")
+    parser.add_argument("--side", choices=("L", "R"), default="L", help="1つだけ処理する場合の左右（既定: L）")
+    parser.add_argument("--end-mode", choices=END_MODES, default="distal",
+                        help="終点を Domain で指定したときの選び方（既定: distal = 最も遠い端点）")
+    parser.add_argument("--max-snap", type=float, default=DEFAULT_MAX_SNAP,
+                        help=f"座標を木の点に合わせるときの距離の上限。超えたらエラー（既定: {DEFAULT_MAX_SNAP:g}、inf で無制限）")
+    parser.add_argument("--seeds", help="被験者・左右ごとの始点・終点の表（CSV）")
+    parser.add_argument("-d", "--dir", help="--seeds 使用時に、血管の木（*.vtk / *.swc）を探すディレクトリ")
+    parser.add_argument("--name", default="path", help="出力ファイル名の経路名 <被験者>_<左右>_<名前>.csv（既定: path）")
+    parser.add_argument("-o", "--output", help="出力CSV（1つだけの場合）または出力先ディレクトリ（--seeds の場合）")
+    parser.add_argument("--summary", help="経路ごとの要約を書き出す CSV")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    configure_cache_from_args(args)
+
+    if args.seeds:
+        if not args.dir:
+            parser.error("--seeds には -d（血管の木のディレクトリ）も指定してください。")
+        output_dir = args.output or "."
+        os.makedirs(output_dir, exist_ok=True)
+        networks = glob.glob(os.path.join(args.dir, "*.vtk")) + glob.glob(os.path.join(args.dir, "*.swc"))
+        tasks = plan_tasks(read_seeds(args.seeds), networks, output_dir, args.name, args.end_mode, args.max_snap)
+    elif args.network:
+        subject = subject_of(args.network) or os.path.splitext(os.path.basename(args.network))[0]
+        seed = {"start": args.start, "end": args.end, "start_domain": args.start_domain,
+                "end_domain": args.end_domain, "output": args.output}
+        tasks = [{"network": args.network, "subject": subject, "paths": {args.side: seed},
+                  "output_dir": ".", "name": args.name, "end_mode": args.end_mode, "max_snap": args.max_snap}]
+    else:
+        parser.error("血管の木の VTK か --seeds を指定してください。")
+
+    rows = []
+    for task, result, error in iter_parallel(path_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["network"], error)
+            continue
+        rows += result
+        for r in result:
+            print(f"{r['subject']} {r['side']}: {r['n_points']} 点, 長さ {r['length']:.2f}"
+                  f"（スナップ {r['start_snap']:.2f} / {r['end_snap']:.2f}） -> {r['output']}")
+
+    if args.summary:
+        summary = pd.DataFrame(rows, columns=SUMMARY_FIELDS).sort_values(["subject", "side"])
+        summary.to_csv(args.summary, index=False)
+        print(f"要約を書き出しました: {args.summary}")
+
+    n_requested = sum(len(task["paths"]) for task in tasks)
+    if len(rows) < n_requested:
+        print(f"{n_requested - len(rows)} / {n_requested} 本の経路を切り出せませんでした。", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線の処理（VTK → CSV, 再サンプリング, 半径の付加, 指標, 管メッシュ, 統計）を
+1つのコマンドでまとめて実行するパイプライン。
+
+これまでは vtkAscii_to_csv.bat が VTK 1本ごとに Python を起動して move し、
+残りの段はスクリプトを GUI で1つずつ実行していた。ここでは
+  - 段（stage）の並びを中心線ごとのジョブの DAG（依存関係のグラフ）にし、
+      points → resample → radius → metrics ┐
+                                 └→ mesh    └→ stats（全例の表と統計）
+  - 依存先が終わったジョブから、1つのプロセスプール（最後まで使い回す）で並列に実行し、
+  - 出力ごとに「入力ファイルのサイズ・mtime・内容のハッシュ」と段のパラメータを
+    マニフェスト（<出力先>/pipeline_manifest.json）に記録しておき、
+    入力の中身かパラメータが変わったジョブだけを作り直す（make と同じ考え方）。
+    mtime だけが変わって中身が同じなら作り直さず、作り直した結果が前回と同じなら
+    その先の段も作り直さない。
+Python の起動はコホート全体で1回（とプールのワーカー数）だけで済む。
+
+段:
+  points   : VTK（ASCII / BINARY）→ x,y,z の CSV（vtkAscii_to_csv.vtk_to_csv）
+  resample : 弧長に沿って --count 点に再サンプリング（resample_centerline）
+  radius   : --networks の木（vtk_set）から半径を付ける（csv_add_raidus、被験者IDで対応付け）。
+             --networks を指定したときに対応する木がない中心線は、radius ジョブの失敗になる
+             （その中心線の metrics / mesh も作らない。一定の半径に黙って切り替えない）。
+             中心線の点から木の点までの距離の中央値が --max-distance を超えたときも
+             （座標系が違う木など）、radius ジョブの失敗にする
+  metrics  : 蛇行度などの指標（centerline_metrics）
+  mesh     : 管のメッシュ（tube_mesh。radius 段があれば点ごとの半径を使う）
+  stats    : 全例の指標の表（centerline_metrics.csv）とコホートの統計（cohort_stats）
+
+出力先のレイアウト（<out> は -o）:
+  <out>/output_csv/<名前>.csv, <名前>_resampled<N>.csv
+  <out>/radius/<名前>_resampled<N>.csv
+  <out>/metrics/<名前>.csv（1本ごとの指標）
+  <out>/stl/<名前>_radius<r>_nTv<n>.stl
+  <out>/centerline_metrics.csv, <out>/cohort_stats.csv, <out>/cohort_stats.json
+
+使い方:
+  python pipeline.py "../data/10_siphon(MCA_ICA)" -o "../data/10_siphon(MCA_ICA)/pipeline" -j 8
+  python pipeline.py centerlines -o out --networks trees   （中心線と同じ座標系の木があるとき）
+  python pipeline.py "../data/10_siphon(MCA_ICA)" -o out --stages points resample   （一部の段だけ）
+  python pipeline.py ... --dry-run      （作り直すジョブを表示するだけ）
+  python pipeline.py ... --force mesh   （mesh 段を入力に関係なく作り直す）
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from csv_add_raidus import DEFAULT_MAX_DISTANCE
+from mesh_io import MESH_FORMATS
+from parallel_batch import default_workers, report_error
+from stage_cache import add_cache_arguments, configure_cache_from_args, file_digest
+from subject_ids import SUBJECT_ID_PATTERN
+
+# 段の順番（DAG の並びもこの順）
+STAGES = ("points", "resample", "radius", "metrics", "mesh", "stats")
+
+# 出力先のサブディレクトリ（output_csv は vtkAscii_to_csv.bat と同じ名前）
+STAGE_DIRS = {
+    "points": "output_csv",
+    "resample": "output_csv",
+    "radius": "radius",
+    "metrics": "metrics",
+    "mesh": "stl",
+}
+
+MANIFEST_NAME = "pipeline_manifest.json"
+
+# マニフェストを書き出す間隔 [秒]（ジョブが終わるたびに書くと、数百本では書き込みが多すぎる）
+MANIFEST_SAVE_INTERVAL = 1.0
+
+# 各段の設定の既定値（plan_jobs の config）
+DEFAULT_CONFIG = {
+    "point_data": False,
+    "count": 120,
+    "networks": None,
+    "id_pattern": SUBJECT_ID_PATTERN,
+    "mode": "nearest",
+    "k": 4,
+    "within": None,
+    "max_distance": DEFAULT_MAX_DISTANCE,
+    "curvature": "auto",
+    "labels": True,
+    "radius": 0.8,
+    "sides": 32,
+    "capping": False,
+    "smooth": 0.0,
+    "format": "stl",
+    "uvcs": None,
+}
+
+# マニフェストの形式を変えたら上げる（古いマニフェストは使わずに全部作り直す）
+_MANIFEST_VERSION = 1
+
+
+# ---- 段ごとのジョブ（プロセスプールのワーカーで実行される） ----
+
+def points_job(job):
+    """VTK を x,y,z（と点データ）の CSV にする"""
+    from vtkAscii_to_csv import vtk_to_csv
+
+    vtk_to_csv(job["inputs"][0], job["params"]["point_data"], csv_path=job["outputs"][0])
+    return job["outputs"][0]
+
+
+def resample_job(job):
+    """CSV を弧長に沿って再サンプリングする"""
+    from resample_centerline import resample_file
+
+    out_path = resample_file({
+        "path": job["inputs"][0],
+        "mode": {"count": job["params"]["count"]},
+        "output_dir": os.path.dirname(job["outputs"][0]),
+    })
+    if os.path.abspath(out_path) != os.path.abspath(job["outputs"][0]):
+        raise RuntimeError(f"再サンプリングの出力が予定と違います: {out_path}")
+    return out_path
+
+
+# ワーカーで読んだ木 {(パス, サイズ, mtime_ns): (点, 半径, 空間インデックス)}
+# 同じ被験者の L / R は続けて同じワーカーに来ることが多いので、数件だけ覚えておく
+_networks = {}
+_NETWORK_MEMO = 4
+
+
+def _network(path):
+    from csv_add_raidus import parse_vtk_points_and_radius
+    from spatial_index import build_spatial_index
+
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _networks:
+        if len(_networks) >= _NETWORK_MEMO:
+            _networks.pop(next(iter(_networks)))
+        points, radius = parse_vtk_points_and_radius(path)
+        _networks[key] = (points, radius, build_spatial_index(points))
+    return _networks[key]
+
+
+def radius_job(job):
+    """
+    中心線 CSV に、同じ被験者の木の半径（radius）と距離（distance）の列を付ける。
+    距離の中央値が max_distance を超えたら書き出さずに ValueError（csv_add_raidus.check_distance）。
+    """
+    from csv_add_raidus import check_distance, csv_points, transfer_radius
+
+    csv_path, vtk_path = job["inputs"]
+    points_vtk, radius_vtk, index = _network(vtk_path)
+    p = job["params"]
+    df = pd.read_csv(csv_path)
+    radii, distances = transfer_radius(
+        csv_points(df), points_vtk, radius_vtk, index, mode=p["mode"], k=p["k"], within=p["within"]
+    )
+    check_distance(distances, p["max_distance"], job["name"])
+    df["radius"], df["distance"] = radii, distances
+    df.to_csv(job["outputs"][0], index=False)
+    return job["outputs"][0]
+
+
+def metrics_job(job):
+    """中心線1本の指標（全体とラベルの区間ごと、1行1区間）を CSV に書き出す"""
+    from centerline_metrics import metrics_task
+    from centerline_store import parse_centerline_name
+
+    path = job["inputs"][0]
+    rows = metrics_task({"path": path, "params": job["params"]})
+    subject, side, variant = parse_centerline_name(job["name"])
+    info = {"file_name": job["name"], "subject": subject, "side": side, "variant": variant}
+    pd.DataFrame([{**info, **r} for r in rows]).to_csv(job["outputs"][0], index=False)
+    return job["outputs"][0]
+
+
+def mesh_job(job):
+    """中心線1本の管メッシュを書き出す"""
+    from tube_mesh import mesh_task
+
+    task = dict(job["params"], path=job["inputs"][0], output_dir=os.path.dirname(job["outputs"][0]))
+    out_path, n_faces = mesh_task(task)
+    return f"{out_path}（{n_faces} 三角形）"
+
+
+def stats_job(job):
+    """全例の指標を1つの表（1行1本）にまとめ、コホートの統計を書き出す"""
+    from centerline_metrics import wide_table
+    from cohort_stats import summarize_tables
+
+    table_path, stats_csv, _ = job["outputs"]
+    long = pd.concat([pd.read_csv(p) for p in job["inputs"]], ignore_index=True)
+    long = long.sort_values(["file_name", "start", "end"], ascending=[True, True, False], ignore_index=True)
+    wide_table(long).to_csv(table_path, index=False)
+    summarize_tables([table_path], os.path.splitext(stats_csv)[0], job["params"]["uvcs"])
+    return table_path
+
+
+# ---- マニフェスト（出力ごとの入力・パラメータの記録） ----
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class Manifest:
+    """
+    出力ごとに、作ったときの段・パラメータ・入力（サイズ, mtime, ハッシュ）・出力（サイズ, mtime）を記録する。
+      {出力の絶対パス: {"stage", "params", "inputs": {パス: [size, mtime_ns, digest]},
+                        "outputs": {パス: [size, mtime_ns]}}}
+    複数の出力を持つジョブ（stats）は、最初の出力をキーにする。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == _MANIFEST_VERSION:
+                self.entries = data["entries"]
+
+    def save(self):
+        """一時ファイルに書いてから置き換える（途中で止まっても壊れたマニフェストを残さない）"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": _MANIFEST_VERSION, "entries": self.entries}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _key(job):
+        return os.path.abspath(job["outputs"][0])
+
+    def reason(self, job):
+        """
+        ジョブを作り直す理由（文字列）を返す。前回と同じなら None。
+        入力はサイズと mtime が記録と同じならハッシュを計算しない。
+        mtime だけが変わって中身が同じ入力は、記録の mtime を更新して「変わっていない」とみなす。
+        """
+        entry = self.entries.get(self._key(job))
+        if entry is None:
+            return "初回"
+        if entry["stage"] != job["stage"] or entry["params"] != _normalized(job["params"]):
+            return "パラメータの変更"
+
+        inputs = [os.path.abspath(p) for p in job["inputs"]]
+        if sorted(inputs) != sorted(entry["inputs"]):
+            return "入力ファイルの変更"
+        for path in job["outputs"]:
+            path = os.path.abspath(path)
+            if not os.path.exists(path) or list(_stat(path)) != entry["outputs"].get(path):
+                return "出力が無いか、書き換えられている"
+
+        touched = {}
+        for path in inputs:
+            if not os.path.exists(path):
+                return f"入力が無い: {path}"
+            size, mtime, digest = entry["inputs"][path]
+            if (size, mtime) == _stat(path):
+                continue
+            if file_digest(path) != digest:
+                return f"入力の内容の変更: {os.path.basename(path)}"
+            touched[path] = [*_stat(path), digest]
+        entry["inputs"].update(touched)
+        return None
+
+    def record(self, job):
+        """ジョブが終わったときの入力・出力を記録する"""
+        self.entries[self._key(job)] = {
+            "stage": job["stage"],
+            "params": _normalized(job["params"]),
+            "inputs": {os.path.abspath(p): [*_stat(p), file_digest(p)] for p in job["inputs"]},
+            "outputs": {os.path.abspath(p): list(_stat(p)) for p in job["outputs"]},
+        }
+
+
+def _normalized(params):
+    """JSON に保存したときと同じ形にする（タプル → リストなど）"""
+    return json.loads(json.dumps(params))
+
+
+# ---- ジョブの計画 ----
+
+def collect_inputs(paths):
+    """
+    入力（ファイルかディレクトリ）から、被験者ID・左右がわかる中心線（*.vtk / *.csv）を集める。
+    ディレクトリは直下の *.vtk と *.csv（再サンプリング済みのものを除く）を使う。
+    同じ名前（拡張子を除く）のファイルは最初のものだけを使う。
+    """
+    from centerline_store import parse_centerline_name
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "*.vtk")))
+            files += [f for f in sorted(glob.glob(os.path.join(path, "*.csv"))) if "_resampled" not in f]
+        else:
+            files.append(path)
+
+    by_stem = {}
+    for f in files:
+        if os.path.splitext(f)[1].lower() not in (".vtk", ".csv"):
+            print(f"警告: VTK / CSV ではないので除きます: {f}", file=sys.stderr)
+            continue
+        try:
+            parse_centerline_name(f)
+        except ValueError:
+            continue
+        stem = os.path.splitext(os.path.basename(f))[0]
+        if stem in by_stem:
+            print(f"警告: {stem} が複数あります。{by_stem[stem]} を使います。", file=sys.stderr)
+            continue
+        by_stem[stem] = f
+    return list(by_stem.values())
+
+
+def _job(stage, func, name, inputs, outputs, params, deps):
+    return {
+        "id": f"{stage}:{name}",
+        "stage": stage,
+        "func": func,
+        "name": name,
+        "inputs": list(inputs),
+        "outputs": list(outputs),
+        "params": params,
+        "deps": [d for d in deps if d is not None],
+    }
+
+
+def plan_jobs(inputs, out_dir, stages=STAGES, config=None):
+    """
+    中心線ごとに、stages のジョブを依存関係つきで作る（段の順＝DAG の並びの順のリスト）。
+    各段の入力は、その中心線の1つ前の段の出力（その段を実行しないなら前の段、最初は元のファイル）。
+    config: point_data, count, networks, id_pattern, mode, k, within, max_distance, curvature, labels,
+            radius, sides, capping, smooth, format, uvcs
+    """
+    from csv_add_raidus import pair_files_by_subject
+    from tube_mesh import output_path_for as mesh_output_path
+
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    d = {stage: os.path.join(out_dir, sub) for stage, sub in STAGE_DIRS.items()}
+
+    # 被験者IDで木と対応付ける（名前だけで決まるので、CSV がまだ無くてもよい）
+    use_radius = "radius" in stages and bool(config["networks"])
+    networks = {}
+    if use_radius:
+        network_paths = glob.glob(os.path.join(config["networks"], "*.vtk"))
+        pairs = pair_files_by_subject(inputs, network_paths, config["id_pattern"])
+        networks = {p: vtk for vtk, paths in pairs.values() for p in paths}
+
+    jobs = []
+    metric_jobs = []
+    for src in inputs:
+        name = os.path.basename(src)
+        stem = os.path.splitext(name)[0]
+        current, dep = src, None
+
+        if "points" in stages and src.lower().endswith(".vtk"):
+            out = os.path.join(d["points"], stem + ".csv")
+            jobs.append(_job("points", points_job, name, [current], [out],
+                             {"point_data": config["point_data"]}, [dep]))
+            current, dep = out, jobs[-1]["id"]
+        # points 段を使わない VTK は resample / radius を飛ばし、metrics / mesh が VTK をそのまま読む
+
+        if "resample" in stages and current.lower().endswith(".csv"):
+            out = os.path.join(d["resample"], f"{os.path.splitext(os.path.basename(current))[0]}"
+                                              f"_resampled{config['count']}.csv")
+            jobs.append(_job("resample", resample_job, name, [current], [out], {"count": config["count"]}, [dep]))
+            current, dep = out, jobs[-1]["id"]
+
+        has_radius = False
+        if use_radius:
+            out = os.path.join(d["radius"], os.path.basename(current))
+            params = {"mode": config["mode"], "k": config["k"], "within": config["within"],
+                      "max_distance": config["max_distance"]}
+            network = networks.get(src)
+            job = _job("radius", radius_job, name, [current] if network is None else [current, network],
+                       [out], params, [dep])
+            if network is None:
+                job["error"] = f"被験者IDに対応する木が {config['networks']} にありません"
+            elif not current.lower().endswith(".csv"):
+                job["error"] = "radius 段の入力は CSV です（points 段も実行してください）"
+            jobs.append(job)
+            current, dep, has_radius = out, job["id"], True
+
+        if "metrics" in stages:
+            out = os.path.join(d["metrics"], stem + ".csv")
+            params = {"curvature": config["curvature"], "labels": config["labels"]}
+            jobs.append(_job("metrics", metrics_job, name, [current], [out], params, [dep]))
+            metric_jobs.append(jobs[-1])
+
+        if "mesh" in stages:
+            vary = has_radius
+            params = {
+                "radius": config["radius"], "sides": config["sides"], "capping": config["capping"],
+                "vary_radius": vary, "smooth": config["smooth"] if vary else 0.0, "format": config["format"],
+            }
+            out = mesh_output_path(current, None if vary else config["radius"], config["sides"],
+                                   d["mesh"], config["format"])
+            jobs.append(_job("mesh", mesh_job, name, [current], [out], params, [dep]))
+
+    if "stats" in stages and metric_jobs:
+        outputs = [os.path.join(out_dir, n) for n in ("centerline_metrics.csv", "cohort_stats.csv", "cohort_stats.json")]
+        job = _job("stats", stats_job, "cohort", [j["outputs"][0] for j in metric_jobs], outputs,
+                   {"uvcs": config["uvcs"]}, [j["id"] for j in metric_jobs])
+        # 失敗した中心線があっても、残りの中心線で統計を出す
+        job["partial"] = True
+        jobs.append(job)
+    return jobs
+
+
+# ---- 実行 ----
+
+def run_job(job):
+    """ジョブ1つを実行する（プロセスプールのワーカーで実行される）"""
+    return job["func"](job)
+
+
+def run_jobs(jobs, manifest, workers=None, force=(), dry_run=False):
+    """
+    依存先が終わったジョブから順に実行する。プロセスプールは最後まで1つだけ使う（workers=1 なら使わない）。
+    force: 入力に関係なく作り直す段の名前（"all" ならすべて）。
+    dry_run=True なら実行せずに、作り直すジョブとその理由を表示する。
+    段ごとの {"built": n, "skipped": n, "failed": n} を返す。
+    """
+    by_id = {job["id"]: job for job in jobs}
+    waiting = {job["id"]: set(job["deps"]) for job in jobs}
+    dependents = {job["id"]: [] for job in jobs}
+    for job in jobs:
+        for dep in job["deps"]:
+            dependents[dep].append(job["id"])
+
+    status = {}
+    counts = {}
+    last_save = [time.monotonic()]
+    ready = deque(job["id"] for job in jobs if not job["deps"])
+
+    def finish(job_id, state):
+        status[job_id] = state
+        stage = by_id[job_id]["stage"]
+        counts.setdefault(stage, {"built": 0, "skipped": 0, "failed": 0})[state] += 1
+        for other in dependents[job_id]:
+            waiting[other].discard(job_id)
+            if not waiting[other]:
+                ready.append(other)
+
+    def done(job, result, error):
+        if error is not None:
+            report_error(job["id"], error)
+            finish(job["id"], "failed")
+            return
+        manifest.record(job)
+        if time.monotonic() - last_save[0] > MANIFEST_SAVE_INTERVAL:
+            manifest.save()
+            last_save[0] = time.monotonic()
+        print(f"[{job['stage']}] {job['name']} -> {result}")
+        finish(job["id"], "built")
+
+    workers = workers or default_workers()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+    pending = {}
+    try:
+        while ready or pending:
+            while ready:
+                job = by_id[ready.popleft()]
+                if job.get("error"):
+                    report_error(job["id"], job["error"])
+                    finish(job["id"], "failed")
+                    continue
+                failed = [d for d in job["deps"] if status[d] == "failed"]
+                if failed and not job.get("partial"):
+                    print(f"[{job['stage']}] {job['name']}: {failed[0]} が失敗したので実行しません。", file=sys.stderr)
+                    finish(job["id"], "failed")
+                    continue
+                if failed:
+                    job["inputs"] = [p for d in job["deps"] if status[d] != "failed" for p in by_id[d]["outputs"][:1]]
+                    if not job["inputs"]:
+                        finish(job["id"], "failed")
+                        continue
+
+                if "all" in force or job["stage"] in force:
+                    reason = "--force"
+                elif dry_run and any(status[d] == "built" for d in job["deps"]):
+                    reason = "依存先を作り直す"
+                else:
+                    reason = manifest.reason(job)
+                if reason is None:
+                    finish(job["id"], "skipped")
+                    continue
+
+                if dry_run:
+                    print(f"[{job['stage']}] {job['name']}: {reason}")
+                    finish(job["id"], "built")
+                    continue
+
+                for path in job["outputs"]:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                if pool is None:
+                    try:
+                        result, error = run_job(job), None
+                    except Exception as e:
+                        result, error = None, e
+                    done(job, result, error)
+                else:
+                    pending[pool.submit(run_job, job)] = job
+
+            if pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    job = pending.pop(fut)
+                    try:
+                        done(job, fut.result(), None)
+                    except Exception as e:
+                        done(job, None, e)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if not dry_run:
+            manifest.save()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="中心線の処理（VTK→CSV, 再サンプリング, 半径, 指標, メッシュ, 統計）を、変わったものだけまとめて実行する"
+    )
+    parser.add_argument("inputs", nargs="+", help="中心線の VTK / CSV、またはそれらのあるディレクトリ")
+    parser.add_argument("-o", "--output-dir", required=True, help="出力先ディレクトリ（マニフェストもここに置く）")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="実行する段（既定: すべて。radius は --networks があるときだけ）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="作り直すジョブを表示するだけで実行しない")
+    parser.add_argument("--force", nargs="*", choices=STAGES + ("all",),
+                        help="入力に関係なく作り直す段（段を省略するとすべて）")
+
+    group = parser.add_argument_group("各段の設定")
+    group.add_argument("--point-data", action="store_true",
+                       help="points: 点ごとの配列（curvature, lab など）も CSV の列にする")
+    group.add_argument("--count", type=int, default=DEFAULT_CONFIG["count"],
+                       help=f"resample: 点数（既定: {DEFAULT_CONFIG['count']}）")
+    group.add_argument("--networks", help="radius: 木の VTK（vtk_set など）のディレクトリ")
+    group.add_argument("--id-pattern", default=DEFAULT_CONFIG["id_pattern"], help="radius: 被験者IDの正規表現")
+    group.add_argument("--mode", choices=("nearest", "knn", "within"), default="nearest",
+                       help="radius: 半径の求め方（csv_add_raidus.py と同じ）")
+    group.add_argument("-k", type=int, default=4, help="radius: knn の近傍点数")
+    group.add_argument("--within", type=float, help="radius: within の距離")
+    group.add_argument("--max-distance", type=float, default=DEFAULT_MAX_DISTANCE,
+                       help=f"radius: 木の点までの距離の中央値の上限。超えたら失敗（既定: {DEFAULT_MAX_DISTANCE:g}、inf で無制限）")
+    group.add_argument("--curvature", choices=("auto", "file", "computed"), default="auto",
+                       help="metrics: 曲率をファイルから読むか座標から計算するか")
+    group.add_argument("--no-labels", action="store_true", help="metrics: ラベルの区間ごとの指標を計算しない")
+    group.add_argument("-r", "--radius", type=float, default=DEFAULT_CONFIG["radius"],
+                       help=f"mesh: 半径のない中心線の管の半径（既定: {DEFAULT_CONFIG['radius']}）")
+    group.add_argument("--nTv", type=int, default=DEFAULT_CONFIG["sides"],
+                       help=f"mesh: 周方向の辺の数（既定: {DEFAULT_CONFIG['sides']}）")
+    group.add_argument("--capping", action="store_true", help="mesh: 両端を閉じる")
+    group.add_argument("--smooth", type=float, default=0.0, help="mesh: 点ごとの半径の平滑化の幅")
+    group.add_argument("--format", choices=MESH_FORMATS, default=DEFAULT_CONFIG["format"], help="mesh: 出力形式（stl / stl-ascii / ply）")
+    group.add_argument("--uvcs", help="stats: 手作業の形状分類（uvcs/）のディレクトリ")
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    configure_cache_from_args(args)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        parser.error("被験者ID・左右がわかる中心線（*.vtk / *.csv）が見つかりません。")
+    if "radius" in args.stages and not args.networks:
+        print("--networks が無いので radius 段は実行しません。", file=sys.stderr)
+
+    config = {
+        "point_data": args.point_data, "count": args.count, "networks": args.networks,
+        "id_pattern": args.id_pattern, "mode": args.mode, "k": args.k, "within": args.within,
+        "max_distance": args.max_distance, "curvature": args.curvature, "labels": not args.no_labels,
+        "radius": args.radius, "sides": args.nTv, "capping": args.capping, "smooth": args.smooth,
+        "format": args.format, "uvcs": args.uvcs,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = plan_jobs(inputs, args.output_dir, args.stages, config)
+    manifest = Manifest(os.path.join(args.output_dir, MANIFEST_NAME))
+    force = () if args.force is None else (args.force or ("all",))
+
+    start = time.perf_counter()
+    counts = run_jobs(jobs, manifest, args.workers, force, args.dry_run)
+    elapsed = time.perf_counter() - start
+
+    label = "作り直す" if args.dry_run else "作り直した"
+    print(f"\n{len(inputs)} 本の中心線, {len(jobs)} ジョブ（{elapsed:.1f} 秒）")
+    for stage in STAGES:
+        if stage in counts:
+            c = counts[stage]
+            print(f"  {stage:9s} {label}: {c['built']:4d}  変更なし: {c['skipped']:4d}  失敗: {c['failed']:4d}")
+    if any(c["failed"] for c in counts.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線 PLY（V-modeler の出力など）を NumPy で読み込むモジュール。
+
+ファイルはメモリマップで開き、ヘッダを1回だけ解析して
+各 element（vertex, edge, vertex_seq, ...）のデータ位置を記録しておく。
+必要な element の必要な列だけを、あらかじめ確保した配列へ直接読み込む。
+
+- ASCII / binary_little_endian / binary_big_endian に対応
+- list property（vertex_seq の vertex_indices, face の vertex_indices など）は
+  VTK の LINES と同じく (offsets, values) の形で返す
+- 返す配列の型は、整数の property は int64、実数の property は float64
+
+    with PlyFile(path) as ply:
+        v = ply.element("vertex", columns=("x", "y", "z", "curvature"))
+        edges = ply.edges()                                  # (E, 2)
+        offsets, indices = ply.list_property("vertex_seq", "vertex_indices")
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from mapped_io import find_line_end, open_mapped, parse_ascii_block
+
+
+# PLY の型名 → NumPy dtype（バイト順は format 行で決める）
+_PLY_DTYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8",
+}
+
+_BYTE_ORDERS = {
+    "ascii": "=",
+    "binary_little_endian": "<",
+    "binary_big_endian": ">",
+}
+
+# property 1つ分の情報
+#   name        : property 名
+#   dtype       : 値の型（list なら要素の型）
+#   count_dtype : list property の個数の型（list でなければ None）
+_Property = namedtuple("_Property", "name dtype count_dtype")
+
+# element 1つ分の情報
+#   name       : element 名（"vertex" など）
+#   count      : 要素数
+#   properties : _Property のリスト（ヘッダの順）
+#   offset,end : データ部のバイト位置 [offset, end)
+_Element = namedtuple("_Element", "name count properties offset end")
+
+
+def _ply_dtype(type_name, byte_order):
+    try:
+        return np.dtype(_PLY_DTYPES[type_name]).newbyteorder(byte_order)
+    except KeyError:
+        raise ValueError(f"未対応の PLY の型です: {type_name}")
+
+
+def _output_dtype(dtype):
+    """返す配列の型（整数は int64、実数は float64 にそろえる）"""
+    return np.int64 if dtype.kind in "iu" else np.float64
+
+
+def _is_list(prop):
+    return prop.count_dtype is not None
+
+
+class PlyFile:
+    """
+    PLY をメモリマップで開き、element ごとのデータ位置を保持するクラス。
+
+        with PlyFile(path) as ply:
+            v = ply.element("vertex", columns=("x", "y", "z", "curvature"))
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = open_mapped(path)
+        try:
+            self._build_index()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._mm is None:
+            return
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._mm = None
+
+    @property
+    def binary(self):
+        return self.format != "ascii"
+
+    def _build_index(self):
+        mm = self._mm
+        if mm[:3] != b"ply":
+            raise ValueError(f"PLY ファイルではありません: {self.path}")
+
+        header_end = mm.find(b"end_header")
+        if header_end < 0:
+            raise ValueError(f"PLY ヘッダの解析に失敗しました: {self.path}")
+        body_start = mm.find(b"\n", header_end) + 1
+        header = mm[:header_end].decode("ascii", errors="replace").splitlines()
+
+        self.format = None
+        for line in header:
+            parts = line.split()
+            if parts and parts[0] == "format":
+                self.format = parts[1]
+        if self.format not in _BYTE_ORDERS:
+            raise ValueError(f"未対応の PLY 形式です: {self.format}")
+        order = _BYTE_ORDERS[self.format]
+
+        elements = []   # [name, count, [_Property, ...]]
+        for line in header:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "element" and len(parts) >= 3:
+                elements.append([parts[1], int(parts[2]), []])
+            elif parts[0] == "property" and elements:
+                if parts[1] == "list":
+                    prop = _Property(parts[4], _ply_dtype(parts[3], order), _ply_dtype(parts[2], order))
+                else:
+                    prop = _Property(parts[2], _ply_dtype(parts[1], order), None)
+                elements[-1][2].append(prop)
+
+        self._elements = {}
+        self._binary_layout = {}
+        pos = body_start
+        for name, count, props in elements:
+            if self.binary:
+                end = self._index_binary(name, count, props, pos)
+            else:
+                # ASCII は 1要素 = 1行 なので、行数を数えて範囲を決める
+                end = find_line_end(mm, pos, count) if count else pos
+            self._elements[name] = _Element(name, count, props, pos, end)
+            pos = end
+
+    def _index_binary(self, name, count, props, pos):
+        """
+        バイナリの element のデータ範囲を求め、読み出し用の構造化 dtype を記録する。
+        list を含む element は、全要素で個数が同じ（face の 3 など）ならまとめて読めるので
+        先頭の要素の個数で dtype を作って確かめる。個数がまちまちなら要素ごとに位置を数える。
+        """
+        mm = self._mm
+        fields = []
+        row_pos = pos
+        for p in props:
+            if _is_list(p):
+                if count == 0:
+                    n = 0
+                else:
+                    n = int(np.frombuffer(mm, p.count_dtype, 1, row_pos)[0])
+                fields.append((p.name + "#count", p.count_dtype))
+                fields.append((p.name, p.dtype, (n,)))
+                row_pos += p.count_dtype.itemsize + n * p.dtype.itemsize
+            else:
+                fields.append((p.name, p.dtype))
+                row_pos += p.dtype.itemsize
+        dtype = np.dtype(fields)
+
+        end = pos + count * dtype.itemsize
+        if end <= len(mm):
+            table = np.frombuffer(mm, dtype, count, pos)
+            if all(np.all(table[p.name + "#count"] == dtype[p.name].shape[0])
+                   for p in props if _is_list(p)):
+                self._binary_layout[name] = ("table", dtype)
+                return end
+
+        # 個数がまちまちな list: 要素ごとに各 property の開始位置を数える
+        starts = {p.name: np.empty(count, dtype=np.int64) for p in props}
+        counts = {p.name: np.empty(count, dtype=np.int64) for p in props if _is_list(p)}
+        for i in range(count):
+            for p in props:
+                starts[p.name][i] = pos
+                if _is_list(p):
+                    n = int(np.frombuffer(mm, p.count_dtype, 1, pos)[0])
+                    counts[p.name][i] = n
+                    pos += p.count_dtype.itemsize + n * p.dtype.itemsize
+                else:
+                    pos += p.dtype.itemsize
+        if pos > len(mm):
+            raise ValueError(f"element {name} のデータが不足しています: {self.path}")
+        self._binary_layout[name] = ("rows", starts, counts)
+        return pos
+
+    def element_names(self):
+        """ヘッダに書かれた element 名のリスト"""
+        return list(self._elements)
+
+    def count(self, name):
+        """element name の要素数"""
+        return self._get(name).count
+
+    def properties(self, name):
+        """element name の property 名のリスト"""
+        return [p.name for p in self._get(name).properties]
+
+    def _get(self, name):
+        try:
+            return self._elements[name]
+        except KeyError:
+            raise ValueError(f"element {name} が見つかりません: {self.path}")
+
+    def _property(self, el, name):
+        for p in el.properties:
+            if p.name == name:
+                return p
+        raise ValueError(f"{name} プロパティが見つかりません: {self.path}")
+
+    # ---- ASCII ----
+    def _ascii_token_index(self, el):
+        """
+        list を含む ASCII の element を数値の1次元配列にし、
+        各 property の値が何番目にあるか {名前: (要素数,)} を返す。
+        行ごとの数値の個数から各行の先頭を求め、property の順に個数の分だけ進める。
+        """
+        raw = np.frombuffer(self._mm, np.uint8, el.end - el.offset, el.offset)
+        blank = (raw == 0x20) | (raw == 0x09) | (raw == 0x0A) | (raw == 0x0D)
+        token_start = ~blank & np.concatenate([[True], blank[:-1]])
+        line_of = np.concatenate([[0], np.cumsum(raw == 0x0A)[:-1]])
+        per_row = np.bincount(line_of[token_start], minlength=el.count)[:el.count]
+        values = np.fromstring(self._mm[el.offset:el.end], dtype=float, sep=" ")
+
+        pos = np.concatenate([[0], np.cumsum(per_row)[:-1]])
+        index = {}
+        for p in el.properties:
+            index[p.name] = pos
+            if _is_list(p):
+                pos = pos + 1 + values[pos].astype(np.int64)
+            else:
+                pos = pos + 1
+        return values, index
+
+    def element(self, name, columns=None):
+        """
+        element name のうち columns の列だけを読み、{property名: 1次元配列} で返す。
+        columns を省略すると list 以外のすべての列を読む（list は list_property で読む）。
+        """
+        el = self._get(name)
+        if columns is None:
+            columns = [p.name for p in el.properties if not _is_list(p)]
+        props = [self._property(el, c) for c in columns]
+        lists = [p.name for p in props if _is_list(p)]
+        if lists:
+            raise ValueError(f"list property は list_property() で読んでください: {'/'.join(lists)}")
+
+        if self.binary:
+            return {p.name: self._binary_scalar(el, p) for p in props}
+
+        if not any(_is_list(p) for p in el.properties):
+            names = [p.name for p in el.properties]
+            table = parse_ascii_block(
+                self._mm, el.offset, el.end, el.count,
+                n_cols=len(names), columns=[names.index(p.name) for p in props],
+            )
+            return {p.name: table[:, i].astype(_output_dtype(p.dtype)) for i, p in enumerate(props)}
+
+        values, index = self._ascii_token_index(el)
+        return {p.name: values[index[p.name]].astype(_output_dtype(p.dtype)) for p in props}
+
+    def _binary_scalar(self, el, prop):
+        layout = self._binary_layout[el.name]
+        if layout[0] == "table":
+            table = np.frombuffer(self._mm, layout[1], el.count, el.offset)
+            return table[prop.name].astype(_output_dtype(prop.dtype))
+        starts = layout[1][prop.name]
+        raw = np.frombuffer(self._mm, np.uint8)
+        # 要素ごとの開始位置から、その property のバイト列を集めて1つの配列にする
+        gathered = raw[starts[:, None] + np.arange(prop.dtype.itemsize)]
+        return gathered.view(prop.dtype).reshape(-1).astype(_output_dtype(prop.dtype))
+
+    def list_property(self, name, prop_name):
+        """
+        element name の list property を (offsets (要素数+1,), values) で返す。
+        要素 i の値は values[offsets[i]:offsets[i+1]]。
+        """
+        el = self._get(name)
+        prop = self._property(el, prop_name)
+        if not _is_list(prop):
+            raise ValueError(f"{prop_name} は list property ではありません: {self.path}")
+        out_dtype = _output_dtype(prop.dtype)
+
+        if not self.binary:
+            values, index = self._ascii_token_index(el)
+            counts = values[index[prop_name]].astype(np.int64)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            items = np.repeat(index[prop_name] + 1 - offsets[:-1], counts) + np.arange(offsets[-1])
+            return offsets, values[items].astype(out_dtype)
+
+        layout = self._binary_layout[name]
+        if layout[0] == "table":
+            table = np.frombuffer(self._mm, layout[1], el.count, el.offset)
+            n = layout[1][prop_name].shape[0]
+            offsets = np.arange(el.count + 1, dtype=np.int64) * n
+            return offsets, table[prop_name].reshape(-1).astype(out_dtype)
+
+        counts = layout[2][prop_name]
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        first = layout[1][prop_name] + prop.count_dtype.itemsize
+        size = prop.dtype.itemsize
+        item_start = np.repeat(first - offsets[:-1] * size, counts) + np.arange(offsets[-1]) * size
+        raw = np.frombuffer(self._mm, np.uint8)
+        gathered = raw[item_start[:, None] + np.arange(size)]
+        return offsets, gathered.view(prop.dtype).reshape(-1).astype(out_dtype)
+
+    # ---- 中心線 PLY 用 ----
+    def edges(self, name="edge"):
+        """
+        edge element の (vertex1, vertex2) を (E, 2) の int64 配列で返す。
+        V-modeler が区切りとして書く負のインデックス（-1 -1）の行は除く。
+        """
+        props = self.properties(name)
+        if "vertex1" in props and "vertex2" in props:
+            e = self.element(name, ("vertex1", "vertex2"))
+            pairs = np.column_stack([e["vertex1"], e["vertex2"]])
+        else:
+            offsets, indices = self.list_property(name, "vertex_indices")
+            if np.any(np.diff(offsets) != 2):
+                raise ValueError(f"2点でない edge があります: {self.path}")
+            pairs = indices.reshape(-1, 2)
+        return pairs[np.all(pairs >= 0, axis=1)]
+
+    def vertex_sequences(self, name="vertex_seq"):
+        """vertex_seq element の頂点の並びを (offsets, indices) で返す（i 本目は indices[offsets[i]:offsets[i+1]]）"""
+        return self.list_property(name, "vertex_indices")
+
+
+def read_ply_vertices(path, columns=None):
+    """PLY の vertex element から columns の列だけを {名前: 配列} で返す"""
+    with PlyFile(path) as ply:
+        return ply.element("vertex", columns)
+
+
+def read_ply_vertex_data(path, columns=("x", "y", "z", "curvature")):
+    """
+    PLY の vertex から columns の列を、その順のタプルで返す（曲率グラフのスクリプト用）。
+    キャッシュが有効なら、内容が前回と同じファイルは読み直さない。
+    """
+    from stage_cache import cached
+
+    columns = tuple(columns)
+
+    def read():
+        v = read_ply_vertices(path, columns)
+        return tuple(v[c] for c in columns)
+
+    return cached("ply_vertices", [path], {"columns": columns}, read)
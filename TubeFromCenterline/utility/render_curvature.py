@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+累積長さ vs 曲率 のグラフを、画面なし（Agg）で PNG / SVG に書き出すスクリプト。
+
+make_graph_curvature(3).py はディレクトリ選択ダイアログと plt.show() を使うので
+描画ノードでは動かない。ここでは
+  - PLY の読み込みをプロセスプールで並列に行い、
+  - 何百本あっても1つの LineCollection でまとめて描き、
+  - pyplot を使わずに Figure + Agg キャンバスで保存する。
+グラフの見た目（色・凡例は曲率の最大値の上位10本・範囲）は uvcs/*/curvature.png と同じ。
+
+使い方:
+  python render_curvature.py "../data/10_siphon(MCA_ICA)/output_csv/uvcs/u/ply" -o curvature.png
+  python render_curvature.py --uvcs "../data/10_siphon(MCA_ICA)/output_csv/uvcs"
+  python render_curvature.py --store store.npz -o vmodeler.svg
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from centerline_io import cumulative_length
+from parallel_batch import iter_parallel, report_error
+from ply_reader import read_ply_vertex_data
+
+# uvcs の形状クラス（ディレクトリ名）
+SHAPE_CLASSES = ("u", "v", "c", "s")
+
+
+def load_profile(path):
+    """PLY 1本から (累積長さ, 曲率) を返す（プロセスプールのワーカーで実行される）"""
+    x, y, z, curvature = read_ply_vertex_data(path)
+    return cumulative_length(np.column_stack([x, y, z])), np.asarray(curvature, dtype=float)
+
+
+def load_profiles(ply_files, workers=None):
+    """PLY ファイルを並列に読み、ファイル名の順に [(名前, s, curvature), ...] を返す"""
+    profiles = []
+    for path, result, error in iter_parallel(load_profile, sorted(ply_files), workers):
+        if error is not None:
+            report_error(path, error)
+            continue
+        profiles.append((os.path.basename(path), *result))
+    profiles.sort(key=lambda p: p[0])
+    return profiles
+
+
+def store_profiles(store_path, variant="vmodeler"):
+    """中心線ストア（.npz）の variant の中心線から [(名前, s, curvature), ...] を返す"""
+    from centerline_store import CenterlineStore
+
+    store = CenterlineStore.load(store_path)
+    profiles = []
+    for i in store.select(variant=variant):
+        e = store.entry(i)
+        profiles.append((store.name_of(i), cumulative_length(e["points"]), e["curvature"]))
+    return profiles
+
+
+def select_directory(title, path=None):
+    """
+    make_graph_curvature(3).py の入力のディレクトリ。path（コマンドライン引数）があればそれを使い、
+    ディレクトリでなければ使い方を表示して終了する（打ち間違いで画面のないノードのダイアログに進まない）。
+    path が無ければ選択ダイアログで選ぶ（キャンセルなら空文字列）。
+    """
+    if path is not None:
+        if not os.path.isdir(path):
+            sys.exit(f"ディレクトリが見つかりません: {path}\n"
+                     f"使い方: python {os.path.basename(sys.argv[0])} [PLY のディレクトリ | 中心線ストア.npz]")
+        return path
+    # 画面のない環境でも import できるよう、ダイアログを出すときだけ読み込む
+    import tkinter as tk
+    from tkinter import filedialog
+
+    root = tk.Tk()
+    root.withdraw()  # Tk ウィンドウを表示しない
+    directory = filedialog.askdirectory(title=title)
+    root.destroy()
+    return directory
+
+
+def draw_profiles(ax, profiles, top=10, linewidth=0.8, alpha=0.8):
+    """
+    profiles を ax に1つの LineCollection として描く。
+    色は matplotlib の既定の色の順（plt.plot を繰り返したときと同じ）。
+    凡例には曲率の最大値が大きい上位 top 本だけを載せる。
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    colors = [f"C{i % 10}" for i in range(len(profiles))]
+    segments = [np.column_stack([s, k]) for _, s, k in profiles]
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=linewidth, alpha=alpha))
+
+    ax.autoscale_view()
+    max_length = max((float(s[-1]) for _, s, _ in profiles if len(s)), default=0.0)
+    ax.set_xlim(0, max_length or 1.0)
+
+    if top and profiles:
+        max_curv = np.array([np.nanmax(k) if len(k) else -np.inf for _, _, k in profiles])
+        ranked = np.argsort(-max_curv, kind="stable")[:top]
+        handles = [Line2D([], [], color=colors[i], linewidth=linewidth, alpha=alpha) for i in ranked]
+        ax.legend(handles, [profiles[i][0] for i in ranked], fontsize=8, title=f"Top {len(ranked)} by max curvature")
+    return max_length
+
+
+def render_profiles(profiles, out_paths, title=None, xlim=None, ylim=None, top=10, dpi=100):
+    """profiles のグラフを out_paths（拡張子で PNG / SVG / PDF）に保存する"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    max_length = draw_profiles(ax, profiles, top)
+
+    ax.set_xlabel("Cumulative length")
+    ax.set_ylabel("Curvature")
+    ax.set_title(title or f"Cumulative length vs curvature ({len(profiles)} files)")
+    ax.grid(True)
+    if xlim:
+        ax.set_xlim(*xlim)
+    if ylim:
+        ax.set_ylim(*ylim)
+    fig.tight_layout()
+    for path in out_paths:
+        fig.savefig(path, dpi=dpi)
+    return max_length
+
+
+def render_uvcs(uvcs_dir, workers=None, formats=("png",), **options):
+    """uvcs/<u|v|c|s>/ply/*.ply から uvcs/<u|v|c|s>/curvature.<形式> を作り直す"""
+    written = []
+    for shape in SHAPE_CLASSES:
+        ply_files = glob.glob(os.path.join(uvcs_dir, shape, "ply", "*.ply"))
+        if not ply_files:
+            continue
+        profiles = load_profiles(ply_files, workers)
+        out_paths = [os.path.join(uvcs_dir, shape, f"curvature.{fmt}") for fmt in formats]
+        render_profiles(profiles, out_paths, **options)
+        written += out_paths
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="累積長さ vs 曲率 のグラフを画面なしで書き出す")
+    parser.add_argument("inputs", nargs="*", help="PLY ファイル、または PLY の入ったディレクトリ")
+    parser.add_argument("--store", help="中心線ストア（.npz）の中心線を描く")
+    parser.add_argument("--variant", default="vmodeler", help="--store 使用時の対象（既定: vmodeler）")
+    parser.add_argument("--uvcs", help="uvcs ディレクトリの u/v/c/s ごとの curvature.png を作り直す")
+    parser.add_argument("-o", "--output", nargs="+", default=["curvature.png"],
+                        help="出力ファイル（拡張子で PNG / SVG。複数指定可、既定: curvature.png）")
+    parser.add_argument("--format", nargs="+", default=["png"], help="--uvcs の出力形式（既定: png）")
+    parser.add_argument("--title", help="グラフのタイトル")
+    parser.add_argument("--xlim", type=float, nargs=2, help="横軸の範囲（既定: 0〜最大の長さ）")
+    parser.add_argument("--ylim", type=float, nargs=2, help="縦軸の範囲（既定: 自動）")
+    parser.add_argument("--top", type=int, default=10, help="凡例に載せる本数（既定: 10）")
+    parser.add_argument("--dpi", type=int, default=100, help="PNG の解像度（既定: 100）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+    options = {"title": args.title, "xlim": args.xlim, "ylim": args.ylim, "top": args.top, "dpi": args.dpi}
+
+    if args.uvcs:
+        for path in render_uvcs(args.uvcs, args.workers, args.format, **options):
+            print(path)
+        return
+
+    if args.store:
+        profiles = store_profiles(args.store, args.variant)
+    else:
+        ply_files = []
+        for item in args.inputs:
+            if os.path.isdir(item):
+                ply_files += glob.glob(os.path.join(item, "*.ply"))
+            else:
+                ply_files.append(item)
+        if not ply_files:
+            parser.error("PLY ファイル・ディレクトリ・--store・--uvcs のいずれかを指定してください。")
+        profiles = load_profiles(ply_files, args.workers)
+
+    max_length = render_profiles(profiles, args.output, **options)
+    print(f"{len(profiles)} 本を描きました（max_length = {max_length:.3f}）: {', '.join(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線を弧長に沿って再サンプリングするスクリプト（*_resampled120.csv などを作る）。
+
+- 点数指定     : --count 120        （両端を含めて等間隔に 120 点）
+- 間隔指定     : --spacing 0.25     （弧長 0.25 ごと。両端は必ず含める）
+- 曲率適応     : --adaptive 0.25    （曲率の大きいところほど細かくする。0.25 は直線部の間隔）
+
+位置 x,y,z と、radius / curvature / torsion などの点ごとの列を
+searchsorted による1回の線形補間でまとめて求める。
+label / lab のような整数ラベルの列は補間せず、近い方の点の値を使う。
+
+使い方:
+  python resample_centerline.py --count 120 file1.csv file2.csv
+  python resample_centerline.py --count 120 -d output_csv/ -o output_csv/resampled/
+  python resample_centerline.py --count 120 --store store.npz -o resampled/
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from centerline_io import cumulative_length
+from centerline_store import has_centerline_name
+from parallel_batch import iter_parallel, report_error
+
+# 補間せずに近い方の点の値を使う列
+LABEL_COLUMNS = ("label", "lab")
+
+# 既存の *_resampled120.csv と同じく、倍精度をそのまま書き出す
+FLOAT_FORMAT = "%.17g"
+
+
+def _distinct_arc_length(points):
+    """
+    累積弧長と、その計算に使った点のインデックスを返す。
+    同じ位置の点が続く（長さ 0 の区間がある）と補間できないので、後ろ側を除く。
+    """
+    s = cumulative_length(points)
+    keep = np.concatenate([[True], np.diff(s) > 0])
+    return s[keep], np.flatnonzero(keep)
+
+
+def discrete_curvature(points):
+    """
+    折れ線の各点の曲率を、隣の2区間がなす角度 / 平均区間長で近似する (M,)。
+    両端は隣の点の値を使う。
+    """
+    points = np.asarray(points, dtype=float)
+    m = len(points)
+    if m < 3:
+        return np.zeros(m)
+    d = np.diff(points, axis=0)
+    seg = np.linalg.norm(d, axis=1)
+    u = d / np.maximum(seg, 1e-12)[:, None]
+    cos = np.clip(np.einsum("ij,ij->i", u[:-1], u[1:]), -1.0, 1.0)
+    inner = np.arccos(cos) / np.maximum(0.5 * (seg[:-1] + seg[1:]), 1e-12)
+    return np.concatenate([[inner[0]], inner, [inner[-1]]])
+
+
+def positions_by_count(total_length, count):
+    """全長 total_length を count 点（両端を含む）で等分した弧長位置"""
+    if count < 2:
+        raise ValueError("点数は 2 以上にしてください。")
+    return np.linspace(0.0, total_length, count)
+
+
+def positions_by_spacing(total_length, spacing):
+    """間隔 spacing に最も近い等間隔で、両端を含む弧長位置"""
+    if spacing <= 0:
+        raise ValueError("間隔は正の値にしてください。")
+    count = max(int(np.ceil(total_length / spacing - 1e-9)) + 1, 2)
+    return positions_by_count(total_length, count)
+
+
+def positions_adaptive(s, curvature, spacing, gain=None, min_spacing=None):
+    """
+    曲率に応じた弧長位置。点密度を 1 + gain * 曲率 に比例させ、
+    直線部で spacing、最も曲がったところでも min_spacing（既定: spacing/4）を下回らないようにする。
+
+    s と curvature は元の点ごとの弧長と曲率。
+    gain を省略すると、曲率の 95 パーセンタイルの位置で間隔が半分になるように決める。
+    """
+    curvature = np.nan_to_num(np.abs(np.asarray(curvature, dtype=float)))
+    min_spacing = spacing / 4.0 if min_spacing is None else min_spacing
+    if gain is None:
+        k95 = float(np.percentile(curvature, 95)) if len(curvature) else 0.0
+        gain = 1.0 / k95 if k95 > 0 else 0.0
+
+    density = np.minimum(1.0 + gain * curvature, spacing / min_spacing)
+    # 密度を弧長で積分した「伸ばした座標」u の上で等間隔に置く（台形則）
+    u = np.concatenate([[0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * np.diff(s))])
+    targets = positions_by_spacing(u[-1], spacing)
+    return np.interp(targets, u, s)
+
+
+def interpolate_table(s, table, s_new, label_mask=None):
+    """
+    弧長 s (M,) の点の値 table (M,C) を、弧長 s_new (K,) で線形補間する (K,C)。
+    label_mask (C,) が True の列は補間せず、近い方の点の値を使う。
+    """
+    table = np.asarray(table, dtype=float)
+    i = np.clip(np.searchsorted(s, s_new, side="right") - 1, 0, len(s) - 2)
+    t = ((s_new - s[i]) / (s[i + 1] - s[i]))[:, None]
+    out = table[i] + t * (table[i + 1] - table[i])
+    if label_mask is not None and np.any(label_mask):
+        nearest = np.where(t[:, 0] < 0.5, i, i + 1)
+        out[:, label_mask] = table[nearest][:, label_mask]
+    return out
+
+
+def resample_arrays(points, attributes=None, count=None, spacing=None, adaptive=None):
+    """
+    点列 points (M,3) と点ごとの属性 {名前: (M,)} を再サンプリングする。
+    count / spacing / adaptive のどれか1つを指定する（adaptive は直線部の間隔）。
+    (新しい点列, {名前: 新しい属性}) を返す。
+    """
+    points = np.asarray(points, dtype=float)
+    attributes = dict(attributes or {})
+    s, keep = _distinct_arc_length(points)
+    if len(s) < 2:
+        raise ValueError("長さのある区間がないため再サンプリングできません。")
+
+    if count is not None:
+        s_new = positions_by_count(s[-1], count)
+    elif spacing is not None:
+        s_new = positions_by_spacing(s[-1], spacing)
+    elif adaptive is not None:
+        curvature = attributes.get("curvature")
+        curvature = discrete_curvature(points) if curvature is None else np.asarray(curvature, dtype=float)
+        s_new = positions_adaptive(s, curvature[keep], adaptive)
+    else:
+        raise ValueError("count / spacing / adaptive のいずれかを指定してください。")
+
+    names = list(attributes)
+    table = np.column_stack([points[keep]] + [np.asarray(attributes[n], dtype=float)[keep] for n in names])
+    label_mask = np.array([False] * 3 + [n.lower() in LABEL_COLUMNS for n in names])
+    out = interpolate_table(s, table, s_new, label_mask)
+
+    # 両端は元の点をそのまま使う（丸め誤差で端点がずれないように）
+    out[0, :3] = points[0]
+    out[-1, :3] = points[-1]
+    return out[:, :3], {n: out[:, 3 + j] for j, n in enumerate(names)}
+
+
+def resample_dataframe(df, **mode):
+    """x,y,z と他の数値列を持つ DataFrame を再サンプリングした DataFrame を返す"""
+    lower = {c.lower(): c for c in df.columns}
+    try:
+        xyz = [lower[c] for c in ("x", "y", "z")]
+    except KeyError:
+        raise ValueError("x/y/z 列が見つかりません。")
+
+    others = [c for c in df.columns if c not in xyz and pd.api.types.is_numeric_dtype(df[c])]
+    points, attrs = resample_arrays(df[xyz].to_numpy(float), {c: df[c].to_numpy() for c in others}, **mode)
+
+    out = pd.DataFrame(points, columns=xyz)
+    for c in others:
+        values = attrs[c]
+        if pd.api.types.is_integer_dtype(df[c]):
+            values = np.rint(values).astype(df[c].dtype)
+        out[c] = values
+    return out[[c for c in df.columns if c in out.columns]]
+
+
+def output_path_for(path, n_points, output_dir=None):
+    """<元のファイル名>_resampled<N>.csv"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(out_dir, f"{stem}_resampled{n_points}.csv")
+
+
+def resample_file(task):
+    """CSV 1本を再サンプリングして書き出す（プロセスプールのワーカーで実行される）"""
+    df = resample_dataframe(pd.read_csv(task["path"]), **task["mode"])
+    out_path = output_path_for(task["path"], len(df), task["output_dir"])
+    df.to_csv(out_path, index=False, float_format=FLOAT_FORMAT)
+    return out_path
+
+
+def resample_store_entries(store_path, output_dir, mode, variant="original"):
+    """中心線ストアの variant の中心線をすべて再サンプリングして CSV に書き出す"""
+    from centerline_store import POINT_ATTRIBUTES, CenterlineStore
+
+    store = CenterlineStore.load(store_path)
+    written = []
+    for i in store.select(variant=variant):
+        e = store.entry(i)
+        # ストアに無い属性（NaN / -1 だけの列）は出力しない
+        attrs = {}
+        for name in POINT_ATTRIBUTES:
+            present = np.any(e[name] >= 0) if name == "label" else np.any(np.isfinite(e[name]))
+            if present:
+                attrs[name] = e[name]
+        try:
+            points, new_attrs = resample_arrays(e["points"], attrs, **mode)
+        except ValueError as err:
+            report_error(store.name_of(i), err)
+            continue
+        df = pd.DataFrame(points, columns=["x", "y", "z"])
+        for name, values in new_attrs.items():
+            df[name] = np.rint(values).astype(int) if name == "label" else values
+
+        stem = f"{e['subject']}_{e['side']}_{e['variant']}"
+        out_path = output_path_for(stem + ".csv", len(df), output_dir)
+        df.to_csv(out_path, index=False, float_format=FLOAT_FORMAT)
+        written.append(out_path)
+        print(f"{store.name_of(i)} -> {out_path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中心線CSVを弧長に沿って再サンプリングする")
+    parser.add_argument("files", nargs="*", help="入力CSVファイル（複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの *.csv をすべて処理する")
+    parser.add_argument("--store", help="中心線ストア（.npz）の中心線を処理する")
+    parser.add_argument("--variant", default="original", help="--store 使用時の対象（既定: original）")
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--count", type=int, help="点数（両端を含む）")
+    group.add_argument("--spacing", type=float, help="弧長の間隔")
+    group.add_argument("--adaptive", type=float, help="曲率適応の直線部の間隔")
+
+    args = parser.parse_args()
+    mode = {"count": args.count, "spacing": args.spacing, "adaptive": args.adaptive}
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.store:
+        resample_store_entries(args.store, args.output_dir or os.path.dirname(os.path.abspath(args.store)),
+                               mode, args.variant)
+        return
+
+    files = list(args.files)
+    if args.dir:
+        files += [
+            f for f in sorted(glob.glob(os.path.join(args.dir, "*.csv")))
+            # 再サンプリング済みのファイルや結果表（radius_transfer.csv など）は対象外
+            if "_resampled" not in os.path.basename(f) and has_centerline_name(f)
+        ]
+    if not files:
+        parser.error("入力ファイル・--dir・--store のいずれかを指定してください。")
+
+    tasks = [{"path": f, "mode": mode, "output_dir": args.output_dir} for f in files]
+    for task, out_path, error in iter_parallel(resample_file, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        print(f"{task['path']} -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+血管の木（vtk_set のネットワーク）を共有メモリに1回だけ読み込み、
+プロセスプールのワーカーにコピーなしの読み取り専用ビューとして渡す実行モジュール。
+
+iter_parallel でネットワークを使う処理を並列にすると、ワーカーごとに同じ VTK を読み直し、
+点・半径・つながりの表・空間インデックスを各プロセスに持つことになる。ここでは
+  - 親プロセスで各ネットワークを1回だけ読み、vessel_graph のつながりの表と
+    spatial_index.GridIndex の配列を1つの SharedMemory ブロックにまとめて置き、
+  - タスクにはブロックの名前と配列の配置（数百バイト）だけを渡し、
+  - ワーカーではブロックに attach して np.ndarray のビュー（書き込み不可）を作る。
+ワーカーは attach したブロックを覚えておくので、同じネットワークの2回目以降は何もしない。
+ジョブはネットワーク（被験者）ごとにまとめてからタスクにするので、同じ木の中心線は
+続けて同じワーカーで処理される。
+
+使い方:
+    def job_func(shared, job):          # モジュールのトップレベルの関数
+        dist, idx = shared.index.query(job["points"])
+        return shared.radius[idx]
+
+    with NetworkPool(vtk_paths) as pool:
+        for job, result, error in pool.run(job_func, jobs, workers=64):
+            ...
+  jobs は {"network": <VTK / SWC のパス>, ...} の dict のリスト。
+"""
+
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from parallel_batch import iter_parallel
+from spatial_index import GridIndex
+from vessel_graph import VesselNetwork, load_vessel_network
+
+# ブロック内の配列の先頭をそろえる境界
+_ALIGN = 64
+
+# ワーカーで attach したネットワーク {ブロック名: SharedNetwork}
+_attached = {}
+
+
+class SharedArrays:
+    """
+    複数の NumPy 配列を1つの SharedMemory ブロックにまとめたもの（親プロセス側）。
+    descriptor（ブロック名と配列の配置）をワーカーに渡し、attach_arrays でビューを作る。
+    """
+
+    def __init__(self, arrays):
+        layout = {}
+        size = 0
+        for name, a in arrays.items():
+            a = np.asarray(a)
+            size = -(-size // _ALIGN) * _ALIGN
+            layout[name] = (size, a.shape, a.dtype.str)
+            size += a.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, a in arrays.items():
+            offset, shape, dtype = layout[name]
+            view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            view[...] = a
+        self.descriptor = {"name": self.shm.name, "layout": layout}
+        self.nbytes = size
+
+    def close(self):
+        """ブロックを閉じて削除する（ワーカーがすべて終わってから呼ぶ）"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_arrays(descriptor):
+    """
+    descriptor のブロックに attach し、(SharedMemory, {名前: 読み取り専用ビュー}) を返す。
+    ブロックは親プロセスが削除するので、ここでは unlink しない。
+    """
+    shm = shared_memory.SharedMemory(name=descriptor["name"])
+    views = {}
+    for name, (offset, shape, dtype) in descriptor["layout"].items():
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view.flags.writeable = False
+        views[name] = view
+    return shm, views
+
+
+class SharedNetwork:
+    """
+    ワーカーから見たネットワーク1つ分。すべての配列は共有メモリのビュー。
+      network : vessel_graph.VesselNetwork（つながりの表）
+      index   : spatial_index.GridIndex（network.points の最近傍探索）
+      points, radius : network.points / network.radius
+    """
+
+    def __init__(self, descriptor):
+        self.path = descriptor["path"]
+        self._shm, views = attach_arrays(descriptor)
+        self.network = VesselNetwork.from_arrays(
+            {k[len("net/"):]: v for k, v in views.items() if k.startswith("net/")}, name=descriptor["label"]
+        )
+        self.index = GridIndex.from_state({k[len("index/"):]: v for k, v in views.items() if k.startswith("index/")})
+
+    def close(self):
+        """ビューを手放してブロックを閉じる（削除は親プロセスが行う）"""
+        self.network = self.index = None
+        self._shm.close()
+
+    @property
+    def points(self):
+        return self.network.points
+
+    @property
+    def radius(self):
+        return self.network.radius
+
+
+def shared_network(descriptor):
+    """ワーカーで descriptor のネットワークを返す（このプロセスで初めてなら attach する）"""
+    net = _attached.get(descriptor["name"])
+    if net is None:
+        net = SharedNetwork(descriptor)
+        _attached[descriptor["name"]] = net
+    return net
+
+
+def _run_group(task):
+    """ネットワーク1つ分のジョブをまとめて実行する（プロセスプールのワーカーで実行される）"""
+    shared = shared_network(task["descriptor"])
+    results = []
+    for job in task["jobs"]:
+        try:
+            results.append((task["func"](shared, job), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+class NetworkPool:
+    """
+    ネットワークを共有メモリに置いて、ジョブを並列に実行するプール。
+    with 文で使い、抜けるときに共有メモリを削除する。
+    """
+
+    def __init__(self, paths=()):
+        self.blocks = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path):
+        """ネットワークを読み込んで共有メモリに置く（同じパスは1回だけ）"""
+        if path in self.blocks:
+            return self.blocks[path]
+        network = load_vessel_network(path)
+        index = GridIndex(network.points)
+        arrays = {f"net/{k}": v for k, v in network.to_arrays().items()}
+        arrays.update({f"index/{k}": v for k, v in index.state().items()})
+        block = SharedArrays(arrays)
+        block.descriptor.update(path=path, label=os.path.basename(path))
+        self.blocks[path] = block
+        return block
+
+    @property
+    def nbytes(self):
+        """共有メモリに置いた配列の合計バイト数"""
+        return sum(b.nbytes for b in self.blocks.values())
+
+    def run(self, func, jobs, workers=None, chunk_size=None):
+        """
+        jobs の各ジョブに func(SharedNetwork, job) を適用し、終わった順に (job, result, error) を返す。
+        ジョブはネットワークごとにまとめ（chunk_size 個ずつに分けてもよい）、ネットワークのパスの順に実行する。
+        func はモジュールのトップレベルで定義された関数であること。
+        """
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job["network"], []).append(job)
+
+        tasks = []
+        for path in sorted(groups):
+            block = self.add(path)
+            group = groups[path]
+            step = chunk_size or len(group)
+            for s in range(0, len(group), step):
+                tasks.append({"descriptor": block.descriptor, "func": func, "jobs": group[s:s + step]})
+
+        for task, results, error in iter_parallel(_run_group, tasks, workers):
+            if error is not None:
+                for job in task["jobs"]:
+                    yield job, None, error
+                continue
+            for job, (result, job_error) in zip(task["jobs"], results):
+                yield job, result, job_error
+
+    def close(self):
+        for block in self.blocks.values():
+            # workers=1 のときはこのプロセスでも attach しているので、先に閉じる
+            net = _attached.pop(block.descriptor["name"], None)
+            if net is not None:
+                net.close()
+            block.close()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+サイフォンの形状（U / V / C / S）を中心線から自動で分類するスクリプト。
+
+これまでは output_csv/uvcs/{u,v,c,s}/ に手で振り分けてコピーし、
+ディレクトリごとに長さの統計（calc_rusult.txt）を出していた。ここでは
+  1. 中心線ごとに形状の特徴量を計算し（プロセスプールで並列）、
+  2. 全例の特徴量の表に対してまとめて分類し、
+  3. 特徴量（と分類）の表1つと、クラスごとの統計の表1つを書き出す
+ので、ファイルのコピーは要らない。
+
+特徴量（曲率・ねじれ率は centerline_geometry.py で計算）:
+  - 曲がり（bend）: 曲率が --bend-curvature 以上の連続した区間。
+    区間ごとの曲がり角（∫κ ds）、位置、幅、曲がる向き（最も当てはまる平面内での回転の向き）
+  - 曲がりの数、最大の曲がりの角度・鋭さ（幅）、逆向きの曲がりがあるか
+  - ねじれ率の符号の変化の回数、全体の曲がり角、両端の接線のなす角、始点-終点の距離 / 全長
+
+分類の方法は次のどちらかを明示して選ぶ（既定の分類器はない）:
+  --fit / --model : 手作業の分類（uvcs/ の振り分け）から各クラスの特徴量の重心を求めて JSON に保存し、
+                    その重心に最も近いクラスに分類する。--fit では1本ずつ除いて作り直したモデル
+                    （leave-one-out）でその1本を分類し、学習に使っていない例での成績を表示する。
+  --heuristic     : しきい値（CLASS_RULES、--rules で上書き）で上から順に判定する。
+    S : 逆向きの大きな曲がりがあり（二重のサイフォン）、曲率の最大値も大きい
+    C : 最大の曲がりの角度が大きく、曲率の最大値も大きい（深く巻き込む）
+    V : 曲率の最大値が大きく、最大の曲がりの幅が狭い（鋭く折り返す）
+    U : それ以外（丸く折り返す）
+    CLASS_RULES は検証済みの分類器ではなく、しきい値を探すときの出発点である。
+
+手作業の分類がわかる例では、一致の表（混同行列）、クラスごとの再現率、
+すべてを多数派クラスと答えたときの一致率（基準）を表示する。
+分類の結果（shape_class 列と、それで分けた統計）を書き出すのは、学習に使っていない例での一致
+（--fit / --model はモデルに保存した leave-one-out、--heuristic は --reference との一致）が
+基準を上回ったときだけである。上回らなければ分類は書き出さず、特徴量の表と、
+手作業の分類（reference_class）で分けた統計だけを書き出す。
+
+使い方:
+  python siphon_classifier.py -d "../data/10_siphon(MCA_ICA)/output_csv" -o siphon_classes.csv \\
+      --reference "../data/10_siphon(MCA_ICA)/output_csv/uvcs" --fit uvcs_model.json
+  python siphon_classifier.py -d ... --model uvcs_model.json -o siphon_classes.csv
+  python siphon_classifier.py -d ... --reference .../uvcs --heuristic
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from centerline_geometry import centerline_geometry, load_points
+from centerline_store import (
+    SHAPE_CLASSES, has_centerline_name, parse_centerline_name, shape_class_lookup, shape_class_of,
+)
+from parallel_batch import iter_parallel, report_error
+from stage_cache import cached
+
+# 曲がりとみなす曲率（1/mm）と、数に入れる曲がりの最小の角度（度）
+BEND_CURVATURE = 0.15
+MIN_BEND_ANGLE = 30.0
+
+# rules のしきい値
+CLASS_RULES = {
+    "s_min_second_bend": 80.0,   # S: 逆向きの2番目の曲がりがこの角度（度）以上
+    "s_min_curvature": 0.9,      #    かつ曲率の最大値（1/mm）がこれ以上
+    "c_min_main_bend": 150.0,    # C: 最大の曲がりがこの角度（度）以上
+    "c_min_curvature": 0.9,      #    かつ曲率の最大値がこれ以上
+    "v_min_curvature": 0.7,      # V: 曲率の最大値がこれ以上
+    "v_max_main_width": 8.0,     #    かつ最大の曲がりの幅（mm）がこれ以下
+}
+
+# 重心による分類（--fit / --model）で使う特徴量
+MODEL_FEATURES = [
+    "chord_ratio", "max_curvature", "n_bends", "main_bend_angle", "main_bend_width",
+    "second_bend_angle", "opposite_bends", "torsion_sign_changes", "total_turning",
+    "end_to_end_angle", "planarity",
+]
+
+# クラスごとの統計を出す列
+STATS_COLUMNS = ["length", "max_curvature", "main_bend_angle", "main_bend_width", "total_turning"]
+
+
+def _runs(mask):
+    """真の値が続く区間を (開始, 終了) の配列 (K,2) で返す（終了は含まない）"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.column_stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)])
+
+
+def _trapezoid_segments(values, s, runs):
+    """区間 runs ごとの ∫values ds（台形則）(K,)"""
+    integrand = 0.5 * (values[1:] + values[:-1]) * np.diff(s)
+    cum = np.concatenate([[0.0], np.cumsum(integrand)])
+    end = np.maximum(runs[:, 1] - 1, runs[:, 0])
+    return cum[end] - cum[runs[:, 0]]
+
+
+def shape_descriptors(points, geom, bend_curvature=BEND_CURVATURE, min_bend_angle=MIN_BEND_ANGLE):
+    """中心線1本の形状の特徴量（dict）。geom は centerline_geometry() の結果"""
+    points = np.asarray(points, dtype=float)
+    s, k, tau, t = geom["s"], geom["curvature"], geom["torsion"], geom["tangent"]
+    length = float(s[-1])
+
+    # 最も当てはまる平面（主成分の第1・第2軸）と、その平面内での接線の回転
+    _, sv, axes = np.linalg.svd(points - points.mean(axis=0), full_matrices=False)
+    planar_t = t @ axes[:2].T
+    heading = np.unwrap(np.arctan2(planar_t[:, 1], planar_t[:, 0]))
+    turn_rate = np.gradient(heading, s) if len(s) > 1 else np.zeros_like(s)
+
+    # 曲がり: 曲率が bend_curvature 以上の区間（曲がり角が min_bend_angle 未満のものは除く）
+    runs = _runs(k >= bend_curvature)
+    angles = np.degrees(_trapezoid_segments(k, s, runs)) if len(runs) else np.empty(0)
+    keep = angles >= min_bend_angle
+    runs, angles = runs[keep], angles[keep]
+    direction = np.sign(_trapezoid_segments(turn_rate, s, runs)) if len(runs) else np.empty(0)
+
+    order = np.argsort(-angles, kind="stable")
+    main = order[0] if len(order) else None
+    if main is not None:
+        a, b = runs[main]
+        peak = a + int(np.argmax(k[a:b]))
+        main_width = float(s[b - 1] - s[a])
+        opposite = angles[direction == -direction[main]]
+        second = float(opposite.max()) if len(opposite) else (float(angles[order[1]]) if len(order) > 1 else 0.0)
+        has_opposite = bool(len(opposite)) and float(opposite.max()) >= min_bend_angle
+    else:
+        peak, main_width, second, has_opposite = int(np.argmax(k)), 0.0, 0.0, False
+
+    # ねじれ率の符号の変化（曲がっているところだけを見る。直線部のねじれ率は定まらない）
+    signs = np.sign(tau[(k >= bend_curvature) & (tau != 0)])
+    chord = float(np.linalg.norm(points[-1] - points[0]))
+
+    return {
+        "length": length,
+        "chord_ratio": chord / length if length > 0 else 0.0,
+        "max_curvature": float(np.max(k)),
+        "n_bends": int(len(runs)),
+        "main_bend_angle": float(angles[main]) if main is not None else 0.0,
+        "main_bend_position": float(s[peak] / length) if length > 0 else 0.0,
+        "main_bend_width": main_width,
+        "second_bend_angle": second,
+        "opposite_bends": int(has_opposite),
+        "torsion_sign_changes": int(np.count_nonzero(signs[1:] != signs[:-1])),
+        "total_turning": float(np.degrees(np.sum(0.5 * (k[1:] + k[:-1]) * np.diff(s)))),
+        "end_to_end_angle": float(np.degrees(np.arccos(np.clip(t[0] @ t[-1], -1.0, 1.0)))),
+        "planarity": float(sv[2] / sv[0]) if sv[0] > 0 else 0.0,
+    }
+
+
+def descriptor_task(task):
+    """中心線1本の特徴量を計算する（プロセスプールのワーカーで実行される）"""
+    path = task["path"]
+    params = task["params"]
+
+    def compute():
+        points = load_points(path)
+        geom = centerline_geometry(points, window=params["window"])
+        return shape_descriptors(points, geom, params["bend_curvature"], params["min_bend_angle"])
+
+    return cached("siphon_descriptors", [path], params, compute)
+
+
+def descriptor_table(paths, params, workers=None):
+    """全例の特徴量を並列に計算し、1行1本の DataFrame にする"""
+    tasks = [{"path": p, "params": params} for p in paths]
+    rows = []
+    for task, desc, error in iter_parallel(descriptor_task, tasks, workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        subject, side, variant = parse_centerline_name(task["path"])
+        rows.append({"file_name": os.path.basename(task["path"]), "subject": subject,
+                     "side": side, "variant": variant, **desc})
+    return pd.DataFrame(rows).sort_values("file_name", ignore_index=True)
+
+
+def classify_rules(table, rules=None):
+    """特徴量の表の全行をしきい値でまとめて分類する（"u"/"v"/"c"/"s" の配列）"""
+    r = {**CLASS_RULES, **(rules or {})}
+    k = table["max_curvature"]
+    is_s = ((table["opposite_bends"] > 0) & (table["second_bend_angle"] >= r["s_min_second_bend"])
+            & (k >= r["s_min_curvature"]))
+    is_c = (table["main_bend_angle"] >= r["c_min_main_bend"]) & (k >= r["c_min_curvature"])
+    is_v = (k >= r["v_min_curvature"]) & (table["main_bend_width"] <= r["v_max_main_width"])
+    return np.select([is_s, is_c, is_v], ["s", "c", "v"], default="u")
+
+
+def fit_centroids(table, labels):
+    """手作業の分類 labels から、標準化した特徴量のクラスごとの重心を求める（JSON にできる dict）"""
+    x = table[MODEL_FEATURES].to_numpy(float)
+    mean, scale = x.mean(axis=0), x.std(axis=0)
+    scale[scale == 0] = 1.0
+    z = (x - mean) / scale
+    labels = np.asarray(labels)
+    centroids = {c: z[labels == c].mean(axis=0).tolist() for c in SHAPE_CLASSES if np.any(labels == c)}
+    return {"features": MODEL_FEATURES, "mean": mean.tolist(), "scale": scale.tolist(), "centroids": centroids}
+
+
+def classify_centroids(table, model):
+    """fit_centroids のモデルで、全行を最も近い重心のクラスに分類する"""
+    x = table[model["features"]].to_numpy(float)
+    z = (x - np.asarray(model["mean"])) / np.asarray(model["scale"])
+    classes = list(model["centroids"])
+    centers = np.asarray([model["centroids"][c] for c in classes])
+    dist = np.linalg.norm(z[:, None, :] - centers[None, :, :], axis=2)
+    return np.asarray(classes)[np.argmin(dist, axis=1)]
+
+
+def leave_one_out(table, labels):
+    """
+    1本ずつ除いた残りで fit_centroids をやり直し、除いた1本をそのモデルで分類する
+    （学習に使っていない例での成績を見るため）。
+    """
+    labels = np.asarray(labels)
+    predicted = np.empty(len(table), dtype=object)
+    for i in range(len(table)):
+        rest = np.arange(len(table)) != i
+        model = fit_centroids(table[rest], labels[rest])
+        predicted[i] = classify_centroids(table.iloc[[i]], model)[0]
+    return predicted.astype(str)
+
+
+def reference_classes(table, reference_dir=None, paths=None):
+    """
+    手作業の分類。reference_dir（uvcs/）の下のファイル名から (被験者, 左右) → クラス を作る。
+    入力そのものが uvcs/ の下にあれば、そのディレクトリのクラスを使う。
+    """
+    lookup = shape_class_lookup(reference_dir) if reference_dir else {}
+    for path in paths or []:
+        cls = shape_class_of(path)
+        if cls:
+            subject, side, _ = parse_centerline_name(path)
+            lookup[(subject, side)] = cls
+    return np.array([lookup.get(key, "") for key in zip(table["subject"], table["side"])])
+
+
+def class_stats(table, column="shape_class"):
+    """クラスごとの統計（件数・最小・最大・中央値・平均）を縦長の表にする"""
+    grouped = table.groupby(column)[STATS_COLUMNS]
+    stats = grouped.agg(["count", "min", "max", "median", "mean"]).stack(level=0, future_stack=True)
+    stats.index.names = [column, "descriptor"]
+    return stats.reset_index()
+
+
+def confusion_table(reference, predicted):
+    """手作業の分類がわかる例について、行 = 手作業、列 = 自動 の件数の表"""
+    known = reference != ""
+    return pd.crosstab(
+        pd.Series(reference[known], name="reference"), pd.Series(predicted[known], name="predicted")
+    ).reindex(index=SHAPE_CLASSES, columns=SHAPE_CLASSES, fill_value=0)
+
+
+def evaluation(reference, predicted):
+    """
+    手作業の分類がわかる例についての成績。一致率、クラスごとの再現率（そのクラスの例のうち
+    正しく分類できた割合）、すべてを多数派クラスと答えたときの一致率（基準）を dict で返す。
+    """
+    reference, predicted = np.asarray(reference), np.asarray(predicted)
+    known = reference != ""
+    reference, predicted = reference[known], predicted[known]
+    classes, counts = np.unique(reference, return_counts=True)
+    recall = {c: (int(np.sum(predicted[reference == c] == c)), int(np.sum(reference == c)))
+              for c in SHAPE_CLASSES if c in classes}
+    return {
+        "n": int(len(reference)),
+        "correct": int(np.sum(reference == predicted)),
+        "majority_class": str(classes[np.argmax(counts)]),
+        "baseline_correct": int(counts.max()),
+        "recall": recall,
+    }
+
+
+def beats_baseline(result):
+    """evaluation の一致が、すべてを多数派クラスと答えたときの一致（基準）を上回るか"""
+    return result is not None and result["n"] > 0 and result["correct"] > result["baseline_correct"]
+
+
+def format_evaluation(result, title):
+    """evaluation の結果を表示用の文字列にする"""
+    n = result["n"]
+    lines = [
+        f"{title}: {result['correct']} / {n}"
+        f"（基準: すべて {result['majority_class'].upper()} と答えると {result['baseline_correct']} / {n}）",
+        "再現率: " + ", ".join(f"{c.upper()}={k}/{m}" for c, (k, m) in result["recall"].items()),
+    ]
+    if not beats_baseline(result):
+        lines.append("警告: 多数派クラスの基準を上回っていません。")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="サイフォンの形状（U/V/C/S）を中心線から分類する")
+    parser.add_argument("files", nargs="*", help="中心線ファイル（CSV / VTK / PLY、複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの中心線（*.csv / *.vtk）をすべて分類する")
+    parser.add_argument("-o", "--output", default="siphon_classes.csv",
+                        help="特徴量（と分類）の表（既定: siphon_classes.csv）。クラスごとの統計は <名前>_stats.csv")
+    parser.add_argument("--reference", help="手作業の分類（uvcs/ ディレクトリ）。一致の表を表示する")
+    parser.add_argument("--fit", help="手作業の分類から重心のモデルを作り、この JSON に保存する")
+    parser.add_argument("--model", help="--fit で作ったモデルで分類する")
+    parser.add_argument("--heuristic", action="store_true",
+                        help="しきい値（CLASS_RULES）で分類する。検証済みではない（docstring を参照）")
+    parser.add_argument("--rules", help="しきい値を上書きする JSON（CLASS_RULES のキー）。--heuristic を含む")
+    parser.add_argument("--window", type=float, default=3.0, help="曲率を求める窓の長さ（既定: 3.0）")
+    parser.add_argument("--bend-curvature", type=float, default=BEND_CURVATURE,
+                        help=f"曲がりとみなす曲率（既定: {BEND_CURVATURE}）")
+    parser.add_argument("--min-bend-angle", type=float, default=MIN_BEND_ANGLE,
+                        help=f"数に入れる曲がりの最小の角度 [度]（既定: {MIN_BEND_ANGLE}）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.dir:
+        files += [
+            f for f in sorted(glob.glob(os.path.join(args.dir, "*")))
+            if os.path.splitext(f)[1].lower() in (".csv", ".vtk")
+            and "_resampled" not in os.path.basename(f) and not f.endswith("_geometry.csv")
+        ]
+    files = [f for f in files if has_centerline_name(f)]
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    heuristic = args.heuristic or bool(args.rules)
+    if heuristic and args.model:
+        parser.error("--model と --heuristic / --rules は同時に指定できません。")
+    if not (args.fit or args.model or heuristic):
+        parser.error("分類の方法（--fit / --model / --heuristic）を指定してください。")
+
+    params = {"window": args.window, "bend_curvature": args.bend_curvature, "min_bend_angle": args.min_bend_angle}
+    table = descriptor_table(files, params, args.workers)
+    table["reference_class"] = reference_classes(table, args.reference, files)
+
+    if args.fit:
+        known = table["reference_class"] != ""
+        if not known.any():
+            parser.error("--fit には手作業の分類（--reference か uvcs/ の下の入力）が必要です。")
+        labels = table.loc[known, "reference_class"].to_numpy()
+        loo = evaluation(labels, leave_one_out(table[known], labels))
+        print(format_evaluation(loo, "leave-one-out での一致"))
+        model = fit_centroids(table[known], labels)
+        model["leave_one_out"] = loo
+        with open(args.fit, "w", encoding="utf-8") as f:
+            json.dump(model, f, indent=2)
+        print(f"モデルを {args.fit} に保存しました（{int(known.sum())} 本）。\n")
+
+    # 学習に使っていない例での成績（validation）が基準を上回ったときだけ、分類を書き出す
+    reference = table["reference_class"].to_numpy()
+    if args.model or not heuristic:
+        if args.model:
+            with open(args.model, encoding="utf-8") as f:
+                model = json.load(f)
+        predicted = classify_centroids(table, model)
+        validation = model.get("leave_one_out")
+        method = "重心のモデルの leave-one-out の一致"
+    else:
+        rules = None
+        if args.rules:
+            with open(args.rules, encoding="utf-8") as f:
+                rules = json.load(f)
+        predicted = classify_rules(table, rules)
+        validation = evaluation(reference, predicted) if np.any(reference != "") else None
+        method = "しきい値と手作業の分類の一致"
+
+    if np.any(reference != ""):
+        title = "手作業の分類との一致" + ("（学習に使った例を含む）" if args.fit and not args.model else "")
+        print(format_evaluation(evaluation(reference, predicted), title))
+        print(confusion_table(reference, predicted).to_string() + "\n")
+
+    if beats_baseline(validation):
+        table["shape_class"] = predicted
+        group_by = "shape_class"
+        counts = table["shape_class"].value_counts().reindex(SHAPE_CLASSES, fill_value=0)
+        print("分類: " + ", ".join(f"{c.upper()}={n}" for c, n in counts.items()))
+    else:
+        group_by = "reference_class"
+        print(f"{method}が多数派クラスの基準を上回らないので、分類（shape_class）は書き出しません。"
+              "統計は手作業の分類ごとに出します。")
+
+    table.to_csv(args.output, index=False)
+    stats_path = os.path.splitext(args.output)[0] + "_stats.csv"
+    grouped = table[table[group_by] != ""]
+    if len(grouped):
+        class_stats(grouped, group_by).to_csv(stats_path, index=False)
+        print(f"\n{args.output} と {stats_path} に書き出しました。")
+    else:
+        print(f"\n{args.output} に書き出しました（分類が無いので統計は書き出しません）。")
+
+
+if __name__ == "__main__":
+    main()
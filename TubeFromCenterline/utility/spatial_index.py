@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+3次元点群の最近傍探索（空間インデックス）モジュール。
+
+- SciPy があれば cKDTree（KDTreeIndex）を使う。
+- SciPy が無い環境では、NumPy だけで作る一様グリッド（GridIndex）を使う。
+
+どちらも同じインターフェースで、複数の問い合わせ点をまとめて1回で処理する。
+
+    index = build_spatial_index(points_vtk)
+    dist, idx = index.query(points_csv, k=1)
+    offsets, idx, dist = index.query_radius(points_csv, 0.5)
+"""
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+def _as_points(points):
+    points = np.ascontiguousarray(points, dtype=float)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError("点群は (N,3) の配列で指定してください。")
+    return points
+
+
+def _lists_to_csr(lists, points, queries):
+    """点インデックスのリストのリストを (offsets, indices, distances) に変換"""
+    counts = np.fromiter((len(a) for a in lists), dtype=np.int64, count=len(lists))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    if offsets[-1]:
+        indices = np.concatenate([np.asarray(a, dtype=np.int64) for a in lists])
+    else:
+        indices = np.zeros(0, dtype=np.int64)
+    owner = np.repeat(np.arange(len(lists)), counts)
+    distances = np.linalg.norm(points[indices] - queries[owner], axis=1)
+    return offsets, indices, distances
+
+
+class KDTreeIndex:
+    """scipy.spatial.cKDTree を使う空間インデックス"""
+
+    def __init__(self, points):
+        if cKDTree is None:
+            raise ImportError("scipy が見つかりません。'pip install scipy' を実行してください。")
+        self.points = _as_points(points)
+        self._tree = cKDTree(self.points)
+
+    def query(self, queries, k=1):
+        """
+        各問い合わせ点に対する k 近傍の (距離, 点インデックス) を返す。
+        k=1 なら (M,) 、k>1 なら (M,k) の配列。
+        """
+        queries = _as_points(queries)
+        dist, idx = self._tree.query(queries, k=k)
+        return dist, idx.astype(np.int64)
+
+    def query_radius(self, queries, radius):
+        """
+        各問い合わせ点から距離 radius 以内の点をすべて返す。
+        結果は CSR 形式 (offsets, indices, distances) で、
+        問い合わせ点 i の結果は indices[offsets[i]:offsets[i+1]]。
+        """
+        queries = _as_points(queries)
+        lists = self._tree.query_ball_point(queries, r=radius)
+        return _lists_to_csr(lists, self.points, queries)
+
+
+class GridIndex:
+    """
+    NumPy だけで作る一様グリッドの空間インデックス。
+
+    点をセル番号でソートしておき、問い合わせ点の周囲のセルを
+    内側から1層ずつ広げながら、全問い合わせ点をまとめて探索する。
+    """
+
+    # この層数を広げても決まらない問い合わせ点は総当たりで求める
+    MAX_RINGS = 4
+
+    def __init__(self, points, cell_size=None):
+        self.points = _as_points(points)
+        n = len(self.points)
+        if n == 0:
+            raise ValueError("点群が空です。")
+
+        self.origin = self.points.min(axis=0)
+        extent = self.points.max(axis=0) - self.origin
+
+        if cell_size is None:
+            cell_size = self._auto_cell_size(extent)
+        self.cell_size = float(cell_size)
+        self.dims = np.floor(extent / self.cell_size).astype(np.int64) + 1
+
+        keys = self._cell_keys(self._cell_coords(self.points))
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    # 共有メモリなどに置けるように、インデックスの中身を配列で受け渡す
+    STATE_ARRAYS = ("points", "origin", "cell_size", "dims", "order", "sorted_keys")
+
+    def state(self):
+        """インデックスの中身 {名前: 配列}（from_state で作り直さずに復元できる）"""
+        return {k: np.asarray(getattr(self, k)) for k in self.STATE_ARRAYS}
+
+    @classmethod
+    def from_state(cls, state):
+        """state() の配列からインデックスを作る（配列はコピーしないので、読み取り専用のビューでもよい）"""
+        self = cls.__new__(cls)
+        for k in cls.STATE_ARRAYS:
+            setattr(self, k, state[k])
+        self.cell_size = float(self.cell_size)
+        return self
+
+    def _auto_cell_size(self, extent):
+        """
+        点の入っているセル1つあたり平均数点になるようにセルの大きさを決める。
+        血管中心線のように点が線状に並ぶ場合は体積からの見積もりが大きすぎるので、
+        実際のセル占有数を見ながら半分ずつ小さくする。
+        """
+        n = len(self.points)
+        volume = float(np.prod(np.maximum(extent, 1e-12)))
+        h = max((volume * 4.0 / n) ** (1.0 / 3.0), float(extent.max()) / 1024.0, 1e-9)
+        for _ in range(10):
+            coords = np.floor((self.points - self.origin) / h).astype(np.int64)
+            n_cells = len(np.unique(coords, axis=0))
+            if n / n_cells <= 8.0 or h <= float(extent.max()) / 1024.0:
+                break
+            h *= 0.5
+        return h
+
+    def _cell_coords(self, pts):
+        return np.floor((pts - self.origin) / self.cell_size).astype(np.int64)
+
+    def _cell_keys(self, coords):
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    @staticmethod
+    def _shell_offsets(r):
+        """チェビシェフ距離がちょうど r のセルのオフセット (S,3)"""
+        rng = np.arange(-r, r + 1)
+        offs = np.stack(np.meshgrid(rng, rng, rng, indexing="ij"), axis=-1).reshape(-1, 3)
+        return offs[np.abs(offs).max(axis=1) == r]
+
+    def _gather(self, query_ids, cells):
+        """
+        (A,S,3) のセル座標に入っている点を集め、
+        (問い合わせ番号, 点インデックス) の組を1次元配列で返す。
+        """
+        valid = np.all((cells >= 0) & (cells < self.dims), axis=2)
+        owner = np.broadcast_to(query_ids[:, None], valid.shape)[valid]
+        keys = self._cell_keys(cells[valid])
+        lo = np.searchsorted(self.sorted_keys, keys, side="left")
+        hi = np.searchsorted(self.sorted_keys, keys, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            return owner[:0], self.order[:0]
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        cand = self.order[starts + np.arange(total)]
+        return np.repeat(owner, counts), cand
+
+    def query(self, queries, k=1):
+        """
+        各問い合わせ点に対する k 近傍の (距離, 点インデックス) を返す。
+        k=1 なら (M,) 、k>1 なら (M,k) の配列。
+        点数が k に満たない場合、足りない分は距離 inf・インデックス N で埋める。
+        """
+        queries = _as_points(queries)
+        m = len(queries)
+        n = len(self.points)
+        best_d = np.full((m, k), np.inf)
+        best_i = np.full((m, k), n, dtype=np.int64)
+
+        qc = self._cell_coords(queries)
+        # グリッド全体を覆うのに必要な層数
+        max_r = np.maximum(np.abs(qc), np.abs(self.dims - 1 - qc)).max(axis=1)
+        # グリッドの外にある問い合わせ点は、グリッドに届く層から探し始める
+        ring = np.maximum(np.maximum(-qc, qc - (self.dims - 1)).max(axis=1), 0)
+
+        active = np.arange(m)
+        while active.size:
+            # 何層も広げる必要がある点（グリッドから遠い点など）は総当たりに切り替える
+            far = ring[active] > self.MAX_RINGS
+            if far.any():
+                self._brute_force(queries, active[far], best_d, best_i, k)
+                active = active[~far]
+                if not active.size:
+                    break
+
+            # 層番号ごとにまとめて処理する（ほとんどの場合 1〜2 種類）
+            for r in np.unique(ring[active]):
+                group = active[ring[active] == r]
+                cells = qc[group, None, :] + self._shell_offsets(int(r))[None, :, :]
+                owner, cand = self._gather(group, cells)
+                if owner.size:
+                    d = np.linalg.norm(self.points[cand] - queries[owner], axis=1)
+                    self._merge(best_d, best_i, group, owner, cand, d, k)
+
+            # r 層まで調べ終えた時点で、k 番目の距離が r*h 以下なら確定
+            done = (best_d[active, k - 1] <= ring[active] * self.cell_size) | (
+                max_r[active] <= ring[active]
+            )
+            ring[active] += 1
+            active = active[~done]
+
+        if k == 1:
+            return best_d[:, 0], best_i[:, 0]
+        return best_d, best_i
+
+    def _brute_force(self, queries, ids, best_d, best_i, k):
+        """ids の問い合わせ点について、全点との距離から k 近傍を求める（チャンク単位）"""
+        n = len(self.points)
+        kk = min(k, n)
+        chunk = max(1, (1 << 22) // n)
+        for s in range(0, len(ids), chunk):
+            sub = ids[s:s + chunk]
+            d = np.linalg.norm(queries[sub, None, :] - self.points[None, :, :], axis=2)
+            idx = np.argpartition(d, kk - 1, axis=1)[:, :kk]
+            dd = np.take_along_axis(d, idx, axis=1)
+            order = np.argsort(dd, axis=1)
+            best_d[sub, :kk] = np.take_along_axis(dd, order, axis=1)
+            best_i[sub, :kk] = np.take_along_axis(idx, order, axis=1)
+
+    @staticmethod
+    def _merge(best_d, best_i, active, owner, cand, d, k):
+        """これまでの k 近傍と新しい候補をまとめ、問い合わせ点ごとに上位 k 個を残す"""
+        all_q = np.concatenate([np.repeat(active, k), owner])
+        all_d = np.concatenate([best_d[active].ravel(), d])
+        all_i = np.concatenate([best_i[active].ravel(), cand])
+
+        order = np.lexsort((all_d, all_q))
+        all_q, all_d, all_i = all_q[order], all_d[order], all_i[order]
+
+        # 問い合わせ点ごとの順位
+        first = np.concatenate([[True], all_q[1:] != all_q[:-1]])
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(all_q)), 0))
+        rank = np.arange(len(all_q)) - group_start
+        keep = rank < k
+
+        best_d[all_q[keep], rank[keep]] = all_d[keep]
+        best_i[all_q[keep], rank[keep]] = all_i[keep]
+
+    def query_radius(self, queries, radius):
+        """
+        各問い合わせ点から距離 radius 以内の点をすべて返す。
+        結果は CSR 形式 (offsets, indices, distances)。
+        """
+        queries = _as_points(queries)
+        m = len(queries)
+        reach = int(np.ceil(radius / self.cell_size))
+        rng = np.arange(-reach, reach + 1)
+        offs = np.stack(np.meshgrid(rng, rng, rng, indexing="ij"), axis=-1).reshape(-1, 3)
+
+        cells = self._cell_coords(queries)[:, None, :] + offs[None, :, :]
+        owner, cand = self._gather(np.arange(m), cells)
+        d = np.linalg.norm(self.points[cand] - queries[owner], axis=1)
+        inside = d <= radius
+        owner, cand, d = owner[inside], cand[inside], d[inside]
+
+        order = np.lexsort((d, owner))
+        owner, cand, d = owner[order], cand[order], d[order]
+        counts = np.bincount(owner, minlength=m)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return offsets, cand, d
+
+
+def build_spatial_index(points, backend="auto"):
+    """
+    空間インデックスを作る。
+    backend: "auto"（SciPy があれば kdtree）/ "kdtree" / "grid"
+    """
+    if backend == "auto":
+        backend = "kdtree" if cKDTree is not None else "grid"
+    if backend == "kdtree":
+        return KDTreeIndex(points)
+    if backend == "grid":
+        return GridIndex(points)
+    raise ValueError(f"未対応の backend です: {backend}")
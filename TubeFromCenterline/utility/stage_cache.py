@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+パイプラインの各段（VTK → CSV, 全長計算, 半径の付加, 曲率の読み込み など）の
+結果をディスクにキャッシュする共通モジュール。
+
+キーは「段の名前 + 入力ファイルの内容ハッシュ（または配列の内容ハッシュ）+ 段のパラメータ」。
+入力ファイルの中身とパラメータが同じなら、前回の結果をそのまま返す。
+キャッシュ全体の大きさは max_bytes までに抑え、古く使われていないものから消す（LRU）。
+
+キャッシュは既定では無効で、次のどちらかで有効にする。
+  - 各スクリプトの --cache-dir オプション（configure_cache を呼ぶ）
+  - 環境変数 CENTERLINE_CACHE_DIR（プロセスプールのワーカーにも引き継がれる）
+
+使い方:
+    from stage_cache import cached
+    length = cached("centerline_length", [csv_file], {}, lambda: compute(csv_file))
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+CACHE_DIR_ENV = "CENTERLINE_CACHE_DIR"
+CACHE_SIZE_ENV = "CENTERLINE_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 2 << 30   # 2 GiB
+
+# キャッシュの形式を変えたら上げる（古いエントリは使われなくなり、いずれ追い出される）
+_FORMAT_VERSION = 1
+
+_HASH_CHUNK = 1 << 20
+
+# 同じプロセス内で同じファイルを何度もハッシュしないためのメモ
+# {(絶対パス, サイズ, mtime_ns): 16進ハッシュ}
+_file_digests = {}
+
+# active_cache が返す StageCache {(ディレクトリ, max_bytes): StageCache}
+_caches = {}
+
+
+def file_digest(path):
+    """ファイルの内容の SHA-256（サイズと mtime が変わらない間はプロセス内で再計算しない）"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_digests[memo_key] = digest
+    return digest
+
+
+def _digest_input(obj):
+    """キーに含める入力1つ分のハッシュ（ファイルパスなら中身、配列ならその値）"""
+    if isinstance(obj, (str, os.PathLike)):
+        return "file:" + file_digest(obj)
+    arr = np.ascontiguousarray(obj)
+    h = hashlib.sha256()
+    h.update(str(arr.dtype).encode())
+    h.update(str(arr.shape).encode())
+    h.update(arr.tobytes())
+    return "array:" + h.hexdigest()
+
+
+def stage_key(stage, inputs, params=None):
+    """段の名前・入力・パラメータからキャッシュキー（16進文字列）を作る"""
+    h = hashlib.sha256()
+    h.update(f"{_FORMAT_VERSION}:{stage}".encode())
+    for obj in inputs:
+        h.update(_digest_input(obj).encode())
+    for name, value in sorted((params or {}).items()):
+        h.update(f"{name}={value!r};".encode())
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    cache_dir 以下に1エントリ1ファイル（pickle）で保存するキャッシュ。
+    読み出したエントリは mtime を更新し、容量を超えたら mtime の古い順に消す。
+
+    合計サイズは最初の put でディレクトリを1回だけ数え、あとは書き込んだ分を足していく
+    （書き込みのたびにディレクトリ全体を stat しない）。見積もりが max_bytes を超えたときだけ
+    数え直して古いものを消すので、ほかのプロセスが書いた分は次に数え直すまで見積もりに入らない。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self._total = None   # 合計サイズの見積もり（None はまだ数えていない）
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def get(self, key):
+        """キャッシュにあれば (True, 値)、無ければ (False, None)"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # 壊れたエントリや、名前を変えたクラス・モジュールの古いエントリは消して作り直す
+            # （キーはコードの変更を含まないので、_FORMAT_VERSION の上げ忘れでもここで外れにする）
+            self._remove(path)
+            self._total = None
+            return False, None
+        try:
+            os.utime(path)   # LRU のために最終使用時刻を更新
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, key, value):
+        """値を保存し、容量を超えていれば古いエントリを消す"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self._total is None:
+            self._total = self.size()
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        # 並列に書き込まれても壊れないよう、一時ファイルに書いてから置き換える
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self._total += os.path.getsize(path) - replaced
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """[(mtime, サイズ, パス), ...]（古い順）"""
+        result = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((st.st_mtime, st.st_size, path))
+        result.sort()
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """合計が max_bytes 以下になるまで、最後に使われたのが古いものから消す"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._total = total
+
+    def clear(self):
+        self.evict(0)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def configure_cache(cache_dir, max_bytes=None):
+    """
+    このプロセスと、ここから起動するワーカープロセスでキャッシュを有効にする。
+    cache_dir=None なら無効にする。
+    """
+    if cache_dir is None:
+        os.environ.pop(CACHE_DIR_ENV, None)
+        return None
+    os.environ[CACHE_DIR_ENV] = os.path.abspath(cache_dir)
+    if max_bytes is not None:
+        os.environ[CACHE_SIZE_ENV] = str(int(max_bytes))
+    return active_cache()
+
+
+def active_cache():
+    """
+    有効なキャッシュ（環境変数で指定されたもの）。無効なら None。
+    合計サイズの見積もりを引き継ぐため、同じ設定ならプロセス内で同じ StageCache を返す。
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    max_bytes = int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_BYTES))
+    key = (os.path.abspath(cache_dir), max_bytes)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = StageCache(cache_dir, max_bytes)
+    return cache
+
+
+def cached(stage, inputs, params, compute):
+    """
+    キャッシュが有効なら (stage, inputs, params) の結果を探し、
+    無ければ compute() を実行して保存する。キャッシュが無効なら compute() を呼ぶだけ。
+    """
+    cache = active_cache()
+    if cache is None:
+        return compute()
+
+    key = stage_key(stage, inputs, params)
+    hit, value = cache.get(key)
+    if hit:
+        return value
+    value = compute()
+    cache.put(key, value)
+    return value
+
+
+def add_cache_arguments(parser):
+    """argparse に --cache-dir / --cache-max-mb を追加する"""
+    parser.add_argument(
+        "--cache-dir",
+        help=f"段ごとの結果をキャッシュするディレクトリ（環境変数 {CACHE_DIR_ENV} でも指定可）"
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float,
+        help=f"キャッシュの上限サイズ [MB]（既定: {DEFAULT_MAX_BYTES >> 20}）"
+    )
+
+
+def configure_cache_from_args(args):
+    """add_cache_arguments で追加したオプションからキャッシュを設定する"""
+    if args.cache_dir:
+        max_bytes = None if args.cache_max_mb is None else int(args.cache_max_mb * (1 << 20))
+        configure_cache(args.cache_dir, max_bytes)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ファイル名の被験者IDをそろえる共通関数。
+
+中心線のファイルは BG0001_L_MCA-ICA.vtk のように 英字2文字 + 4桁 だが、
+vtk_set の木は BG001_…, BG04_…, BG0002_… のように桁数がそろっていない。
+ファイル名から ID を取り出したら normalize_subject で 4桁 にそろえてから比べる。
+"""
+
+import os
+import re
+
+# ファイル名の中の被験者ID（桁数は問わない。後ろに数字が続くものは除く）
+SUBJECT_ID_PATTERN = r"(B[A-Z]\d+)(?!\d)"
+
+
+def normalize_subject(subject):
+    """被験者IDを BG0001 のような 英字2文字 + 4桁 にそろえる（BG001, BG04 → BG0001, BG0004）"""
+    m = re.fullmatch(r"(B[A-Z])(\d+)", subject)
+    return f"{m.group(1)}{int(m.group(2)):04d}" if m else subject
+
+
+def subject_of(path, id_pattern=SUBJECT_ID_PATTERN):
+    """
+    ファイル名から被験者IDを取り出し、そろえて返す（見つからなければ None）。
+    id_pattern にグループがあれば最初のグループを、なければ一致した全体を ID とする。
+    """
+    regex = re.compile(id_pattern)
+    m = regex.search(os.path.basename(path))
+    if m is None:
+        return None
+    return normalize_subject(m.group(1) if regex.groups else m.group(0))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NeuroMorpho の CNG 形式（SWC）の血管の木を読み書きするモジュール。
+
+vtk_set/*_ColorCoded.CNG.swc.vtk は SWC を VTK に変換したもので、
+SWC は1行1点の「id type x y z radius parent」だけの小さなファイル。ここでは
+  - 全行を NumPy で1回で読み（read_swc）、
+  - parent の表から、LINES セルと同じ枝（最初の子へはそのまま続き、他の子の枝は親の点から始まる）を
+    ポインタを倍々にたどる方法でまとめて作り（swc_segments）、
+  - network_mesh.load_network と同じ dict（points / offsets / connectivity / radius / domain /
+    segment_index）で返す（load_swc_network）。domain には枝の点の type を使う。
+逆に、LINES の VTK の木を SWC に書き出すこともできる（network_to_swc, write_swc）。
+
+使い方:
+    network = load_swc_network("BG0002_ColorCoded.CNG.swc")
+
+  python swc_io.py ../data/vtk_set/*.vtk -o swc/    （VTK の木を SWC に変換する）
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from parallel_batch import iter_parallel, report_error
+
+# SWC の列
+SWC_COLUMNS = ("id", "type", "x", "y", "z", "radius", "parent")
+
+SWC_HEADER = "# id type x y z radius parent"
+
+
+def read_swc(path):
+    """
+    SWC を読み込み、dict で返す。
+      id (N,), type (N,), points (N,3), radius (N,),
+      parent (N,)（親の「行」のインデックス。根は -1）
+    """
+    table = np.loadtxt(path, comments="#", ndmin=2)
+    if table.shape[1] < len(SWC_COLUMNS):
+        raise ValueError(f"SWC の列が足りません（{len(SWC_COLUMNS)} 列必要）: {path}")
+    ids = table[:, 0].astype(np.int64)
+    parent_ids = table[:, 6].astype(np.int64)
+
+    # id は連番とは限らないので、行のインデックスに直す
+    order = np.argsort(ids, kind="stable")
+    pos = np.searchsorted(ids, parent_ids, sorter=order)
+    pos = np.minimum(pos, len(ids) - 1)
+    found = (parent_ids >= 0) & (ids[order[pos]] == parent_ids)
+    if np.any((parent_ids >= 0) & ~found):
+        missing = parent_ids[(parent_ids >= 0) & ~found][0]
+        raise ValueError(f"親の id {missing} がありません: {path}")
+    parent = np.where(found, order[pos], -1)
+
+    return {
+        "id": ids,
+        "type": table[:, 1].astype(np.int64),
+        "points": table[:, 2:5].astype(float),
+        "radius": table[:, 5].astype(float),
+        "parent": parent,
+    }
+
+
+def swc_segments(parent):
+    """
+    parent の表から枝を作り、(offsets (S+1,), connectivity, 枝の先頭の点 (S,)) を返す。
+    vtk_set の LINES セルと同じく、枝は分岐点で切らずに最初の子（ファイルで先に出てくる子）へ続け、
+    2番目以降の子と根の子から新しい枝を始める。枝の最初の点には親の点（分岐点・根）を置く。
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    n = len(parent)
+    has_parent = parent >= 0
+    child = np.flatnonzero(has_parent)
+    first_child = np.full(n, n, dtype=np.int64)
+    np.minimum.at(first_child, parent[child], child)
+
+    # 枝の先頭: 親の最初の子でない点、親が根の点、または親の無い点
+    head = ~has_parent
+    head[child] = (first_child[parent[child]] != child) | (parent[parent[child]] < 0)
+
+    # 各点から、同じ枝の先頭までの距離と先頭の点を、ポインタを倍々にたどって求める
+    jump = np.where(head, np.arange(n), parent)
+    dist = (~head).astype(np.int64)
+    for _ in range(max(int(n).bit_length(), 1)):
+        nxt = jump[jump]
+        if np.array_equal(nxt, jump):
+            break
+        dist += dist[jump]
+        jump = nxt
+
+    # 枝（先頭の点が同じもの）ごとに、先頭からの距離の順に並べる（根は枝の最初に親として入る）
+    heads = np.flatnonzero(head & has_parent)
+    order = np.lexsort((dist, jump))
+    order = order[has_parent[order]]
+    seg_of = np.searchsorted(heads, jump[order])
+    counts = np.bincount(seg_of, minlength=len(heads))
+
+    # 各枝の最初に親の点を入れる
+    offsets = np.concatenate([[0], np.cumsum(counts + 1)])
+    connectivity = np.empty(offsets[-1], dtype=np.int64)
+    connectivity[offsets[:-1]] = parent[heads]
+    body = np.ones(offsets[-1], dtype=bool)
+    body[offsets[:-1]] = False
+    connectivity[body] = order
+    return offsets, connectivity, heads
+
+
+def load_swc_network(path):
+    """
+    SWC の木を network_mesh.load_network と同じ dict で返す。
+      points, offsets, connectivity, radius, domain（枝の先頭の点の type）, segment_index
+    """
+    swc = read_swc(path)
+    offsets, connectivity, heads = swc_segments(swc["parent"])
+    return {
+        "points": swc["points"],
+        "offsets": offsets,
+        "connectivity": connectivity,
+        "radius": swc["radius"],
+        "domain": swc["type"][heads],
+        "segment_index": np.arange(len(heads)),
+    }
+
+
+def network_to_swc(network):
+    """
+    load_network の dict（LINES の木）から SWC の表 (id, type, points, radius, parent) を作る。
+    点の親は、その点を2番目以降に持つ枝の1つ前の点。type には枝の domain を使う。
+    """
+    offsets = np.asarray(network["offsets"], dtype=np.int64)
+    conn = np.asarray(network["connectivity"], dtype=np.int64)
+    n = len(network["points"])
+    entry_seg = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    same = entry_seg[1:] == entry_seg[:-1]
+
+    parent = np.full(n, -1, dtype=np.int64)
+    parent[conn[1:][same]] = conn[:-1][same]
+    types = np.zeros(n, dtype=np.int64)
+    types[conn] = network["domain"][entry_seg]
+    types[conn[1:][same]] = network["domain"][entry_seg[1:][same]]
+
+    radius = network["radius"]
+    return {
+        "id": np.arange(1, n + 1),
+        "type": types,
+        "points": np.asarray(network["points"], dtype=float),
+        "radius": np.zeros(n) if radius is None else np.asarray(radius, dtype=float),
+        "parent": parent,
+    }
+
+
+def write_swc(path, swc, comments=()):
+    """SWC の表を書き出す（parent は行のインデックス。id は 1 からの連番にする）"""
+    n = len(swc["points"])
+    parent = np.asarray(swc["parent"], dtype=np.int64)
+    table = np.empty(n, dtype=[("id", "i8"), ("type", "i8"), ("xyz", "f8", (3,)), ("radius", "f8"), ("parent", "i8")])
+    table["id"] = np.arange(1, n + 1)
+    table["type"] = swc["type"]
+    table["xyz"] = swc["points"]
+    table["radius"] = swc["radius"]
+    table["parent"] = np.where(parent >= 0, parent + 1, -1)
+
+    with open(path, "w", newline="\n") as f:
+        for line in comments:
+            f.write(f"# {line}\n")
+        f.write(SWC_HEADER + "\n")
+        np.savetxt(f, np.column_stack([table["id"], table["type"], table["xyz"], table["radius"], table["parent"]]),
+                   fmt=["%d", "%d", "%.7g", "%.7g", "%.7g", "%.7g", "%d"])
+
+
+def output_path_for(path, output_dir=None):
+    """<名前>.swc（*.swc.vtk なら .vtk を取るだけ）"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if not stem.lower().endswith(".swc"):
+        stem += ".swc"
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(out_dir, stem)
+
+
+def convert_task(task):
+    """VTK の木1つを SWC に変換する（プロセスプールのワーカーで実行される）"""
+    from network_mesh import load_network
+
+    network = load_network(task["path"])
+    out_path = output_path_for(task["path"], task["output_dir"])
+    write_swc(out_path, network_to_swc(network), comments=[f"converted from {os.path.basename(task['path'])}"])
+    return out_path, os.path.getsize(task["path"]), os.path.getsize(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LINES の VTK の血管の木を SWC に変換する")
+    parser.add_argument("files", nargs="*", help="入力VTKファイル（複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの *.vtk をすべて変換する")
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+    files = list(args.files)
+    if args.dir:
+        files += sorted(glob.glob(os.path.join(args.dir, "*.vtk")))
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = [{"path": f, "output_dir": args.output_dir} for f in files]
+    total_in = total_out = 0
+    for task, result, error in iter_parallel(convert_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        out_path, size_in, size_out = result
+        total_in += size_in
+        total_out += size_out
+        print(f"{os.path.basename(task['path'])} -> {out_path}")
+    if total_out:
+        print(f"合計 {total_in / 1e6:.1f} MB -> {total_out / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
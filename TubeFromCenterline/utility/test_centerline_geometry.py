@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""centerline_geometry の座標からの接線・曲率・ねじれ率のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from centerline_geometry import (
+    GEOMETRY_COLUMNS, centerline_geometry, frenet_quantities, geometry_summary, geometry_task,
+    output_path_for, savgol_derivatives,
+)
+
+A, B = 4.0, 1.5
+
+
+def helix(n=400, turns=2.0, noise=0.0, seed=16):
+    """半径 A・ピッチ 2πB の螺旋（κ = A/(A²+B²), τ = B/(A²+B²)）"""
+    t = np.linspace(0, 2 * np.pi * turns, n)
+    points = np.column_stack([A * np.cos(t), A * np.sin(t), B * t])
+    if noise:
+        points += np.random.default_rng(seed).normal(scale=noise, size=points.shape)
+    return points
+
+
+KAPPA = A / (A * A + B * B)
+TAU = B / (A * A + B * B)
+
+
+def test_frenet_quantities_of_the_exact_helix_derivatives():
+    t = np.linspace(0, 4, 9)
+    d1 = np.column_stack([-A * np.sin(t), A * np.cos(t), np.full_like(t, B)])
+    d2 = np.column_stack([-A * np.cos(t), -A * np.sin(t), np.zeros_like(t)])
+    d3 = np.column_stack([A * np.sin(t), -A * np.cos(t), np.zeros_like(t)])
+    tangent, curvature, torsion = frenet_quantities(d1, d2, d3)
+    np.testing.assert_allclose(np.linalg.norm(tangent, axis=1), 1.0)
+    np.testing.assert_allclose(curvature, KAPPA)
+    np.testing.assert_allclose(torsion, TAU)
+
+
+def test_savgol_derivatives_of_a_cubic_are_exact():
+    x = np.arange(20) * 0.5
+    values = (x ** 3 - 2 * x)[:, None]
+    d0, d1, d2, d3 = savgol_derivatives(values, 0.5, 7, order=3)
+    np.testing.assert_allclose(d0[:, 0], values[:, 0], atol=1e-9)
+    np.testing.assert_allclose(d1[:, 0], 3 * x ** 2 - 2, atol=1e-8)
+    np.testing.assert_allclose(d2[:, 0], 6 * x, atol=1e-8)
+    np.testing.assert_allclose(d3[:, 0], 6, atol=1e-7)
+
+
+@pytest.mark.parametrize("method, params, rtol", [
+    ("savgol", {"window": 1.0}, 3e-3),          # 窓の多項式の分だけ曲率が小さめに出る
+    ("spline", {}, 1e-6),
+])
+def test_helix_curvature_and_torsion(method, params, rtol):
+    points = helix()
+    geom = centerline_geometry(points, method=method, **params)
+    inner = slice(20, -20)                     # 両端は窓が片側に寄るので除く
+    np.testing.assert_allclose(geom["curvature"][inner], KAPPA, rtol=rtol)
+    np.testing.assert_allclose(geom["torsion"][inner], TAU, rtol=rtol)
+    np.testing.assert_allclose(np.linalg.norm(geom["tangent"], axis=1), 1.0)
+    assert geom["s"][-1] == pytest.approx(4 * np.pi * np.sqrt(A * A + B * B), rel=1e-4)
+
+
+@pytest.mark.parametrize("method, params", [("savgol", {"window": 6.0}), ("spline", {"noise": 0.05})])
+def test_noisy_helix_is_smoothed(method, params):
+    geom = centerline_geometry(helix(noise=0.02), method=method, **params)
+    inner = slice(40, -40)
+    assert np.median(geom["curvature"][inner]) == pytest.approx(KAPPA, rel=0.05)
+    assert np.median(geom["torsion"][inner]) == pytest.approx(TAU, rel=0.15)
+
+
+def test_straight_line_and_repeated_points():
+    line = np.column_stack([np.linspace(0, 10, 30), np.zeros(30), np.zeros(30)])
+    line = np.insert(line, 5, line[5], axis=0)          # 同じ位置の点
+    geom = centerline_geometry(line)
+    assert len(geom["curvature"]) == len(line)
+    np.testing.assert_allclose(geom["curvature"], 0, atol=1e-9)
+    np.testing.assert_array_equal(geom["torsion"], 0)
+    with pytest.raises(ValueError):
+        centerline_geometry(line, method="finite")
+    with pytest.raises(ValueError):
+        centerline_geometry(np.zeros((5, 3)))
+
+
+def test_summary_turning_angle_of_a_quarter_circle():
+    t = np.linspace(0, np.pi / 2, 200)
+    arc = np.column_stack([5 * np.cos(t), 5 * np.sin(t), np.zeros_like(t)])
+    summary = geometry_summary("arc", centerline_geometry(arc))
+    assert summary["length"] == pytest.approx(5 * np.pi / 2, rel=1e-4)
+    assert summary["total_turning"] == pytest.approx(np.pi / 2, rel=1e-2)
+    assert summary["mean_curvature"] == pytest.approx(0.2, rel=1e-2)
+
+
+def test_task_writes_geometry_columns(tmp_path):
+    src = tmp_path / "BG0001_L_MCA-ICA_ascii.csv"
+    points = helix(200)
+    pd.DataFrame(points, columns=["x", "y", "z"]).to_csv(src, index=False)
+    summary = geometry_task({"path": str(src), "params": {"method": "savgol"}, "output_dir": str(tmp_path)})
+    df = pd.read_csv(output_path_for(str(src), str(tmp_path)))
+    assert list(df.columns) == ["x", "y", "z", *GEOMETRY_COLUMNS]
+    assert len(df) == 200 and summary["n_points"] == 200
+    assert summary["max_curvature"] == pytest.approx(df["curvature"].max())
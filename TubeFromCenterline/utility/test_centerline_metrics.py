@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""centerline_metrics の蛇行度などの指標（全体・ラベルの区間ごと）のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from centerline_metrics import METRIC_COLUMNS, centerline_metrics, metrics_table, segment_metrics, wide_table
+
+
+def semicircle(r=5.0, n=200):
+    t = np.linspace(0, np.pi, n)
+    return np.column_stack([r * np.cos(t), r * np.sin(t), np.zeros(n)])
+
+
+def s_curve(r=5.0, n=200):
+    """半径 r の半円を2つ、逆向きにつないだ S 字（中央が変曲点）"""
+    t = np.linspace(0, np.pi, n)
+    first = np.column_stack([r - r * np.cos(t), r * np.sin(t), np.zeros(n)])
+    second = np.column_stack([3 * r - r * np.cos(t[1:]), -r * np.sin(t[1:]), np.zeros(n - 1)])
+    return np.concatenate([first, second])
+
+
+def metrics_of(points, curvature=None, **kwargs):
+    curvature = np.full(len(points), 0.0) if curvature is None else curvature
+    out = segment_metrics(points, curvature, [0], [len(points)], **kwargs)
+    return {k: v[0] for k, v in out.items()}
+
+
+def test_straight_line_is_not_tortuous():
+    line = np.column_stack([np.linspace(0, 10, 50), np.zeros(50), np.zeros(50)])
+    m = metrics_of(line)
+    assert m["length"] == pytest.approx(10) and m["chord"] == pytest.approx(10)
+    assert m["dm_tortuosity"] == pytest.approx(1.0)
+    assert m["soam"] == pytest.approx(0.0, abs=1e-12)
+    assert m["inflections"] == 0 and m["icm"] == pytest.approx(1.0)
+    assert np.isnan(m["mean_radius"])
+
+
+def test_semicircle_distance_metric_and_angles():
+    r = 5.0
+    points = semicircle(r)
+    m = metrics_of(points, np.full(len(points), 1 / r), radius=np.full(len(points), 0.8))
+    assert m["dm_tortuosity"] == pytest.approx(np.pi / 2, rel=1e-4)
+    # 平面の曲線なので捩れの角は 0、曲がりの角の和は π（両端の点を除く分だけ少し小さい）
+    assert m["soam"] * m["length"] == pytest.approx(np.pi, rel=0.02)
+    assert m["mean_curvature"] == pytest.approx(1 / r)
+    assert m["inflections"] == 0
+    assert m["mean_radius"] == pytest.approx(0.8) and m["min_radius"] == pytest.approx(0.8)
+
+
+def test_s_curve_has_one_inflection():
+    points = s_curve()
+    rows = centerline_metrics(points, {}, curvature_source="computed")
+    assert len(rows) == 1 and rows[0]["segment"] == "all"
+    m = rows[0]
+    assert m["inflections"] == 1
+    assert m["dm_tortuosity"] == pytest.approx(np.pi / 2, rel=1e-3)
+    assert m["icm"] == pytest.approx(2 * m["dm_tortuosity"])
+    with pytest.raises(ValueError):
+        centerline_metrics(points, {}, curvature_source="file")
+
+
+def test_helix_soam_counts_torsion():
+    a, b = 4.0, 1.5
+    t = np.linspace(0, 4 * np.pi, 400)
+    helix = np.column_stack([a * np.cos(t), a * np.sin(t), b * t])
+    # 点ごとの角は κ ds と τ ds なので、SOAM は sqrt(κ² + τ²) = 1/sqrt(a² + b²) に近づく
+    soam = metrics_of(helix)["soam"]
+    assert soam == pytest.approx(1 / np.hypot(a, b), rel=0.01)
+    assert soam > a / (a * a + b * b) * 1.05          # 曲率だけより大きい
+
+
+def test_label_segments_and_overlapping_whole():
+    points = semicircle(n=101)
+    labels = np.repeat([1, 0, 2], [30, 40, 31])
+    rows = centerline_metrics(points, {"label": labels, "curvature": np.full(101, 0.2)})
+    assert [r["segment"] for r in rows] == ["all", "lab1", "lab0", "lab2"]
+    assert [(r["start"], r["end"]) for r in rows] == [(0, 101), (0, 30), (30, 70), (70, 101)]
+    whole, parts = rows[0], rows[1:]
+    # 区間の境目をまたぐ辺（2本）はどの区間にも入らない
+    step = np.linalg.norm(points[1] - points[0])
+    assert sum(p["length"] for p in parts) == pytest.approx(whole["length"] - 2 * step)
+    assert sum(p["n_points"] for p in parts) == whole["n_points"]
+    assert all(p["max_curvature"] == pytest.approx(0.2) for p in rows)
+
+    no_labels = centerline_metrics(points, {"label": labels}, use_labels=False)
+    assert [r["segment"] for r in no_labels] == ["all"]
+
+
+def test_table_from_csv_and_wide_layout(tmp_path):
+    points = semicircle(n=60)
+    path = tmp_path / "BG0001_L_MCA-ICA_ascii.csv"
+    pd.DataFrame({"x": points[:, 0], "y": points[:, 1], "z": points[:, 2],
+                  "label": np.repeat([1, 2], 30)}).to_csv(path, index=False)
+    long = metrics_table([str(path)], {"curvature": "auto", "labels": True}, workers=1)
+    assert list(long["segment"]) == ["all", "lab1", "lab2"]
+    assert set(long["variant"]) == {"original"}
+
+    wide = wide_table(long)
+    assert len(wide) == 1
+    assert list(wide.columns[4:4 + len(METRIC_COLUMNS)]) == METRIC_COLUMNS
+    assert "dm_tortuosity_lab2" in wide.columns
+    assert wide["length"].item() > wide["length_lab1"].item() + wide["length_lab2"].item()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""centerline_store のファイル名の解釈と、.npz ストアの保存・読み込みのテスト"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from centerline_io import polyline_length
+from centerline_store import CenterlineStore, build_store, has_centerline_name, parse_centerline_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("BG0001_L_MCA-ICA_ascii.csv", ("BG0001", "L", "original")),
+    ("BG0001_L_MCA-ICA_ascii_resampled120.csv", ("BG0001", "L", "resampled120")),
+    ("BG0001_ICA_L.vtk", ("BG0001", "L", "ICA")),
+    ("BG0001_L_siphon_lab.vtk", ("BG0001", "L", "siphon")),
+    ("BG0010_R.ply", ("BG0010", "R", "vmodeler")),
+])
+def test_parse_centerline_name(name, expected):
+    assert parse_centerline_name(os.path.join("some", "dir", name)) == expected
+
+
+def test_result_tables_are_not_centerlines():
+    assert not has_centerline_name("centerline_lengths.csv")
+    assert not has_centerline_name("BG0001_summary.csv")
+    with pytest.raises(ValueError):
+        parse_centerline_name("centerline_lengths.csv")
+
+
+def test_store_round_trip_keeps_points_attributes_and_shape_class(tmp_path):
+    rng = np.random.default_rng(4)
+    uvcs = tmp_path / "uvcs" / "v"
+    uvcs.mkdir(parents=True)
+    a = rng.normal(size=(30, 3))
+    b = rng.normal(size=(12, 3))
+    pd.DataFrame({"x": a[:, 0], "y": a[:, 1], "z": a[:, 2], "radius": np.arange(30) / 10}).to_csv(
+        tmp_path / "BG0001_L_MCA-ICA_ascii.csv", index=False)
+    pd.DataFrame(b, columns=["x", "y", "z"]).to_csv(tmp_path / "BG0001_R_MCA-ICA_ascii.csv", index=False)
+    # uvcs/ のコピーは同じ中心線として1本にまとめ、形状クラスだけを補う
+    pd.DataFrame(b, columns=["x", "y", "z"]).to_csv(uvcs / "BG0001_R_MCA-ICA_ascii.csv", index=False)
+
+    path = str(tmp_path / "store.npz")
+    build_store([str(tmp_path)], path)
+    store = CenterlineStore.load(path)
+
+    assert len(store) == 2
+    left = store.get("BG0001", "L")
+    np.testing.assert_array_equal(left["points"], a)
+    np.testing.assert_allclose(left["radius"], np.arange(30) / 10)
+    right = store.get("BG0001", "R")
+    np.testing.assert_array_equal(right["points"], b)
+    assert np.all(np.isnan(right["radius"])) and np.all(right["label"] == -1)
+    assert right["shape_class"] == "v"
+    np.testing.assert_array_equal(store.select(shape_class="v"), [store.index_of("BG0001", "R")])
+    np.testing.assert_allclose(store.lengths(), [polyline_length(a), polyline_length(b)])
+    with pytest.raises(KeyError):
+        store.get("BG0001", "L", "resampled120")
+
+    # 曲率のグラフ（make_graph_curvature*.py / render_curvature.py）はストアから累積長さと曲率を読む
+    from render_curvature import store_profiles
+    profiles = store_profiles(path, variant="original")
+    assert [name for name, _, _ in profiles] == [store.name_of(i) for i in store.select(variant="original")]
+    assert [s[-1] for _, s, _ in profiles] == pytest.approx([polyline_length(a), polyline_length(b)])
+    assert [len(k) for _, _, k in profiles] == [30, 12]
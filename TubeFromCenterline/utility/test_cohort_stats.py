@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""cohort_stats の結果表の読み込み・結合・グループごとの統計のテスト"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cohort_stats import STAT_NAMES, cohort_stats, merge_tables, read_result_table, summarize_tables
+
+
+@pytest.fixture
+def lengths_csv(tmp_path):
+    """元の点列と resampled120 の両方の行を持つ長さの表（合計の行つき）"""
+    rows = []
+    for i, (subject, side) in enumerate([("BG0001", "L"), ("BG0001", "R"), ("BH0002", "L"), ("BH0003", "R")]):
+        rows.append({"file_name": f"{subject}_{side}_MCA-ICA_ascii.csv", "length": 10.0 * (i + 1)})
+        rows.append({"file_name": f"{subject}_{side}_MCA-ICA_ascii_resampled120.csv", "length": 10.0 * (i + 1) - 0.5})
+    rows.append({"file_name": "total", "length": 1000.0})
+    path = tmp_path / "centerline_lengths.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def classes_csv(tmp_path):
+    path = tmp_path / "siphon_classes.csv"
+    pd.DataFrame({
+        "file_name": ["BG0001_L_MCA-ICA_ascii.csv", "BG0001_R_MCA-ICA_ascii.csv", "BH0002_L_MCA-ICA_ascii.csv"],
+        "shape_class": ["u", "s", "u"],
+        "length": [10.1, 20.1, 30.1],
+        "max_curvature": [0.5, 1.0, 0.7],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_rows_carry_subject_side_and_variant(lengths_csv, capsys):
+    df = read_result_table(lengths_csv)
+    assert len(df) == 8 and "file_name" not in df.columns
+    assert set(df["variant"]) == {"original", "resampled120"}
+    assert "1 行を除きました" in capsys.readouterr().err
+
+    only = read_result_table(lengths_csv, variant="resampled120")
+    assert set(only["variant"]) == {"resampled120"} and len(only) == 4
+
+
+def test_variants_are_not_mixed_in_the_statistics(lengths_csv):
+    stats = cohort_stats(merge_tables([read_result_table(lengths_csv)], ["lengths"]))
+    overall = stats[(stats["group_by"] == "all") & (stats["metric"] == "length")].set_index("variant")
+    assert overall.loc["original", "count"] == 4
+    assert overall.loc["original", "mean"] == pytest.approx(25.0)
+    assert overall.loc["resampled120", "mean"] == pytest.approx(24.5)
+
+    by_prefix = stats[(stats["group_by"] == "prefix") & (stats["variant"] == "original")].set_index("group")
+    assert by_prefix.loc["BG", "mean"] == pytest.approx(15.0)
+    assert by_prefix.loc["BH", "p50"] == pytest.approx(35.0)
+    assert list(stats.columns) == ["variant", "group_by", "group", "metric"] + STAT_NAMES
+
+
+def test_same_key_with_different_names_is_an_error(tmp_path):
+    path = tmp_path / "table.csv"
+    pd.DataFrame({"file_name": ["BG0001_L_MCA-ICA_ascii.csv", "BG0001_L_MCA-ICA.vtk"], "length": [1.0, 2.0]}).to_csv(
+        path, index=False)
+    with pytest.raises(ValueError):
+        read_result_table(str(path))
+
+    pd.DataFrame({"length": [1.0]}).to_csv(path, index=False)          # ファイル名の列が無い
+    with pytest.raises(ValueError):
+        read_result_table(str(path))
+
+
+def test_merge_on_subject_side_and_variant(lengths_csv, classes_csv):
+    merged = merge_tables([read_result_table(lengths_csv), read_result_table(classes_csv)],
+                          ["centerline_lengths", "siphon_classes"])
+    assert len(merged) == 8
+    row = merged[(merged["subject"] == "BG0001") & (merged["side"] == "R") & (merged["variant"] == "original")]
+    assert row["length"].item() == 20.0 and row["siphon_classes.length"].item() == 20.1
+    assert row["shape_class"].item() == "s" and row["prefix"].item() == "BG"
+    # 再サンプリングの行には分類の表の値を付けない
+    resampled = merged[merged["variant"] == "resampled120"]
+    assert resampled["max_curvature"].isna().all()
+
+
+def test_summary_files_and_variant_filter(lengths_csv, classes_csv, tmp_path):
+    base = str(tmp_path / "cohort_stats")
+    stats = summarize_tables([lengths_csv, classes_csv], base, variant="original")
+    assert set(stats["variant"]) == {"original"}
+    with open(base + ".json", encoding="utf-8") as f:
+        data = json.load(f)
+    u = data["original"]["shape_class"]["u"]["max_curvature"]
+    assert u["count"] == 2 and u["mean"] == pytest.approx(0.6)
+    assert data["original"]["all"]["all"]["length"]["max"] == 40.0
+    assert np.isnan(stats[(stats["group"] == "s") & (stats["metric"] == "max_curvature")]["std"].item())
+    assert pd.read_csv(base + ".csv").shape == stats.shape
+
+
+def test_length_batch_can_run_twice_on_its_own_output_dir(tmp_path, capsys):
+    """統計の表（centerline_lengths_stats.csv）が入力のディレクトリにあっても、次の実行で中心線として読まない"""
+    pytest.importorskip("matplotlib")
+    from make_graph_and_csv_centerline_length_batch import process_directory
+
+    for i, side in enumerate("LR"):
+        pd.DataFrame({"x": [0.0, 0.0], "y": [0.0, 0.0], "z": [0.0, 5.0 + i]}).to_csv(
+            tmp_path / f"BG0001_{side}_MCA-ICA_ascii.csv", index=False)
+    output = tmp_path / "centerline_lengths.csv"
+    for _ in range(2):
+        process_directory(str(tmp_path), str(output), workers=1)
+        assert "エラー" not in capsys.readouterr().err
+        assert list(pd.read_csv(output)["total_length"]) == [5.0, 6.0]
+    stats = pd.read_csv(tmp_path / "centerline_lengths_stats.csv")
+    assert stats.loc[(stats["group_by"] == "all") & (stats["metric"] == "total_length"), "count"].item() == 2
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""csv_add_raidus の半径の付加（最近傍・補間）と、被験者ごとのバッチ処理のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_add_raidus import (
+    check_distance, compute_interpolated, compute_nearest, pair_files_by_subject, parse_vtk_points_and_radius, run_batch,
+    transfer_radius,
+)
+from subject_ids import normalize_subject, subject_of
+
+
+def brute_nearest(queries, points):
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    return d.min(axis=1), d.argmin(axis=1)
+
+
+@pytest.fixture
+def network():
+    rng = np.random.default_rng(5)
+    points = rng.uniform(0, 20, size=(800, 3))
+    radius = rng.uniform(0.2, 2.0, size=800)
+    queries = rng.uniform(-2, 22, size=(150, 3))
+    return points, radius, queries
+
+
+def test_compute_nearest_matches_brute_force(network):
+    points, radius, queries = network
+    radii, distances = compute_nearest(queries, points, radius)
+    ref_d, ref_i = brute_nearest(queries, points)
+    np.testing.assert_allclose(distances, ref_d)
+    np.testing.assert_array_equal(radii, radius[ref_i])
+
+
+def test_interpolated_weights_by_inverse_distance(network):
+    points, radius, queries = network
+    radii, distances = compute_interpolated(queries, points, radius, k=3)
+
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    nearest3 = np.argsort(d, axis=1)[:, :3]
+    w = 1.0 / np.take_along_axis(d, nearest3, axis=1) ** 2
+    np.testing.assert_allclose(radii, (w * radius[nearest3]).sum(axis=1) / w.sum(axis=1))
+    np.testing.assert_allclose(distances, d.min(axis=1))
+
+
+def test_within_falls_back_to_nearest_when_nothing_is_in_range(network):
+    points, radius, _ = network
+    far = np.array([[100.0, 100.0, 100.0]])
+    radii, _ = transfer_radius(far, points, radius, None, mode="within", within=0.1)
+    assert radii[0] == radius[brute_nearest(far, points)[1][0]]
+    with pytest.raises(ValueError):
+        transfer_radius(far, points, radius, None, mode="within")
+
+
+def test_parse_vtk_points_and_radius_reads_network(network_vtk):
+    points, radius = parse_vtk_points_and_radius(network_vtk)
+    assert points.shape == (8, 3)
+    np.testing.assert_allclose(radius[:3], [1.0, 0.9, 0.8])
+
+
+# ---- バッチ処理（被験者IDで CSV と VTK を対応付ける） ----
+
+def test_subject_ids_are_normalized_to_four_digits():
+    assert normalize_subject("BG001") == "BG0001"
+    assert normalize_subject("BG04") == "BG0004"
+    assert normalize_subject("BH0036") == "BH0036"
+    assert subject_of("vtk_set/BG04_ColorCoded.CNG.swc.vtk") == "BG0004"
+    assert subject_of("BG0001_L_MCA-ICA_ascii_resampled120.csv") == "BG0001"
+    assert subject_of("Set8_ColorCoded.vtk") is None
+
+
+def test_pair_files_by_subject_matches_unpadded_network_ids(capsys):
+    csv_paths = ["out/BG0001_L_MCA-ICA_ascii.csv", "out/BG0001_R_MCA-ICA_ascii.csv",
+                 "out/BG0004_L_MCA-ICA_ascii.csv", "out/BH0099_L_MCA-ICA_ascii.csv"]
+    vtk_paths = ["vtk_set/BG001_ColorCoded.vtk", "vtk_set/BG04_ColorCoded.vtk", "vtk_set/Set8_ColorCoded.vtk"]
+    pairs = pair_files_by_subject(csv_paths, vtk_paths)
+    assert pairs == {
+        "BG0001": ("vtk_set/BG001_ColorCoded.vtk", csv_paths[:2]),
+        "BG0004": ("vtk_set/BG04_ColorCoded.vtk", csv_paths[2:3]),
+    }
+    assert "BH0099" in capsys.readouterr().err
+
+
+def test_run_batch_writes_one_table_for_all_subjects(tmp_path, network_vtk):
+    points, radius = parse_vtk_points_and_radius(network_vtk)
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    for side, idx in (("L", [0, 1, 2]), ("R", [4, 7])):
+        pd.DataFrame(points[idx] + 0.01, columns=["x", "y", "z"]).to_csv(
+            csv_dir / f"BG0002_{side}_MCA-ICA_ascii.csv", index=False)
+    out = tmp_path / "radius_transfer.csv"
+
+    n = run_batch(sorted(str(p) for p in csv_dir.glob("*.csv")), [network_vtk], str(out), workers=1, per_file=True)
+
+    assert n == 1
+    table = pd.read_csv(out)
+    assert list(table["side"]) == ["L"] * 3 + ["R"] * 2
+    np.testing.assert_allclose(table["radius"], radius[[0, 1, 2, 4, 7]])
+    np.testing.assert_allclose(table["distance"], np.sqrt(3) * 0.01)
+    per_file = pd.read_csv(csv_dir / "BG0002_R_MCA-ICA_ascii_with_radius_distance.csv")
+    np.testing.assert_allclose(per_file["radius"], radius[[4, 7]])
+
+
+def test_centerlines_far_from_the_network_fail_the_subject(tmp_path, network_vtk, capsys):
+    points, _ = parse_vtk_points_and_radius(network_vtk)
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    # 別の座標系の中心線: どの点も木から 50 以上離れている
+    pd.DataFrame(points + [50.0, 0.0, 0.0], columns=["x", "y", "z"]).to_csv(
+        csv_dir / "BG0002_L_MCA-ICA_ascii.csv", index=False)
+    paths = [str(csv_dir / "BG0002_L_MCA-ICA_ascii.csv")]
+    out = tmp_path / "radius_transfer.csv"
+
+    assert run_batch(paths, [network_vtk], str(out), workers=1) == 0
+    assert "上限 5" in capsys.readouterr().err
+    assert out.read_text() == ""
+    assert run_batch(paths, [network_vtk], str(out), workers=1, max_distance=np.inf) == 1
+
+    check_distance(np.array([0.1, 0.2, 100.0]), 1.0, "x")         # 中央値で判定する
+    with pytest.raises(ValueError, match="中央値"):
+        check_distance(np.array([0.1, 2.0, 100.0]), 1.0, "x")
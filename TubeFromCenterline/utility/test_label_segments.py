@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""label_segments の点ごとのラベルによる区間分けのテスト"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import label_segments
+from label_segments import (
+    joined_ends, label_runs, load_labeled_centerline, segment_names, segment_table, segments_task,
+    split_centerline,
+)
+
+
+def test_runs_split_at_label_changes_and_breaks():
+    labels = np.array([1, 1, 2, 2, 2, 1, 1, 1])
+    starts, ends, run_labels = label_runs(labels)
+    np.testing.assert_array_equal(starts, [0, 2, 5])
+    np.testing.assert_array_equal(ends, [2, 5, 8])
+    np.testing.assert_array_equal(run_labels, [1, 2, 1])
+    assert segment_names(run_labels) == ["lab1", "lab2", "lab1.2"]
+
+    starts, ends, _ = label_runs(labels, breaks=[3, 8])     # 並びの境目でも切る（末尾は無視）
+    np.testing.assert_array_equal(starts, [0, 2, 3, 5])
+    assert len(label_runs(np.zeros(0))[0]) == 0
+
+
+def test_joined_ends_stop_at_sequence_breaks():
+    np.testing.assert_array_equal(joined_ends([0, 2, 5], [2, 5, 8], [5], 8), [3, 5, 8])
+
+
+def test_split_without_labels_is_one_segment():
+    points = np.arange(12.0).reshape(4, 3)
+    [seg] = split_centerline(points, {"radius": np.ones(4)})
+    assert seg["label"] == -1 and (seg["start"], seg["end"]) == (0, 4)
+    assert seg["radius"].shape == (4,)
+    only = split_centerline(points, {"label": np.array([0, 0, 3, 3])}, labels=[3])
+    assert [(s["name"], s["start"]) for s in only] == [("lab3", 2)]
+
+
+def write_seq_ply(path):
+    """点のラベルは無く、vertex_seq（逆順の並びを含む）にラベルがある PLY"""
+    xs = np.arange(6.0)
+    header = ["ply", "format ascii 1.0", "element vertex 6", "property float x", "property float y",
+              "property float z", "element vertex_seq 2", "property int label",
+              "property list int int vertex_indices", "end_header"]
+    rows = [f"{x} 0 0" for x in xs] + ["4 3 2 1 0", "7 3 3 4 5"]
+    path.write_text("\n".join(header + rows) + "\n")
+    return str(path)
+
+
+def test_ply_sequences_give_order_and_labels(tmp_path):
+    path = write_seq_ply(tmp_path / "BG0001_L.ply")
+    points, attrs, breaks = load_labeled_centerline(path)
+    np.testing.assert_array_equal(points[:, 0], [2, 1, 0, 3, 4, 5])
+    np.testing.assert_array_equal(attrs["label"], [4, 4, 4, 7, 7, 7])
+    np.testing.assert_array_equal(breaks, [3])
+
+    rows = segment_table(path, points, attrs, breaks)
+    assert [(r["segment"], r["length"]) for r in rows] == [("lab4", 2.0), ("lab7", 2.0)]
+    assert rows[0]["variant"] == "vmodeler"
+
+
+def test_siphon_vtk_runs_match_the_lab_array(data_dir):
+    vtk = pytest.importorskip("vtk")
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    path = os.path.join(data_dir, "8_Centerline_Siphon(with labal)", "BG0001_L_siphon_lab.vtk")
+    if not os.path.exists(path):
+        pytest.skip("siphon のラベルつき VTK がありません")
+    reader = vtk.vtkPolyDataReader()
+    reader.SetFileName(path)
+    reader.Update()
+    lab = vtk_to_numpy(reader.GetOutput().GetPointData().GetArray("lab"))
+
+    points, attrs, breaks = load_labeled_centerline(path)
+    segments = split_centerline(points, attrs, breaks)
+    assert sum(s["end"] - s["start"] for s in segments) == len(points)
+    assert sorted({s["label"] for s in segments}) == sorted(set(lab.astype(int).tolist()))
+    for s in segments:
+        assert len(set(attrs["label"][s["start"]:s["end"]].tolist())) == 1
+
+
+def test_task_writes_segment_csv_and_joined_meshes(tmp_path):
+    path = write_seq_ply(tmp_path / "BG0001_L.ply")
+    out = tmp_path / "segments"
+    out.mkdir()
+    mesh = {"radius": 0.3, "sides": 6, "capping": False, "format": "stl", "vary_radius": False, "smooth": 0.0}
+    rows, written = segments_task({"path": path, "output_dir": str(out), "csv": True, "mesh": mesh})
+    names = sorted(os.path.basename(p) for p in written)
+    assert names == ["BG0001_L_lab4.csv", "BG0001_L_lab4_radius0.3_nTv6.stl",
+                     "BG0001_L_lab7.csv", "BG0001_L_lab7_radius0.3_nTv6.stl"]
+    df = pd.read_csv(out / "BG0001_L_lab7.csv")
+    assert list(df["x"]) == [3, 4, 5] and set(df["label"]) == {7}
+    # 並びの境目では次の区間に延ばさないので、どちらの管も 3 点 = 2 区間
+    for name in ("BG0001_L_lab4_radius0.3_nTv6.stl", "BG0001_L_lab7_radius0.3_nTv6.stl"):
+        assert os.path.getsize(out / name) == 84 + 50 * 2 * 6 * 2
+
+
+def test_main_skips_result_tables_in_the_input_dir(tmp_path, monkeypatch):
+    write_seq_ply(tmp_path / "BG0001_L.ply")
+    pd.DataFrame({"file_name": ["x"], "length": [1.0]}).to_csv(tmp_path / "label_segments.csv", index=False)
+    table = tmp_path / "out.csv"
+    monkeypatch.setattr(sys, "argv", ["label_segments.py", "-d", str(tmp_path), "--no-csv",
+                                      "--table", str(table), "-j", "1"])
+    label_segments.main()
+    result = pd.read_csv(table)
+    assert list(result["file_name"]) == ["BG0001_L.ply", "BG0001_L.ply"]
+    assert list(result["segment"]) == ["lab4", "lab7"]
+
+
+def test_running_twice_in_place_does_not_split_the_segment_files(tmp_path, monkeypatch):
+    write_seq_ply(tmp_path / "BG0001_L.ply")
+    table = tmp_path / "out.csv"
+    monkeypatch.setattr(sys, "argv", ["label_segments.py", "-d", str(tmp_path), "--table", str(table), "-j", "1"])
+    for _ in range(2):
+        label_segments.main()
+        assert list(pd.read_csv(table)["segment"]) == ["lab4", "lab7"]
+    assert sorted(p.name for p in tmp_path.glob("*_lab*.csv")) == ["BG0001_L_lab4.csv", "BG0001_L_lab7.csv"]
+
+    from centerline_store import is_segment_file
+    assert is_segment_file("BG0001_L_siphon_lab_lab1.csv") and is_segment_file("BG0001_L_lab1.2.csv")
+    assert not is_segment_file("BG0001_L_siphon_lab.vtk")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""length_batch の全長の並列計算と逐次統計のテスト"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from centerline_io import cumulative_length, polyline_length
+from length_batch import LengthStats, list_csv_files, stream_lengths
+
+
+def write_polyline(path, points):
+    pd.DataFrame(points, columns=["x", "y", "z"]).to_csv(path, index=False)
+
+
+def test_polyline_length_of_known_shapes():
+    assert polyline_length([[0, 0, 0], [3, 4, 0], [3, 4, 12]]) == pytest.approx(17.0)
+    np.testing.assert_allclose(cumulative_length([[0, 0, 0], [3, 4, 0], [3, 4, 12]]), [0, 5, 17])
+    assert polyline_length([[1, 2, 3]]) == 0.0
+
+
+def test_length_stats_match_numpy():
+    values = np.random.default_rng(2).uniform(10, 90, size=101)
+    stats = LengthStats()
+    for v in values:
+        stats.add(float(v))
+    assert stats.count == 101
+    assert stats.min == values.min() and stats.max == values.max()
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.median() == pytest.approx(np.median(values))
+    assert math.isnan(LengthStats().median())
+
+
+def test_stream_lengths_writes_every_file_and_skips_broken_ones(tmp_path, capsys):
+    t = np.linspace(0, np.pi, 200)
+    write_polyline(tmp_path / "BG0001_L_MCA-ICA_ascii.csv", np.column_stack([10 * np.cos(t), 10 * np.sin(t), 0 * t]))
+    write_polyline(tmp_path / "BG0001_R_MCA-ICA_ascii.csv", [[0, 0, 0], [0, 0, 7]])
+    (tmp_path / "BG0002_L_broken.csv").write_text("a,b\n1,2\n")
+    # 同じディレクトリの結果表（x, y, z の列があっても）は中心線として数えない
+    write_polyline(tmp_path / "radius_transfer.csv", [[0, 0, 0], [0, 0, 100]])
+    (tmp_path / "centerline_lengths_stats.csv").write_text("variant,group_by\n")
+    output = tmp_path / "centerline_lengths.csv"
+    output.write_text("stale\n")
+
+    files = list_csv_files(str(tmp_path), str(output))
+    assert [os.path.basename(f) for f in files] == [
+        "BG0001_L_MCA-ICA_ascii.csv", "BG0001_R_MCA-ICA_ascii.csv", "BG0002_L_broken.csv"]
+    stats = stream_lengths(files, str(output), workers=1)
+
+    table = pd.read_csv(output).set_index("filename")["total_length"]
+    assert table["BG0001_R_MCA-ICA_ascii.csv"] == pytest.approx(7.0)
+    assert table["BG0001_L_MCA-ICA_ascii.csv"] == pytest.approx(10 * np.pi, rel=1e-4)
+    assert "BG0002_L_broken.csv" not in table.index
+    assert stats.count == 2
+    assert "BG0002_L_broken.csv" in capsys.readouterr().err
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""mapped_io のチャンク単位の ASCII 読み込みと、メモリマップ上のビューのテスト"""
+
+import numpy as np
+import pytest
+
+import mapped_io
+from mapped_io import find_line_end, open_mapped, parse_ascii_block
+from vtk_legacy_reader import VtkLegacyFile
+
+
+@pytest.fixture
+def table_file(tmp_path):
+    rng = np.random.default_rng(1)
+    table = rng.normal(size=(500, 4)) * 1e3
+    path = tmp_path / "table.txt"
+    body = "\n".join(" ".join(f"{v:.12g}" for v in row) for row in table)
+    path.write_text("header line\n" + body + "\n")
+    return path, table
+
+
+@pytest.mark.parametrize("chunk", [mapped_io.ASCII_CHUNK_BYTES, 64, 7])
+def test_parse_ascii_block_matches_loadtxt_across_chunk_boundaries(table_file, monkeypatch, chunk):
+    monkeypatch.setattr(mapped_io, "ASCII_CHUNK_BYTES", chunk)
+    path, table = table_file
+    buf = open_mapped(str(path))
+    try:
+        start = find_line_end(buf, 0, 1)
+        out = parse_ascii_block(buf, start, len(buf), len(table), n_cols=4, columns=[0, 2])
+    finally:
+        buf.close()
+    np.testing.assert_array_equal(out, np.loadtxt(path, skiprows=1)[:, [0, 2]])
+
+
+def test_find_line_end_counts_lines_without_trailing_newline(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"a\nbb\nccc")
+    buf = open_mapped(str(path))
+    try:
+        assert find_line_end(buf, 0, 2) == 5
+        assert find_line_end(buf, 0, 3) == len(buf)
+        with pytest.raises(ValueError):
+            find_line_end(buf, 0, 4)
+    finally:
+        buf.close()
+
+
+def test_binary_vtk_arrays_are_views_until_copied(tmp_path):
+    vtk = pytest.importorskip("vtk")
+    points = vtk.vtkPoints()
+    points.SetDataTypeToDouble()
+    for i in range(10):
+        points.InsertNextPoint(i, 2 * i, 3 * i)
+    poly = vtk.vtkPolyData()
+    poly.SetPoints(points)
+    path = str(tmp_path / "points.vtk")
+    writer = vtk.vtkPolyDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(poly)
+    writer.SetFileTypeToBinary()
+    writer.Write()
+
+    with VtkLegacyFile(path) as vf:
+        view = vf.points()
+        copy = vf.points(copy=True)
+        assert not view.flags.owndata and not view.flags.writeable
+        assert copy.flags.writeable and not np.shares_memory(copy, view)
+        np.testing.assert_array_equal(view, copy)
+        del view
+    np.testing.assert_array_equal(copy[:, 1], 2 * np.arange(10))
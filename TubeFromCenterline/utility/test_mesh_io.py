@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""mesh_io の STL / PLY の書き出し（一括・少しずつ）のテスト"""
+
+import numpy as np
+import pytest
+
+from mesh_io import MESH_FORMATS, MeshWriter, open_mesh_writer, write_mesh
+from ply_reader import PlyFile
+from tube_mesh import tube_mesh
+
+
+@pytest.fixture
+def parts():
+    """少しずつ書き出す部品（管2本）"""
+    t = np.linspace(0, 1, 6)[:, None]
+    a = tube_mesh(t * [10.0, 0, 0], 0.5, 8, capping=True)
+    b = tube_mesh([0, 3.0, 0] + t * [0, 0, 5.0], 0.25, 6)
+    return [a, b]
+
+
+def merged(parts):
+    shift = np.cumsum([0] + [len(v) for v, _ in parts[:-1]])
+    return np.concatenate([v for v, _ in parts]), np.concatenate([f + s for (_, f), s in zip(parts, shift)])
+
+
+# バイナリ STL の1三角形分（50 バイト）
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")])
+
+
+def read_binary_stl(path):
+    with open(path, "rb") as f:
+        header = f.read(80)
+        n = int(np.frombuffer(f.read(4), "<u4")[0])
+        records = np.fromfile(f, dtype=STL_RECORD)
+    assert not header.lower().startswith(b"solid")
+    assert n == len(records)
+    return records
+
+
+def test_streamed_stl_equals_one_shot_stl(tmp_path, parts):
+    vertices, faces = merged(parts)
+    write_mesh(str(tmp_path / "once.stl"), vertices, faces)
+    with open_mesh_writer(str(tmp_path / "streamed.stl")) as w:
+        for v, f in parts:
+            w.add(v, f)
+        w.add(np.zeros((0, 3)), np.zeros((0, 3), dtype=int))
+    assert w.n_faces == len(faces)
+    assert (tmp_path / "once.stl").read_bytes() == (tmp_path / "streamed.stl").read_bytes()
+
+    records = read_binary_stl(tmp_path / "once.stl")
+    np.testing.assert_allclose(records["vertices"], vertices[faces], rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(records["normal"], axis=1), 1.0, rtol=1e-6)
+
+
+def test_ply_round_trip_through_ply_reader(tmp_path, parts):
+    vertices, faces = merged(parts)
+    with open_mesh_writer(str(tmp_path / "mesh.ply")) as w:
+        for v, f in parts:
+            w.add(v, f)
+    with PlyFile(str(tmp_path / "mesh.ply")) as ply:
+        assert ply.count("vertex") == len(vertices) and ply.count("face") == len(faces)
+        v = ply.element("vertex")
+        offsets, indices = ply.list_property("face", "vertex_indices")
+    np.testing.assert_allclose(np.column_stack([v["x"], v["y"], v["z"]]), vertices, rtol=1e-6)
+    np.testing.assert_array_equal(np.diff(offsets), 3)
+    np.testing.assert_array_equal(indices.reshape(-1, 3), faces)
+
+
+@pytest.mark.parametrize("fmt", MESH_FORMATS)
+def test_vtk_reads_every_format(tmp_path, parts, fmt):
+    vtk = pytest.importorskip("vtk")
+    vertices, faces = merged(parts)
+    path = str(tmp_path / ("mesh.ply" if fmt == "ply" else "mesh.stl"))
+    write_mesh(path, vertices, faces, fmt)
+    reader = vtk.vtkPLYReader() if fmt == "ply" else vtk.vtkSTLReader()
+    reader.SetFileName(path)
+    reader.Update()
+    assert reader.GetOutput().GetNumberOfPolys() == len(faces)
+
+
+def test_mesh_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        MeshWriter(str(tmp_path / "x.stl"))
+    with pytest.raises(ValueError):
+        open_mesh_writer(str(tmp_path / "x.obj"), "obj")
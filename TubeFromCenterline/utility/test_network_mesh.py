@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""network_mesh の木全体の管メッシュ（分岐点の球・出力単位の分け方）のテスト"""
+
+import os
+
+import numpy as np
+import pytest
+
+import network_mesh
+from network_mesh import (
+    file_domains, file_segment_count, group_segments, junction_points, load_network, mesh_network_task,
+    sphere_template,
+)
+
+
+def base_task(path, split, output_dir, **extra):
+    return dict({
+        "path": path, "split": split, "radius": 0.3, "sides": 8, "vary_radius": False, "smooth": 0.0,
+        "max_slope": None, "joints": True, "output_dir": str(output_dir), "format": "stl",
+    }, **extra)
+
+
+def test_sphere_template_is_a_closed_unit_sphere():
+    verts, faces = sphere_template(12)
+    np.testing.assert_allclose(np.linalg.norm(verts, axis=1), 1.0)
+    edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    assert np.all(counts == 2)
+
+
+def test_junctions_are_points_shared_by_branches(network_vtk):
+    net = load_network(network_vtk)
+    np.testing.assert_array_equal(junction_points(net["offsets"], net["connectivity"]), [2, 4])
+    np.testing.assert_array_equal(junction_points(net["offsets"], net["connectivity"], [0, 2]), [2])
+
+
+def test_group_segments_by_tree_domain_and_segment(network_vtk):
+    net = load_network(network_vtk)
+    assert [(name, list(s)) for name, s in group_segments(net, "tree")] == [("", [0, 1, 2, 3])]
+    assert [(name, list(s)) for name, s in group_segments(net, "domain")] == [
+        ("_domain1", [0, 1, 3]), ("_domain2", [2])]
+    assert [name for name, _ in group_segments(net, "segment", segments=(1, 3))] == ["_segment11", "_segment12"]
+    assert file_domains(network_vtk) == [1, 2]
+    assert file_segment_count(network_vtk) == 4
+    with pytest.raises(ValueError):
+        group_segments(net, "leaf")
+
+
+def test_segment_chunks_cover_the_tree_once(network_vtk, tmp_path, monkeypatch):
+    monkeypatch.setattr(network_mesh, "SEGMENTS_PER_TASK", 3)
+    monkeypatch.setattr(network_mesh, "_prepared", {})
+    (tmp_path / "whole").mkdir()
+    (tmp_path / "chunks").mkdir()
+    whole = mesh_network_task(base_task(network_vtk, "segment", tmp_path / "whole"))
+    chunks = []
+    for start in range(0, file_segment_count(network_vtk), network_mesh.SEGMENTS_PER_TASK):
+        chunks += mesh_network_task(base_task(network_vtk, "segment", tmp_path / "chunks",
+                                              segments=(start, start + network_mesh.SEGMENTS_PER_TASK)))
+    assert sorted(os.path.basename(p) for p, _ in chunks) == sorted(os.path.basename(p) for p, _ in whole)
+    assert sorted(n for _, n in chunks) == sorted(n for _, n in whole)
+    assert len(whole) == 4
+
+
+def test_tree_mesh_counts_tubes_and_joint_spheres(network_vtk, tmp_path):
+    [(path, n_faces)] = mesh_network_task(base_task(network_vtk, "tree", tmp_path))
+    tubes = 2 * 8 * (2 + 2 + 2 + 1)                  # 枝ごとに (点数 - 1) 区間
+    sphere = len(sphere_template(8)[1])
+    assert n_faces == tubes + 2 * sphere              # 分岐点は 2 と 4
+    assert os.path.getsize(path) == 84 + 50 * n_faces
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""path_extraction の木の上の最短路による経路の切り出しのテスト"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import write_network_vtk
+from path_extraction import (
+    _dijkstra_heap, distances_from, extract_path, path_task, plan_tasks, read_seeds, trace_path,
+)
+from vessel_graph import VesselNetwork
+
+SQRT2 = np.sqrt(2.0)
+
+
+@pytest.fixture
+def tree(network_vtk):
+    return VesselNetwork.from_file(network_vtk)
+
+
+def test_scipy_and_heap_dijkstra_agree(tree):
+    dist, pred = distances_from(tree, 0)
+    heap_dist, heap_pred = _dijkstra_heap(tree, 0)
+    np.testing.assert_allclose(dist, heap_dist)
+    np.testing.assert_array_equal(pred, heap_pred)
+    np.testing.assert_allclose(dist, [0, 1, 2, 2 + SQRT2, 2 + 2 * SQRT2, 2 + SQRT2, 2 + 2 * SQRT2, 2 + 3 * SQRT2])
+    assert pred[0] == -1
+
+
+def test_dijkstra_agrees_on_vtk_set_trees(data_dir):
+    paths = sorted(glob.glob(os.path.join(data_dir, "vtk_set", "*.vtk")))[:2]
+    if not paths:
+        pytest.skip("vtk_set がありません")
+    for path in paths:
+        net = VesselNetwork.from_file(path)
+        source = int(net.segment_points(net.roots()[0])[0])
+        dist, pred = distances_from(net, source)
+        heap_dist, _ = _dijkstra_heap(net, source)
+        np.testing.assert_allclose(dist, heap_dist, rtol=1e-12)
+        # 前の点の表をたどった経路の長さが距離と一致する
+        target = int(np.argmax(np.where(np.isfinite(dist), dist, -1)))
+        ids = trace_path(pred, source, target)
+        assert np.linalg.norm(np.diff(net.points[ids], axis=0), axis=1).sum() == pytest.approx(dist[target])
+
+
+def test_path_between_coordinates_reports_snap_distances(tree):
+    result = extract_path(tree, start=[0, 0.3, 0], end=[5, 3, 0.4], max_snap=1.0)
+    np.testing.assert_array_equal(result["ids"], [0, 1, 2, 3, 4, 7])
+    assert result["length"] == pytest.approx(2 + 3 * SQRT2)
+    assert result["start_snap"] == pytest.approx(0.3) and result["end_snap"] == pytest.approx(0.4)
+    np.testing.assert_allclose(result["radius"], [1.0, 0.9, 0.8, 0.6, 0.5, 0.4])
+
+    with pytest.raises(ValueError, match="離れています"):
+        extract_path(tree, start=[0, 0, 0], end=[50, 3, 0], max_snap=1.0)
+    # 上限を付けなければ木の最も近い点に寄せる
+    far = extract_path(tree, start=[0, 0, 0], end=[50, 3, 0])
+    assert far["end_point"] == 7 and far["end_snap"] == pytest.approx(45.0)
+
+
+def test_domain_start_and_end_points(tree):
+    distal = extract_path(tree, start_domain=1, end_domain=2)
+    np.testing.assert_array_equal(distal["ids"], [0, 1, 2, 5, 6])
+    assert np.isnan(distal["start_snap"]) and np.isnan(distal["end_snap"])
+    proximal = extract_path(tree, start_domain=1, end_domain=2, end_mode="proximal")
+    assert proximal["end_point"] == 2
+    with pytest.raises(ValueError):
+        extract_path(tree, start_domain=9, end_domain=2)
+    with pytest.raises(ValueError):
+        extract_path(tree, start_domain=1)
+
+
+def test_disconnected_points_are_an_error(tmp_path):
+    path = write_network_vtk(tmp_path / "BG0003_tree.vtk", [[0, 0, 0], [1, 0, 0], [5, 0, 0], [6, 0, 0]],
+                             [[0, 1], [2, 3]])
+    net = VesselNetwork.from_file(path)
+    with pytest.raises(ValueError, match="つながっていません"):
+        extract_path(net, start=[0, 0, 0], end=[6, 0, 0])
+    with pytest.raises(ValueError):
+        trace_path(np.array([-1, 0, -1, 2]), 0, 3)
+
+
+def test_seeds_plan_and_task(network_vtk, tmp_path, capsys):
+    seeds_csv = tmp_path / "seeds.csv"
+    pd.DataFrame([
+        {"subject": "*", "side": "L", "start_domain": 1, "end_domain": 2},
+        {"subject": "BG2", "side": "L", "start_x": 0, "start_y": 0, "start_z": 0, "end_x": 5, "end_y": 3, "end_z": 0},
+        {"subject": "BG0002", "side": "R", "start_x": 0, "start_y": 0, "start_z": 0,
+         "end_x": 40, "end_y": 3, "end_z": 0},
+        {"subject": "BG0009", "side": "L", "start_domain": 1, "end_domain": 2},
+    ]).to_csv(seeds_csv, index=False)
+    seeds = read_seeds(str(seeds_csv))
+    assert [s["subject"] for s in seeds] == ["*", "BG0002", "BG0002", "BG0009"]
+
+    [task] = plan_tasks(seeds, [network_vtk], str(tmp_path), "ICA-MCA", "distal", max_snap=5.0)
+    assert "BG0009 の木がありません" in capsys.readouterr().err
+    assert task["paths"]["L"]["end"] is not None          # 個別の行を優先する
+
+    rows = path_task(task)
+    assert "R" in capsys.readouterr().err                 # 上限を超えた右は飛ばす
+    [row] = rows
+    assert row["side"] == "L" and row["end_point"] == 7 and row["start_snap"] == 0
+    df = pd.read_csv(tmp_path / "BG0002_L_ICA-MCA.csv")
+    assert list(df.columns) == ["x", "y", "z", "radius"] and len(df) == 6
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""pipeline のジョブの DAG・マニフェストによる作り直しの判定・失敗の伝わり方のテスト"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import write_network_vtk
+from pipeline import MANIFEST_NAME, Manifest, collect_inputs, plan_jobs, run_jobs
+
+CONFIG = {"count": 20, "sides": 6, "format": "stl"}
+
+
+def centerline(shift=0.0):
+    t = np.linspace(0, 1, 15)
+    return np.column_stack([4 * t, 2 * t ** 2 + shift, np.zeros_like(t)])
+
+
+@pytest.fixture
+def cohort(tmp_path, network_vtk):
+    """中心線 CSV 2本（BG0002 は木あり、BG0009 は木なし）と VTK 1本、木のディレクトリ"""
+    src = tmp_path / "centerlines"
+    src.mkdir()
+    for name, shift in (("BG0002_L_MCA-ICA_ascii.csv", 0.0), ("BG0009_L_MCA-ICA_ascii.csv", 1.0)):
+        pd.DataFrame(centerline(shift), columns=["x", "y", "z"]).to_csv(src / name, index=False)
+    write_network_vtk(src / "BG0002_R_MCA-ICA.vtk", centerline(-1.0), [list(range(15))])
+    networks = tmp_path / "networks"
+    networks.mkdir()
+    os.replace(network_vtk, networks / "BG0002_tree.vtk")
+    return {"src": src, "networks": str(networks), "out": str(tmp_path / "out")}
+
+
+def run(cohort, stages=("points", "resample", "metrics", "mesh", "stats"), config=None, **kwargs):
+    inputs = collect_inputs([str(cohort["src"])])
+    jobs = plan_jobs(inputs, cohort["out"], stages, dict(CONFIG, **(config or {})))
+    os.makedirs(cohort["out"], exist_ok=True)
+    manifest = Manifest(os.path.join(cohort["out"], MANIFEST_NAME))
+    return jobs, run_jobs(jobs, manifest, workers=1, **kwargs)
+
+
+def test_plan_is_a_dag_in_stage_order(cohort):
+    inputs = collect_inputs([str(cohort["src"])])
+    assert [os.path.basename(p) for p in inputs] == [
+        "BG0002_R_MCA-ICA.vtk", "BG0002_L_MCA-ICA_ascii.csv", "BG0009_L_MCA-ICA_ascii.csv"]
+    jobs = plan_jobs(inputs, cohort["out"], config=dict(CONFIG, networks=cohort["networks"]))
+    ids = [j["id"] for j in jobs]
+    assert ids[:5] == ["points:BG0002_R_MCA-ICA.vtk", "resample:BG0002_R_MCA-ICA.vtk",
+                       "radius:BG0002_R_MCA-ICA.vtk", "metrics:BG0002_R_MCA-ICA.vtk", "mesh:BG0002_R_MCA-ICA.vtk"]
+    for k, job in enumerate(jobs):
+        assert all(ids.index(d) < k for d in job["deps"])
+    by_id = {j["id"]: j for j in jobs}
+    assert by_id["radius:BG0002_L_MCA-ICA_ascii.csv"]["inputs"][1].endswith("BG0002_tree.vtk")
+    assert by_id["mesh:BG0002_L_MCA-ICA_ascii.csv"]["params"]["vary_radius"]
+    assert "error" in by_id["radius:BG0009_L_MCA-ICA_ascii.csv"]
+    assert len(by_id["stats:cohort"]["deps"]) == 3 and by_id["stats:cohort"]["partial"]
+
+
+def test_second_run_skips_unchanged_jobs(cohort, capsys):
+    jobs, counts = run(cohort)
+    assert counts["points"] == {"built": 1, "skipped": 0, "failed": 0}
+    assert counts["metrics"]["built"] == 3 and counts["stats"]["built"] == 1
+    table = pd.read_csv(os.path.join(cohort["out"], "centerline_metrics.csv"))
+    assert len(table) == 3
+    assert os.path.exists(os.path.join(cohort["out"], "cohort_stats.json"))
+
+    _, counts = run(cohort)
+    assert all(c["built"] == 0 and c["failed"] == 0 for c in counts.values())
+    assert sum(c["skipped"] for c in counts.values()) == len(jobs)
+
+    # mtime だけが変わって中身が同じなら作り直さない
+    src = cohort["src"] / "BG0002_L_MCA-ICA_ascii.csv"
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    _, counts = run(cohort)
+    assert all(c["built"] == 0 for c in counts.values())
+
+
+def test_changed_input_or_params_rebuild_only_what_depends_on_them(cohort, capsys):
+    run(cohort)
+    pd.DataFrame(centerline(0.5), columns=["x", "y", "z"]).to_csv(
+        cohort["src"] / "BG0002_L_MCA-ICA_ascii.csv", index=False)
+    _, counts = run(cohort)
+    assert counts["resample"] == {"built": 1, "skipped": 2, "failed": 0}
+    assert counts["metrics"] == {"built": 1, "skipped": 2, "failed": 0}
+    assert counts["mesh"]["built"] == 1 and counts["stats"]["built"] == 1
+
+    _, counts = run(cohort, config={"sides": 8})
+    assert counts["mesh"]["built"] == 3 and counts["metrics"]["built"] == 0
+
+    _, counts = run(cohort, force=("metrics",))
+    assert counts["metrics"]["built"] == 3 and counts["resample"]["built"] == 0
+
+    # 出力を消したジョブは作り直す
+    os.remove(os.path.join(cohort["out"], "metrics", "BG0009_L_MCA-ICA_ascii.csv"))
+    _, counts = run(cohort, dry_run=True)
+    assert counts["metrics"]["built"] == 1
+    assert "出力が無いか" in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(cohort["out"], "metrics", "BG0009_L_MCA-ICA_ascii.csv"))
+
+
+def test_unmatched_network_fails_the_radius_job(cohort, capsys):
+    stages = ("points", "resample", "radius", "metrics", "mesh", "stats")
+    _, counts = run(cohort, stages, {"networks": cohort["networks"]})
+    assert counts["radius"] == {"built": 2, "skipped": 0, "failed": 1}
+    assert counts["metrics"] == {"built": 2, "skipped": 0, "failed": 1}
+    assert counts["mesh"]["failed"] == 1
+    err = capsys.readouterr().err
+    assert "radius:BG0009_L_MCA-ICA_ascii.csv" in err and "木が" in err
+
+    # 一定の半径に切り替えず、残りの中心線だけで統計を出す
+    assert counts["stats"]["built"] == 1
+    table = pd.read_csv(os.path.join(cohort["out"], "centerline_metrics.csv"))
+    assert sorted(table["subject"]) == ["BG0002", "BG0002"]
+    assert not any(f.startswith("BG0009") for f in os.listdir(os.path.join(cohort["out"], "stl")))
+    radius = pd.read_csv(os.path.join(cohort["out"], "radius", "BG0002_L_MCA-ICA_ascii_resampled20.csv"))
+    assert {"radius", "distance"} <= set(radius.columns)
+
+
+def test_networks_in_another_frame_fail_the_radius_job(cohort, capsys):
+    # 木だけを 100 ずらす（座標系の違う木）。どの点にも同じ端点の半径が付くので、書き出さずに失敗にする
+    write_network_vtk(os.path.join(cohort["networks"], "BG0002_tree.vtk"), centerline() + 100.0,
+                      [list(range(15))], radius=np.linspace(1.0, 0.3, 15))
+    stages = ("points", "resample", "radius", "mesh")
+    _, counts = run(cohort, stages, {"networks": cohort["networks"]})
+    assert counts["radius"] == {"built": 0, "skipped": 0, "failed": 3}
+    assert counts["mesh"]["failed"] == 3
+    assert "中央値" in capsys.readouterr().err
+    assert not os.path.exists(os.path.join(cohort["out"], "stl"))
+    assert not os.listdir(os.path.join(cohort["out"], "radius"))
+
+    _, counts = run(cohort, stages, {"networks": cohort["networks"], "max_distance": np.inf})
+    assert counts["radius"]["built"] == 2 and counts["mesh"]["built"] == 2
+
+
+def test_old_manifest_versions_are_ignored(tmp_path):
+    path = tmp_path / MANIFEST_NAME
+    path.write_text('{"version": 0, "entries": {"x": {}}}')
+    assert Manifest(str(path)).entries == {}
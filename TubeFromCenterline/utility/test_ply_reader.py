@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""ply_reader の ASCII / バイナリ PLY の読み込みのテスト"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from ply_reader import PlyFile, read_ply_vertex_data
+
+
+RNG = np.random.default_rng(14)
+VERTEX = {
+    "x": RNG.normal(size=7).astype("f4"),
+    "y": RNG.normal(size=7).astype("f4"),
+    "z": RNG.normal(size=7).astype("f4"),
+    "label": np.arange(7, dtype="i4"),
+    "curvature": RNG.uniform(size=7).astype("f4"),
+}
+EDGES = np.array([[0, 1], [1, 2], [-1, -1], [3, 4], [4, 5], [5, 6]], dtype="i4")
+SEQUENCES = [[0, 1, 2], [3, 4, 5, 6]]
+
+
+def write_ply(path, fmt):
+    """vertex / edge / vertex_seq を持つ中心線 PLY を手で書く"""
+    header = [
+        "ply", f"format {fmt} 1.0", "comment test",
+        "element vertex 7",
+        "property float x", "property float y", "property float z",
+        "property int label", "property float curvature",
+        f"element edge {len(EDGES)}", "property int vertex1", "property int vertex2",
+        f"element vertex_seq {len(SEQUENCES)}", "property int label", "property list uchar int vertex_indices",
+        "end_header",
+    ]
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        if fmt == "ascii":
+            for i in range(7):
+                f.write(" ".join(repr(VERTEX[c][i].item()) for c in VERTEX).encode() + b"\n")
+            for a, b in EDGES:
+                f.write(f"{a} {b}\n".encode())
+            for i, seq in enumerate(SEQUENCES):
+                f.write(f"{i} {len(seq)} {' '.join(map(str, seq))}\n".encode())
+            return
+        bo = "<" if fmt == "binary_little_endian" else ">"
+        vertex = np.zeros(7, dtype=[(c, bo + VERTEX[c].dtype.str[1:]) for c in VERTEX])
+        for c in VERTEX:
+            vertex[c] = VERTEX[c]
+        f.write(vertex.tobytes())
+        f.write(EDGES.astype(bo + "i4").tobytes())
+        for i, seq in enumerate(SEQUENCES):
+            f.write(np.array([i], bo + "i4").tobytes() + bytes([len(seq)]) + np.array(seq, bo + "i4").tobytes())
+
+
+@pytest.fixture(params=["ascii", "binary_little_endian", "binary_big_endian"])
+def ply_path(request, tmp_path):
+    path = str(tmp_path / f"BG0001_L_{request.param}.ply")
+    write_ply(path, request.param)
+    return path
+
+
+def test_header_and_columns(ply_path):
+    with PlyFile(ply_path) as ply:
+        assert ply.element_names() == ["vertex", "edge", "vertex_seq"]
+        assert ply.count("vertex") == 7 and ply.count("edge") == len(EDGES)
+        assert ply.properties("vertex") == list(VERTEX)
+        v = ply.element("vertex", ("z", "label"))
+        assert set(v) == {"z", "label"}
+        np.testing.assert_array_equal(v["z"], VERTEX["z"])
+        assert v["z"].dtype == np.float64 and v["label"].dtype == np.int64
+        np.testing.assert_array_equal(v["label"], VERTEX["label"])
+        with pytest.raises(ValueError):
+            ply.element("vertex", ("radius",))
+
+
+def test_edges_drop_separator_rows(ply_path):
+    with PlyFile(ply_path) as ply:
+        np.testing.assert_array_equal(ply.edges(), EDGES[EDGES[:, 0] >= 0])
+
+
+def test_list_property_returns_offsets_and_values(ply_path):
+    with PlyFile(ply_path) as ply:
+        offsets, indices = ply.vertex_sequences()
+        labels = ply.element("vertex_seq", ("label",))["label"]
+    np.testing.assert_array_equal(offsets, [0, 3, 7])
+    np.testing.assert_array_equal(indices, np.concatenate(SEQUENCES))
+    np.testing.assert_array_equal(labels, [0, 1])
+
+
+def test_read_ply_vertex_data_keeps_the_column_order(ply_path):
+    x, curvature = read_ply_vertex_data(ply_path, ("x", "curvature"))
+    np.testing.assert_array_equal(x, VERTEX["x"])
+    np.testing.assert_array_equal(curvature, VERTEX["curvature"])
+
+
+def test_v_modeler_files_match_vtk(data_dir):
+    vtk = pytest.importorskip("vtk")
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    paths = sorted(glob.glob(os.path.join(data_dir, "6_Centerline(V-modeler)", "*.ply")))[:3]
+    if not paths:
+        pytest.skip("V-modeler の PLY がありません")
+    for path in paths:
+        reader = vtk.vtkPLYReader()
+        reader.SetFileName(path)
+        reader.Update()
+        expected = vtk_to_numpy(reader.GetOutput().GetPoints().GetData())
+        with PlyFile(path) as ply:
+            v = ply.element("vertex", ("x", "y", "z"))
+            edges = ply.edges()
+        np.testing.assert_allclose(np.column_stack([v["x"], v["y"], v["z"]]), expected, rtol=1e-6)
+        assert edges.min() >= 0 and edges.max() < len(expected)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""render_curvature の画面なしでの曲率グラフの書き出しのテスト"""
+
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from render_curvature import draw_profiles, load_profiles, render_profiles, render_uvcs, select_directory
+
+
+def write_centerline_ply(path, points, curvature):
+    header = [
+        "ply", "format ascii 1.0", f"element vertex {len(points)}",
+        "property float x", "property float y", "property float z", "property float curvature",
+        "end_header",
+    ]
+    rows = [" ".join(f"{v:.6f}" for v in (*p, k)) for p, k in zip(points, curvature)]
+    path.write_text("\n".join(header + rows) + "\n")
+
+
+@pytest.fixture
+def uvcs_dir(tmp_path):
+    """uvcs/u/ply に3本、uvcs/s/ply に1本の中心線 PLY を置く"""
+    t = np.linspace(0, 1, 30)
+    for shape, names in (("u", ["BG0001_L.ply", "BG0002_R.ply", "BG0003_L.ply"]), ("s", ["BG0004_R.ply"])):
+        (tmp_path / "uvcs" / shape / "ply").mkdir(parents=True)
+        for i, name in enumerate(names):
+            points = np.column_stack([t * (10 + i), np.zeros_like(t), np.zeros_like(t)])
+            write_centerline_ply(tmp_path / "uvcs" / shape / "ply" / name, points, np.sin(np.pi * t) * (i + 1))
+    return tmp_path / "uvcs"
+
+
+def test_profiles_are_cumulative_length_and_curvature(uvcs_dir):
+    profiles = load_profiles([str(p) for p in (uvcs_dir / "u" / "ply").iterdir()], workers=1)
+    assert [name for name, _, _ in profiles] == ["BG0001_L.ply", "BG0002_R.ply", "BG0003_L.ply"]
+    name, s, k = profiles[2]
+    assert s[0] == 0 and s[-1] == pytest.approx(12.0, rel=1e-5)
+    np.testing.assert_allclose(k, 3 * np.sin(np.pi * np.linspace(0, 1, 30)), atol=1e-6)
+
+
+def test_legend_lists_the_highest_curvature_first(uvcs_dir):
+    from matplotlib.figure import Figure
+
+    profiles = load_profiles([str(p) for p in (uvcs_dir / "u" / "ply").iterdir()], workers=1)
+    ax = Figure().add_subplot()
+    max_length = draw_profiles(ax, profiles, top=2)
+    assert max_length == pytest.approx(12.0, rel=1e-5)
+    assert ax.get_xlim() == pytest.approx((0, max_length))
+    assert [t.get_text() for t in ax.get_legend().get_texts()] == ["BG0003_L.ply", "BG0002_R.ply"]
+    assert len(ax.collections[0].get_segments()) == 3
+
+
+def test_render_writes_png_and_svg_without_a_display(uvcs_dir, tmp_path):
+    profiles = load_profiles([str(p) for p in (uvcs_dir / "u" / "ply").iterdir()], workers=1)
+    png, svg = tmp_path / "curvature.png", tmp_path / "curvature.svg"
+    render_profiles(profiles, [str(png), str(svg)], ylim=(0, 4))
+    assert png.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+    assert b"<svg" in svg.read_bytes()[:1000]
+
+    written = render_uvcs(str(uvcs_dir), workers=1)
+    assert sorted(written) == sorted(str(uvcs_dir / shape / "curvature.png") for shape in ("s", "u"))
+
+
+def test_select_directory_rejects_a_path_that_is_not_a_directory(tmp_path, monkeypatch, capsys):
+    assert select_directory("title", str(tmp_path)) == str(tmp_path)
+    with pytest.raises(SystemExit, match="ディレクトリが見つかりません"):
+        select_directory("title", str(tmp_path / "typo"))
+
+    # make_graph_curvature*.py も、打ち間違いなら選択ダイアログに進まずに終了する
+    import make_graph_curvature3
+
+    monkeypatch.setattr(sys, "argv", ["make_graph_curvature3.py", str(tmp_path / "typo")])
+    monkeypatch.setitem(sys.modules, "tkinter", None)
+    with pytest.raises(SystemExit, match="使い方"):
+        make_graph_curvature3.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""resample_centerline の弧長に沿った再サンプリングのテスト"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import resample_centerline
+
+from centerline_io import cumulative_length, segment_lengths
+from resample_centerline import (
+    discrete_curvature, interpolate_table, output_path_for, resample_arrays, resample_dataframe,
+)
+
+
+@pytest.fixture
+def arc():
+    """半径 5 の半円（点の間隔は不ぞろい）"""
+    t = np.sort(np.random.default_rng(6).uniform(0, np.pi, 80))
+    t = np.concatenate([[0.0], t, [np.pi]])
+    return np.column_stack([5 * np.cos(t), 5 * np.sin(t), np.zeros_like(t)])
+
+
+def test_count_gives_equal_spacing_and_keeps_end_points(arc):
+    points, _ = resample_arrays(arc, count=120)
+    assert len(points) == 120
+    np.testing.assert_array_equal(points[[0, -1]], arc[[0, -1]])
+    seg = segment_lengths(points)
+    assert seg.std() / seg.mean() < 1e-3
+    assert cumulative_length(points)[-1] == pytest.approx(cumulative_length(arc)[-1], rel=1e-3)
+
+
+def test_spacing_rounds_to_the_nearest_even_step(arc):
+    total = cumulative_length(arc)[-1]
+    points, _ = resample_arrays(arc, spacing=0.25)
+    assert len(points) == int(np.ceil(total / 0.25)) + 1
+    assert segment_lengths(points).max() <= 0.25 + 1e-9
+
+
+def test_adaptive_is_denser_where_curvature_is_high():
+    # 直線 → 半径 1 の 90 度の曲がり → 直線
+    t = np.linspace(0, np.pi / 2, 50)
+    bend = np.column_stack([10 + np.sin(t), 1 - np.cos(t), np.zeros_like(t)])
+    line_in = np.column_stack([np.linspace(0, 10, 50, endpoint=False), np.zeros(50), np.zeros(50)])
+    line_out = np.column_stack([np.full(50, 11.0), np.linspace(1, 11, 51)[1:], np.zeros(50)])
+    points, _ = resample_arrays(np.concatenate([line_in, bend, line_out]), adaptive=0.5)
+    seg = segment_lengths(points)
+    mid = (points[1:, 0] > 10) & (points[1:, 1] < 1)
+    assert seg[mid].mean() < 0.6 * seg[~mid].mean()
+    assert seg.min() >= 0.5 / 4 - 1e-9
+
+
+def test_attributes_are_interpolated_and_labels_are_not():
+    s = np.array([0.0, 1.0, 3.0])
+    table = np.array([[0.0, 1], [10.0, 1], [30.0, 2]])
+    out = interpolate_table(s, table, np.array([0.5, 1.9, 2.1, 3.0]), label_mask=np.array([False, True]))
+    np.testing.assert_allclose(out[:, 0], [5, 19, 21, 30])
+    np.testing.assert_array_equal(out[:, 1], [1, 1, 2, 2])
+
+
+def test_dataframe_keeps_columns_and_integer_labels(tmp_path):
+    df = pd.DataFrame({
+        "x": np.arange(10.0), "y": 0.0, "z": 0.0,
+        "radius": np.linspace(1, 2, 10), "lab": [1] * 5 + [2] * 5, "name": list("abcdefghij"),
+    })
+    df.loc[3, ["x", "y", "z"]] = df.loc[2, ["x", "y", "z"]].to_numpy()   # 長さ 0 の区間も含める
+    out = resample_dataframe(df, count=19)
+    assert list(out.columns) == ["x", "y", "z", "radius", "lab"]
+    assert out["lab"].dtype == df["lab"].dtype
+    assert set(out["lab"]) == {1, 2}
+    assert np.all(np.diff(out["x"]) > 0)
+    assert output_path_for("dir/BG0001_L_MCA-ICA_ascii.csv", 19, str(tmp_path)).endswith(
+        "BG0001_L_MCA-ICA_ascii_resampled19.csv")
+
+
+def test_discrete_curvature_of_a_circle():
+    t = np.linspace(0, 2 * np.pi, 400)
+    circle = np.column_stack([3 * np.cos(t), 3 * np.sin(t), np.zeros_like(t)])
+    np.testing.assert_allclose(discrete_curvature(circle), 1 / 3, rtol=1e-3)
+
+
+def test_rejects_degenerate_input():
+    with pytest.raises(ValueError):
+        resample_arrays(np.zeros((5, 3)), count=10)
+    with pytest.raises(ValueError):
+        resample_arrays(np.eye(3), count=1)
+    with pytest.raises(ValueError):
+        resample_arrays(np.eye(3))
+
+
+def test_dir_scan_skips_resampled_files_and_result_tables(tmp_path, monkeypatch):
+    line = pd.DataFrame({"x": [0.0, 1.0, 2.0], "y": 0.0, "z": 0.0})
+    for name in ("BG0001_L_MCA-ICA_ascii.csv", "BG0001_L_MCA-ICA_ascii_resampled5.csv", "radius_transfer.csv"):
+        line.to_csv(tmp_path / name, index=False)
+    out = tmp_path / "out"
+    monkeypatch.setattr(sys, "argv", ["resample_centerline.py", "-d", str(tmp_path), "-o", str(out),
+                                      "--count", "5", "-j", "1"])
+    resample_centerline.main()
+    assert sorted(p.name for p in out.iterdir()) == ["BG0001_L_MCA-ICA_ascii_resampled5.csv"]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""shared_network_pool の共有メモリ上のネットワークと、それを使う半径の付与のテスト"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import shared_network_pool
+from csv_add_raidus import parse_vtk_points_and_radius, run_batch
+from shared_network_pool import NetworkPool, SharedArrays, attach_arrays
+from vessel_graph import NETWORK_ARRAYS, load_vessel_network
+
+
+def nearest_radius(shared, job):
+    """ジョブの点に最も近いネットワークの点の半径（プロセスプールのワーカーで実行される）"""
+    _, idx = shared.index.query(np.asarray(job["points"]))
+    return shared.radius[idx].tolist()
+
+
+def failing_job(shared, job):
+    if job["fail"]:
+        raise ValueError("失敗するジョブ")
+    return shared.network.n_segments
+
+
+def test_arrays_are_shared_as_read_only_views():
+    arrays = {"a": np.arange(10.0), "b": np.arange(6, dtype=np.int32).reshape(2, 3), "empty": np.zeros(0)}
+    block = SharedArrays(arrays)
+    try:
+        shm, views = attach_arrays(block.descriptor)
+        for name, a in arrays.items():
+            np.testing.assert_array_equal(views[name], a)
+            assert views[name].dtype == a.dtype and not views[name].flags.writeable
+        assert all(offset % 64 == 0 for offset, _, _ in block.descriptor["layout"].values())
+        # ワーカーに渡すのはブロックの名前と配置だけ
+        assert len(pickle.dumps(block.descriptor)) < 1000
+        del views
+        shm.close()
+    finally:
+        block.close()
+
+
+def test_shared_network_matches_the_loaded_network(network_vtk, monkeypatch):
+    monkeypatch.setattr(shared_network_pool, "_attached", {})
+    with NetworkPool([network_vtk]) as pool:
+        assert pool.add(network_vtk) is pool.blocks[network_vtk]
+        shared = shared_network_pool.shared_network(pool.blocks[network_vtk].descriptor)
+        assert shared_network_pool.shared_network(pool.blocks[network_vtk].descriptor) is shared
+        direct = load_vessel_network(network_vtk)
+        for k in NETWORK_ARRAYS:
+            np.testing.assert_array_equal(getattr(shared.network, k), getattr(direct, k))
+        np.testing.assert_array_equal(shared.network.subtree(1), [1, 3])
+        assert pool.nbytes > 0
+    assert shared_network_pool._attached == {} and pool.blocks == {}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pool_runs_jobs_per_network(network_vtk, monkeypatch, workers):
+    monkeypatch.setattr(shared_network_pool, "_attached", {})
+    points, radius = parse_vtk_points_and_radius(network_vtk)
+    jobs = [{"network": network_vtk, "id": i, "points": points[[i, 7 - i]] + 0.01} for i in range(6)]
+    with NetworkPool() as pool:
+        results = {job["id"]: (result, error) for job, result, error in
+                   pool.run(nearest_radius, jobs, workers=workers, chunk_size=2)}
+    assert sorted(results) == list(range(6))
+    for i, (result, error) in results.items():
+        assert error is None
+        np.testing.assert_allclose(result, radius[[i, 7 - i]])
+
+
+def test_job_errors_are_reported_per_job(network_vtk, monkeypatch):
+    monkeypatch.setattr(shared_network_pool, "_attached", {})
+    jobs = [{"network": network_vtk, "fail": f} for f in (False, True, False)]
+    with NetworkPool() as pool:
+        out = list(pool.run(failing_job, jobs, workers=1))
+    assert [r for _, r, _ in out] == [4, None, 4]
+    assert [type(e) for _, _, e in out] == [type(None), ValueError, type(None)]
+
+
+@pytest.mark.parametrize("mode", ["nearest", "knn"])
+def test_shared_run_batch_matches_the_per_subject_path(tmp_path, network_vtk, monkeypatch, mode):
+    monkeypatch.setattr(shared_network_pool, "_attached", {})
+    points, _ = parse_vtk_points_and_radius(network_vtk)
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    rng = np.random.default_rng(24)
+    for side, idx in (("L", [0, 1, 2, 3]), ("R", [4, 5, 6, 7])):
+        pd.DataFrame(points[idx] + rng.normal(scale=0.1, size=(4, 3)), columns=["x", "y", "z"]).to_csv(
+            csv_dir / f"BG0002_{side}_MCA-ICA_ascii.csv", index=False)
+    csv_paths = sorted(str(p) for p in csv_dir.glob("*.csv"))
+
+    direct, shared = tmp_path / "direct.csv", tmp_path / "shared.csv"
+    assert run_batch(csv_paths, [network_vtk], str(direct), mode=mode, k=3, workers=1) == 1
+    assert run_batch(csv_paths, [network_vtk], str(shared), mode=mode, k=3, workers=1, shared=True) == 1
+
+    key = ["side", "x", "y", "z"]
+    a = pd.read_csv(direct).sort_values(key, ignore_index=True)
+    b = pd.read_csv(shared).sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(a, b)
+    assert len(a) == 8
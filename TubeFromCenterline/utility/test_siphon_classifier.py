@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""siphon_classifier の形状の特徴量・分類・成績の評価のテスト"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import siphon_classifier
+from centerline_geometry import centerline_geometry
+from siphon_classifier import (
+    CLASS_RULES, MODEL_FEATURES, beats_baseline, classify_centroids, classify_rules, confusion_table, evaluation,
+    fit_centroids, format_evaluation, leave_one_out, reference_classes, shape_descriptors,
+)
+
+
+def bends(angles, radius=3.0, straight=10.0, step=0.2):
+    """平面内で直線 → 曲がり（角度 angles [度]、正が左・負が右）→ 直線 … とつないだ中心線"""
+    heading, pos, points = 0.0, np.zeros(2), [np.zeros(2)]
+
+    def walk(length, turn_rate):
+        nonlocal heading, pos
+        for _ in range(int(round(length / step))):
+            heading += turn_rate * step
+            pos = pos + step * np.array([np.cos(heading), np.sin(heading)])
+            points.append(pos)
+
+    walk(straight, 0.0)
+    for angle in angles:
+        walk(radius * np.radians(abs(angle)), np.sign(angle) / radius)
+        walk(straight, 0.0)
+    p = np.array(points)
+    return np.column_stack([p, np.zeros(len(p))])
+
+
+def descriptors(points):
+    return shape_descriptors(points, centerline_geometry(points, window=1.0))
+
+
+def test_single_bend_descriptors():
+    d = descriptors(bends([180]))
+    assert d["n_bends"] == 1 and d["opposite_bends"] == 0
+    # 曲がりの角度は曲率が BEND_CURVATURE 以上の区間だけで積分するので、両端の分だけ小さい
+    assert 170 < d["main_bend_angle"] <= 180
+    assert d["main_bend_width"] == pytest.approx(3 * np.pi, rel=0.05)
+    assert d["max_curvature"] == pytest.approx(1 / 3, rel=0.05)
+    assert d["end_to_end_angle"] == pytest.approx(180, abs=1)
+    assert d["planarity"] < 1e-9
+    assert set(MODEL_FEATURES) <= set(d)
+
+
+def test_opposite_bends_are_found():
+    d = descriptors(bends([120, -90]))
+    assert d["n_bends"] == 2 and d["opposite_bends"] == 1
+    assert 110 < d["main_bend_angle"] <= 120
+    assert 80 < d["second_bend_angle"] <= 90
+    assert d["total_turning"] == pytest.approx(210, rel=0.03)
+
+    same_way = descriptors(bends([120, 90]))
+    assert same_way["opposite_bends"] == 0 and 80 < same_way["second_bend_angle"] <= 90
+
+
+def rule_row(**values):
+    row = {"max_curvature": 0.0, "opposite_bends": 0, "second_bend_angle": 0.0,
+           "main_bend_angle": 0.0, "main_bend_width": 100.0}
+    row.update(values)
+    return row
+
+
+def test_rules_are_checked_in_s_c_v_order():
+    r = CLASS_RULES
+    table = pd.DataFrame([
+        # S と C の両方の条件を満たすなら S
+        rule_row(max_curvature=1.0, opposite_bends=1, second_bend_angle=r["s_min_second_bend"],
+                 main_bend_angle=r["c_min_main_bend"]),
+        rule_row(max_curvature=1.0, main_bend_angle=r["c_min_main_bend"], main_bend_width=1.0),
+        rule_row(max_curvature=r["v_min_curvature"], main_bend_width=r["v_max_main_width"]),
+        rule_row(max_curvature=r["v_min_curvature"], main_bend_width=r["v_max_main_width"] + 1),
+        rule_row(max_curvature=1.0, opposite_bends=0, second_bend_angle=170.0),
+    ])
+    assert list(classify_rules(table)) == ["s", "c", "v", "u", "u"]
+    assert list(classify_rules(table, {"v_max_main_width": 200.0}))[3:] == ["v", "v"]
+
+
+@pytest.fixture
+def separable():
+    """クラスごとに特徴量がはっきり分かれた 4 クラス × 6 本の表"""
+    rng = np.random.default_rng(17)
+    centers = {"u": 0.0, "v": 5.0, "c": 10.0, "s": 15.0}
+    rows, labels = [], []
+    for cls, c in centers.items():
+        for _ in range(6):
+            rows.append({f: c + rng.normal(scale=0.5) for f in MODEL_FEATURES})
+            labels.append(cls)
+    return pd.DataFrame(rows), np.array(labels)
+
+
+def test_centroids_and_leave_one_out_on_separable_data(separable):
+    table, labels = separable
+    model = fit_centroids(table, labels)
+    assert list(model["centroids"]) == ["u", "v", "c", "s"]
+    np.testing.assert_array_equal(classify_centroids(table, model), labels)
+    np.testing.assert_array_equal(leave_one_out(table, labels), labels)
+
+
+def test_leave_one_out_does_not_see_the_held_out_example(separable):
+    table, labels = separable
+    # 1本だけのクラスは、除くと重心が無くなるので当てられない
+    labels = labels.copy()
+    labels[0] = "s"
+    predicted = leave_one_out(table, labels)
+    assert predicted[0] != "s"
+    assert classify_centroids(table.iloc[[0]], fit_centroids(table, labels))[0] == "u"
+
+
+def test_evaluation_counts_baseline_and_recall():
+    reference = np.array(["u", "u", "u", "v", "c", "s", ""])
+    predicted = np.array(["u", "v", "u", "v", "u", "s", "c"])
+    result = evaluation(reference, predicted)
+    assert result == {
+        "n": 6, "correct": 4, "majority_class": "u", "baseline_correct": 3,
+        "recall": {"u": (2, 3), "v": (1, 1), "c": (0, 1), "s": (1, 1)},
+    }
+    text = format_evaluation(result, "rules")
+    assert text.startswith("rules: 4 / 6") and "警告" not in text
+
+    all_u = evaluation(reference, np.array(["u"] * 7))
+    assert all_u["correct"] == all_u["baseline_correct"]
+    assert "警告" in format_evaluation(all_u, "rules")
+
+    confusion = confusion_table(reference, predicted)
+    assert confusion.loc["u", "u"] == 2 and confusion.loc["c", "u"] == 1
+    assert confusion.to_numpy().sum() == 6
+
+
+def test_reference_classes_from_uvcs_names(tmp_path):
+    for cls, name in (("u", "BG0001_L_MCA-ICA.ply"), ("s", "BG0002_R_MCA-ICA.ply")):
+        (tmp_path / "uvcs" / cls / "ply").mkdir(parents=True)
+        (tmp_path / "uvcs" / cls / "ply" / name).write_text("")
+    table = pd.DataFrame({"subject": ["BG0001", "BG0002", "BG0003"], "side": ["L", "R", "L"]})
+    np.testing.assert_array_equal(reference_classes(table, str(tmp_path / "uvcs")), ["u", "s", ""])
+    paths = [str(tmp_path / "uvcs" / "c" / "ply" / "BG0003_L_MCA-ICA.ply")]
+    np.testing.assert_array_equal(reference_classes(table, paths=paths), ["", "", "c"])
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    """丸い U 字 4本と、鋭い S 字 2本の CSV（手作業の分類は uvcs/ の空のファイルで与える）"""
+    src = tmp_path / "output_csv"
+    src.mkdir()
+    shapes = {f"BG000{i}": ("u", bends([180], radius=3.0 + 0.3 * i)) for i in range(1, 5)}
+    shapes.update({f"BG000{i}": ("s", bends([150, -120], radius=0.8)) for i in (5, 6)})
+    for subject, (cls, points) in shapes.items():
+        pd.DataFrame(points, columns=["x", "y", "z"]).to_csv(src / f"{subject}_L_MCA-ICA_ascii.csv", index=False)
+    return src, {subject: cls for subject, (cls, _) in shapes.items()}
+
+
+def write_reference(root, classes):
+    for subject, cls in classes.items():
+        (root / "uvcs" / cls).mkdir(parents=True, exist_ok=True)
+        (root / "uvcs" / cls / f"{subject}_L_MCA-ICA.ply").write_text("")
+    return str(root / "uvcs")
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["siphon_classifier.py", *args, "-j", "1"])
+    siphon_classifier.main()
+
+
+def test_classes_are_written_only_when_they_beat_the_baseline(cohort, tmp_path, monkeypatch, capsys):
+    src, classes = cohort
+    out = tmp_path / "classes.csv"
+    run_main(monkeypatch, "-d", str(src), "-o", str(out), "--heuristic",
+             "--reference", write_reference(tmp_path / "good", classes))
+    table = pd.read_csv(out, keep_default_na=False)
+    assert list(table["shape_class"]) == list(table["reference_class"]) == ["u"] * 4 + ["s"] * 2
+    stats = pd.read_csv(tmp_path / "classes_stats.csv")
+    assert "shape_class" in stats.columns and set(stats["shape_class"]) == {"u", "s"}
+
+    # 手作業の分類と逆なら、分類は書き出さず手作業の分類ごとの統計だけを出す
+    swapped = {subject: {"u": "s", "s": "u"}[cls] for subject, cls in classes.items()}
+    run_main(monkeypatch, "-d", str(src), "-o", str(out), "--heuristic",
+             "--reference", write_reference(tmp_path / "bad", swapped))
+    assert "書き出しません" in capsys.readouterr().out
+    table = pd.read_csv(out)
+    assert "shape_class" not in table.columns and "max_curvature" in table.columns
+    stats = pd.read_csv(tmp_path / "classes_stats.csv")
+    assert list(stats.columns[:2]) == ["reference_class", "descriptor"]
+
+    # 手作業の分類が無ければ確かめられないので、分類も統計も書き出さない
+    (tmp_path / "classes_stats.csv").unlink()
+    run_main(monkeypatch, "-d", str(src), "-o", str(out), "--heuristic")
+    assert "shape_class" not in pd.read_csv(out).columns
+    assert not (tmp_path / "classes_stats.csv").exists()
+
+
+def test_saved_model_carries_its_leave_one_out_gate(cohort, tmp_path, monkeypatch):
+    src, classes = cohort
+    model_path = tmp_path / "model.json"
+    out = tmp_path / "classes.csv"
+    run_main(monkeypatch, "-d", str(src), "-o", str(out), "--fit", str(model_path),
+             "--reference", write_reference(tmp_path, classes))
+    assert list(pd.read_csv(out)["shape_class"]) == ["u"] * 4 + ["s"] * 2
+
+    run_main(monkeypatch, "-d", str(src), "-o", str(out), "--model", str(model_path))
+    assert list(pd.read_csv(out)["shape_class"]) == ["u"] * 4 + ["s"] * 2
+    assert not beats_baseline(None)
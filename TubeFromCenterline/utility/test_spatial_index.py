@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""GridIndex（NumPy だけの一様グリッド）を scipy の cKDTree と突き合わせるテスト"""
+
+import numpy as np
+import pytest
+
+from spatial_index import GridIndex, KDTreeIndex, build_spatial_index
+
+cKDTree = pytest.importorskip("scipy.spatial").cKDTree
+
+
+@pytest.fixture
+def clouds():
+    """血管の木に近い、細長く偏った点群と、その周りや遠くの問い合わせ点"""
+    rng = np.random.default_rng(3)
+    t = rng.random(3000) * 60.0
+    points = np.column_stack([t, 5 * np.sin(t / 7), 3 * np.cos(t / 5)]) + rng.normal(scale=0.3, size=(3000, 3))
+    queries = np.concatenate([
+        points[rng.integers(0, len(points), 400)] + rng.normal(scale=0.5, size=(400, 3)),
+        rng.uniform(-100, 150, size=(100, 3)),   # グリッドの外の点も含める
+    ])
+    return points, queries
+
+
+@pytest.mark.parametrize("k", [1, 4])
+def test_grid_query_matches_ckdtree(clouds, k):
+    points, queries = clouds
+    dist, idx = GridIndex(points).query(queries, k=k)
+    ref_dist, ref_idx = cKDTree(points).query(queries, k=k)
+    np.testing.assert_allclose(dist, ref_dist, rtol=0, atol=1e-12)
+    # 同じ距離の点が複数あると番号は違ってよいので、選んだ点までの距離で確かめる
+    chosen = np.linalg.norm(points[idx] - (queries[:, None, :] if k > 1 else queries), axis=-1)
+    np.testing.assert_allclose(chosen, ref_dist, rtol=0, atol=1e-12)
+    assert idx.dtype == np.int64 and idx.shape == ref_idx.shape
+
+
+def test_grid_query_radius_matches_ckdtree(clouds):
+    points, queries = clouds
+    offsets, idx, dist = GridIndex(points).query_radius(queries, 1.5)
+    ref = cKDTree(points).query_ball_point(queries, r=1.5)
+    assert offsets[-1] == sum(len(r) for r in ref)
+    for i, expected in enumerate(ref):
+        found = idx[offsets[i]:offsets[i + 1]]
+        assert sorted(found) == sorted(expected)
+        d = dist[offsets[i]:offsets[i + 1]]
+        np.testing.assert_allclose(d, np.linalg.norm(points[found] - queries[i], axis=1))
+        assert np.all(np.diff(d) >= 0)
+
+
+def test_grid_state_round_trip_gives_same_answers(clouds):
+    points, queries = clouds
+    index = GridIndex(points)
+    restored = GridIndex.from_state({k: v.copy() for k, v in index.state().items()})
+    for a, b in zip(index.query(queries, k=2), restored.query(queries, k=2)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_grid_pads_when_fewer_points_than_k():
+    dist, idx = GridIndex(np.eye(3)).query(np.zeros((1, 3)), k=5)
+    np.testing.assert_allclose(dist[0, :3], 1.0)
+    assert np.all(np.isinf(dist[0, 3:])) and np.all(idx[0, 3:] == 3)
+
+
+def test_build_spatial_index_backends(clouds):
+    points, _ = clouds
+    assert isinstance(build_spatial_index(points), KDTreeIndex)
+    assert isinstance(build_spatial_index(points, backend="grid"), GridIndex)
+    with pytest.raises(ValueError):
+        build_spatial_index(points, backend="octree")
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""stage_cache のキャッシュの再利用・無効化・容量管理のテスト"""
+
+import os
+
+import numpy as np
+import pytest
+
+import stage_cache
+from stage_cache import StageCache, active_cache, cached, configure_cache, stage_key
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv(stage_cache.CACHE_DIR_ENV, raising=False)
+    monkeypatch.delenv(stage_cache.CACHE_SIZE_ENV, raising=False)
+    monkeypatch.setattr(stage_cache, "_caches", {})
+    yield tmp_path / "cache"
+    configure_cache(None)
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, value):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+
+def test_disabled_cache_always_computes(cache_dir):
+    count = Counter()
+    assert cached("stage", [], {}, count(1)) == 1
+    assert cached("stage", [], {}, count(1)) == 1
+    assert count.calls == 2 and active_cache() is None
+
+
+def test_file_content_and_params_invalidate_entries(cache_dir, tmp_path):
+    configure_cache(str(cache_dir))
+    src = tmp_path / "input.csv"
+    src.write_text("x,y,z\n0,0,0\n")
+    count = Counter()
+
+    assert cached("length", [str(src)], {"n": 1}, count("a")) == "a"
+    assert cached("length", [str(src)], {"n": 1}, count("b")) == "a"
+    assert count.calls == 1
+
+    assert cached("length", [str(src)], {"n": 2}, count("c")) == "c"     # パラメータが違う
+    assert cached("other", [str(src)], {"n": 1}, count("d")) == "d"      # 段が違う
+
+    src.write_text("x,y,z\n1,1,1\n")                                   # 中身が変わった
+    assert cached("length", [str(src)], {"n": 1}, count("e")) == "e"
+    assert count.calls == 4
+
+
+def test_array_inputs_are_keyed_by_value():
+    a = np.arange(6.0)
+    assert stage_key("s", [a]) == stage_key("s", [a.copy()])
+    assert stage_key("s", [a]) != stage_key("s", [a.reshape(2, 3)])
+    assert stage_key("s", [a]) != stage_key("s", [a.astype(np.float32)])
+
+
+def test_corrupt_entry_is_recomputed(cache_dir):
+    cache = StageCache(str(cache_dir))
+    key = stage_key("s", [], {})
+    cache.put(key, 1)
+    with open(cache._path(key), "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.get(key) == (False, None)
+    assert not os.path.exists(cache._path(key))
+
+
+@pytest.mark.parametrize("stale", [b"cstage_cache\nRenamedClass\n.", b"cremoved_module\nThing\n."])
+def test_entry_of_a_renamed_class_or_module_is_a_miss(cache_dir, stale):
+    cache = StageCache(str(cache_dir))
+    key = stage_key("s", [], {})
+    cache.put(key, 1)
+    with open(cache._path(key), "wb") as f:
+        f.write(stale)
+    assert cache.get(key) == (False, None)
+    assert not os.path.exists(cache._path(key))
+
+
+def test_put_keeps_a_running_total_and_evicts_least_recently_used(cache_dir, monkeypatch):
+    payload = np.zeros(1000)                      # 1 エントリ約 8 KB
+    cache = StageCache(str(cache_dir), max_bytes=6 * payload.nbytes)   # 5 エントリまで入る
+    keys = [stage_key("s", [i]) for i in range(8)]
+    for i, key in enumerate(keys[:4]):
+        cache.put(key, payload)
+        os.utime(cache._path(key), (i, i))      # 古い順に並べる
+    cache.get(keys[0])                           # 一番古いものを使い直す
+
+    # 容量内の書き込みではディレクトリを数え直さない
+    scans = []
+    with monkeypatch.context() as m:
+        m.setattr(StageCache, "entries", lambda self: scans.append(1) or [])
+        cache.put(keys[4], payload)
+    assert scans == [] and cache._total == cache.size()
+
+    for key in keys[5:]:
+        cache.put(key, payload)
+    assert cache.size() <= cache.max_bytes
+    assert cache._total == cache.size()
+    assert cache.get(keys[0])[0]                 # 使い直したものは残る
+    assert not cache.get(keys[1])[0]             # 使われていない古いものから消える
+
+    cache.clear()
+    assert cache.size() == 0 and cache._total == 0
+
+
+def test_active_cache_is_reused_within_a_process(cache_dir):
+    configure_cache(str(cache_dir), max_bytes=1 << 20)
+    assert active_cache() is active_cache()
+    assert active_cache().max_bytes == 1 << 20
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""swc_io の SWC の読み書きと、parent の表からの枝の組み立てのテスト"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from network_mesh import file_domains, load_network
+from swc_io import (
+    convert_task, load_swc_network, network_to_swc, output_path_for, read_swc, swc_segments, write_swc,
+)
+from vessel_graph import VesselNetwork
+
+
+def edge_set(offsets, connectivity):
+    """枝の中で隣り合う点の組（向きなし）"""
+    pairs = set()
+    for s in range(len(offsets) - 1):
+        ids = connectivity[offsets[s]:offsets[s + 1]]
+        pairs |= {tuple(sorted(p)) for p in zip(ids[:-1].tolist(), ids[1:].tolist())}
+    return pairs
+
+
+def segments_of(offsets, connectivity):
+    return [connectivity[offsets[s]:offsets[s + 1]].tolist() for s in range(len(offsets) - 1)]
+
+
+def test_segments_continue_into_the_first_child():
+    #      0 ─ 1 ─ 2 ─ 3 ─ 4
+    #              └ 5 ─ 6
+    #      └ 7（根の2番目の子）
+    parent = np.array([-1, 0, 1, 2, 3, 2, 5, 0])
+    offsets, connectivity, heads = swc_segments(parent)
+    assert segments_of(offsets, connectivity) == [[0, 1, 2, 3, 4], [2, 5, 6], [0, 7]]
+    np.testing.assert_array_equal(heads, [1, 5, 7])
+
+
+def test_read_swc_with_unordered_ids(tmp_path):
+    path = tmp_path / "tree.swc"
+    path.write_text(
+        "# comment\n"
+        "10 1 0 0 0 1.0 -1\n"
+        "30 3 2 0 0 0.5 20\n"
+        "20 1 1 0 0 0.8 10\n"
+    )
+    swc = read_swc(str(path))
+    np.testing.assert_array_equal(swc["parent"], [-1, 2, 0])
+    np.testing.assert_array_equal(swc["type"], [1, 3, 1])
+    network = load_swc_network(str(path))
+    assert segments_of(network["offsets"], network["connectivity"]) == [[0, 2, 1]]
+    np.testing.assert_array_equal(network["domain"], [1])
+
+    path.write_text("1 1 0 0 0 1.0 -1\n2 1 1 0 0 1.0 5\n")
+    with pytest.raises(ValueError):
+        read_swc(str(path))
+
+
+def test_vtk_tree_round_trips_through_swc(network_vtk, tmp_path):
+    vtk_net = load_network(network_vtk)
+    swc_path = tmp_path / "BG0002_tree.swc"
+    write_swc(str(swc_path), network_to_swc(vtk_net), comments=["test"])
+    assert swc_path.read_text().startswith("# test\n# id type x y z radius parent\n")
+
+    swc = read_swc(str(swc_path))
+    np.testing.assert_allclose(swc["points"], vtk_net["points"])
+    np.testing.assert_allclose(swc["radius"], vtk_net["radius"])
+    np.testing.assert_array_equal(swc["type"], [1, 1, 1, 1, 1, 2, 2, 1])
+
+    swc_net = load_swc_network(str(swc_path))
+    # 枝の切り方は違っても（LINES は分岐ごと、SWC は最初の子へ続ける）、辺は同じ
+    assert segments_of(swc_net["offsets"], swc_net["connectivity"]) == [[0, 1, 2, 3, 4, 7], [2, 5, 6]]
+    assert edge_set(swc_net["offsets"], swc_net["connectivity"]) == edge_set(
+        vtk_net["offsets"], vtk_net["connectivity"])
+    np.testing.assert_array_equal(swc_net["domain"], [1, 2])
+    assert file_domains(str(swc_path)) == [1, 2]
+
+    a, b = VesselNetwork.from_file(network_vtk), VesselNetwork.from_file(str(swc_path))
+    np.testing.assert_array_equal(a.degree, b.degree)
+    assert a.segment_length.sum() == pytest.approx(b.segment_length.sum())
+
+
+def test_convert_vtk_set_trees(data_dir, tmp_path):
+    paths = sorted(glob.glob(os.path.join(data_dir, "vtk_set", "*.vtk")))[:2]
+    if not paths:
+        pytest.skip("vtk_set がありません")
+    for path in paths:
+        out_path, _, _ = convert_task({"path": path, "output_dir": str(tmp_path)})
+        assert out_path == output_path_for(path, str(tmp_path)) and out_path.endswith(".swc")
+        vtk_net, swc_net = load_network(path), load_swc_network(out_path)
+        np.testing.assert_allclose(swc_net["points"], vtk_net["points"], rtol=1e-6)
+        assert edge_set(swc_net["offsets"], swc_net["connectivity"]) == edge_set(
+            vtk_net["offsets"], vtk_net["connectivity"])
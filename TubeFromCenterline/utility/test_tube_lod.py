@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""tube_lod の許容ずれから決める辺の数・輪の間隔・LOD の出力のテスト"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tube_lod
+from tube_lod import (
+    lod_tube_mesh, sides_for, stitch_rings, tolerance_for_budget, triangle_count,
+)
+
+
+def bend(n=120):
+    """直線 → 半径 3 の 90 度の曲がり → 直線"""
+    t = np.linspace(0, np.pi / 2, n)
+    arc = np.column_stack([20 + 3 * np.sin(t), 3 - 3 * np.cos(t), np.zeros(n)])
+    line_in = np.column_stack([np.linspace(0, 20, n, endpoint=False), np.zeros(n), np.zeros(n)])
+    line_out = np.column_stack([np.full(n, 23.0), np.linspace(3, 23, n + 1)[1:], np.zeros(n)])
+    points = np.concatenate([line_in, arc, line_out])
+    curvature = np.concatenate([np.zeros(n), np.full(n, 1 / 3), np.zeros(n)])
+    return points, curvature
+
+
+def test_sides_keep_the_polygon_within_tolerance():
+    radius = np.array([0.3, 0.8, 1.5, 3.0])
+    for tol in (0.001, 0.01, 0.05):
+        n = sides_for(radius, tol)
+        assert np.all(n % 2 == 0)
+        inside = (n > tube_lod.MIN_SIDES) & (n < tube_lod.MAX_SIDES)
+        assert np.all(radius[inside] * (1 - np.cos(np.pi / n[inside])) <= tol)
+        # 辺を 2 本減らすと許容ずれを超える（最小の数になっている）
+        fewer = n[inside] - 2
+        assert np.all(radius[inside] * (1 - np.cos(np.pi / fewer)) > tol)
+    assert np.all(sides_for(radius, 10.0) == tube_lod.MIN_SIDES)
+    assert np.all(sides_for(radius, 1e-9) == tube_lod.MAX_SIDES)
+
+
+@pytest.mark.parametrize("n_a, n_b", [(8, 8), (8, 12), (14, 6)])
+def test_stitched_rings_share_each_edge_once(n_a, n_b):
+    faces = stitch_rings(0, n_a, n_a, n_b)
+    assert len(faces) == n_a + n_b
+    # 輪の辺は1回ずつ、輪どうしをつなぐ辺は2回ずつ使われる
+    edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+    uniq, counts = np.unique(edges, axis=0, return_counts=True)
+    on_ring = (uniq < n_a).all(axis=1) | (uniq >= n_a).all(axis=1)
+    assert on_ring.sum() == n_a + n_b
+    assert np.all(counts[on_ring] == 1) and np.all(counts[~on_ring] == 2)
+
+
+def test_lod_mesh_stays_on_the_tube_and_coarsens_with_tolerance():
+    points, curvature = bend()
+    counts = []
+    for tol in (0.005, 0.02, 0.1):
+        vertices, faces = lod_tube_mesh(points, 1.0, curvature, tol)
+        assert len(faces) == triangle_count(points, 1.0, curvature, tol)
+        assert faces.max() < len(vertices)
+        # 頂点は中心線から半径 1 の位置にある（補間の誤差は許容ずれ程度）
+        d = np.min(np.linalg.norm(vertices[:, None, :] - points[None, :, :], axis=2), axis=1)
+        assert np.all(np.abs(d - 1.0) < max(tol, 0.05))
+        counts.append(len(faces))
+    assert counts[0] > counts[1] > counts[2]
+
+
+def test_budget_search_returns_a_tolerance_that_fits():
+    points, curvature = bend()
+    for budget in (4000, 1000):
+        tol = tolerance_for_budget(points, 1.0, curvature, budget)
+        assert triangle_count(points, 1.0, curvature, tol) <= budget
+        assert triangle_count(points, 1.0, curvature, tol / 1.05) > budget
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["tube_lod.py", *argv])
+    tube_lod.main()
+
+
+def test_repeated_tolerance_writes_every_level(tmp_path, monkeypatch, capsys):
+    points, curvature = bend(40)
+    src = tmp_path / "BG0001_L_MCA-ICA_ascii.csv"
+    pd.DataFrame({"x": points[:, 0], "y": points[:, 1], "z": points[:, 2], "curvature": curvature}).to_csv(
+        src, index=False)
+    out = tmp_path / "lod"
+
+    # --tolerance を繰り返しても、後ろの入力ファイルは飲み込まれない
+    run_main(monkeypatch, "-r", "1.0", "--tolerance", "0.01", "--tolerance", "0.1", str(src),
+             "-o", str(out), "-j", "1")
+    names = sorted(p.name for p in out.iterdir())
+    assert names == ["BG0001_L_MCA-ICA_ascii_lod0_tol0.01.stl", "BG0001_L_MCA-ICA_ascii_lod1_tol0.1.stl"]
+    sizes = [(out / n).stat().st_size for n in names]
+    assert sizes[0] > sizes[1]
+
+    run_main(monkeypatch, "-r", "1.0", "--budget", "2000", "--budget", "500", str(src),
+             "-o", str(tmp_path / "budget"), "-j", "1")
+    lines = capsys.readouterr().out.splitlines()[-2:]
+    triangles = [int(line.split(", ")[-1].split()[0]) for line in lines]
+    assert triangles[0] <= 2000 and triangles[1] <= 500
+    assert "警告" not in capsys.readouterr().err
+
+    # 最も粗くしても収まらない budget は、書き出したうえで知らせる
+    run_main(monkeypatch, "-r", "1.0", "--budget", "10", str(src), "-o", str(tmp_path / "small"), "-j", "1")
+    captured = capsys.readouterr()
+    n_faces = int(captured.out.splitlines()[-1].split(", ")[-1].split()[0])
+    assert n_faces > 10 and "--budget 10 に収まりません" in captured.err
+
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, "--tolerance", "0.01", "--budget", "500", str(src))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""tube_mesh の管メッシュ（平行移動フレーム・輪・三角形）のテスト"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tube_mesh import (
+    load_centerline, mesh_task, output_path_for, parallel_transport_frames, smooth_radius, task_radius, tube_mesh,
+)
+
+
+def helix(n=200, a=4.0, b=1.5, turns=2.0):
+    t = np.linspace(0, 2 * np.pi * turns, n)
+    return np.column_stack([a * np.cos(t), a * np.sin(t), b * t])
+
+
+def edge_counts(faces):
+    edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    return counts
+
+
+def test_frames_are_orthonormal_and_twist_free():
+    points = helix()
+    t, n, b = parallel_transport_frames(points)
+    for u, v in ((t, n), (t, b), (n, b)):
+        np.testing.assert_allclose(np.einsum("ij,ij->i", u, v), 0, atol=1e-9)
+    for u in (t, n, b):
+        np.testing.assert_allclose(np.linalg.norm(u, axis=1), 1, atol=1e-9)
+    # 回転最小化フレームでは、法線の変化は接線方向の成分しか持たない
+    dn = np.diff(n, axis=0)
+    mid_b = 0.5 * (b[1:] + b[:-1])
+    assert np.abs(np.einsum("ij,ij->i", dn, mid_b)).max() < 1e-3
+
+
+def test_rings_lie_on_the_tube_surface_and_faces_point_outwards():
+    points = helix()
+    sides = 12
+    vertices, faces = tube_mesh(points, 0.8, sides)
+    assert vertices.shape == (len(points) * sides, 3)
+    assert faces.shape == (2 * sides * (len(points) - 1), 3)
+
+    t, _, _ = parallel_transport_frames(points)
+    offsets = vertices.reshape(len(points), sides, 3) - points[:, None, :]
+    np.testing.assert_allclose(np.linalg.norm(offsets, axis=2), 0.8)
+    np.testing.assert_allclose(np.einsum("mk,msk->ms", t, offsets), 0, atol=1e-9)
+
+    tri = vertices[faces]
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    ring = faces[:, 0] // sides
+    assert np.all(np.einsum("ij,ij->i", normal, tri.mean(axis=1) - points[ring]) > 0)
+
+
+def test_capped_tube_is_closed():
+    vertices, faces = tube_mesh(helix(50), 0.5, 8, capping=True)
+    assert len(vertices) == 50 * 8 + 2
+    assert np.all(edge_counts(faces) == 2)
+
+
+def test_open_tube_leaves_both_ends_open():
+    _, faces = tube_mesh(helix(50), 0.5, 8)
+    assert np.sum(edge_counts(faces) == 1) == 2 * 8
+
+
+def test_repeated_points_are_dropped():
+    points = np.array([[0, 0, 0], [1, 0, 0], [1, 0, 0], [2, 0, 0]], dtype=float)
+    vertices, _ = tube_mesh(points, 1.0, 6)
+    assert len(vertices) == 3 * 6
+    with pytest.raises(ValueError):
+        tube_mesh(np.zeros((4, 3)), 1.0, 6)
+    with pytest.raises(ValueError):
+        tube_mesh(points, 1.0, 2)
+
+
+def test_output_name_follows_the_executable():
+    assert output_path_for("a/BG0001_L.csv", 0.8, 24, "out").endswith("BG0001_L_radius0.8_nTv24.stl")
+    assert output_path_for("a/BG0001_L.csv", None, 24, "out", fmt="ply").endswith("BG0001_L_radiusvar_nTv24.ply")
+
+
+def test_mesh_task_writes_binary_stl_by_default(tmp_path):
+    path = tmp_path / "BG0001_L_MCA-ICA_ascii.csv"
+    pd.DataFrame(helix(20), columns=["x", "y", "z"]).to_csv(path, index=False)
+    task = {"path": str(path), "radius": 0.5, "sides": 6, "capping": False, "output_dir": str(tmp_path)}
+    out_path, n_faces = mesh_task(task)
+    assert n_faces == 19 * 6 * 2
+    with open(out_path, "rb") as f:
+        assert not f.read(5).startswith(b"solid")
+    assert (tmp_path / "BG0001_L_MCA-ICA_ascii_radius0.5_nTv6.stl").stat().st_size == 84 + 50 * n_faces
+
+
+# ---- 点ごとの半径（--vary-radius） ----
+
+def test_point_radius_sets_each_ring():
+    points = helix(40)
+    radius = np.linspace(0.5, 1.5, 40)
+    vertices, _ = tube_mesh(points, radius, 10)
+    offsets = vertices.reshape(40, 10, 3) - points[:, None, :]
+    np.testing.assert_allclose(np.linalg.norm(offsets, axis=2), radius[:, None] * np.ones((1, 10)))
+
+
+def test_smooth_radius_fills_gaps_and_limits_slope():
+    points = np.column_stack([np.arange(11.0), np.zeros(11), np.zeros(11)])
+    r = np.array([1, 1, np.nan, 1, 0, 1, 4, 1, 1, 1, 1], dtype=float)
+
+    filled = smooth_radius(points, r)
+    assert filled[2] == 1.0 and filled[4] == 1.0
+
+    limited = smooth_radius(points, r, max_slope=0.5)
+    assert limited[6] == pytest.approx(1.5)
+    assert np.abs(np.diff(limited)).max() <= 0.5 + 1e-12
+    assert np.all(limited <= filled)
+
+    smoothed = smooth_radius(points, np.where(np.arange(11) < 5, 1.0, 2.0), sigma=1.0)
+    assert np.all(np.diff(smoothed) >= 0) and 1.0 < smoothed[5] < 2.0
+    with pytest.raises(ValueError):
+        smooth_radius(points, np.zeros(11))
+
+
+def test_load_centerline_reads_radius_column(tmp_path):
+    path = tmp_path / "BG0001_L_MCA-ICA_ascii_with_radius_distance.csv"
+    pd.DataFrame({"x": [0.0, 1, 2], "y": 0.0, "z": 0.0, "radius": [0.7, 0.8, 0.9], "distance": 0.1}).to_csv(
+        path, index=False)
+    points, radius = load_centerline(str(path))
+    np.testing.assert_array_equal(radius, [0.7, 0.8, 0.9])
+    assert load_centerline(str(path), radius_column="distance")[1][0] == 0.1
+
+    task = {"vary_radius": True, "smooth": 0.0}
+    np.testing.assert_array_equal(task_radius(task, points, radius), radius)
+    with pytest.raises(ValueError):
+        task_radius(task, points, None)
+    assert task_radius({"radius": 0.8}, points, radius) == 0.8
+
+
+def test_load_centerline_orders_vtk_points_along_the_first_line(network_vtk):
+    points, radius = load_centerline(network_vtk)
+    np.testing.assert_array_equal(points[:, 0], [0, 1, 2])
+    np.testing.assert_allclose(radius, [1.0, 0.9, 0.8])
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""vessel_graph の CSR の隣接表と枝の親子関係のテスト"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+import stage_cache
+from stage_cache import configure_cache
+from vessel_graph import NETWORK_ARRAYS, VesselNetwork, load_vessel_network
+
+SQRT2 = np.sqrt(2.0)
+
+
+def test_point_adjacency_of_the_y_tree(network_vtk):
+    net = VesselNetwork.from_file(network_vtk)
+    np.testing.assert_array_equal(net.degree, [1, 2, 3, 2, 2, 2, 1, 1])
+    np.testing.assert_array_equal(net.endpoints(), [0, 6, 7])
+    np.testing.assert_array_equal(net.bifurcations(), [2])
+    np.testing.assert_array_equal(net.junctions(), [2, 4])
+
+    neighbors, lengths = net.point_neighbors(2)
+    order = np.argsort(neighbors)
+    np.testing.assert_array_equal(neighbors[order], [1, 3, 5])
+    np.testing.assert_allclose(lengths[order], [1, SQRT2, SQRT2])
+    # CSR は対称（両向きの辺）
+    rows = np.repeat(np.arange(net.n_points), net.degree)
+    pairs = set(zip(rows.tolist(), net.adj_indices.tolist()))
+    assert pairs == {(b, a) for a, b in pairs}
+
+
+def test_segment_tree_of_the_y_tree(network_vtk):
+    net = VesselNetwork.from_file(network_vtk)
+    np.testing.assert_array_equal(net.parent, [-1, 0, 0, 1])
+    np.testing.assert_array_equal(net.depth, [0, 1, 1, 2])
+    np.testing.assert_array_equal(net.roots(), [0])
+    np.testing.assert_array_equal(net.children(0), [1, 2])
+    np.testing.assert_array_equal(net.children(3), [])
+    np.testing.assert_array_equal(net.ancestors(3), [1, 0])
+    np.testing.assert_array_equal(net.subtree(0), [0, 1, 3, 2])
+    np.testing.assert_array_equal(net.subtree(1), [1, 3])
+    np.testing.assert_array_equal(np.sort(net.segment_neighbors(1)), [0, 2, 3])
+    np.testing.assert_array_equal(net.domain_segments(1), [0, 1, 3])
+
+    np.testing.assert_allclose(net.segment_length, [2, 2 * SQRT2, 2 * SQRT2, SQRT2])
+    np.testing.assert_allclose(net.subtree_length, [2 + 5 * SQRT2, 3 * SQRT2, 2 * SQRT2, SQRT2])
+    np.testing.assert_allclose(net.segment_mean_radius, [0.9, (0.8 + 0.6 + 0.5) / 3, 0.7, 0.45])
+
+    summary = net.summary()
+    assert summary["n_endpoints"] == 3 and summary["n_bifurcations"] == 1
+    assert summary["n_domains"] == 2 and summary["max_depth"] == 2
+    assert summary["total_length"] == pytest.approx(2 + 5 * SQRT2)
+    table = net.segment_table()
+    assert list(table["segment_index"]) == [10, 11, 12, 13]
+    assert list(table["n_children"]) == [2, 1, 0, 0]
+
+
+def test_arrays_round_trip_through_the_cache(network_vtk, tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_cache, "_caches", {})
+    configure_cache(str(tmp_path / "cache"))
+    try:
+        first = load_vessel_network(network_vtk)
+        monkeypatch.setattr(VesselNetwork, "_build", lambda self: pytest.fail("キャッシュから読んでいない"))
+        second = load_vessel_network(network_vtk)
+    finally:
+        configure_cache(None)
+    for k in NETWORK_ARRAYS:
+        np.testing.assert_array_equal(getattr(first, k), getattr(second, k))
+    np.testing.assert_array_equal(second.subtree(1), [1, 3])
+
+
+def test_vtk_set_trees_are_consistent(data_dir):
+    paths = sorted(glob.glob(os.path.join(data_dir, "vtk_set", "*.vtk")))[:3]
+    if not paths:
+        pytest.skip("vtk_set がありません")
+    for path in paths:
+        net = VesselNetwork.from_file(path)
+        # 次数の合計 = 辺の数の 2 倍（各枝は 点数 - 1 本の辺）
+        assert net.degree.sum() == 2 * (np.diff(net.offsets) - 1).clip(min=0).sum()
+        # 行きがけ順は全枝を1回ずつ通り、各根の部分木で全体を覆う
+        np.testing.assert_array_equal(np.sort(net.preorder), np.arange(net.n_segments))
+        assert sum(net.subtree_size[r] for r in net.roots()) == net.n_segments
+        for s in range(0, net.n_segments, max(net.n_segments // 10, 1)):
+            sub = net.subtree(s)
+            assert net.subtree_length[s] == pytest.approx(net.segment_length[sub].sum())
+            for child in sub[1:]:
+                assert s in net.ancestors(child)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""vtk_legacy_reader を vtk パッケージの vtkPolyDataReader と突き合わせるテスト"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vtkAscii_to_csv import vtk_to_csv
+from vtk_legacy_reader import VtkLegacyFile, read_vtk_polydata, split_cells
+
+vtk = pytest.importorskip("vtk")
+from vtk.util.numpy_support import vtk_to_numpy  # noqa: E402
+
+
+def read_with_vtk(path):
+    reader = vtk.vtkPolyDataReader()
+    reader.SetFileName(path)
+    reader.ReadAllScalarsOn()
+    reader.ReadAllFieldsOn()
+    reader.Update()
+    return reader.GetOutput()
+
+
+def vtk_lines(poly):
+    lines = poly.GetLines()
+    return vtk_to_numpy(lines.GetOffsetsArray()), vtk_to_numpy(lines.GetConnectivityArray())
+
+
+def assert_same_as_vtk(path):
+    poly = read_with_vtk(path)
+    data = read_vtk_polydata(path)
+
+    np.testing.assert_array_equal(data["points"], vtk_to_numpy(poly.GetPoints().GetData()))
+    if poly.GetNumberOfLines():
+        offsets, connectivity = data["cells"]["LINES"]
+        ref_offsets, ref_connectivity = vtk_lines(poly)
+        np.testing.assert_array_equal(offsets, ref_offsets)
+        np.testing.assert_array_equal(connectivity, ref_connectivity)
+
+    for attrs, section in ((poly.GetPointData(), "point_data"), (poly.GetCellData(), "cell_data")):
+        for i in range(attrs.GetNumberOfArrays()):
+            name = attrs.GetArrayName(i)
+            np.testing.assert_array_equal(
+                np.squeeze(data[section][name]), np.squeeze(vtk_to_numpy(attrs.GetArray(i))), err_msg=name
+            )
+
+
+@pytest.mark.parametrize("pattern", [
+    "10_siphon(MCA_ICA)/BG0001_L_MCA-ICA.vtk",                       # 5.1 BINARY
+    "10_siphon(MCA_ICA)/output_vtkAscii/BG0001_L_MCA-ICA_ascii.vtk",  # 5.1 ASCII
+    "8_Centerline_Siphon(with labal)/BG0001_L_siphon_lab.vtk",        # lab つき
+    "vtk_set/BG0002_ColorCoded.CNG.swc.vtk",                          # 2.0 ASCII, CELL_DATA つきの木
+])
+def test_matches_vtk_reader_on_checked_in_files(data_dir, pattern):
+    paths = glob.glob(os.path.join(glob.escape(data_dir), *pattern.split("/")))
+    if not paths:
+        pytest.skip(f"{pattern} がありません。")
+    assert_same_as_vtk(paths[0])
+
+
+def make_polydata():
+    """枝3本・点ごとの2配列・セルごとの1配列を持つ POLYDATA"""
+    rng = np.random.default_rng(0)
+    poly = vtk.vtkPolyData()
+    pts = vtk.vtkPoints()
+    pts.SetDataTypeToDouble()
+    for p in rng.normal(size=(9, 3)):
+        pts.InsertNextPoint(*p)
+    poly.SetPoints(pts)
+    lines = vtk.vtkCellArray()
+    for cell in ([0, 1, 2, 3], [3, 4, 5], [3, 6, 7, 8]):
+        lines.InsertNextCell(len(cell), cell)
+    poly.SetLines(lines)
+    for name, values in (("curvature", rng.random(9)), ("torsion", rng.normal(size=9))):
+        arr = vtk.vtkDoubleArray()
+        arr.SetName(name)
+        for v in values:
+            arr.InsertNextValue(v)
+        poly.GetPointData().AddArray(arr)
+    domain = vtk.vtkIntArray()
+    domain.SetName("Domain")
+    for v in (1, 2, 2):
+        domain.InsertNextValue(v)
+    poly.GetCellData().AddArray(domain)
+    return poly
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("version", [42, 51])
+def test_matches_vtk_reader_on_written_files(tmp_path, binary, version):
+    path = str(tmp_path / f"poly_{version}_{'bin' if binary else 'ascii'}.vtk")
+    writer = vtk.vtkPolyDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(make_polydata())
+    writer.SetFileVersion(version)
+    if binary:
+        writer.SetFileTypeToBinary()
+    writer.Write()
+
+    assert_same_as_vtk(path)
+    with VtkLegacyFile(path) as vf:
+        assert vf.binary is binary
+        assert [len(c) for c in split_cells(*vf.cells("LINES"))] == [4, 3, 4]
+
+
+def test_vtk_to_csv_reads_binary_directly(data_dir, tmp_path):
+    """BINARY の VTK から直接作った CSV が、ASCII に変換してから作ったチェックイン済みの CSV と同じ値になる"""
+    src = os.path.join(data_dir, "10_siphon(MCA_ICA)", "BG0001_L_MCA-ICA.vtk")
+    ref = os.path.join(data_dir, "10_siphon(MCA_ICA)", "output_csv", "BG0001_L_MCA-ICA_ascii.csv")
+    if not (os.path.exists(src) and os.path.exists(ref)):
+        pytest.skip("BG0001_L の VTK / CSV がありません。")
+    out = vtk_to_csv(src, csv_path=str(tmp_path / "out.csv"))
+    np.testing.assert_allclose(pd.read_csv(out)[["x", "y", "z"]], pd.read_csv(ref)[["x", "y", "z"]], rtol=1e-9)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+管メッシュの LOD（詳細度）版を作るスクリプト。
+
+tube_mesh.py は全長にわたって一定の nTv・中心線の点ごとの輪でメッシュを作るが、
+ここでは許容する面のずれ（tolerance）から、場所ごとに
+  - 周方向の辺の数: 半径 r の円を n 角形で近似したときのずれ r(1 - cos(π/n)) <= tolerance
+  - 輪の間隔      : 曲がった管の内側の壁（曲率 κ/(1-κr)）を弦で近似したときのずれ <= tolerance
+                    （直線部は --max-aspect で辺の縦横比を抑える）
+を決める。まっすぐな ICA では輪も辺も少なく、サイフォンの急な曲がりでは細かくなる。
+辺の数が違う輪どうしは、角度の順にたどって三角形でつなぐ。
+
+--tolerance / --budget を繰り返し指定すると、1回の読み込みで複数の LOD を出力する。
+--budget で三角形数を指定すると、その数に収まる tolerance を二分探索で求める。
+
+曲率は PLY / CSV / VTK の curvature があればそれを、なければ折れ線から近似する。
+
+使い方:
+  python tube_lod.py -r 0.8 --tolerance 0.01 --tolerance 0.05 --tolerance 0.2 BH0036_R_MCA-ICA_ascii_resampled120.csv
+  python tube_lod.py --vary-radius --budget 20000 --budget 5000 -d "../data/6_Centerline(V-modeler)" -o lod/
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from centerline_io import read_csv_header, read_centerline_columns
+from mesh_io import MESH_FORMATS, mesh_extension, write_mesh
+from parallel_batch import iter_parallel, report_error
+from resample_centerline import discrete_curvature, interpolate_table
+from tube_mesh import (
+    distinct_points, load_centerline, parallel_transport_frames, smooth_radius,
+)
+
+# 周方向の辺の数の範囲と刻み（刻みを揃えると隣の輪と同じ数になりやすい）
+MIN_SIDES = 6
+MAX_SIDES = 128
+SIDES_STEP = 2
+
+
+def load_lod_input(path, radius_column=None):
+    """
+    中心線の点列・点ごとの半径・点ごとの曲率を読み込む。
+    (points, radius or None, curvature or None)。PLY / CSV / VTK に対応。
+    """
+    if path.lower().endswith(".ply"):
+        from ply_reader import PlyFile
+
+        with PlyFile(path) as ply:
+            props = ply.properties("vertex")
+            want = ["x", "y", "z"] + [p for p in ("radius", "curvature") if p in props]
+            v = ply.element("vertex", want)
+        points = np.column_stack([v["x"], v["y"], v["z"]])
+        return points, v.get("radius"), v.get("curvature")
+
+    points, radius = load_centerline(path, radius_column)
+    curvature = None
+    if path.lower().endswith(".vtk"):
+        from vtk_legacy_reader import VtkLegacyFile
+
+        with VtkLegacyFile(path) as vf:
+            names = {n.lower(): n for n in vf.array_names("point_data")}
+            if "curvature" in names:
+                # load_centerline と同じく最初の LINES セルの順に並べる
+                offsets, connectivity = vf.cells("LINES")
+                order = connectivity[offsets[0]:offsets[1]] if len(offsets) > 1 else np.arange(vf.n_points)
+                curvature = vf.point_array(names["curvature"], copy=True).astype(float)[order]
+    elif "curvature" in [c.lower() for c in read_csv_header(path)]:
+        curvature = read_centerline_columns(path, ("curvature",))[:, 0]
+    return points, radius, curvature
+
+
+def sides_for(radius, tolerance, min_sides=MIN_SIDES, max_sides=MAX_SIDES, step=SIDES_STEP):
+    """ずれ r(1 - cos(π/n)) が tolerance 以下になる最小の辺の数 n（step の倍数に切り上げ）"""
+    ratio = np.clip(tolerance / np.maximum(radius, 1e-12), 1e-9, 1.0)
+    n = np.ceil(np.pi / np.arccos(1.0 - ratio))
+    n = np.ceil(n / step) * step
+    return np.clip(n, min_sides, max_sides).astype(np.int64)
+
+
+def axial_spacing(radius, curvature, sides, tolerance, max_aspect=4.0, max_spacing=None):
+    """
+    輪の間隔 h。内側の壁の曲率 κw = κ/(1-κr) の弧を長さ h の弦で近似したずれ
+    h^2 κw / 8 を tolerance 以下にし、周方向の辺の長さ 2πr/n の max_aspect 倍も超えないようにする。
+    """
+    kr = np.minimum(np.abs(curvature) * radius, 0.9)
+    k_wall = np.abs(curvature) / (1.0 - kr)
+    with np.errstate(divide="ignore"):
+        h_bend = np.sqrt(8.0 * tolerance / k_wall)
+    h = np.minimum(h_bend, max_aspect * 2.0 * np.pi * radius / sides)
+    if max_spacing is not None:
+        h = np.minimum(h, max_spacing)
+    return h
+
+
+def ring_layout(s, radius, curvature, tolerance, max_aspect=4.0):
+    """
+    弧長 s の中心線に沿って置く輪の弧長位置と、各輪の辺の数を決める。
+    点密度 1/h を弧長で積分し、整数ごとに輪を置く（両端は必ず置く）。
+    """
+    sides = sides_for(radius, tolerance)
+    h = axial_spacing(radius, curvature, sides, tolerance, max_aspect)
+    density = 1.0 / np.maximum(h, 1e-9)
+    u = np.concatenate([[0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * np.diff(s))])
+    n_rings = max(int(np.ceil(u[-1])) + 1, 2)
+    s_new = np.interp(np.linspace(0.0, u[-1], n_rings), u, s)
+    # 輪の位置での辺の数は、その区間に含まれる元の点の最大値（細かい方に合わせる）
+    idx = np.searchsorted(s, s_new, side="right") - 1
+    ring_sides = np.maximum(sides[np.clip(idx, 0, len(s) - 1)], sides[np.clip(idx + 1, 0, len(s) - 1)])
+    return s_new, ring_sides
+
+
+def stitch_rings(start_a, n_a, start_b, n_b):
+    """
+    頂点番号 start_a から n_a 個の輪 A と、start_b から n_b 個の輪 B を三角形でつなぐ (n_a+n_b, 3)。
+    両方の輪の頂点を角度の順にたどり、進んだ側の輪で三角形を1枚作る
+    （n_a == n_b なら tube_mesh.tube_faces と同じ並び）。
+    """
+    # 各イベント: 輪 A の i 番目 → i+1 番目（角度 (i+1)/n_a）、輪 B も同様
+    t_a = np.arange(1, n_a + 1) / n_a
+    t_b = np.arange(1, n_b + 1) / n_b
+    key = np.concatenate([t_a, t_b])
+    is_a = np.concatenate([np.ones(n_a, bool), np.zeros(n_b, bool)])
+    order = np.lexsort((~is_a, key))   # 同じ角度なら A を先に進める
+    is_a = is_a[order]
+
+    # そのイベントの直前の各輪の位置
+    pos_a = np.concatenate([[0], np.cumsum(is_a)[:-1]])
+    pos_b = np.concatenate([[0], np.cumsum(~is_a)[:-1]])
+    cur_a = start_a + pos_a % n_a
+    nxt_a = start_a + (pos_a + 1) % n_a
+    cur_b = start_b + pos_b % n_b
+    nxt_b = start_b + (pos_b + 1) % n_b
+
+    return np.where(
+        is_a[:, None],
+        np.column_stack([cur_a, nxt_a, cur_b]),
+        np.column_stack([cur_b, cur_a, nxt_b]),
+    )
+
+
+def lod_tube_mesh(points, radius, curvature, tolerance, max_aspect=4.0):
+    """
+    許容ずれ tolerance の LOD 管メッシュ (頂点, 三角形) を作る。
+    radius / curvature は点ごとの (M,) 配列（radius はスカラーでもよい）。
+    """
+    points = np.asarray(points, dtype=float)
+    keep = distinct_points(points)
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(points),))[keep]
+    curvature = np.asarray(curvature, dtype=float)[keep]
+    points = points[keep]
+    if len(points) < 2:
+        raise ValueError("有効な点が 2 点未満のため、管を作れません。")
+
+    t, n, b = parallel_transport_frames(points)
+    s = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+    s_new, ring_sides = ring_layout(s, radius, curvature, tolerance, max_aspect)
+
+    # 輪の位置での中心・法線・従法線・半径を1回の補間でまとめて求める
+    table = interpolate_table(s, np.column_stack([points, n, b, radius]), s_new)
+    centers, nn, bb, rr = table[:, :3], table[:, 3:6], table[:, 6:9], table[:, 9]
+    # 補間で長さ・直交性が崩れた分を直す
+    tt = np.gradient(centers, axis=0)
+    tt /= np.maximum(np.linalg.norm(tt, axis=1, keepdims=True), 1e-12)
+    nn -= np.einsum("ij,ij->i", nn, tt)[:, None] * tt
+    nn /= np.maximum(np.linalg.norm(nn, axis=1, keepdims=True), 1e-12)
+    bb = np.cross(tt, nn)
+
+    # 輪ごとに辺の数が違うので、全輪の頂点を1つの配列に並べる
+    starts = np.concatenate([[0], np.cumsum(ring_sides)])
+    ring_of = np.repeat(np.arange(len(ring_sides)), ring_sides)
+    k = np.arange(starts[-1]) - starts[ring_of]
+    theta = 2.0 * np.pi * k / ring_sides[ring_of]
+    vertices = centers[ring_of] + rr[ring_of, None] * (
+        np.cos(theta)[:, None] * nn[ring_of] + np.sin(theta)[:, None] * bb[ring_of]
+    )
+
+    faces = np.concatenate([
+        stitch_rings(starts[i], ring_sides[i], starts[i + 1], ring_sides[i + 1])
+        for i in range(len(ring_sides) - 1)
+    ])
+    return vertices, faces
+
+
+def triangle_count(points, radius, curvature, tolerance, max_aspect=4.0):
+    """lod_tube_mesh が作る三角形の数（メッシュは作らずに数える）"""
+    points = np.asarray(points, dtype=float)
+    keep = distinct_points(points)
+    p = points[keep]
+    s = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(p, axis=0), axis=1))])
+    r = np.broadcast_to(np.asarray(radius, dtype=float), (len(points),))[keep]
+    _, ring_sides = ring_layout(s, r, np.asarray(curvature, dtype=float)[keep], tolerance, max_aspect)
+    return int((ring_sides[:-1] + ring_sides[1:]).sum())
+
+
+def tolerance_for_budget(points, radius, curvature, budget, max_aspect=4.0):
+    """
+    三角形数が budget 以下になる最小の tolerance を（対数で）二分探索する。
+    tolerance = 半径の最大値（輪の辺が最も少ない）でも budget を超えるときはその値を返す
+    （呼び出し側で三角形数と budget を比べて知らせる）。
+    """
+    r_max = float(np.max(radius))
+    lo, hi = r_max * 1e-5, r_max
+    if triangle_count(points, radius, curvature, hi, max_aspect) > budget:
+        return hi
+    for _ in range(40):
+        mid = np.sqrt(lo * hi)
+        if triangle_count(points, radius, curvature, mid, max_aspect) > budget:
+            lo = mid
+        else:
+            hi = mid
+        if hi / lo < 1.01:
+            break
+    return hi
+
+
+def output_path_for(path, level, tolerance, output_dir=None, fmt="stl"):
+    """'<stem>_lod{i}_tol{tolerance}.stl'"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(out_dir, f"{stem}_lod{level}_tol{tolerance:.4g}{mesh_extension(fmt)}")
+
+
+def lod_task(task):
+    """
+    1本分の中心線から全 LOD のメッシュを作って書き出す（プロセスプールのワーカーで実行される）。
+    [(出力パス, tolerance, 三角形数), ...] を返す。
+    """
+    points, point_radius, curvature = load_lod_input(task["path"], task.get("radius_column"))
+    if task["vary_radius"]:
+        if point_radius is None:
+            raise ValueError("点ごとの半径（radius / MaximumInscribedSphereRadius）が見つかりません。")
+        radius = smooth_radius(points, point_radius, task["smooth"])
+    else:
+        radius = np.full(len(points), task["radius"])
+    if curvature is None:
+        curvature = discrete_curvature(points)
+    curvature = np.nan_to_num(curvature)
+
+    if task["budgets"]:
+        tolerances = [
+            tolerance_for_budget(points, radius, curvature, budget, task["max_aspect"])
+            for budget in task["budgets"]
+        ]
+    else:
+        tolerances = task["tolerances"]
+
+    written = []
+    for level, tol in enumerate(tolerances):
+        vertices, faces = lod_tube_mesh(points, radius, curvature, tol, task["max_aspect"])
+        out_path = output_path_for(task["path"], level, tol, task["output_dir"], task["format"])
+        write_mesh(out_path, vertices, faces, task["format"])
+        written.append((out_path, tol, len(faces)))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="曲率・半径に応じて細かさを変えた管メッシュ（LOD）を作る")
+    parser.add_argument("files", nargs="*", help="入力ファイル（CSV / PLY / VTK、複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリのファイルをすべて処理する")
+    parser.add_argument("--glob", default="*", help="--dir で対象にするファイルのパターン（既定: すべての csv/ply/vtk）")
+    parser.add_argument("-r", "--radius", type=float, default=0.8, help="管の半径（既定: 0.8）")
+    parser.add_argument("--vary-radius", action="store_true", help="点ごとの半径を使う")
+    parser.add_argument("--radius-column", help="--vary-radius で使う列名（既定: 自動）")
+    parser.add_argument("--smooth", type=float, default=0.0, help="--vary-radius の半径を平滑化する幅（既定: 0）")
+
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--tolerance", type=float, action="append",
+                       help="許容する面のずれ（LOD ごとに繰り返し指定: --tolerance 0.01 --tolerance 0.05）")
+    group.add_argument("--budget", type=int, action="append",
+                       help="三角形数の上限（LOD ごとに繰り返し指定: --budget 20000 --budget 5000）")
+
+    parser.add_argument("--max-aspect", type=float, default=4.0,
+                        help="輪の間隔 / 周方向の辺の長さ の上限（既定: 4）")
+    parser.add_argument("--format", choices=MESH_FORMATS, default="stl",
+                        help="出力形式（既定: stl = バイナリSTL）")
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.dir:
+        files += sorted(
+            f for f in glob.glob(os.path.join(args.dir, args.glob))
+            if os.path.splitext(f)[1].lower() in (".csv", ".ply", ".vtk")
+        )
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = [
+        {
+            "path": f,
+            "radius": args.radius,
+            "vary_radius": args.vary_radius,
+            "radius_column": args.radius_column,
+            "smooth": args.smooth,
+            "tolerances": args.tolerance,
+            "budgets": args.budget,
+            "max_aspect": args.max_aspect,
+            "format": args.format,
+            "output_dir": args.output_dir,
+        }
+        for f in files
+    ]
+    for task, written, error in iter_parallel(lod_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        for level, (out_path, tol, n_faces) in enumerate(written):
+            print(f"{os.path.basename(task['path'])} -> {out_path} (tolerance {tol:.4g}, {n_faces} triangles)")
+            if task["budgets"] and n_faces > task["budgets"][level]:
+                print(f"警告: {os.path.basename(out_path)} は --budget {task['budgets'][level]} に収まりません"
+                      f"（最も粗い tolerance {tol:.4g} でも {n_faces} 三角形）。", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+中心線CSVから管（チューブ）の三角形メッシュを作り、STL で出力するスクリプト。
+
+src/TubeFromCenterline.cpp（vtkTubeFilter + vtkTriangleFilter + vtkSTLWriter）と
+同じ形のメッシュ（各点に nTv 個の頂点の輪、隣の輪の間を 2*nTv 枚の三角形でつなぐ、
+端は閉じない）を、VTK も画面も使わずに NumPy だけで作る。
+出力ファイル名も同じ '<CSVのファイル名>_radius{r}_nTv{n}.stl'。
+
+- 輪の向きは平行移動フレーム（rotation minimizing frame, ダブルリフレクション法）で決める。
+- 輪の頂点と三角形はすべて事前に確保した配列にまとめて計算する。
+- --vary-radius を付けると、CSV の radius 列（csv_add_raidus.py の出力）や
+  MaximumInscribedSphereRadius 列・VTK の点データを点ごとの半径として使う
+  （vtkTubeFilter の VaryRadius に相当）。半径の飛びは弧長に沿って平滑化できる。
+
+使い方:
+  python tube_mesh.py -r 0.8 -n 24 BH0036_R_MCA-ICA_ascii_resampled120.csv
+  python tube_mesh.py -r 0.8 -n 24 -d output_csv/ -o stl/ -j 8
+  python tube_mesh.py -r 0.8 -n 24 --store store.npz --variant resampled120 -o stl/
+  python tube_mesh.py --vary-radius --smooth 1.0 -n 24 BG0001_L_siphon_lab.vtk
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from centerline_io import cumulative_length, read_csv_header, read_centerline_columns
+from mesh_io import MESH_FORMATS, mesh_extension, write_mesh
+from parallel_batch import iter_parallel, report_error
+
+# --vary-radius で点ごとの半径として探す列名・配列名（先にあるものを使う）
+RADIUS_COLUMNS = ("radius", "MaximumInscribedSphereRadius")
+
+
+def load_centerline(path, radius_column=None):
+    """
+    中心線の点列と、あれば点ごとの半径を読み込む。(points (M,3), radius (M,) or None)
+    CSV と、VTK（最初の LINES セルの順に並べる）に対応する。
+    radius_column を省略すると RADIUS_COLUMNS の順に探す。
+    """
+    candidates = (radius_column,) if radius_column else RADIUS_COLUMNS
+
+    if path.lower().endswith(".vtk"):
+        from vtk_legacy_reader import VtkLegacyFile
+
+        with VtkLegacyFile(path) as vf:
+            points = vf.points(copy=True).astype(float)
+            offsets, connectivity = vf.cells("LINES")
+            order = connectivity[offsets[0]:offsets[1]] if len(offsets) > 1 else np.arange(len(points))
+            names = {n.lower(): n for n in vf.array_names("point_data")}
+            radius = None
+            for c in candidates:
+                if c.lower() in names:
+                    radius = vf.point_array(names[c.lower()], copy=True).astype(float)[order]
+                    break
+        return points[order], radius
+
+    header = {c.lower(): c for c in read_csv_header(path)}
+    column = next((header[c.lower()] for c in candidates if c.lower() in header), None)
+    if column is None:
+        return read_centerline_columns(path, ("x", "y", "z")), None
+    table = read_centerline_columns(path, ("x", "y", "z", column))
+    return table[:, :3], table[:, 3]
+
+
+def smooth_radius(points, radius, sigma=0.0, max_slope=None):
+    """
+    点ごとの半径を弧長に沿って整える (M,)。
+    - 欠損（NaN・0 以下）は前後の点から弧長で線形補間する。
+    - sigma > 0 なら、弧長での標準偏差 sigma のガウス重み付き平均で平滑化する。
+    - max_slope を指定すると、|dr/ds| が max_slope を超える急な膨らみを削る
+      （両側から r_i <= r_j + max_slope * |s_i - s_j| となるように下げる）。
+    """
+    s = cumulative_length(points)
+    r = np.asarray(radius, dtype=float).copy()
+
+    valid = np.isfinite(r) & (r > 0)
+    if not valid.any():
+        raise ValueError("有効な半径がありません。")
+    if not valid.all():
+        r[~valid] = np.interp(s[~valid], s[valid], r[valid])
+
+    if sigma and sigma > 0 and len(r) > 1:
+        out = np.empty_like(r)
+        # 点数が多くてもメモリが増えないよう、行をまとめて少しずつ計算する
+        for start in range(0, len(r), 1024):
+            ds = (s[start:start + 1024, None] - s[None, :]) / sigma
+            w = np.exp(-0.5 * ds * ds)
+            out[start:start + 1024] = (w @ r) / w.sum(axis=1)
+        r = out
+
+    if max_slope is not None:
+        forward = np.minimum.accumulate(r - max_slope * s) + max_slope * s
+        backward = (np.minimum.accumulate((r + max_slope * s)[::-1]) - max_slope * s[::-1])[::-1]
+        r = np.minimum(r, np.minimum(forward, backward))
+    return r
+
+
+def distinct_points(points):
+    """
+    同じ位置の点が続くと接線が決まらないので、後ろ側を除く。
+    残した点のインデックスを返す。
+    """
+    if len(points) < 2:
+        return np.arange(len(points))
+    step = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    return np.flatnonzero(np.concatenate([[True], step > 0]))
+
+
+def tangents(points):
+    """各点の単位接線 (M,3)（内部は中心差分、両端は片側差分）"""
+    t = np.gradient(points, axis=0)
+    return t / np.maximum(np.linalg.norm(t, axis=1, keepdims=True), 1e-12)
+
+
+def _initial_normal(t0):
+    """t0 に垂直な単位ベクトル（t0 と最も平行でない座標軸との外積）"""
+    axis = np.zeros(3)
+    axis[np.argmin(np.abs(t0))] = 1.0
+    n = np.cross(t0, axis)
+    return n / np.linalg.norm(n)
+
+
+def parallel_transport_frames(points):
+    """
+    平行移動フレーム（接線 T, 法線 N, 従法線 B）を求める。それぞれ (M,3)。
+    ねじれの少ないフレームを、ダブルリフレクション法
+    （Wang et al., "Computation of rotation minimizing frames", 2008）で点から点へ運ぶ。
+    """
+    points = np.asarray(points, dtype=float)
+    t = tangents(points)
+    m = len(points)
+    n = np.empty((m, 3))
+    n[0] = _initial_normal(t[0])
+
+    # 1点ずつ前の点のフレームから決まるので、ここは点の数だけのループになる
+    for i in range(m - 1):
+        v1 = points[i + 1] - points[i]
+        c1 = v1 @ v1
+        if c1 == 0.0:
+            n[i + 1] = n[i]
+            continue
+        r_l = n[i] - (2.0 / c1) * (v1 @ n[i]) * v1
+        t_l = t[i] - (2.0 / c1) * (v1 @ t[i]) * v1
+        v2 = t[i + 1] - t_l
+        c2 = v2 @ v2
+        r = r_l if c2 == 0.0 else r_l - (2.0 / c2) * (v2 @ r_l) * v2
+        # 丸め誤差が溜まらないよう、接線に垂直な単位ベクトルに直す
+        r -= (r @ t[i + 1]) * t[i + 1]
+        n[i + 1] = r / np.linalg.norm(r)
+
+    b = np.cross(t, n)
+    return t, n, b
+
+
+def ring_vertices(points, normals, binormals, radius, sides):
+    """
+    各点のまわりに sides 個の頂点の輪を作る (M*sides, 3)。
+    radius はスカラーまたは点ごとの (M,) 配列。
+    """
+    theta = 2.0 * np.pi * np.arange(sides) / sides
+    cos, sin = np.cos(theta), np.sin(theta)
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(points),))
+
+    verts = np.empty((len(points), sides, 3))
+    # (M,1,3) * (1,S,1) の形でまとめて計算
+    np.multiply(normals[:, None, :], cos[None, :, None], out=verts)
+    verts += binormals[:, None, :] * sin[None, :, None]
+    verts *= radius[:, None, None]
+    verts += points[:, None, :]
+    return verts.reshape(-1, 3)
+
+
+def tube_faces(n_rings, sides):
+    """
+    隣り合う輪の間を三角形でつなぐ頂点インデックス (2*sides*(n_rings-1), 3)。
+    法線が管の外側を向く順に並べる。
+    """
+    i = np.arange(n_rings - 1)[:, None]
+    k = np.arange(sides)[None, :]
+    a = i * sides + k
+    b = i * sides + (k + 1) % sides
+    c = a + sides
+    d = b + sides
+
+    faces = np.empty((n_rings - 1, sides, 2, 3), dtype=np.int64)
+    faces[:, :, 0, 0], faces[:, :, 0, 1], faces[:, :, 0, 2] = a, b, c
+    faces[:, :, 1, 0], faces[:, :, 1, 1], faces[:, :, 1, 2] = c, b, d
+    return faces.reshape(-1, 3)
+
+
+def cap_faces(n_rings, sides, n_vertices):
+    """
+    両端を閉じる三角形（扇形）。端の中心点は頂点配列の最後（n_vertices, n_vertices+1）に足す前提。
+    """
+    k = np.arange(sides)
+    k1 = (k + 1) % sides
+    start = np.column_stack([np.full(sides, n_vertices), k1, k])
+    last = (n_rings - 1) * sides
+    end = np.column_stack([np.full(sides, n_vertices + 1), last + k, last + k1])
+    return np.concatenate([start, end])
+
+
+def tube_mesh(points, radius, sides, capping=False):
+    """
+    中心線 points (M,3) から管のメッシュを作り、(頂点 (V,3), 三角形 (F,3)) を返す。
+    radius はスカラーか点ごとの (M,) 配列（smooth_radius で整えたものなど）。
+    capping=True なら両端を閉じる（TubeFromCenterline.cpp の既定は閉じない）。
+    """
+    if sides < 3:
+        raise ValueError("辺の数（nTv）は 3 以上にしてください。")
+    points = np.asarray(points, dtype=float)
+    keep = distinct_points(points)
+    points = points[keep]
+    if np.ndim(radius):
+        radius = np.asarray(radius, dtype=float)[keep]
+    if len(points) < 2:
+        raise ValueError("有効な点が 2 点未満のため、管を作れません。")
+
+    _, n, b = parallel_transport_frames(points)
+    vertices = ring_vertices(points, n, b, radius, sides)
+    faces = tube_faces(len(points), sides)
+
+    if capping:
+        faces = np.concatenate([faces, cap_faces(len(points), sides, len(vertices))])
+        vertices = np.concatenate([vertices, points[[0, -1]]])
+    return vertices, faces
+
+
+def output_path_for(path, radius, sides, output_dir=None, fmt="stl"):
+    """
+    '<stem>_radius{r}_nTv{n}.stl'（r の書式は C++ の既定 = %g と同じ）。
+    点ごとの半径を使った場合は r の代わりに 'var' を付ける。PLY なら拡張子は .ply。
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_dir = output_dir or os.path.dirname(os.path.abspath(path))
+    r = "var" if radius is None else f"{radius:g}"
+    return os.path.join(out_dir, f"{stem}_radius{r}_nTv{sides}{mesh_extension(fmt)}")
+
+
+def task_radius(task, points, point_radius):
+    """タスクの設定から、メッシュに使う半径（スカラーまたは点ごとの配列）を決める"""
+    if not task.get("vary_radius"):
+        return task["radius"]
+    if point_radius is None:
+        raise ValueError("点ごとの半径（radius / MaximumInscribedSphereRadius）が見つかりません。")
+    return smooth_radius(points, point_radius, task.get("smooth", 0.0), task.get("max_slope"))
+
+
+def mesh_task(task):
+    """1本分のメッシュを作って書き出す（プロセスプールのワーカーで実行される）"""
+    points = task.get("points")
+    point_radius = task.get("point_radius")
+    if points is None:
+        points, point_radius = load_centerline(task["path"], task.get("radius_column"))
+    radius = task_radius(task, points, point_radius)
+
+    vertices, faces = tube_mesh(points, radius, task["sides"], task["capping"])
+    out_radius = None if task.get("vary_radius") else task["radius"]
+    fmt = task.get("format", "stl")
+    out_path = output_path_for(task["path"], out_radius, task["sides"], task["output_dir"], fmt)
+    write_mesh(out_path, vertices, faces, fmt)
+    return out_path, len(faces)
+
+
+def store_tasks(store_path, variant, base_task):
+    """中心線ストアの variant の中心線を、mesh_task に渡すタスクにする"""
+    from centerline_store import CenterlineStore
+
+    store = CenterlineStore.load(store_path)
+    tasks = []
+    for i in store.select(variant=variant):
+        e = store.entry(i)
+        name = f"{e['subject']}_{e['side']}_{e['variant']}.csv"
+        radius = e["radius"] if np.isfinite(e["radius"]).any() else None
+        tasks.append(dict(base_task, path=name, points=np.array(e["points"]),
+                          point_radius=None if radius is None else np.array(radius)))
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="中心線CSVから管の三角形メッシュ（STL）を作る（TubeFromCenterline の一括処理版）"
+    )
+    parser.add_argument("files", nargs="*", help="入力CSVファイル（複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの *.csv をすべて処理する")
+    parser.add_argument("--glob", default="*.csv", help="--dir で対象にするファイルのパターン（既定: *.csv）")
+    parser.add_argument("--store", help="中心線ストア（.npz）の中心線を処理する")
+    parser.add_argument("--variant", default="original", help="--store 使用時の対象（既定: original）")
+    parser.add_argument("-r", "--radius", type=float, default=0.8, help="管の半径（既定: 0.8）")
+    parser.add_argument("-n", "--nTv", type=int, default=32, help="周方向の辺の数（既定: 32）")
+    parser.add_argument("--capping", action="store_true", help="両端を閉じる")
+    parser.add_argument(
+        "--vary-radius", action="store_true",
+        help="-r の代わりに点ごとの半径（radius / MaximumInscribedSphereRadius）を使う"
+    )
+    parser.add_argument("--radius-column", help="--vary-radius で使う列名・配列名（既定: 自動）")
+    parser.add_argument(
+        "--smooth", type=float, default=0.0,
+        help="--vary-radius の半径を弧長に沿って平滑化する幅（ガウスの標準偏差）。既定: 0（しない）"
+    )
+    parser.add_argument(
+        "--max-slope", type=float,
+        help="--vary-radius の半径の傾き |dr/ds| の上限（急な膨らみを削る）"
+    )
+    parser.add_argument(
+        "--format", choices=MESH_FORMATS, default="stl",
+        help="出力形式（stl: バイナリSTL（既定） / stl-ascii: ASCII STL / ply: バイナリPLY）"
+    )
+    parser.add_argument("-o", "--output-dir", help="出力先ディレクトリ（既定: 入力と同じ場所）")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+
+    args = parser.parse_args()
+    if args.radius <= 0.0:
+        parser.error("半径は正の値にしてください。")
+    if args.nTv < 3:
+        parser.error("辺の数は 3 以上にしてください。")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    base_task = {
+        "radius": args.radius,
+        "sides": args.nTv,
+        "capping": args.capping,
+        "output_dir": args.output_dir,
+        "format": args.format,
+        "vary_radius": args.vary_radius,
+        "radius_column": args.radius_column,
+        "smooth": args.smooth,
+        "max_slope": args.max_slope,
+    }
+
+    if args.store:
+        if not args.output_dir:
+            base_task["output_dir"] = os.path.dirname(os.path.abspath(args.store))
+        tasks = store_tasks(args.store, args.variant, base_task)
+    else:
+        files = list(args.files)
+        if args.dir:
+            files += sorted(glob.glob(os.path.join(args.dir, args.glob)))
+        tasks = [dict(base_task, path=f) for f in files]
+
+    if not tasks:
+        parser.error("入力ファイル・--dir・--store のいずれかを指定してください。")
+
+    for task, result, error in iter_parallel(mesh_task, tasks, args.workers):
+        if error is not None:
+            report_error(task["path"], error)
+            continue
+        out_path, n_faces = result
+        print(f"{os.path.basename(task['path'])} -> {out_path} ({n_faces} triangles)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+vtk_set/*_ColorCoded.CNG.swc.vtk のような血管の木（LINES セルが枝ごとに分かれたもの）の
+つながり（トポロジー）を、CSR 形式の隣接表にまとめて扱うモジュール。
+
+LINES・SegmentIndex・Domain・MaximumInscribedSphereRadius（SWC なら swc_io で作った枝）を1回だけ読み、
+  - 点の隣接表（CSR: indptr / indices / 辺の長さ / 辺の属する枝）と次数
+    → 端点（次数 1）・分岐点（次数 3 以上）
+  - 枝どうしの隣接表（同じ点を共有する枝）
+  - 親の枝（子の枝の最初の点を途中に持つ枝）、子の枝の表、深さ
+  - 枝ごとの長さ・平均半径、部分木（その枝から先）の長さ
+をすべて配列でまとめて計算する。部分木は行きがけ順に並べてあるので、
+ある枝の部分木は preorder[tin[s]:tin[s] + subtree_size[s]] で取り出せる。
+
+計算した配列は to_arrays() で dict にでき、stage_cache に保存しておけば
+2回目からは VTK を読み直さずに使える（load_vessel_network）。
+
+使い方:
+    network = load_vessel_network("../data/vtk_set/BG0002_ColorCoded.CNG.swc.vtk")
+    network.bifurcations(), network.segment_length, network.subtree(0)
+
+  python vessel_graph.py -d ../data/vtk_set -o networks.csv --segments segments.csv
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from parallel_batch import iter_parallel, report_error
+from stage_cache import add_cache_arguments, cached, configure_cache_from_args
+
+# to_arrays() / from_arrays() で受け渡す配列
+NETWORK_ARRAYS = (
+    "points", "radius", "offsets", "connectivity", "domain", "segment_index",
+    "adj_indptr", "adj_indices", "adj_length", "adj_segment",
+    "seg_adj_indptr", "seg_adj_indices",
+    "parent", "child_indptr", "child_indices", "depth",
+    "preorder", "tin", "subtree_size", "subtree_length",
+    "segment_length", "segment_mean_radius",
+)
+
+# 1本ごとの要約の列
+SUMMARY_FIELDS = [
+    "file_name", "n_points", "n_segments", "n_domains", "n_endpoints", "n_bifurcations",
+    "n_roots", "max_depth", "total_length", "mean_radius",
+]
+
+
+def _csr(rows, cols, n_rows, *values):
+    """(行, 列[, 値...]) の組を行の順に並べ、(indptr, 列, 値...) の CSR にする"""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return (indptr, cols[order]) + tuple(v[order] for v in values)
+
+
+def _shared_pairs(groups, members):
+    """
+    同じ groups の値を持つ members の組 (i, j)（i != j, 両向き）をまとめて求める。
+    点を共有する枝の組を作るのに使う。
+    """
+    keys = np.unique(np.column_stack([groups, members]), axis=0)
+    groups, members = keys[:, 0], keys[:, 1]
+    _, first, size = np.unique(groups, return_index=True, return_counts=True)
+    # 各要素から、同じグループの後ろの要素との組を作る
+    group_end = np.repeat(first + size, size)
+    k = np.arange(len(groups))
+    n_after = group_end - k - 1
+    left = np.repeat(k, n_after)
+    right = left + 1 + (np.arange(n_after.sum()) - np.repeat(np.cumsum(n_after) - n_after, n_after))
+    a, b = members[left], members[right]
+    return np.concatenate([a, b]), np.concatenate([b, a])
+
+
+class VesselNetwork:
+    """
+    血管の木1つ分の点・枝と、そのつながりの表。
+    VesselNetwork(points, offsets, connectivity, radius, domain, segment_index) で作るか、
+    load_vessel_network(path) で読み込む。
+    """
+
+    def __init__(self, points, offsets, connectivity, radius=None, domain=None, segment_index=None, name=""):
+        self.name = name
+        self.points = np.asarray(points, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.connectivity = np.asarray(connectivity, dtype=np.int64)
+        n_seg = len(self.offsets) - 1
+        self.radius = (np.full(len(self.points), np.nan) if radius is None
+                       else np.asarray(radius, dtype=float))
+        self.domain = np.zeros(n_seg, dtype=np.int64) if domain is None else np.asarray(domain, dtype=np.int64)
+        self.segment_index = (np.arange(n_seg) if segment_index is None
+                              else np.asarray(segment_index, dtype=np.int64))
+        self._build()
+
+    @classmethod
+    def from_file(cls, path):
+        """LINES の VTK か SWC から作る"""
+        from network_mesh import load_network
+
+        net = load_network(path)
+        return cls(net["points"], net["offsets"], net["connectivity"], net["radius"],
+                   net["domain"], net["segment_index"], name=os.path.basename(path))
+
+    def to_arrays(self):
+        """キャッシュや共有メモリに渡すための {名前: 配列}（名前は NETWORK_ARRAYS）"""
+        return {k: getattr(self, k) for k in NETWORK_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays, name=""):
+        """to_arrays() の配列から作る（つながりは計算し直さない）"""
+        self = cls.__new__(cls)
+        self.name = name
+        for k in NETWORK_ARRAYS:
+            setattr(self, k, arrays[k])
+        return self
+
+    # ---- 作成 ----
+    def _build(self):
+        points, offsets, conn = self.points, self.offsets, self.connectivity
+        n_points, n_seg = len(points), len(offsets) - 1
+        counts = np.diff(offsets)
+        entry_seg = np.repeat(np.arange(n_seg), counts)
+
+        # 点の隣接表: 同じ枝で隣り合う点を両向きにつなぐ
+        same = entry_seg[1:] == entry_seg[:-1]
+        a, b = conn[:-1][same], conn[1:][same]
+        edge_seg = entry_seg[:-1][same]
+        edge_len = np.linalg.norm(points[b] - points[a], axis=1)
+        self.adj_indptr, self.adj_indices, self.adj_length, self.adj_segment = _csr(
+            np.concatenate([a, b]), np.concatenate([b, a]), n_points,
+            np.concatenate([edge_len, edge_len]), np.concatenate([edge_seg, edge_seg]),
+        )
+
+        # 枝ごとの長さ・平均半径
+        self.segment_length = np.bincount(edge_seg, weights=edge_len, minlength=n_seg)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.segment_mean_radius = np.bincount(entry_seg, weights=self.radius[conn], minlength=n_seg) / counts
+
+        # 枝どうしの隣接表（同じ点を共有する枝）
+        sa, sb = _shared_pairs(conn, entry_seg)
+        self.seg_adj_indptr, self.seg_adj_indices = _csr(sa, sb, n_seg)
+
+        # 親の枝: 子の枝の最初の点を、最初の点以外の位置に持つ枝
+        nonempty = counts > 0
+        is_first = np.zeros(len(conn), dtype=bool)
+        is_first[offsets[:-1][nonempty]] = True
+        owner = np.full(n_points, -1, dtype=np.int64)
+        owner[conn[~is_first]] = entry_seg[~is_first]
+        parent = np.full(n_seg, -1, dtype=np.int64)
+        parent[nonempty] = owner[conn[offsets[:-1][nonempty]]]
+        parent[parent == np.arange(n_seg)] = -1
+        self.parent = parent
+
+        has_parent = np.flatnonzero(parent >= 0)
+        self.child_indptr, self.child_indices = _csr(parent[has_parent], has_parent, n_seg)
+
+        # 深さ: 親をたどる（ポインタを1段ずつ全枝まとめて進める）
+        depth = np.zeros(n_seg, dtype=np.int64)
+        anc = parent.copy()
+        for _ in range(n_seg):
+            alive = anc >= 0
+            if not alive.any():
+                break
+            depth += alive
+            anc[alive] = parent[anc[alive]]
+        self.depth = depth
+
+        # 部分木の大きさ・長さ: 深い枝から親に足し上げる
+        size = np.ones(n_seg, dtype=np.int64)
+        sub_len = self.segment_length.copy()
+        for d in range(int(depth.max(initial=0)), 0, -1):
+            at = np.flatnonzero((depth == d) & (parent >= 0))
+            np.add.at(size, parent[at], size[at])
+            np.add.at(sub_len, parent[at], sub_len[at])
+        self.subtree_size = size
+        self.subtree_length = sub_len
+
+        # 行きがけ順（部分木が連続した範囲になる）
+        preorder = np.empty(n_seg, dtype=np.int64)
+        stack = list(np.flatnonzero(parent < 0)[::-1])
+        k = 0
+        while stack:
+            s = stack.pop()
+            preorder[k] = s
+            k += 1
+            stack.extend(self.child_indices[self.child_indptr[s]:self.child_indptr[s + 1]][::-1])
+        self.preorder = preorder[:k]
+        self.tin = np.full(n_seg, -1, dtype=np.int64)
+        self.tin[self.preorder] = np.arange(k)
+
+    # ---- 点 ----
+    @property
+    def n_points(self):
+        return len(self.points)
+
+    @property
+    def degree(self):
+        """各点の次数（隣の点の数）"""
+        return np.diff(self.adj_indptr)
+
+    def point_neighbors(self, i):
+        """点 i の隣の点と、その辺の長さ"""
+        lo, hi = self.adj_indptr[i], self.adj_indptr[i + 1]
+        return self.adj_indices[lo:hi], self.adj_length[lo:hi]
+
+    def endpoints(self):
+        """端点（次数 1 の点）のインデックス"""
+        return np.flatnonzero(self.degree == 1)
+
+    def bifurcations(self):
+        """分岐点（次数 3 以上の点）のインデックス"""
+        return np.flatnonzero(self.degree >= 3)
+
+    def junctions(self):
+        """2本以上の枝が共有する点のインデックス（network_mesh.junction_points と同じ）"""
+        owners = np.bincount(self.connectivity, minlength=self.n_points)
+        return np.flatnonzero(owners >= 2)
+
+    # ---- 枝 ----
+    @property
+    def n_segments(self):
+        return len(self.offsets) - 1
+
+    def segment_points(self, s):
+        """枝 s の点のインデックス（線の順）"""
+        return self.connectivity[self.offsets[s]:self.offsets[s + 1]]
+
+    def segment_neighbors(self, s):
+        """枝 s と点を共有する枝"""
+        return self.seg_adj_indices[self.seg_adj_indptr[s]:self.seg_adj_indptr[s + 1]]
+
+    def children(self, s):
+        """枝 s から分かれる子の枝"""
+        return self.child_indices[self.child_indptr[s]:self.child_indptr[s + 1]]
+
+    def roots(self):
+        """親の無い枝"""
+        return np.flatnonzero(self.parent < 0)
+
+    def ancestors(self, s):
+        """枝 s の親・その親…（近い順）"""
+        out = []
+        s = self.parent[s]
+        while s >= 0 and len(out) < self.n_segments:
+            out.append(int(s))
+            s = self.parent[s]
+        return np.array(out, dtype=np.int64)
+
+    def subtree(self, s):
+        """枝 s とその先の枝すべて（行きがけ順）"""
+        return self.preorder[self.tin[s]:self.tin[s] + self.subtree_size[s]]
+
+    def domain_segments(self, domain):
+        """Domain が domain の枝"""
+        return np.flatnonzero(self.domain == domain)
+
+    def segment_table(self):
+        """枝ごとの表（1行1枝）"""
+        return pd.DataFrame({
+            "segment": np.arange(self.n_segments),
+            "segment_index": self.segment_index,
+            "domain": self.domain,
+            "parent": self.parent,
+            "depth": self.depth,
+            "n_points": np.diff(self.offsets),
+            "n_children": np.diff(self.child_indptr),
+            "length": self.segment_length,
+            "mean_radius": self.segment_mean_radius,
+            "subtree_segments": self.subtree_size,
+            "subtree_length": self.subtree_length,
+        })
+
+    def summary(self):
+        """ネットワーク全体の要約"""
+        return {
+            "file_name": self.name,
+            "n_points": self.n_points,
+            "n_segments": self.n_segments,
+            "n_domains": len(np.unique(self.domain)),
+            "n_endpoints": len(self.endpoints()),
+            "n_bifurcations": len(self.bifurcations()),
+            "n_roots": len(self.roots()),
+            "max_depth": int(self.depth.max(initial=0)),
+            "total_length": float(self.segment_length.sum()),
+            "mean_radius": float(np.nanmean(self.radius)) if np.isfinite(self.radius).any() else float("nan"),
+        }
+
+
+def load_vessel_network(path):
+    """
+    血管の木の VTK（または SWC）を読み、VesselNetwork を返す。
+    キャッシュが有効なら、つながりの表は内容が同じファイルにつき1回だけ計算する。
+    """
+    arrays = cached("vessel_network", [path], {}, lambda: VesselNetwork.from_file(path).to_arrays())
+    return VesselNetwork.from_arrays(arrays, name=os.path.basename(path))
+
+
+def network_task(path):
+    """ネットワーク1つの要約と枝の表（プロセスプールのワーカーで実行される）"""
+    network = load_vessel_network(path)
+    return network.summary(), network.segment_table()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="血管の木の VTK から、つながり（端点・分岐・枝の親子）の表を作る")
+    parser.add_argument("files", nargs="*", help="血管の木の VTK / SWC（複数指定可）")
+    parser.add_argument("-d", "--dir", help="このディレクトリの *.vtk / *.swc をすべて処理する")
+    parser.add_argument("-o", "--output", default="vessel_networks.csv",
+                        help="1ネットワーク1行の要約（既定: vessel_networks.csv）")
+    parser.add_argument("--segments", help="全ネットワークの枝ごとの表を書き出す CSV")
+    parser.add_argument("-j", "--workers", type=int, help="並列プロセス数（既定: CPU コア数）")
+    add_cache_arguments(parser)
+
+    args = parser.parse_args()
+    configure_cache_from_args(args)
+
+    files = list(args.files)
+    if args.dir:
+        files += sorted(glob.glob(os.path.join(args.dir, "*.vtk")) + glob.glob(os.path.join(args.dir, "*.swc")))
+    if not files:
+        parser.error("入力ファイルか --dir を指定してください。")
+
+    start = time.perf_counter()
+    summaries, tables = [], []
+    for path, result, error in iter_parallel(network_task, files, args.workers):
+        if error is not None:
+            report_error(path, error)
+            continue
+        summary, table = result
+        summaries.append(summary)
+        tables.append(table.assign(file_name=summary["file_name"]))
+
+    summary_df = pd.DataFrame(summaries, columns=SUMMARY_FIELDS).sort_values("file_name", ignore_index=True)
+    summary_df.to_csv(args.output, index=False)
+    if args.segments and tables:
+        seg = pd.concat(tables, ignore_index=True)
+        seg = seg[["file_name"] + [c for c in seg.columns if c != "file_name"]]
+        seg.sort_values(["file_name", "segment"]).to_csv(args.segments, index=False)
+
+    print(summary_df.drop(columns="file_name").describe().loc[["mean", "min", "max"]].round(2).to_string())
+    print(f"{len(summary_df)} ネットワークを {time.perf_counter() - start:.2f} 秒で処理し、{args.output} に書き出しました。")
+
+
+if __name__ == "__main__":
+    main()
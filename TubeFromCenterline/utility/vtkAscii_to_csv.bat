@@ -1,18 +1,25 @@
 @echo off
 setlocal
 
+rem VTK（ASCII / BINARY）をまとめて CSV に変換する（pipeline.py の points 段だけを実行する）。
+rem Python の起動は1回だけで、前回から中身が変わっていない VTK は変換し直さない。
+rem 再サンプリング・半径・指標・メッシュ・統計まで通すときは pipeline.py を直接使う。
+rem
+rem 使い方: vtkAscii_to_csv.bat [VTKのフォルダ]
+
 rem ===== 設定ここから =====
 rem Python 実行コマンド（必要なら python.exe のフルパスに変更）
 set "PYTHON=python"
 
-rem vtk_to_csv.py のパス（この bat と同じフォルダにある想定）
-set "SCRIPT=%~dp0vtkAscii_to_csv.py"
+rem pipeline.py のパス（この bat と同じフォルダにある想定）
+set "SCRIPT=%~dp0pipeline.py"
 
-rem VTK ASCII ファイルが置いてあるディレクトリ
-set "INPUT_DIR=D:\vessel-surface-reconstruction\TubeFromCenterline\data\10_siphon(MCA_ICA)\output_vtkAscii"
+rem VTK ファイルが置いてあるディレクトリ（引数で指定しなければ既定のフォルダ）
+set "INPUT_DIR=%~1"
+if "%INPUT_DIR%"=="" set "INPUT_DIR=%~dp0..\data\10_siphon(MCA_ICA)\output_vtkAscii"
 
-rem 出力 CSV フォルダ（INPUT_DIR の親フォルダと同じ階層に output_csv を作る）
-for %%A in ("%INPUT_DIR%\..") do set "OUTPUT_DIR=%%~fA\output_csv"
+rem 出力先（INPUT_DIR の親フォルダ。CSV はその下の output_csv にできる）
+for %%A in ("%INPUT_DIR%\..") do set "OUTPUT_ROOT=%%~fA"
 rem ===== 設定ここまで =====
 
 if not exist "%SCRIPT%" (
@@ -27,31 +34,8 @@ if not exist "%INPUT_DIR%" (
     exit /b 1
 )
 
-if not exist "%OUTPUT_DIR%" (
-    echo 出力フォルダ "%OUTPUT_DIR%" を作成します。
-    mkdir "%OUTPUT_DIR%"
-)
-
-echo.
-echo 入力フォルダ: "%INPUT_DIR%"
-echo 出力フォルダ: "%OUTPUT_DIR%"
-echo.
-
-rem *.vtk を順に処理
-for %%F in ("%INPUT_DIR%\*.vtk") do (
-    echo Converting "%%~nxF" ...
-
-    rem Python スクリプトを CLI モードで実行
-    "%PYTHON%" "%SCRIPT%" "%%F"
-
-    rem Python スクリプトは同じディレクトリに CSV を出すので、
-    rem それを output_csv フォルダに移動
-    if exist "%%~dpF%%~nF.csv" (
-        move /Y "%%~dpF%%~nF.csv" "%OUTPUT_DIR%\"
-    ) else (
-        echo   -> WARNING: "%%~nxF" に対応する CSV が見つかりません。
-    )
-)
+"%PYTHON%" "%SCRIPT%" "%INPUT_DIR%" -o "%OUTPUT_ROOT%" --stages points
+if errorlevel 1 echo WARNING: 変換できなかったファイルがあります。
 
 echo.
 echo すべての変換処理が終了しました。
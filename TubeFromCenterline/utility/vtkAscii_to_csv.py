@@ -1,41 +1,61 @@
-import re
 import pandas as pd
-import tkinter as tk
-from tkinter import filedialog, messagebox
 import os
 import sys  # ← 追加
-
-def vtk_to_csv(vtk_path):
-    """VTKファイルを読み取り、x,y,z座標をCSVに変換"""
-    with open(vtk_path, "r") as f:
-        vtk_text = f.read()
-
-    # POINTSセクションを正規表現で抽出
-    match = re.search(r"POINTS\s+\d+\s+\w+\s+([\s\S]*?)(?:\n[A-Z]|$)", vtk_text)
-    if not match:
-        raise ValueError("POINTS セクションが見つかりません。")
-
-    points_text = match.group(1)
-
-    # 数値を抽出して3列ごとにグループ化
-    numbers = [float(n) for n in points_text.split()]
-    if len(numbers) % 3 != 0:
-        raise ValueError("POINTS の数値が3の倍数ではありません。")
-
-    points = [numbers[i:i+3] for i in range(0, len(numbers), 3)]
-    df = pd.DataFrame(points, columns=["x", "y", "z"])
+import argparse
+
+# GUI 用（引数が無いときに使う）
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+except ImportError:
+    tk = None
+    filedialog = None
+    messagebox = None
+
+from stage_cache import add_cache_arguments, configure_cache_from_args, cached
+from vtk_legacy_reader import read_vtk_polydata
+
+
+def vtk_to_csv(vtk_path, include_point_data=False, csv_path=None):
+    """
+    VTKファイル（ASCII / BINARY どちらでも可）を読み取り、x,y,z座標をCSVに変換。
+    include_point_data=True のときは、点ごとの1成分配列
+    （MaximumInscribedSphereRadius, curvature, torsion, lab など）も列として出力する。
+    csv_path を省略すると、VTK と同じ場所に <ファイル名>.csv で書き出す。
+    """
+    def convert():
+        data = read_vtk_polydata(vtk_path)
+        points = data["points"]
+        if points.shape[0] == 0:
+            raise ValueError("POINTS セクションが見つかりません。")
+
+        df = pd.DataFrame(points, columns=["x", "y", "z"])
+        if include_point_data:
+            for name, values in data["point_data"].items():
+                if values.ndim == 1 and len(values) == len(df):
+                    df[name] = values
+
+        # CSVの中身（ASCII VTK と同じ有効桁数 11 桁で書く）
+        return df.to_csv(index=False, float_format="%.11g")
+
+    # キャッシュが有効なら、内容が前回と同じVTKは変換し直さない
+    text = cached("vtk_to_csv", [vtk_path], {"include_point_data": include_point_data}, convert)
 
     # 出力ファイル名を決定
-    base = os.path.splitext(vtk_path)[0]
-    csv_path = base + ".csv"
+    if csv_path is None:
+        csv_path = os.path.splitext(vtk_path)[0] + ".csv"
 
-    # CSV出力
-    df.to_csv(csv_path, index=False)
+    with open(csv_path, "w", newline="") as f:
+        f.write(text)
     return csv_path
 
 
 def main_gui():
     """GUIでVTKファイルを選択してCSVに変換"""
+    if tk is None:
+        print("tkinter が利用できないため、GUIでの選択は使えません。引数に VTK ファイルを指定してください。", file=sys.stderr)
+        return
+
     root = tk.Tk()
     root.withdraw()  # メインウィンドウ非表示
 
@@ -61,9 +81,19 @@ def main_gui():
 def main():
     # 1個以上の引数がある場合は、CLIモードで処理（Tk は使わない）
     if len(sys.argv) > 1:
-        for vtk_path in sys.argv[1:]:
+        parser = argparse.ArgumentParser(description="VTK（ASCII / BINARY）を x,y,z の CSV に変換する")
+        parser.add_argument("files", nargs="+", help="入力VTKファイル")
+        parser.add_argument(
+            "--point-data", action="store_true",
+            help="点ごとの配列（MaximumInscribedSphereRadius など）も列として出力する"
+        )
+        add_cache_arguments(parser)
+        args = parser.parse_args()
+        configure_cache_from_args(args)
+
+        for vtk_path in args.files:
             try:
-                csv_path = vtk_to_csv(vtk_path)
+                csv_path = vtk_to_csv(vtk_path, include_point_data=args.point_data)
                 print(f"Converted: {vtk_path} -> {csv_path}")
             except Exception as e:
                 print(f"Error converting {vtk_path}: {e}")
@@ -7,6 +7,9 @@ ASCII 形式の legacy VTK (*.vtk) として保存するスクリプト（GUI版
 
 - 起動するとファイル選択ダイアログが開くので、入力 .vtk を選択する。
 - 続いて、出力ファイル名を指定するダイアログが開く。
+
+※ CSV 化だけが目的なら、vtkAscii_to_csv.py（vtk_legacy_reader.py）が
+  バイナリの VTK を直接読めるので、この変換は不要。
 """
 
 import os
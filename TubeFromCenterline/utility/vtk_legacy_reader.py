@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+legacy VTK (*.vtk, POLYDATA) を NumPy だけで読み込むモジュール。
+
+- ASCII / BINARY のどちらにも対応（BINARY はビッグエンディアン）。
+- ファイルバージョン 5.1 の OFFSETS / CONNECTIVITY 形式と、
+  それ以前の "n id0 id1 ..." 形式のセル配列の両方を読める。
+- POINTS, VERTICES/LINES/POLYGONS/TRIANGLE_STRIPS,
+  POINT_DATA / CELL_DATA の SCALARS・VECTORS・NORMALS・FIELD 配列を取り出す。
+
+vtk パッケージや vtk_binary_to_ascii.py による ASCII 変換を経由せずに、
+バイナリの VTK から直接座標や curvature / torsion / lab などを取得できる。
+
+ファイルはメモリマップで開き、最初に各セクションの位置だけを調べておく。
+VtkLegacyFile を使えば、POINTS だけ・スカラー1つだけ、のように
+必要な配列だけを取り出せる（BINARY ならコピーせずにビューを返す）。
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from mapped_io import open_mapped, parse_ascii_block
+
+
+# legacy VTK のデータ型名 → NumPy dtype（BINARY はビッグエンディアン）
+_VTK_DTYPES = {
+    "bit": "u1",
+    "unsigned_char": "u1",
+    "char": "i1",
+    "unsigned_short": ">u2",
+    "short": ">i2",
+    "unsigned_int": ">u4",
+    "int": ">i4",
+    "unsigned_long": ">u8",
+    "long": ">i8",
+    "float": ">f4",
+    "double": ">f8",
+    "vtkidtype": ">i4",
+    "vtktypeint32": ">i4",
+    "vtktypeint64": ">i8",
+    "vtktypeuint32": ">u4",
+    "vtktypeuint64": ">u8",
+}
+
+_CELL_KEYWORDS = ("VERTICES", "LINES", "POLYGONS", "TRIANGLE_STRIPS")
+
+# ASCII のデータ部の終わり（= 次のキーワード行の先頭）を探す。
+# 英字で始まる行をキーワード行とみなすが、nan / inf は数値として扱う。
+_ASCII_HEADER_LINE = re.compile(
+    rb"^[ \t]*(?![+-]?(?:nan|inf)\b)[A-Za-z_]", re.MULTILINE | re.IGNORECASE
+)
+
+# ファイル内のデータ部1つ分の位置情報
+#   offset, end : データ部のバイト位置 [offset, end)
+#   count       : 値の個数
+#   dtype       : 値の型（BINARY ならビッグエンディアン）
+#   shape       : 取り出すときの配列形状
+_Section = namedtuple("_Section", "offset end count dtype shape")
+
+
+def _vtk_dtype(type_name, binary):
+    """legacy VTK の型名から NumPy dtype を返す"""
+    try:
+        dt = np.dtype(_VTK_DTYPES[type_name.lower()])
+    except KeyError:
+        raise ValueError(f"未対応のデータ型です: {type_name}")
+    if not binary:
+        # ASCII はテキストから読むのでネイティブのバイト順でよい
+        dt = dt.newbyteorder("=")
+    return dt
+
+
+class _Cursor:
+    """バッファ上を先頭から順に読み進め、データ部の位置を記録するためのヘルパー"""
+
+    def __init__(self, buf, binary):
+        self.buf = buf
+        self.pos = 0
+        self.binary = binary
+
+    def at_end(self):
+        return self.pos >= len(self.buf)
+
+    def skip_blank(self):
+        buf = self.buf
+        n = len(buf)
+        while self.pos < n and buf[self.pos:self.pos + 1] in (b" ", b"\t", b"\r", b"\n"):
+            self.pos += 1
+
+    def read_raw_line(self):
+        """現在位置から改行までをそのまま返す（タイトル行など空行もありうる行用）"""
+        end = self.buf.find(b"\n", self.pos)
+        if end < 0:
+            end = len(self.buf)
+        line = self.buf[self.pos:end].rstrip(b"\r")
+        self.pos = end + 1
+        return line
+
+    def read_line(self):
+        """空白行を飛ばして次の1行をトークンに分割して返す（EOF なら None）"""
+        self.skip_blank()
+        if self.at_end():
+            return None
+        return self.read_raw_line().decode("ascii", errors="replace").split()
+
+    def peek_keyword(self):
+        """次の行の先頭トークンを（位置を進めずに）大文字で返す"""
+        save = self.pos
+        tokens = self.read_line()
+        self.pos = save
+        return tokens[0].upper() if tokens else None
+
+    def skip_values(self, count, dtype, shape=None):
+        """count 個の値のデータ部を読み飛ばし、その位置を _Section で返す"""
+        start = self.pos
+        if self.binary:
+            end = start + count * dtype.itemsize
+            if end > len(self.buf):
+                raise ValueError("バイナリデータがファイル末尾を超えています。")
+        else:
+            # ASCII: 次のキーワード行までがデータ部
+            m = _ASCII_HEADER_LINE.search(self.buf, start)
+            end = m.start() if m else len(self.buf)
+        self.pos = end
+        return _Section(start, end, count, dtype, shape if shape is not None else (count,))
+
+
+def _legacy_cells_to_offsets(flat):
+    """旧形式のセル配列 (n, id0, id1, ..., n, id0, ...) を offsets / connectivity に変換"""
+    offsets = [0]
+    conn_idx = []
+    pos = 0
+    total = len(flat)
+    while pos < total:
+        n = int(flat[pos])
+        conn_idx.append(np.arange(pos + 1, pos + 1 + n))
+        offsets.append(offsets[-1] + n)
+        pos += n + 1
+    if conn_idx:
+        connectivity = flat[np.concatenate(conn_idx)]
+    else:
+        connectivity = flat[:0]
+    return np.asarray(offsets, dtype=np.int64), connectivity.astype(np.int64)
+
+
+def _index_cells(cur, header, version):
+    """
+    VERTICES / LINES などのセル配列の位置を調べる。
+    5.x 形式なら (offsets, connectivity) の2つ、旧形式なら (flat,) の1つを返す。
+    """
+    n_a, n_b = int(header[1]), int(header[2])
+
+    if version >= (5, 0):
+        # 5.x: "LINES <offsets数> <connectivity数>" に続いて OFFSETS / CONNECTIVITY
+        sub = cur.read_line()
+        if not sub or sub[0].upper() != "OFFSETS":
+            raise ValueError(f"{header[0]} の OFFSETS が見つかりません。")
+        offsets = cur.skip_values(n_a, _vtk_dtype(sub[1], cur.binary))
+        sub = cur.read_line()
+        if not sub or sub[0].upper() != "CONNECTIVITY":
+            raise ValueError(f"{header[0]} の CONNECTIVITY が見つかりません。")
+        connectivity = cur.skip_values(n_b, _vtk_dtype(sub[1], cur.binary))
+        return (offsets, connectivity)
+
+    # 旧形式: "LINES <セル数> <総数>" に続いて int の並び
+    return (cur.skip_values(n_b, _vtk_dtype("int", cur.binary)),)
+
+
+def _index_attribute(cur, header, n_tuples, sections):
+    """
+    POINT_DATA / CELL_DATA 内の属性1つの位置を調べ、sections に追加する。
+    FIELD の場合は含まれる配列をすべて追加する。
+    """
+    keyword = header[0].upper()
+
+    if keyword == "SCALARS":
+        name, type_name = header[1], header[2]
+        n_comp = int(header[3]) if len(header) > 3 else 1
+        # 続く LOOKUP_TABLE 行（省略されることもある）
+        if cur.peek_keyword() == "LOOKUP_TABLE":
+            cur.read_line()
+        shape = (n_tuples, n_comp) if n_comp > 1 else (n_tuples,)
+        sections[name] = cur.skip_values(
+            n_tuples * n_comp, _vtk_dtype(type_name, cur.binary), shape
+        )
+
+    elif keyword in ("VECTORS", "NORMALS"):
+        name, type_name = header[1], header[2]
+        sections[name] = cur.skip_values(
+            n_tuples * 3, _vtk_dtype(type_name, cur.binary), (n_tuples, 3)
+        )
+
+    elif keyword == "TENSORS":
+        name, type_name = header[1], header[2]
+        sections[name] = cur.skip_values(
+            n_tuples * 9, _vtk_dtype(type_name, cur.binary), (n_tuples, 3, 3)
+        )
+
+    elif keyword == "TEXTURE_COORDINATES":
+        name, dim, type_name = header[1], int(header[2]), header[3]
+        sections[name] = cur.skip_values(
+            n_tuples * dim, _vtk_dtype(type_name, cur.binary), (n_tuples, dim)
+        )
+
+    elif keyword == "COLOR_SCALARS":
+        name, n_comp = header[1], int(header[2])
+        dt = np.dtype("u1") if cur.binary else np.dtype(float)
+        sections[name] = cur.skip_values(n_tuples * n_comp, dt, (n_tuples, n_comp))
+
+    elif keyword == "LOOKUP_TABLE":
+        # データ属性としての LOOKUP_TABLE（色テーブル）は読み飛ばす
+        n_entries = int(header[2])
+        dt = np.dtype("u1") if cur.binary else np.dtype(float)
+        cur.skip_values(n_entries * 4, dt)
+
+    elif keyword == "FIELD":
+        _index_field(cur, int(header[2]), sections)
+
+    else:
+        raise ValueError(f"未対応のデータ属性です: {header[0]}")
+
+
+def _index_field(cur, n_arrays, sections):
+    """FIELD ブロック内の配列 (name n_comp n_tuples type) の位置を調べる"""
+    for _ in range(n_arrays):
+        sub = cur.read_line()
+        if sub is None:
+            raise ValueError("FIELD 配列の途中でファイルが終わっています。")
+        if sub[0].upper() == "NULL_ARRAY":
+            continue
+        name, n_comp, n_tuples, type_name = sub[0], int(sub[1]), int(sub[2]), sub[3]
+        shape = (n_tuples, n_comp) if n_comp > 1 else (n_tuples,)
+        sections[name] = cur.skip_values(
+            n_comp * n_tuples, _vtk_dtype(type_name, cur.binary), shape
+        )
+        _skip_metadata(cur)
+
+
+def _skip_metadata(cur):
+    """配列の後ろに付く METADATA ブロックがあれば読み飛ばす"""
+    if cur.peek_keyword() != "METADATA":
+        return
+    cur.read_line()
+    _skip_metadata_body(cur)
+
+
+def _skip_metadata_body(cur):
+    """METADATA の中身（INFORMATION など）を空行まで読み飛ばす"""
+    while not cur.at_end():
+        if not cur.read_raw_line().strip():
+            return
+
+
+class VtkLegacyFile:
+    """
+    legacy VTK (POLYDATA) をメモリマップで開き、各データ部の位置を保持するクラス。
+
+    配列は必要になったときに、その部分だけを読み出す。
+    BINARY の場合、copy=False（既定）ではメモリマップ上のビュー
+    （ビッグエンディアンの dtype）を返すので、ファイルを開いている間だけ有効。
+    ファイルを閉じた後も使う場合や、値を書き換える場合は copy=True を指定する。
+
+        with VtkLegacyFile(path) as vf:
+            points = vf.points()
+            radius = vf.point_array("MaximumInscribedSphereRadius")
+    """
+
+    def __init__(self, vtk_path):
+        self.path = vtk_path
+        self._mm = open_mapped(vtk_path)
+        try:
+            self._build_index()
+        except Exception:
+            self.close()
+            raise
+
+    # ---- コンテキストマネージャ ----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """メモリマップを閉じる（ビューが残っている場合は、それが解放されたときに閉じる）"""
+        if self._mm is None:
+            return
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._mm = None
+
+    # ---- 位置の索引作成 ----
+    def _build_index(self):
+        cur = _Cursor(self._mm, binary=False)
+
+        # ---- ヘッダ（先頭4行） ----
+        version_line = cur.read_raw_line()
+        if not version_line.startswith(b"# vtk DataFile Version"):
+            raise ValueError(f"legacy VTK ファイルではありません: {self.path}")
+        m_ver = re.search(rb"Version\s+(\d+)\.(\d+)", version_line)
+        self.version = (int(m_ver.group(1)), int(m_ver.group(2))) if m_ver else (3, 0)
+
+        self.title = cur.read_raw_line().decode("utf-8", errors="replace")
+
+        file_type = cur.read_raw_line().strip().upper()
+        if file_type not in (b"ASCII", b"BINARY"):
+            raise ValueError(f"ASCII / BINARY の指定が不正です: {file_type!r}")
+        self.binary = file_type == b"BINARY"
+        cur.binary = self.binary
+
+        dataset = cur.read_line()
+        if not dataset or len(dataset) < 2 or dataset[1].upper() != "POLYDATA":
+            raise ValueError("DATASET POLYDATA 以外には対応していません。")
+
+        self.n_points = 0
+        self._points = None
+        self._cells = {}
+        self._arrays = {"point_data": {}, "cell_data": {}, "field_data": {}}
+
+        # 現在どの属性ブロックにいるか (None / "point_data" / "cell_data")
+        section = None
+        section_size = 0
+
+        while True:
+            header = cur.read_line()
+            if header is None:
+                break
+            keyword = header[0].upper()
+
+            if keyword == "POINTS":
+                self.n_points = int(header[1])
+                self._points = cur.skip_values(
+                    3 * self.n_points, _vtk_dtype(header[2], self.binary), (self.n_points, 3)
+                )
+                _skip_metadata(cur)
+
+            elif keyword in _CELL_KEYWORDS:
+                self._cells[keyword] = _index_cells(cur, header, self.version)
+
+            elif keyword == "POINT_DATA":
+                section, section_size = "point_data", int(header[1])
+
+            elif keyword == "CELL_DATA":
+                section, section_size = "cell_data", int(header[1])
+
+            elif keyword == "FIELD" and section is None:
+                _index_field(cur, int(header[2]), self._arrays["field_data"])
+
+            elif keyword == "METADATA":
+                _skip_metadata_body(cur)
+
+            elif section is not None:
+                _index_attribute(cur, header, section_size, self._arrays[section])
+                _skip_metadata(cur)
+
+            else:
+                raise ValueError(f"未対応のキーワードです: {header[0]}")
+
+    # ---- データの取り出し ----
+    def _load(self, sec, copy):
+        if self._mm is None:
+            raise ValueError("ファイルは既に閉じられています。")
+        if self.binary:
+            values = np.frombuffer(self._mm, dtype=sec.dtype, count=sec.count, offset=sec.offset)
+            if copy:
+                values = values.astype(sec.dtype.newbyteorder("="))
+        else:
+            values = parse_ascii_block(
+                self._mm, sec.offset, sec.end, sec.count, dtype=sec.dtype
+            )
+        return values.reshape(sec.shape)
+
+    def points(self, copy=False):
+        """点座標 (N,3) を返す"""
+        if self._points is None:
+            raise ValueError("VTK内に POINTS ブロックが見つかりません。")
+        return self._load(self._points, copy)
+
+    def cell_types(self):
+        """ファイルに含まれるセル配列の種類（"LINES" など）のリスト"""
+        return list(self._cells)
+
+    def cells(self, kind="LINES"):
+        """セル配列 kind を (offsets, connectivity) の int64 配列で返す"""
+        try:
+            secs = self._cells[kind.upper()]
+        except KeyError:
+            raise ValueError(f"VTK内に {kind} ブロックが見つかりません。")
+        if len(secs) == 2:
+            offsets, connectivity = (self._load(s, copy=True) for s in secs)
+            return offsets.astype(np.int64), connectivity.astype(np.int64)
+        return _legacy_cells_to_offsets(self._load(secs[0], copy=True))
+
+    def array_names(self, section="point_data"):
+        """section（"point_data" / "cell_data" / "field_data"）に含まれる配列名のリスト"""
+        return list(self._arrays[section])
+
+    def _array(self, section, name, copy):
+        try:
+            sec = self._arrays[section][name]
+        except KeyError:
+            raise ValueError(f"{section} に配列 {name} が見つかりません。")
+        return self._load(sec, copy)
+
+    def point_array(self, name, copy=False):
+        """POINT_DATA の配列 name（SCALARS / FIELD など）を返す"""
+        return self._array("point_data", name, copy)
+
+    def cell_array(self, name, copy=False):
+        """CELL_DATA の配列 name を返す"""
+        return self._array("cell_data", name, copy)
+
+    def field_array(self, name, copy=False):
+        """データセット全体の FIELD 配列 name を返す"""
+        return self._array("field_data", name, copy)
+
+
+def read_vtk_polydata(vtk_path):
+    """
+    legacy VTK (POLYDATA) を読み込み、以下のキーを持つ dict を返す。
+    （全配列をコピーして返すので、ファイルは閉じてよい）
+
+    - "points"     : 点座標 (N,3) ndarray
+    - "cells"      : {"LINES": (offsets, connectivity), ...}
+    - "point_data" : {配列名: ndarray}  （SCALARS / FIELD など）
+    - "cell_data"  : {配列名: ndarray}
+    - "field_data" : {配列名: ndarray}  （データセット全体の FIELD）
+    - "binary"     : BINARY 形式なら True
+    """
+    with VtkLegacyFile(vtk_path) as vf:
+        result = {
+            "points": np.zeros((0, 3)),
+            "cells": {kind: vf.cells(kind) for kind in vf.cell_types()},
+            "point_data": {n: vf.point_array(n, copy=True) for n in vf.array_names("point_data")},
+            "cell_data": {n: vf.cell_array(n, copy=True) for n in vf.array_names("cell_data")},
+            "field_data": {n: vf.field_array(n, copy=True) for n in vf.array_names("field_data")},
+            "binary": vf.binary,
+        }
+        if vf.n_points:
+            result["points"] = vf.points(copy=True).astype(float)
+    return result
+
+
+def split_cells(offsets, connectivity):
+    """(offsets, connectivity) をセルごとの点インデックス配列のリストに分割する"""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.split(np.asarray(connectivity), offsets[1:-1])
+
+
+def read_vtk_points(vtk_path):
+    """legacy VTK から点座標 (N,3) だけを返す（他の配列は読まない）"""
+    with VtkLegacyFile(vtk_path) as vf:
+        return vf.points(copy=True).astype(float)
+
+
+def read_vtk_point_array(vtk_path, name):
+    """legacy VTK から POINT_DATA の配列 name だけを返す（他の配列は読まない）"""
+    with VtkLegacyFile(vtk_path) as vf:
+        return vf.point_array(name, copy=True)